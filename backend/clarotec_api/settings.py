@@ -16,6 +16,7 @@ COMPONENTES CLAVE:
 from datetime import timedelta  # Importacion de timedelta para configuracion de JWT
 from pathlib import Path  # Importacion de Path para definicion de directorio base
 import os  # Importacion de os para variables de entorno
+from corsheaders.defaults import default_headers  # Importacion de los headers CORS por defecto
 
 # Definicion de Directorio Base
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -57,6 +58,7 @@ AUTH_USER_MODEL = 'usuarios.User'
 # Definicion de Middleware
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',  # Seguridad
+    'gestion.middleware.CompresionMiddleware',  # Compresión Brotli/gzip de respuestas de texto
     'django.contrib.sessions.middleware.SessionMiddleware',  # Sesiones
     'corsheaders.middleware.CorsMiddleware',  # CORS
     'django.middleware.common.CommonMiddleware',  # Middleware común
@@ -151,14 +153,32 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'  # Campo por defecto
 # CORS protege la API impidiendo que sitios web falsos consuman los datos
 CORS_ALLOWED_ORIGINS = os.environ.get(
     'CORS_ALLOWED_ORIGINS', "http://localhost:3000,http://127.0.0.1:3000").split(',')  # Dominios permitidos
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')  # Reintentos idempotentes de solicitudes
 
 # Configuración de REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (  # Clases de autenticación
         'rest_framework_simplejwt.authentication.JWTAuthentication',  # Clase de autenticación
     ),
+    'DEFAULT_RENDERER_CLASSES': (  # Clases de renderizado
+        'gestion.renderers.ORJSONRenderer',  # JSON con orjson (ver 'python manage.py benchmark_json')
+        'rest_framework.renderers.BrowsableAPIRenderer',  # API navegable
+    ),
 }
 
+# Compresión de respuestas (gestion/middleware.py)
+COMPRESION_MINIMO = int(os.environ.get('COMPRESION_MINIMO', '1024'))  # Bytes mínimos para comprimir
+# Content-Type comprimibles (prefijos). Solo JSON: el HTML (admin, API navegable, formularios con
+# token CSRF) queda sin comprimir para no exponerlo a BREACH
+COMPRESION_TIPOS = ('application/json',)
+COMPRESION_NIVEL_BROTLI = int(os.environ.get('COMPRESION_NIVEL_BROTLI', '4'))  # 0-11 (4: rápido para respuestas dinámicas)
+COMPRESION_NIVEL_GZIP = int(os.environ.get('COMPRESION_NIVEL_GZIP', '6'))  # 1-9
+
+# Paginación por cursor de los listados de pedidos (gestion/pagination.py)
+PEDIDOS_PAGINA = int(os.environ.get('PEDIDOS_PAGINA', '50'))  # Pedidos por página por defecto
+PEDIDOS_PAGINA_MAXIMA = int(os.environ.get('PEDIDOS_PAGINA_MAXIMA', '500'))  # Máximo aceptado en ?page_size=
+PEDIDOS_CAMBIOS_MARGEN = int(os.environ.get('PEDIDOS_CAMBIOS_MARGEN', '5'))  # Retraso (s) del cursor de cambios
+
 # Configuración de Simple JWT
 
 SIMPLE_JWT = {
@@ -180,6 +200,73 @@ EMAIL_USE_TLS = True  # Uso de TLS
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', 'correoclarotec@gmail.com')  # Usuario de correo
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', 'uovd swcs xxkw gchg')  # Contraseña de correo
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER  # Email de origen
+# Segundos máximos de espera de la conexión SMTP (evita workers colgados ante un bloqueo de red)
+EMAIL_TIMEOUT = int(os.environ.get('EMAIL_TIMEOUT', '30'))
+
+# Bandeja de salida de correos (gestion/outbox.py, worker 'python manage.py run_outbox')
+EMAIL_OUTBOX_LOTE = int(os.environ.get('EMAIL_OUTBOX_LOTE', '50'))  # Correos por lote (una conexión SMTP)
+EMAIL_OUTBOX_MAX_INTENTOS = int(os.environ.get('EMAIL_OUTBOX_MAX_INTENTOS', '6'))  # Intentos antes de 'fallido'
+EMAIL_OUTBOX_BACKOFF = 60  # Segundos de espera tras el primer fallo (se duplica en cada intento)
+EMAIL_OUTBOX_BACKOFF_MAXIMO = 3600  # Tope de la espera entre intentos
+EMAIL_OUTBOX_BLOQUEO = 600  # Segundos tras los que un correo 'enviando' de un worker caído se reintenta
+
+# Claves Idempotency-Key de las escrituras públicas (gestion/idempotencia.py)
+IDEMPOTENCIA_TTL_HORAS = int(os.environ.get('IDEMPOTENCIA_TTL_HORAS', '24'))  # Vigencia de una clave
+IDEMPOTENCIA_LOTE = 1000  # Claves eliminadas por sentencia al purgar
+
+# Transiciones de estado en lote (confirmar pago / despachar varios pedidos, gestion/transiciones.py)
+TRANSICIONES_LOTE_MAXIMO = int(os.environ.get('TRANSICIONES_LOTE_MAXIMO', '500'))  # Pedidos máximos por lote
 
 # URL del Frontend (Para correos y enlaces)
 FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:3000')  # URL del Frontend
+
+# BI: Usar la tabla de hechos VentasDiarias para KPIs (sin filtro de fechas), tendencia mensual
+# y facetas de filtro. La migración 0015 la puebla; 'reconstruir_ventas_diarias' la regenera.
+BI_USAR_TABLA_HECHOS = os.environ.get('BI_USAR_TABLA_HECHOS', 'True') == 'True'
+
+
+def _cache_desde_url(url, nombre_local):
+    """
+    Configuración de caché a partir de una URL:
+    vacío = memoria local del proceso; 'file:///ruta/directorio' = archivos;
+    'redis://host:6379/1' = Redis o compatible (requiere el paquete 'redis').
+    """
+    if url.startswith(('redis://', 'rediss://')):
+        return {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': url}
+    if url.startswith('file://'):
+        return {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': url[len('file://'):]}
+    return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': nombre_local}
+
+
+# Caché de respuestas BI (versionado; ver gestion/bi_cache.py)
+BI_CACHE_URL = os.environ.get('BI_CACHE_URL', '')
+
+# Caché de PDFs de cotización renderizados (direccionado por contenido; ver gestion/pdf.py).
+# En producción conviene 'file://' o 'redis://' para compartirlo entre los workers de gunicorn.
+PDF_CACHE_URL = os.environ.get('PDF_CACHE_URL', '')
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'bi': _cache_desde_url(BI_CACHE_URL, 'clarotec-bi'),
+    'pdf': _cache_desde_url(PDF_CACHE_URL, 'clarotec-pdf'),
+}
+BI_CACHE_ALIAS = 'bi'
+# Segundos de vida de cada respuesta (0 desactiva el caché BI)
+BI_CACHE_TTL = int(os.environ.get('BI_CACHE_TTL', '3600'))
+PDF_CACHE_ALIAS = 'pdf'
+# Segundos de vida de cada PDF (0 desactiva el caché de PDFs)
+PDF_CACHE_TTL = int(os.environ.get('PDF_CACHE_TTL', str(7 * 24 * 3600)))
+
+# Motor de PDF de cotizaciones: 'xhtml2pdf' (plantilla HTML) o 'reportlab' (nativo, más rápido)
+PDF_MOTOR = os.environ.get('PDF_MOTOR', 'xhtml2pdf')
+
+# Servicio de render de PDFs (pool de procesos por worker; ver gestion/pdf_service.py)
+PDF_POOL_WORKERS = int(os.environ.get('PDF_POOL_WORKERS', '2'))  # Procesos por worker (0 = sin pool)
+PDF_POOL_CONTEXTO = 'forkserver'  # Método de inicio de los procesos (no hereda conexiones ni hilos)
+PDF_POOL_MAX_TAREAS = 200  # Renders por proceso antes de reciclarlo (acota fugas de memoria)
+PDF_MAX_CONCURRENCIA = int(os.environ.get('PDF_MAX_CONCURRENCIA', '4'))  # Renders en curso por worker
+PDF_ESPERA_COLA = 10  # Segundos máximos esperando cupo antes de responder 503
+PDF_TIMEOUT = int(os.environ.get('PDF_TIMEOUT', '30'))  # Segundos máximos por render
+# Exportación masiva de cotizaciones en ZIP (pedidos/pdf/zip/)
+PDF_ZIP_LOTE = PDF_MAX_CONCURRENCIA  # PDFs convertidos en paralelo (y en memoria) a la vez
+PDF_ZIP_MAXIMO = int(os.environ.get('PDF_ZIP_MAXIMO', '2000'))  # Cotizaciones máximas por archivo
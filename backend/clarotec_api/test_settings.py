@@ -12,3 +12,10 @@ DATABASES = {
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
+
+# Caché BI desactivado por defecto en pruebas (el contador de versión se reinicia
+# con cada prueba); las pruebas del caché lo activan explícitamente.
+BI_CACHE_TTL = 0
+
+# PDFs renderizados en el mismo proceso (las pruebas del pool lo activan explícitamente)
+PDF_POOL_WORKERS = 0
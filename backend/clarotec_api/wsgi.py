@@ -15,3 +15,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'clarotec_api.settings')
 
 # Obtiene la aplicación WSGI de Django.
 application = get_wsgi_application()
+
+# Crea el pool caliente de render de PDFs de este worker (fuentes de reportlab cargadas una vez).
+from gestion.pdf_service import iniciar_pool  # noqa: E402
+
+iniciar_pool()
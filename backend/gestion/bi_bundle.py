@@ -0,0 +1,240 @@
+"""
+Secciones BI y Bundle de un Solo Viaje.
+
+PROPOSITO:
+    Calcula los payloads de los endpoints de BI (kpis, dashboard, rentabilidad,
+    filter_options) a partir de un ContextoBI compartido. Los endpoints individuales
+    usan un contexto por request; 'bi/bundle/' usa un único contexto para todas las
+    secciones solicitadas, de modo que:
+    - Los filtros se interpretan una sola vez.
+    - El conjunto de clientes recurrentes se evalúa una sola vez (IDs en memoria)
+      en lugar de re-derivarse como subconsulta en cada consulta.
+    - Las filas de pedidos materializadas para 'rentabilidad' se reutilizan en
+      'dashboard' (ventas por región) sin volver a leer la tabla de pedidos.
+"""
+from collections import defaultdict  # Acumuladores
+from django.conf import settings  # Configuración del proyecto
+from django.db.models import Sum  # Agregaciones
+from django.db.models.functions import Coalesce, TruncMonth  # Funciones SQL
+from django.utils.functional import cached_property  # Evaluación perezosa compartida
+from .bi_filters import (  # Compilador de filtros BI
+    filtrar_pedidos,
+    filtrar_ventas_diarias,
+    clientes_recurrentes,
+    CAMPO_FECHA_DESPACHO,
+    CAMPO_FECHA_ACTUALIZACION
+)
+from .bi_metrics import calcular_kpis, calcular_kpis_hechos  # Motor de KPIs
+from .bi_facetas import calcular_facetas  # Motor de facetas
+from .models import ItemsPedido  # Modelo de items
+
+# Secciones disponibles en 'bi/bundle/' (en el orden en que se calculan)
+SECCIONES = ('rentabilidad', 'kpis', 'dashboard', 'filter_options')
+
+
+class ContextoBI:
+    """
+    Estado compartido entre las secciones BI de un mismo request.
+    Cada pieza se calcula de forma perezosa y a lo más una vez.
+    Con compartir=True el conjunto de clientes recurrentes se materializa una vez
+    y se reutiliza en todas las consultas (útil cuando hay varias secciones).
+    """
+
+    def __init__(self, spec, compartir=False):
+        self.spec = spec
+        self.compartir = compartir
+        self.usar_hechos = settings.BI_USAR_TABLA_HECHOS
+
+    @cached_property
+    def recurrentes(self):
+        """IDs de clientes recurrentes (None = usar la subconsulta en cada consulta)."""
+        if not self.compartir:
+            return None
+        return frozenset(clientes_recurrentes().values_list('id', flat=True))
+
+    @cached_property
+    def pedidos(self):
+        """Pedidos completados filtrados por fecha de despacho."""
+        return filtrar_pedidos(self.spec, campo_fecha=CAMPO_FECHA_DESPACHO, recurrentes=self.recurrentes)
+
+    @cached_property
+    def filas_pedidos(self):
+        """Filas materializadas de los pedidos filtrados (columnas desnormalizadas)."""
+        return list(self.pedidos.order_by('fecha_despacho').values(
+            'id', 'fecha_despacho', 'fecha_actualizacion', 'cliente__nombre', 'neto', 'utilidad',
+            'region', 'subtotal'))
+
+    def ventas(self, spec=None):
+        """Filas de VentasDiarias filtradas por la especificación (o una variante)."""
+        return filtrar_ventas_diarias(spec or self.spec, recurrentes=self.recurrentes)
+
+    def filas_cargadas(self):
+        """True si las filas de pedidos ya fueron materializadas por otra sección."""
+        return 'filas_pedidos' in self.__dict__
+
+
+def seccion_rentabilidad(ctx):
+    """Payload de 'bi/rentabilidad/': ganancia y margen por pedido completado."""
+    data = []
+
+    # Lectura de columnas (totales desnormalizados): sin consultas por pedido
+    for p in ctx.filas_pedidos:
+        # Ingreso Neto (Subtotal + Recargo) y Ganancia (Neto - Costo de compra)
+        ingreso_neto = p['neto']
+        ganancia = p['utilidad']
+
+        margen = 0
+        if ingreso_neto > 0:
+            margen = (ganancia / ingreso_neto) * 100
+
+        fecha = p['fecha_despacho'] or p['fecha_actualizacion']
+
+        data.append({
+            'id': p['id'],
+            # Fecha para el eje X (Fallback a actualizacion)
+            'fecha': fecha.strftime('%Y-%m-%d'),
+            'cliente': p['cliente__nombre'],
+            'ganancia': float(ganancia),  # Decimal a float para JSON
+            'margen': round(float(margen), 2),
+            'total_venta': float(ingreso_neto)
+        })
+    return data
+
+
+def seccion_kpis(ctx):
+    """Payload de 'bi/kpis/': recurrencia, margen operacional y desgloses."""
+    # Los KPIs filtran por fecha_actualizacion (consistencia histórica) y la tabla de hechos está
+    # agrupada por fecha de venta: solo se usa sin filtro temporal, donde ambas dan lo mismo
+    if ctx.usar_hechos and ctx.spec.sin('months') == ctx.spec:
+        return calcular_kpis_hechos(ctx.ventas(), recurrentes=ctx.recurrentes)
+
+    pedidos = filtrar_pedidos(ctx.spec, campo_fecha=CAMPO_FECHA_ACTUALIZACION, recurrentes=ctx.recurrentes)
+    return calcular_kpis(pedidos, recurrentes=ctx.recurrentes)
+
+
+def _ventas_por_region(ctx):
+    """Suma del subtotal por región (desde las filas materializadas si ya existen)."""
+    if ctx.filas_cargadas():
+        totales = defaultdict(int)
+        for fila in ctx.filas_pedidos:
+            totales[fila['region']] += fila['subtotal']
+        filas = [{'region': r, 'total_ventas': t} for r, t in totales.items() if t > 0]
+        return sorted(filas, key=lambda f: f['total_ventas'], reverse=True)
+
+    # Suma del subtotal desnormalizado de cada pedido (sin unir con ItemsPedido)
+    return ctx.pedidos.values('region').annotate(
+        total_ventas=Sum('subtotal')
+    ).filter(total_ventas__gt=0).order_by('-total_ventas')
+
+
+def _tendencia_mensual(ctx):
+    """Ventas, costos y utilidad agrupados por mes de venta."""
+    if ctx.usar_hechos:
+        # Filas diarias de la tabla de hechos (no depende del volumen histórico de pedidos)
+        return ctx.ventas().annotate(
+            mes=TruncMonth('fecha')
+        ).values('mes').annotate(
+            ventas=Sum('venta'),
+            costos=Sum('costo'),
+            utilidad=Sum('utilidad')
+        ).order_by('mes')
+
+    # Mes de la venta: fecha de despacho (fallback a fecha de actualización)
+    return ctx.pedidos.annotate(
+        mes=TruncMonth(Coalesce('fecha_despacho', 'fecha_actualizacion'))
+    ).values('mes').annotate(
+        # Ventas: TOTAL REAL (Subtotal + Recargo + IVA + Envío)
+        ventas=Sum('total'),
+        # Costos: costo de compra de items
+        costos=Sum('costo_compra'),
+        # Utilidad Neta: (Subtotal + Recargo) - Costos (sin IVA ni Envío)
+        utilidad=Sum('utilidad')
+    ).order_by('mes')
+
+
+def seccion_dashboard(ctx):
+    """Payload de 'bi/dashboard-stats/': top productos, ventas por región y tendencia mensual."""
+    # 1. Top 10 Productos (Por Ingresos)
+    # Necesitamos unir con ItemsPedido
+    top_products_qs = ItemsPedido.objects.filter(pedido__in=ctx.pedidos).values('descripcion').annotate(
+        total_vendido=Sum('subtotal'),
+        cantidad_total=Sum('cantidad')
+    ).order_by('-total_vendido')[:10]
+
+    top_products = [
+        {
+            # Truncar nombre largo
+            'name': item['descripcion'][:20] + '...' if len(item['descripcion']) > 20 else item['descripcion'],
+            'full_name': item['descripcion'],
+            'value': float(item['total_vendido']),
+            'cantidad': item['cantidad_total']
+        }
+        for item in top_products_qs
+    ]
+
+    # 2. Ventas por Región
+    sales_by_region = [
+        {
+            'name': item['region'],
+            'value': float(item['total_ventas'])
+        }
+        for item in _ventas_por_region(ctx)
+    ]
+
+    # 3. Tendencia Mensual de Ingresos
+    monthly_trend = [
+        {
+            'name': fila['mes'].strftime('%Y-%m'),
+            'ventas': float(fila['ventas']),
+            'costos': float(fila['costos']),
+            'utilidad': float(fila['utilidad'])
+        }
+        for fila in _tendencia_mensual(ctx)
+    ]
+
+    return {
+        'top_products': top_products,
+        'sales_by_region': sales_by_region,
+        'monthly_trend': monthly_trend
+    }
+
+
+def seccion_filter_options(ctx):
+    """
+    Payload de 'bi/filter-options/': opciones de filtro dinámicas (facetas) con exclusión
+    y cantidad de pedidos por valor, calculadas en una sola consulta (ver bi_facetas).
+    """
+    return calcular_facetas(ctx.spec, ctx.usar_hechos, recurrentes=ctx.recurrentes)
+
+
+# Constructor de cada sección del bundle
+CONSTRUCTORES = {
+    'rentabilidad': seccion_rentabilidad,
+    'kpis': seccion_kpis,
+    'dashboard': seccion_dashboard,
+    'filter_options': seccion_filter_options,
+}
+
+
+def parse_secciones(query_params):
+    """
+    Lee 'sections' (lista separada por comas o 'sections[]').
+    Sin parámetro se devuelven todas. Lanza ValueError si alguna sección no existe.
+    """
+    valores = query_params.getlist('sections[]')
+    if not valores and query_params.get('sections'):
+        valores = query_params.get('sections').split(',')
+    solicitadas = {v.strip() for v in valores if v and v.strip()}
+
+    desconocidas = solicitadas - set(SECCIONES)
+    if desconocidas:
+        raise ValueError(f"Secciones desconocidas: {', '.join(sorted(desconocidas))}. "
+                         f"Opciones: {', '.join(SECCIONES)}.")
+    # Orden fijo: 'rentabilidad' primero para que 'dashboard' reutilice sus filas
+    return [s for s in SECCIONES if s in solicitadas] if solicitadas else list(SECCIONES)
+
+
+def construir_bundle(spec, secciones):
+    """Calcula las secciones indicadas compartiendo un único ContextoBI."""
+    ctx = ContextoBI(spec, compartir=True)
+    return {seccion: CONSTRUCTORES[seccion](ctx) for seccion in secciones}
@@ -0,0 +1,167 @@
+"""
+Caché Versionado de Respuestas BI.
+
+PROPOSITO:
+    Evita recalcular los endpoints de BI en cada request. Las respuestas se guardan
+    en el caché configurado en settings.BI_CACHE_ALIAS (memoria local, archivos o Redis)
+    con una clave compuesta por:
+        versión de datos BI + endpoint + rol del usuario + especificación de filtros normalizada.
+
+INVALIDACIÓN:
+    La versión es un contador global en la base de datos (VersionDatosBI), compartido por
+    todos los workers de gunicorn. Se incrementa al confirmar la transacción que modifica
+    datos BI (ver notificar_cambio_bi); las claves antiguas simplemente dejan de usarse
+    y expiran por TTL.
+
+MÉTRICAS:
+    Contadores de aciertos/fallos por endpoint, expuestos en 'bi/cache-stats/'.
+"""
+import hashlib  # Hash de la especificación de filtros
+from functools import wraps  # Decorador que preserva metadatos
+from django.conf import settings  # Configuración del proyecto
+from django.core.cache import caches  # Backends de caché
+from django.db import transaction  # Ejecución post-commit
+from django.db.models import F  # Incremento atómico
+from rest_framework.response import Response  # Respuesta DRF
+from .bi_filters import parse_bi_filters  # Normalización de filtros
+from .models import VersionDatosBI  # Contador de versión
+
+# Fila única del contador de versión
+VERSION_PK = 1
+
+# Endpoints cacheados (nombre usado en claves y métricas)
+ENDPOINTS_CACHEADOS = ('rentabilidad', 'kpis', 'dashboard', 'filter-options', 'bundle')
+
+
+def _cache():
+    """Backend de caché usado por BI."""
+    return caches[settings.BI_CACHE_ALIAS]
+
+
+def cache_bi_habilitado():
+    """El caché BI se desactiva con BI_CACHE_TTL = 0."""
+    return settings.BI_CACHE_TTL > 0
+
+
+def obtener_version():
+    """Versión actual de los datos BI (0 si nunca se ha incrementado)."""
+    return VersionDatosBI.objects.filter(pk=VERSION_PK).values_list('version', flat=True).first() or 0
+
+
+def incrementar_version():
+    """Incrementa atómicamente la versión de los datos BI. Retorna la nueva versión."""
+    actualizados = VersionDatosBI.objects.filter(pk=VERSION_PK).update(version=F('version') + 1)
+    if not actualizados:
+        _, creado = VersionDatosBI.objects.get_or_create(pk=VERSION_PK, defaults={'version': 1})
+        if not creado:
+            # Otro worker creó la fila en paralelo
+            VersionDatosBI.objects.filter(pk=VERSION_PK).update(version=F('version') + 1)
+    return obtener_version()
+
+
+def notificar_cambio_bi():
+    """
+    Registra que los datos BI cambiaron. El incremento se difiere al commit de la
+    transacción en curso: así ningún worker puede cachear, con la versión nueva,
+    datos que todavía no son visibles (fuera de una transacción se ejecuta de inmediato).
+    """
+    transaction.on_commit(incrementar_version)
+
+
+def _rol(request):
+    """Nombre del rol del usuario del request (parte de la clave de caché)."""
+    rol = getattr(request.user, 'rol', None)
+    return rol.nombre if rol else 'sin-rol'
+
+
+def _valores_extra(query_params, nombre):
+    """Valores normalizados (ordenados, sin duplicados) de un parámetro adicional."""
+    valores = query_params.getlist(f'{nombre}[]') or query_params.get(nombre, '').split(',')
+    return ','.join(sorted({v.strip() for v in valores if v and v.strip()}))
+
+
+def clave_respuesta(endpoint, request, version, parametros_extra=()):
+    """
+    Clave de caché de la respuesta de un endpoint BI para el request dado.
+    'parametros_extra': query params propios del endpoint que también alteran la respuesta.
+    """
+    spec = parse_bi_filters(request.query_params)
+    partes = [spec.clave()] + [f'{nombre}={_valores_extra(request.query_params, nombre)}'
+                               for nombre in parametros_extra]
+    digest = hashlib.sha1('|'.join(partes).encode('utf-8')).hexdigest()
+    return f'bi:v{version}:{endpoint}:{_rol(request)}:{digest}'
+
+
+def _clave_contador(endpoint, tipo):
+    return f'bi:stats:{endpoint}:{tipo}'
+
+
+def _registrar(endpoint, tipo):
+    """Incrementa el contador de aciertos ('hits') o fallos ('misses') de un endpoint."""
+    cache = _cache()
+    clave = _clave_contador(endpoint, tipo)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        # El contador no existe aún (o expiró): se crea sin expiración
+        if not cache.add(clave, 1, timeout=None):
+            cache.incr(clave)
+
+
+def estadisticas():
+    """Aciertos, fallos y tasa de acierto por endpoint y globales."""
+    claves = [_clave_contador(e, t) for e in ENDPOINTS_CACHEADOS for t in ('hits', 'misses')]
+    valores = _cache().get_many(claves)
+
+    def tasa(hits, misses):
+        return round(hits / (hits + misses) * 100, 1) if hits + misses else 0.0
+
+    por_endpoint = {}
+    for endpoint in ENDPOINTS_CACHEADOS:
+        hits = valores.get(_clave_contador(endpoint, 'hits'), 0)
+        misses = valores.get(_clave_contador(endpoint, 'misses'), 0)
+        por_endpoint[endpoint] = {'hits': hits, 'misses': misses, 'hit_rate': tasa(hits, misses)}
+
+    total_hits = sum(e['hits'] for e in por_endpoint.values())
+    total_misses = sum(e['misses'] for e in por_endpoint.values())
+    return {
+        'enabled': cache_bi_habilitado(),
+        'backend': settings.CACHES[settings.BI_CACHE_ALIAS]['BACKEND'],
+        'version': obtener_version(),
+        'hits': total_hits,
+        'misses': total_misses,
+        'hit_rate': tasa(total_hits, total_misses),
+        'endpoints': por_endpoint,
+    }
+
+
+def cache_respuesta_bi(endpoint, parametros_extra=()):
+    """
+    Decorador para el método get() de un endpoint BI.
+    Sirve la respuesta desde caché si existe para la versión de datos actual;
+    si no, la calcula y guarda (solo respuestas 200).
+    Agrega el header 'X-BI-Cache: HIT|MISS' para diagnóstico.
+    """
+    def decorador(metodo):
+        @wraps(metodo)
+        def envoltura(self, request, *args, **kwargs):
+            if not cache_bi_habilitado():
+                return metodo(self, request, *args, **kwargs)
+
+            cache = _cache()
+            clave = clave_respuesta(endpoint, request, obtener_version(), parametros_extra)
+            datos = cache.get(clave)
+            if datos is not None:
+                _registrar(endpoint, 'hits')
+                response = Response(datos)
+                response['X-BI-Cache'] = 'HIT'
+                return response
+
+            _registrar(endpoint, 'misses')
+            response = metodo(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(clave, response.data, timeout=settings.BI_CACHE_TTL)
+            response['X-BI-Cache'] = 'MISS'
+            return response
+        return envoltura
+    return decorador
@@ -0,0 +1,97 @@
+"""
+Motor de Facetas BI (Opciones de Filtro).
+
+PROPOSITO:
+    Calcula todas las facetas de BIFilterOptionsView (clientes, regiones, comunas, meses)
+    con lógica de exclusión a partir de UNA sola consulta, y entrega además la cantidad
+    de pedidos completados por cada valor de faceta.
+
+DISEÑO:
+    - Se leen una vez las filas agrupadas por (día, cliente, región, comuna), aplicando en
+      SQL solo el filtro que ninguna faceta excluye (tipo de cliente).
+      Con la tabla de hechos activa, esas filas son directamente las de VentasDiarias.
+    - Cada faceta se acumula en Python evaluando sobre cada fila todos los filtros
+      EXCEPTO el de su propia categoría:
+        clients  -> todo excepto clientes
+        regions  -> todo excepto región y comuna
+        comunas  -> todo excepto comuna (la región sí limita: jerárquico)
+        months   -> todo excepto meses / rango de fechas
+"""
+from collections import Counter  # Conteo por valor de faceta
+from django.db.models import Count  # Agregación
+from django.db.models.functions import TruncDate  # Día de la fecha
+from .bi_filters import filtrar_pedidos, filtrar_ventas_diarias, CAMPO_FECHA_ACTUALIZACION  # Compiladores
+
+
+def _filas_base(spec, usar_hechos, recurrentes=None):
+    """
+    Única consulta del motor: filas (fecha, cliente_id, region, comuna, n) donde 'n'
+    es la cantidad de pedidos completados. Solo se aplica el filtro de tipo de cliente.
+    """
+    base = spec.sin('months', 'clients', 'regions', 'comunas')
+    if usar_hechos:
+        # VentasDiarias ya es única por (fecha, región, comuna, cliente)
+        return filtrar_ventas_diarias(base, recurrentes=recurrentes).values_list(
+            'fecha', 'cliente_id', 'region', 'comuna', 'pedidos')
+
+    # Sin tabla de hechos: se agrupan los pedidos por día de actualización (semántica histórica)
+    return filtrar_pedidos(base, campo_fecha=CAMPO_FECHA_ACTUALIZACION, recurrentes=recurrentes).annotate(
+        _dia=TruncDate(CAMPO_FECHA_ACTUALIZACION)
+    ).values_list('_dia', 'cliente_id', 'region', 'comuna').annotate(n=Count('id')).order_by()
+
+
+def _predicado_fecha(spec):
+    """Función que indica si un día cumple el filtro temporal de la especificación."""
+    if spec.months:
+        meses = set(spec.months)
+        return lambda dia: dia.strftime('%Y-%m') in meses
+
+    def cumple(dia):
+        if spec.start_date and dia < spec.start_date:
+            return False
+        if spec.end_date and dia > spec.end_date:
+            return False
+        return True
+    return cumple
+
+
+def calcular_facetas(spec, usar_hechos, recurrentes=None):
+    """
+    Calcula las facetas con exclusión y sus conteos de pedidos.
+    Retorna: {'clients': [...], 'regions': [...], 'comunas': [...], 'months': [...],
+              'counts': {'clients': {id: n}, 'regions': {...}, 'comunas': {...}, 'months': {...}}}
+    """
+    cumple_fecha = _predicado_fecha(spec)
+    clientes_sel = set(spec.cliente_ids)
+    regiones_sel = set(spec.regions)
+    comunas_sel = set(spec.comunas)
+
+    clientes, regiones, comunas, meses = Counter(), Counter(), Counter(), Counter()
+
+    for dia, cliente_id, region, comuna, n in _filas_base(spec, usar_hechos, recurrentes):
+        ok_fecha = cumple_fecha(dia)
+        ok_cliente = not clientes_sel or cliente_id in clientes_sel
+        ok_region = not regiones_sel or region in regiones_sel
+        ok_comuna = not comunas_sel or comuna in comunas_sel
+
+        if ok_fecha and ok_region and ok_comuna:
+            clientes[cliente_id] += n
+        if ok_fecha and ok_cliente and region:
+            regiones[region] += n
+        if ok_fecha and ok_cliente and ok_region and comuna:
+            comunas[comuna] += n
+        if ok_cliente and ok_region and ok_comuna:
+            meses[dia.strftime('%Y-%m')] += n
+
+    return {
+        'clients': sorted(clientes),
+        'regions': sorted(regiones),
+        'comunas': sorted(comunas),
+        'months': sorted(meses, reverse=True),
+        'counts': {
+            'clients': dict(clientes),
+            'regions': dict(regiones),
+            'comunas': dict(comunas),
+            'months': dict(meses),
+        }
+    }
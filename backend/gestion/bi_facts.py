@@ -0,0 +1,131 @@
+"""
+Mantenimiento de la Tabla de Hechos BI (VentasDiarias).
+
+PROPOSITO:
+    Mantiene VentasDiarias sincronizada con los pedidos completados.
+    - Incremental: al guardar un pedido que entra, sale o cambia estando en 'completado'
+      se re-agregan solo las filas (día, región, comuna, cliente) afectadas.
+    - Reconstrucción completa: comando 'reconstruir_ventas_diarias'.
+
+    Re-agregar la fila completa de una clave (en lugar de aplicar deltas) hace que
+    la operación sea idempotente: repetirla o ejecutarla fuera de orden no descuadra.
+
+    Todo cambio en la tabla de hechos incrementa la versión de datos BI (invalida el caché BI).
+"""
+from datetime import datetime, time, timedelta  # Rangos de fecha
+from decimal import Decimal  # Precisión monetaria
+from django.db import transaction  # Transacciones
+from django.db.models import Count, Q, Sum, Value, CharField  # Agregaciones
+from django.db.models.functions import Coalesce, TruncDate  # Funciones SQL
+from django.utils import timezone  # Fechas con zona horaria
+from .models import Pedido, VentasDiarias  # Modelos
+from .bi_cache import notificar_cambio_bi  # Invalidación del caché BI
+
+# Fecha de la venta: despacho, con fallback a la última actualización
+FECHA_VENTA = Coalesce('fecha_despacho', 'fecha_actualizacion')
+
+
+def clave_ventas_diarias(pedido):
+    """Clave (fecha, region, comuna, cliente_id) de la fila de VentasDiarias de un pedido."""
+    fecha_venta = pedido.fecha_despacho or pedido.fecha_actualizacion
+    fecha = timezone.localtime(fecha_venta).date() if fecha_venta else timezone.localdate()
+    return (fecha, pedido.region or '', pedido.comuna or '', pedido.cliente_id)
+
+
+def _agregar(pedidos):
+    """
+    Agrupa pedidos completados por (fecha, región, comuna, cliente) y suma sus totales
+    desnormalizados. Región/comuna nulas se agrupan junto con las vacías ('').
+    """
+    return pedidos.annotate(
+        _fecha=TruncDate(FECHA_VENTA),
+        _region=Coalesce('region', Value(''), output_field=CharField()),
+        _comuna=Coalesce('comuna', Value(''), output_field=CharField()),
+    ).values('_fecha', '_region', '_comuna', 'cliente_id').annotate(
+        _pedidos=Count('id'),
+        _venta=Sum('total'),
+        _neto=Sum('neto'),
+        _costo=Sum('costo_compra'),
+        _utilidad=Sum('utilidad'),
+        _iva=Sum('iva'),
+        _envios=Sum('costo_envio_estimado'),
+    ).order_by()
+
+
+def _fila_ventas_diarias(agregado):
+    """Construye una instancia VentasDiarias (sin guardar) a partir de una fila agregada."""
+    return VentasDiarias(
+        fecha=agregado['_fecha'],
+        region=agregado['_region'],
+        comuna=agregado['_comuna'],
+        cliente_id=agregado['cliente_id'],
+        pedidos=agregado['_pedidos'],
+        venta=agregado['_venta'] or Decimal('0'),
+        neto=agregado['_neto'] or Decimal('0'),
+        costo=agregado['_costo'] or Decimal('0'),
+        utilidad=agregado['_utilidad'] or Decimal('0'),
+        iva=agregado['_iva'] or Decimal('0'),
+        envios=agregado['_envios'] or Decimal('0'),
+    )
+
+
+def _pedidos_de_clave(clave):
+    """Pedidos completados que aportan a una clave (fecha, región, comuna, cliente)."""
+    fecha, region, comuna, cliente_id = clave
+    inicio = timezone.make_aware(datetime.combine(fecha, time.min))
+    fin = inicio + timedelta(days=1)
+
+    # Región/comuna '' en la clave corresponden a NULL o '' en Pedido
+    q_region = Q(region=region) if region else Q(region__isnull=True) | Q(region='')
+    q_comuna = Q(comuna=comuna) if comuna else Q(comuna__isnull=True) | Q(comuna='')
+
+    return Pedido.objects.filter(estado='completado', cliente_id=cliente_id).filter(q_region, q_comuna).annotate(
+        _fecha_venta=FECHA_VENTA).filter(_fecha_venta__gte=inicio, _fecha_venta__lt=fin)
+
+
+def refrescar_ventas_diarias(*claves):
+    """
+    Re-agrega las filas de VentasDiarias indicadas (las claves None se ignoran).
+    Cada clave cuesta una agregación acotada a un cliente y un día.
+    """
+    claves = {c for c in claves if c is not None}
+    for clave in claves:
+        fecha, region, comuna, cliente_id = clave
+        with transaction.atomic():
+            agregado = next(iter(_agregar(_pedidos_de_clave(clave))), None)
+            filtro = {'fecha': fecha, 'region': region, 'comuna': comuna, 'cliente_id': cliente_id}
+            if agregado is None:
+                # Ya no quedan pedidos completados en esta clave
+                VentasDiarias.objects.filter(**filtro).delete()
+                continue
+
+            fila = _fila_ventas_diarias(agregado)
+            VentasDiarias.objects.update_or_create(
+                **filtro,
+                defaults={campo: getattr(fila, campo) for campo in
+                          ('pedidos', 'venta', 'neto', 'costo', 'utilidad', 'iva', 'envios')}
+            )
+    if claves:
+        notificar_cambio_bi()
+
+
+def reconstruir_ventas_diarias(batch_size=1000):
+    """
+    Reconstruye VentasDiarias desde cero a partir de todos los pedidos completados.
+    Retorna: cantidad de filas creadas.
+    """
+    creadas = 0
+    with transaction.atomic():
+        VentasDiarias.objects.all().delete()
+        lote = []
+        for agregado in _agregar(Pedido.objects.filter(estado='completado')).iterator(chunk_size=batch_size):
+            lote.append(_fila_ventas_diarias(agregado))
+            if len(lote) >= batch_size:
+                VentasDiarias.objects.bulk_create(lote)
+                creadas += len(lote)
+                lote = []
+        if lote:
+            VentasDiarias.objects.bulk_create(lote)
+            creadas += len(lote)
+        notificar_cambio_bi()
+    return creadas
@@ -0,0 +1,281 @@
+"""
+Compilador de Filtros BI (Business Intelligence).
+
+PROPOSITO:
+    Centraliza la lectura de los parámetros de filtro que comparten los endpoints de BI
+    (month[], start_date/end_date, cliente_id[], region[], comuna[], client_type[]).
+    Convierte los query params en una especificación canónica e inmutable (hashable)
+    y compila esa especificación en un único QuerySet de Pedidos apto para índices.
+
+DISEÑO:
+    - Rangos de fecha semi-abiertos [inicio, fin) sobre el campo datetime, en lugar de
+      lookups no indexables como 'fecha__date__gte' o 'fecha__year'/'fecha__month'.
+    - Los meses consecutivos seleccionados se fusionan en un solo rango.
+    - La segmentación Nuevo/Recurrente filtra por la columna indexada
+      Cliente.completed_order_count (más de un pedido completado).
+    - filtrar_ventas_diarias compila la misma especificación sobre la tabla de hechos
+      VentasDiarias (fecha de venta = despacho, con fallback a actualización).
+"""
+from dataclasses import dataclass, replace  # Especificación inmutable de filtros
+from datetime import date, datetime, time, timedelta  # Manejo de fechas
+from django.db.models import Q  # Condiciones
+from django.utils import timezone  # Fechas con zona horaria
+from .models import Cliente, Pedido, VentasDiarias  # Modelos de Cliente, Pedido y tabla de hechos
+
+# Campos de fecha usados por cada endpoint (se conservan las semánticas históricas)
+CAMPO_FECHA_DESPACHO = 'fecha_despacho'
+CAMPO_FECHA_ACTUALIZACION = 'fecha_actualizacion'
+
+# Facetas que pueden excluirse al compilar (lógica de exclusión de BIFilterOptionsView)
+FACETAS = ('months', 'clients', 'client_types', 'regions', 'comunas')
+
+
+@dataclass(frozen=True)
+class BIFilterSpec:
+    """
+    Especificación canónica de filtros BI.
+    Todos los campos son tuplas ordenadas y sin duplicados, por lo que dos requests
+    equivalentes (mismo filtro en distinto orden) producen la misma especificación.
+    """
+    months: tuple = ()
+    start_date: date = None
+    end_date: date = None
+    cliente_ids: tuple = ()
+    regions: tuple = ()
+    comunas: tuple = ()
+    client_type: str = None  # 'new', 'recurring' o None (ambos/ninguno = sin filtro)
+
+    def sin(self, *facetas):
+        """
+        Devuelve una copia de la especificación sin las facetas indicadas.
+        'months' elimina tanto los meses como el rango start_date/end_date.
+        """
+        cambios = {}
+        if 'months' in facetas:
+            cambios.update(months=(), start_date=None, end_date=None)
+        if 'clients' in facetas:
+            cambios['cliente_ids'] = ()
+        if 'client_types' in facetas:
+            cambios['client_type'] = None
+        if 'regions' in facetas:
+            cambios['regions'] = ()
+        if 'comunas' in facetas:
+            cambios['comunas'] = ()
+        return replace(self, **cambios)
+
+    def clave(self):
+        """Representación textual estable (útil para claves de caché)."""
+        return '|'.join([
+            'm=' + ','.join(self.months),
+            'sd=' + (self.start_date.isoformat() if self.start_date else ''),
+            'ed=' + (self.end_date.isoformat() if self.end_date else ''),
+            'c=' + ','.join(str(c) for c in self.cliente_ids),
+            'r=' + ','.join(self.regions),
+            'co=' + ','.join(self.comunas),
+            't=' + (self.client_type or ''),
+        ])
+
+
+def _lista_param(query_params, nombre, separar=False):
+    """
+    Lee un filtro multi-valor aceptando 'nombre[]' (multi-select) o 'nombre' (fallback single).
+    Si separar=True, el valor single se interpreta como lista separada por comas.
+    """
+    valores = query_params.getlist(f'{nombre}[]')
+    if not valores and query_params.get(nombre):
+        valor = query_params.get(nombre)
+        valores = valor.split(',') if separar else [valor]
+    return [v.strip() for v in valores if v and v.strip()]
+
+
+def _parse_fecha(valor):
+    """Convierte 'YYYY-MM-DD' a date. Valores inválidos se ignoran (None)."""
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def _parse_mes(valor):
+    """Normaliza 'YYYY-MM' (acepta 'YYYY-M'). Devuelve None si no es un mes válido."""
+    try:
+        year, month = valor.split('-')
+        year, month = int(year), int(month)
+    except ValueError:
+        return None
+    if not (1 <= month <= 12) or year < 1:
+        return None
+    return f'{year:04d}-{month:02d}'
+
+
+def parse_bi_filters(query_params):
+    """
+    Construye la especificación canónica a partir de request.query_params.
+    Ej: ?month[]=2025-02&month[]=2025-01&region=RM,SUR&client_type[]=new
+    """
+    months = tuple(sorted({m for m in map(_parse_mes, _lista_param(query_params, 'month')) if m}))
+
+    cliente_ids = set()
+    for valor in _lista_param(query_params, 'cliente_id'):
+        try:
+            cliente_ids.add(int(valor))
+        except ValueError:
+            pass
+
+    client_types = set(_lista_param(query_params, 'client_type'))
+    filter_new = 'new' in client_types
+    filter_recurring = 'recurring' in client_types
+    client_type = None
+    # Si vienen ambos tipos no se filtra (se muestran todos)
+    if filter_new and not filter_recurring:
+        client_type = 'new'
+    elif filter_recurring and not filter_new:
+        client_type = 'recurring'
+
+    return BIFilterSpec(
+        months=months,
+        # Los meses tienen prioridad sobre el rango de fechas (en la UI se usa uno u otro)
+        start_date=None if months else _parse_fecha(query_params.get('start_date')),
+        end_date=None if months else _parse_fecha(query_params.get('end_date')),
+        cliente_ids=tuple(sorted(cliente_ids)),
+        regions=tuple(sorted(set(_lista_param(query_params, 'region', separar=True)))),
+        comunas=tuple(sorted(set(_lista_param(query_params, 'comuna', separar=True)))),
+        client_type=client_type,
+    )
+
+
+def _inicio_del_dia(dia):
+    """Datetime (aware) del inicio del día en la zona horaria actual."""
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def _mes_siguiente(year, month):
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def rangos_de_meses_fecha(months):
+    """
+    Fusiona meses 'YYYY-MM' (ordenados) en rangos semi-abiertos de fechas (date).
+    Ej: ['2025-01', '2025-02'] -> [(2025-01-01, 2025-03-01)]
+    """
+    rangos = []
+    for m in months:
+        year, month = map(int, m.split('-'))
+        inicio = date(year, month, 1)
+        fin = date(*_mes_siguiente(year, month), 1)
+        if rangos and rangos[-1][1] == inicio:
+            rangos[-1] = (rangos[-1][0], fin)
+        else:
+            rangos.append((inicio, fin))
+    return rangos
+
+
+def rangos_de_meses(months):
+    """
+    Fusiona meses 'YYYY-MM' (ordenados) en rangos semi-abiertos de datetimes.
+    Ej: ['2025-01', '2025-02', '2025-05'] -> [(2025-01-01, 2025-03-01), (2025-05-01, 2025-06-01)]
+    """
+    return [(_inicio_del_dia(inicio), _inicio_del_dia(fin)) for inicio, fin in rangos_de_meses_fecha(months)]
+
+
+def q_rango_fechas(spec, campo_fecha):
+    """
+    Condición temporal de la especificación sobre 'campo_fecha' (datetime).
+    Retorna None si la especificación no tiene filtro temporal.
+    """
+    if spec.months:
+        q = Q()
+        for inicio, fin in rangos_de_meses(spec.months):
+            q |= Q(**{f'{campo_fecha}__gte': inicio, f'{campo_fecha}__lt': fin})
+        return q
+
+    q = Q()
+    if spec.start_date:
+        q &= Q(**{f'{campo_fecha}__gte': _inicio_del_dia(spec.start_date)})
+    if spec.end_date:
+        # end_date es inclusivo: se compara contra el inicio del día siguiente
+        q &= Q(**{f'{campo_fecha}__lt': _inicio_del_dia(spec.end_date + timedelta(days=1))})
+    return q if q else None
+
+
+def clientes_recurrentes():
+    """
+    Subconsulta de IDs de clientes con más de un pedido completado (histórico).
+    Usa el agregado persistido en Cliente (columna indexada), sin agrupar pedidos.
+    """
+    return Cliente.objects.filter(completed_order_count__gt=1).values('id')
+
+
+def _q_tipo_cliente(spec, recurrentes):
+    """
+    Condición Nuevo/Recurrente. 'recurrentes' es la subconsulta de clientes recurrentes
+    o un conjunto de IDs ya evaluado (compartido entre varias consultas).
+    """
+    if spec.client_type == 'new':
+        return ~Q(cliente_id__in=recurrentes)
+    if spec.client_type == 'recurring':
+        return Q(cliente_id__in=recurrentes)
+    return None
+
+
+def filtrar_pedidos(spec, campo_fecha=CAMPO_FECHA_DESPACHO, queryset=None, recurrentes=None):
+    """
+    Compila la especificación en un QuerySet de pedidos completados.
+    Todas las condiciones se combinan en un único filter() para generar un solo WHERE.
+    Si se entrega 'recurrentes' (IDs ya evaluados) no se re-deriva la subconsulta de recurrencia.
+    """
+    if queryset is None:
+        queryset = Pedido.objects.filter(estado='completado')
+
+    condiciones = Q()
+
+    q_fechas = q_rango_fechas(spec, campo_fecha)
+    if q_fechas is not None:
+        condiciones &= q_fechas
+    if spec.cliente_ids:
+        condiciones &= Q(cliente_id__in=spec.cliente_ids)
+    if spec.regions:
+        condiciones &= Q(region__in=spec.regions)
+    if spec.comunas:
+        condiciones &= Q(comuna__in=spec.comunas)
+    q_tipo = _q_tipo_cliente(spec, clientes_recurrentes() if recurrentes is None else recurrentes)
+    if q_tipo is not None:
+        condiciones &= q_tipo
+
+    return queryset.filter(condiciones)
+
+
+def filtrar_ventas_diarias(spec, queryset=None, recurrentes=None):
+    """
+    Compila la especificación en un QuerySet de filas de VentasDiarias.
+    Equivale a filtrar_pedidos usando como fecha la fecha de venta, pero sobre filas
+    pre-agregadas por día (su cantidad no depende del volumen histórico de pedidos).
+    """
+    if queryset is None:
+        queryset = VentasDiarias.objects.all()
+
+    condiciones = Q()
+
+    if spec.months:
+        q_meses = Q()
+        for inicio, fin in rangos_de_meses_fecha(spec.months):
+            q_meses |= Q(fecha__gte=inicio, fecha__lt=fin)
+        condiciones &= q_meses
+    else:
+        if spec.start_date:
+            condiciones &= Q(fecha__gte=spec.start_date)
+        if spec.end_date:
+            condiciones &= Q(fecha__lte=spec.end_date)
+    if spec.cliente_ids:
+        condiciones &= Q(cliente_id__in=spec.cliente_ids)
+    if spec.regions:
+        condiciones &= Q(region__in=spec.regions)
+    if spec.comunas:
+        condiciones &= Q(comuna__in=spec.comunas)
+    q_tipo = _q_tipo_cliente(spec, clientes_recurrentes() if recurrentes is None else recurrentes)
+    if q_tipo is not None:
+        condiciones &= q_tipo
+
+    return queryset.filter(condiciones)
@@ -0,0 +1,119 @@
+"""
+Motor de Agregación BI (SQL).
+
+PROPOSITO:
+    Calcula las métricas de BI directamente en la base de datos mediante
+    agregaciones (Sum, Count condicional) sobre los totales desnormalizados de Pedido,
+    evitando iterar en Python sobre cada Pedido e ItemsPedido.
+
+FUNCIONES:
+    - calcular_kpis: Payload completo de MetricasKPIView a partir de un QuerySet filtrado.
+    - calcular_kpis_hechos: Mismo payload a partir de filas de la tabla de hechos VentasDiarias.
+"""
+from decimal import Decimal  # Precisión monetaria
+from django.db.models import Count, Q, Sum  # Expresiones ORM
+from .models import Cliente  # Modelos
+
+
+def contar_clientes_recurrentes(queryset):
+    """
+    Cuenta los clientes presentes en 'queryset' (pedidos o filas de VentasDiarias) y cuántos
+    de ellos son recurrentes (más de un pedido completado histórico, columna indexada
+    Cliente.completed_order_count), con una única agregación condicional.
+    Retorna: (total_clientes, recurrentes)
+    """
+    resultado = Cliente.objects.filter(pk__in=queryset.values('cliente_id')).aggregate(
+        total=Count('id'),
+        recurrentes=Count('id', filter=Q(completed_order_count__gt=1)),
+    )
+    return resultado['total'], resultado['recurrentes']
+
+
+def _contar_clientes_con_conjunto(queryset, recurrentes):
+    """
+    Variante de contar_clientes_recurrentes cuando el conjunto de clientes recurrentes
+    ya fue evaluado (IDs en memoria): solo se consultan los clientes del periodo.
+    """
+    clientes = set(queryset.values_list('cliente_id', flat=True).distinct().order_by())
+    return len(clientes), len(clientes & set(recurrentes))
+
+
+def _payload_kpis(total_clientes_periodo, clientes_recurrentes_count, totales):
+    """
+    Arma el payload de KPIs a partir de los conteos de clientes y de las sumas
+    (neto, total, costo, iva, envios, pedidos). El redondeo es idéntico al cálculo iterativo original.
+    """
+    # --- KPI 1: Tasa de Recurrencia ---
+    clientes_nuevos_count = total_clientes_periodo - clientes_recurrentes_count
+
+    tasa_recurrencia = 0
+    if total_clientes_periodo > 0:
+        tasa_recurrencia = (clientes_recurrentes_count / total_clientes_periodo) * 100
+
+    # --- KPI 2: Margen Operacional Global y desgloses ---
+    def monto(clave):
+        return totales[clave] if totales[clave] is not None else Decimal('0.00')
+
+    total_ingresos_netos = monto('neto')  # Subtotal + Recargo (Sin IVA/Envio)
+    total_costos_global = monto('costo')
+    # Utilidad Neta Real (Neto - Costo)
+    total_utilidad_neta = total_ingresos_netos - total_costos_global
+
+    margen_operacional_global = 0
+    if total_ingresos_netos > 0:
+        # Margen = Utilidad / Ingresos Netos (Sin IVA)
+        margen_operacional_global = (total_utilidad_neta / total_ingresos_netos) * 100
+
+    return {
+        'tasa_recurrencia': round(tasa_recurrencia, 1),
+        'clientes_nuevos': clientes_nuevos_count,
+        'clientes_recurrentes': clientes_recurrentes_count,
+        'margen_operacional': round(float(margen_operacional_global), 1),
+        'total_ingresos': int(round(monto('total'))),  # Bruto Real (Entero)
+        'total_neto': int(round(total_ingresos_netos)),  # Neto (Entero)
+        'total_costos': int(round(total_costos_global)),
+        'total_utilidad': int(round(total_utilidad_neta)),
+        'total_iva': int(round(monto('iva'))),
+        'total_envios': int(round(monto('envios'))),
+        'total_pedidos': totales['pedidos'] or 0
+    }
+
+
+def calcular_kpis(pedidos, recurrentes=None):
+    """
+    Calcula el payload de KPIs (recurrencia, margen y desgloses) para el QuerySet filtrado.
+    Usa dos consultas en total, independiente del número de pedidos.
+    'recurrentes': IDs de clientes recurrentes ya evaluados (opcional).
+    """
+    if recurrentes is None:
+        total_clientes, recurrentes = contar_clientes_recurrentes(pedidos)
+    else:
+        total_clientes, recurrentes = _contar_clientes_con_conjunto(pedidos, recurrentes)
+    totales = pedidos.aggregate(
+        neto=Sum('neto'),
+        total=Sum('total'),  # Con IVA y Envio (suma de totales redondeados)
+        costo=Sum('costo_compra'),
+        iva=Sum('iva'),
+        envios=Sum('costo_envio_estimado'),
+        pedidos=Count('id'),
+    )
+    return _payload_kpis(total_clientes, recurrentes, totales)
+
+
+def calcular_kpis_hechos(ventas, recurrentes=None):
+    """
+    Calcula el mismo payload que calcular_kpis sobre filas filtradas de VentasDiarias.
+    """
+    if recurrentes is None:
+        total_clientes, recurrentes = contar_clientes_recurrentes(ventas)
+    else:
+        total_clientes, recurrentes = _contar_clientes_con_conjunto(ventas, recurrentes)
+    totales = ventas.aggregate(
+        neto=Sum('neto'),
+        total=Sum('venta'),
+        costo=Sum('costo'),
+        iva=Sum('iva'),
+        envios=Sum('envios'),
+        pedidos=Sum('pedidos'),
+    )
+    return _payload_kpis(total_clientes, recurrentes, totales)
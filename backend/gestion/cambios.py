@@ -0,0 +1,145 @@
+"""
+Sincronización Incremental de los Paneles (pedidos/changes/).
+
+PROPOSITO:
+    Los paneles del personal vuelven a pedir sus listados completos para detectar cambios.
+    Con este módulo el panel envía el cursor del sondeo anterior y recibe solo los pedidos
+    cuya fecha_actualizacion avanzó desde entonces: un rango sobre el índice
+    (fecha_actualizacion, id) que en la mayoría de los sondeos no devuelve filas.
+
+RESPUESTA:
+    {
+      "cursor": "<opaco>",   # ?since= del siguiente sondeo
+      "hay_mas": false,      # true: hay más cambios, repetir de inmediato con el nuevo cursor
+      "pedidos": [...],      # pedidos cambiados que pertenecen a algún panel pedido (admite ?fields=)
+      "paneles": {"cotizados": {"actualizados": [ids], "bajas": [ids]}, ...}
+    }
+    'actualizados' son los pedidos (de 'pedidos') que hoy pertenecen al panel; 'bajas' son
+    lápidas: pedidos cambiados que ya no pertenecen al panel (salida de estado) o que fueron
+    eliminados estando en él. El panel reemplaza/agrega los primeros y quita los segundos.
+
+CURSOR:
+    - ?since= acepta el cursor de la respuesta anterior o una fecha ISO 8601.
+    - Sin ?since= solo se entrega el cursor actual (punto de partida al cargar el panel).
+    - El cursor se mantiene settings.PEDIDOS_CAMBIOS_MARGEN segundos detrás del momento
+      actual: un pedido guardado en una transacción que confirma tarde (con una
+      fecha_actualizacion anterior a la del último sondeo) se entrega en el sondeo
+      siguiente. Los pedidos repetidos se reemplazan sin efecto en el panel.
+"""
+from datetime import timedelta  # Margen del cursor
+from django.conf import settings  # Margen y tamaño máximo
+from django.utils import timezone  # Fechas con zona horaria
+from django.utils.dateparse import parse_datetime  # Fechas ISO 8601
+from rest_framework.exceptions import NotFound, ValidationError  # Cursor inválido (400)
+from .models import Pedido, PedidoEliminado  # Modelos
+from .pagination import PaginacionPorActualizacionAntigua  # Keyset ascendente sobre (fecha_actualizacion, id)
+from .permissions import IsAdministrativaOrGerencia, IsDespachadorOrGerencia, IsVendedorOrGerencia  # Permisos
+
+# Paneles sincronizables: estados de su listado (ver las vistas de listado) y permiso de acceso
+PANELES = {
+    'solicitudes': (('solicitud',), IsVendedorOrGerencia),
+    'cotizados': (('cotizado',), IsVendedorOrGerencia),
+    'historial-cotizaciones': (('aceptado', 'rechazado', 'completado', 'despachado', 'pago_confirmado'),
+                               IsVendedorOrGerencia),
+    'aceptados': (('aceptado',), IsAdministrativaOrGerencia),
+    'historial-pagos': (('pago_confirmado', 'rechazado', 'despachado', 'completado'), IsAdministrativaOrGerencia),
+    'para-despachar': (('pago_confirmado',), IsDespachadorOrGerencia),
+    'historial-despachos': (('despachado', 'completado'), IsDespachadorOrGerencia),
+}
+
+# Recorrido ascendente (fecha_actualizacion, id): mismo cursor que la cola de despacho
+_PAGINACION = PaginacionPorActualizacionAntigua()
+
+
+def paneles_permitidos(request, view, pedidos=None):
+    """
+    Paneles que el usuario puede ver, limitados a 'pedidos' (?paneles=a,b) si se indica.
+    Lanza ValidationError con los nombres desconocidos.
+    """
+    if pedidos:
+        desconocidos = sorted(set(pedidos) - set(PANELES))
+        if desconocidos:
+            raise ValidationError({'paneles': [f"Panel desconocido: '{nombre}'." for nombre in desconocidos]})
+    return {
+        nombre: estados for nombre, (estados, permiso) in PANELES.items()
+        if (not pedidos or nombre in pedidos) and permiso().has_permission(request, view)
+    }
+
+
+def parse_since(texto):
+    """
+    Posición (fecha, id) desde la que se buscan cambios, o None si no se indicó.
+    'texto' es un cursor de una respuesta anterior o una fecha ISO 8601.
+    """
+    if not texto:
+        return None
+    # En la query string sin codificar, el '+' de la zona horaria llega como espacio
+    try:
+        fecha = parse_datetime(texto.strip().replace(' ', '+'))
+    except ValueError:
+        fecha = None
+    if fecha is not None:
+        if timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha)
+        return fecha, 0
+
+    try:
+        valor, pk, _ = _PAGINACION.decodificar_cursor(texto, Pedido._meta.get_field('fecha_actualizacion'))
+    except NotFound:
+        valor = None
+    if valor is None:
+        raise ValidationError({'since': ['Debe ser el cursor de una respuesta anterior o una fecha ISO 8601.']})
+    return valor, pk
+
+
+def consulta_cambios(queryset, desde, tamano):
+    """
+    Pedidos de 'queryset' posteriores a la posición 'desde' = (fecha, id), en orden de
+    actualización (LIMIT tamano + 1: la fila extra indica que hay más cambios).
+    """
+    return _PAGINACION.consulta(queryset, tamano, (desde[0], desde[1], False))
+
+
+def cambios(queryset, desde, paneles, tamano=None):
+    """
+    Cambios desde 'desde' para los 'paneles' indicados ({nombre: estados}).
+    Retorna (pedidos, paneles, cursor, hay_mas): 'pedidos' son los pedidos cambiados que
+    pertenecen a algún panel y 'paneles' mapea cada panel a {'actualizados', 'bajas'}.
+    """
+    limite = (timezone.now() - timedelta(seconds=settings.PEDIDOS_CAMBIOS_MARGEN), 0)
+    resultado = {nombre: {'actualizados': [], 'bajas': []} for nombre in paneles}
+    if desde is None:
+        return [], resultado, _PAGINACION.codificar_cursor(*limite), False
+
+    tamano = tamano or settings.PEDIDOS_PAGINA_MAXIMA
+    filas = list(consulta_cambios(queryset, desde, tamano))
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+
+    visibles = []
+    for pedido in filas:
+        dentro = False
+        for nombre, estados in paneles.items():
+            if pedido.estado in estados:
+                resultado[nombre]['actualizados'].append(pedido.pk)
+                dentro = True
+            else:
+                resultado[nombre]['bajas'].append(pedido.pk)
+        if dentro:
+            visibles.append(pedido)
+
+    # Pedidos eliminados estando en un panel (lápidas registradas por Pedido.delete)
+    eliminados = PedidoEliminado.objects.filter(fecha_eliminacion__gte=desde[0]).values_list('pedido_id', 'estado')
+    for pk, estado in eliminados:
+        for nombre, estados in paneles.items():
+            if estado in estados:
+                resultado[nombre]['bajas'].append(pk)
+
+    if hay_mas:
+        # Página llena: se continúa desde la última fila entregada
+        cursor = (filas[-1].fecha_actualizacion, filas[-1].pk)
+    else:
+        # Sin más cambios: el cursor queda detrás del margen, sin retroceder
+        ultimo = (filas[-1].fecha_actualizacion, filas[-1].pk) if filas else desde
+        cursor = max(desde, min(ultimo, limite))
+    return visibles, resultado, _PAGINACION.codificar_cursor(*cursor), hay_mas
@@ -0,0 +1,96 @@
+"""
+Selección de Campos de los Listados (?fields= / ?expand=).
+
+PROPOSITO:
+    Los paneles muestran pocas columnas de cada pedido, pero el listado completo
+    serializa el cliente anidado, todos los items y el JSON de opciones de envío.
+    Con la selección de campos el frontend pide solo lo que muestra, y la consulta
+    carga solo esas columnas (only) y precarga solo las relaciones pedidas.
+
+PARÁMETROS:
+    - fields: campos de primer nivel, separados por coma (o fields[]=...).
+      Un campo 'relacion.campo' limita los campos de la relación anidada y la expande.
+    - expand: relaciones que se entregan anidadas (cliente, items). Sin expandir,
+      una relación pedida en 'fields' se entrega como id (cliente) o lista de ids (items).
+    Sin 'fields' ni 'expand' se mantiene la representación completa.
+
+    Ej: ?fields=id,estado,fecha_actualizacion,cliente.nombre,cliente.empresa,total_cotizacion
+        ?fields=id,estado,items&expand=items
+"""
+from dataclasses import dataclass, field  # Especificación inmutable de la selección
+from rest_framework import serializers  # Serializadores (relaciones anidadas)
+from rest_framework.exceptions import ValidationError  # Campos desconocidos (400)
+
+
+@dataclass(frozen=True)
+class SeleccionCampos:
+    """
+    Selección de campos de un listado.
+    'anidados' mapea cada relación expandida a sus campos (None = todos los campos).
+    """
+    campos: frozenset
+    expandir: frozenset = frozenset()
+    anidados: dict = field(default_factory=dict)
+
+    def campos_de(self, relacion):
+        """Campos pedidos de la relación anidada (None = todos)."""
+        return self.anidados.get(relacion)
+
+
+def _lista(query_params, nombre):
+    """Valores de 'nombre[]' o de 'nombre' separado por comas."""
+    valores = query_params.getlist(f'{nombre}[]') or query_params.get(nombre, '').split(',')
+    return [v.strip() for v in valores if v and v.strip()]
+
+
+def _campos_anidados(campo):
+    """Campos disponibles de una relación anidada (serializer simple o many=True)."""
+    if isinstance(campo, serializers.ListSerializer):
+        campo = campo.child
+    return set(campo.fields)
+
+
+def parse_seleccion(query_params, serializer_class):
+    """
+    Construye la selección a partir de request.query_params para 'serializer_class'.
+    Retorna None si no se pidió selección (representación completa).
+    Lanza ValidationError (400) con los nombres desconocidos.
+    """
+    pedidos = _lista(query_params, 'fields')
+    expandir = set(_lista(query_params, 'expand'))
+    if not pedidos and not expandir:
+        return None
+
+    disponibles = serializer_class().fields
+    relaciones = {nombre: campo for nombre, campo in disponibles.items()
+                  if isinstance(campo, serializers.BaseSerializer)}
+
+    campos, anidados, errores = set(), {}, []
+    for nombre in pedidos:
+        relacion, _, subcampo = nombre.partition('.')
+        if subcampo:
+            if relacion not in relaciones or subcampo not in _campos_anidados(relaciones[relacion]):
+                errores.append(nombre)
+                continue
+            anidados.setdefault(relacion, set()).add(subcampo)
+            expandir.add(relacion)
+        elif nombre not in disponibles:
+            errores.append(nombre)
+            continue
+        campos.add(relacion)
+
+    errores += [nombre for nombre in expandir if nombre not in relaciones]
+    if errores:
+        raise ValidationError({'fields': [f"Campo desconocido: '{nombre}'." for nombre in sorted(set(errores))]})
+
+    # Sin 'fields' se entregan todos los campos de primer nivel
+    if not pedidos:
+        campos = set(disponibles)
+    # Una relación expandida siempre se incluye
+    campos |= expandir
+
+    return SeleccionCampos(
+        campos=frozenset(campos),
+        expandir=frozenset(expandir),
+        anidados={relacion: frozenset(subcampos) for relacion, subcampos in anidados.items()},
+    )
@@ -0,0 +1,133 @@
+"""
+Escrituras Idempotentes por Header 'Idempotency-Key'.
+
+PROPOSITO:
+    Ante una respuesta lenta, el formulario público reintenta el envío y cada reintento
+    creaba otro Pedido con sus items. Con el header 'Idempotency-Key' (un identificador
+    generado por el cliente para cada envío) la primera petición registra su clave, la
+    huella del cuerpo y la respuesta; los reintentos reciben la respuesta registrada
+    con una sola búsqueda por índice, sin volver a ejecutar la escritura.
+
+REGLAS:
+    - Sin el header la petición se procesa como siempre.
+    - La clave se reserva (INSERT sobre la restricción única ambito + clave) en la misma
+      transacción que la escritura: una petición simultánea con la misma clave espera a
+      que la primera confirme y luego recibe su respuesta (o 409 si aún no hay respuesta).
+    - Solo se registran las respuestas exitosas (2xx); un error de validación libera la clave.
+    - La misma clave con un cuerpo distinto responde 422.
+    - Las respuestas repetidas llevan el header 'Idempotent-Replayed: true'.
+    - Las claves vencen tras settings.IDEMPOTENCIA_TTL_HORAS y se eliminan con
+      'python manage.py purgar_idempotencia'.
+"""
+import hashlib  # Huella del cuerpo
+import json  # Serialización canónica del cuerpo
+from datetime import timedelta  # Vigencia de las claves
+from functools import wraps  # Decorador que preserva metadatos
+from django.conf import settings  # Vigencia y lote de purga
+from django.core.serializers.json import DjangoJSONEncoder  # Decimales y fechas del cuerpo
+from django.db import IntegrityError, transaction  # Reserva de la clave
+from django.utils import timezone  # Fechas
+from rest_framework import status  # Códigos de estado HTTP
+from rest_framework.response import Response  # Respuesta DRF
+from .models import ClaveIdempotencia  # Claves registradas
+
+HEADER = 'Idempotency-Key'
+LARGO_MAXIMO = ClaveIdempotencia._meta.get_field('clave').max_length
+
+
+def huella_peticion(request):
+    """SHA-256 del cuerpo de la petición (JSON con claves ordenadas)."""
+    cuerpo = json.dumps(request.data, sort_keys=True, separators=(',', ':'), cls=DjangoJSONEncoder)
+    return hashlib.sha256(cuerpo.encode()).hexdigest()
+
+
+def _vencimiento():
+    """Fecha de creación más antigua de una clave vigente."""
+    return timezone.now() - timedelta(hours=settings.IDEMPOTENCIA_TTL_HORAS)
+
+
+def _registrada(ambito, clave):
+    """Clave vigente registrada (búsqueda por el índice único). Una clave vencida se elimina."""
+    registro = ClaveIdempotencia.objects.filter(ambito=ambito, clave=clave).first()
+    if registro is not None and registro.fecha_creacion < _vencimiento():
+        registro.delete()
+        return None
+    return registro
+
+
+def _reservar(ambito, clave, huella):
+    """Inserta la clave. Retorna None si otra petición ya la registró."""
+    try:
+        with transaction.atomic():
+            return ClaveIdempotencia.objects.create(ambito=ambito, clave=clave, huella=huella)
+    except IntegrityError:
+        return None
+
+
+def _repetir(registro, huella):
+    """Respuesta registrada para un reintento (o el error si no corresponde a la misma petición)."""
+    if registro is None or registro.codigo_estado is None:
+        return Response({'error': 'Hay una petición en proceso con la misma Idempotency-Key.'},
+                        status=status.HTTP_409_CONFLICT)
+    if registro.huella != huella:
+        return Response({'error': 'La Idempotency-Key ya se usó con una petición distinta.'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    response = Response(registro.respuesta, status=registro.codigo_estado)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def respuesta_idempotente(ambito):
+    """
+    Decorador para el método create()/post() de una vista de escritura.
+    Aplica las reglas del módulo cuando la petición trae el header Idempotency-Key.
+    """
+    def decorador(metodo):
+        @wraps(metodo)
+        def envoltura(self, request, *args, **kwargs):
+            clave = request.headers.get(HEADER, '').strip()
+            if not clave:
+                return metodo(self, request, *args, **kwargs)
+            if len(clave) > LARGO_MAXIMO:
+                return Response({'error': f'La {HEADER} admite hasta {LARGO_MAXIMO} caracteres.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            huella = huella_peticion(request)
+            # Reintento de una petición ya respondida: una sola búsqueda por índice
+            registro = _registrada(ambito, clave)
+            if registro is not None:
+                return _repetir(registro, huella)
+
+            with transaction.atomic():
+                registro = _reservar(ambito, clave, huella)
+                if registro is not None:
+                    response = metodo(self, request, *args, **kwargs)
+                    if status.is_success(response.status_code):
+                        registro.codigo_estado = response.status_code
+                        registro.respuesta = response.data
+                        registro.save(update_fields=['codigo_estado', 'respuesta'])
+                    else:
+                        # Sin registrar: la clave queda libre para reenviar la petición corregida
+                        transaction.set_rollback(True)
+            if registro is None:
+                # Otra petición con la misma clave confirmó primero (o sigue en curso)
+                return _repetir(_registrada(ambito, clave), huella)
+            return response
+        return envoltura
+    return decorador
+
+
+def purgar_claves(lote=None):
+    """
+    Elimina las claves vencidas en lotes de 'lote' (por defecto settings.IDEMPOTENCIA_LOTE).
+    Retorna la cantidad eliminada.
+    """
+    lote = lote or settings.IDEMPOTENCIA_LOTE
+    vencimiento = _vencimiento()
+    eliminadas = 0
+    while True:
+        ids = list(ClaveIdempotencia.objects.filter(fecha_creacion__lt=vencimiento)
+                   .order_by('fecha_creacion').values_list('id', flat=True)[:lote])
+        if not ids:
+            return eliminadas
+        eliminadas += ClaveIdempotencia.objects.filter(id__in=ids).delete()[0]
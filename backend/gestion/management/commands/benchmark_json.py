@@ -0,0 +1,116 @@
+"""
+Comando de Gestión: Benchmark de Renderizado JSON y Compresión.
+
+PROPOSITO:
+    Compara el JSONRenderer de DRF con el ORJSONRenderer (gestion/renderers.py) sobre
+    los payloads reales de 'bi/rentabilidad/' y 'pedidos/historial-pagos/' (una página
+    del tamaño máximo), y mide la compresión gzip / Brotli de la respuesta resultante.
+
+    Los payloads se obtienen ejecutando las vistas en este proceso. Con --pedidos N se
+    agregan N pedidos completados sintéticos (con 3 items cada uno) dentro de una
+    transacción que se revierte al terminar: la base de datos no se modifica.
+
+USO:
+    python manage.py benchmark_json
+    python manage.py benchmark_json --pedidos 5000 --repeticiones 20
+"""
+import statistics  # Mediana de tiempos
+import time  # Medición de tiempos
+from datetime import timedelta  # Fechas de los pedidos sintéticos
+from decimal import Decimal  # Montos
+from django.conf import settings  # Niveles de compresión y tamaño de página
+from django.core.management.base import BaseCommand  # Importa la clase BaseCommand
+from django.db import transaction  # Transacción revertida
+from django.utils import timezone  # Fechas
+from rest_framework.renderers import JSONRenderer  # Renderer estándar de DRF
+from rest_framework.test import APIRequestFactory, force_authenticate  # Ejecución de vistas en proceso
+from gestion.middleware import comprimir  # Compresión de respuestas
+from gestion.models import Cliente, ItemsPedido, Pedido  # Modelos
+from gestion.renderers import ORJSONRenderer  # Renderer orjson
+from gestion.views import PedidosHistorialPagosListView, RentabilidadHistoricaAPIView  # Vistas medidas
+from usuarios.models import Roles, User  # Usuario de Gerencia para las vistas
+
+RENDERERS = (('drf-json', JSONRenderer()), ('orjson', ORJSONRenderer()))
+
+
+def _crear_pedidos(cantidad):
+    """Agrega 'cantidad' pedidos completados con 3 items cada uno (bulk_create, sin hooks)."""
+    cliente = Cliente.objects.create(nombre='Benchmark', apellido='JSON', email='benchmark_json@clarotec.cl',
+                                     empresa='Clarotec')
+    ahora = timezone.now()
+    pedidos = Pedido.objects.bulk_create([
+        Pedido(cliente=cliente, estado='completado', region='RM', comuna='Santiago',
+               fecha_despacho=ahora - timedelta(hours=i), subtotal=Decimal('59700'), neto=Decimal('59700'),
+               iva=Decimal('11343'), total=Decimal('71043'), costo_compra=Decimal('41790'),
+               utilidad=Decimal('17910'), opciones_envio={'STARKEN': 5990, 'BLUE': 4990})
+        for i in range(cantidad)
+    ], batch_size=1000)
+    ItemsPedido.objects.bulk_create([
+        ItemsPedido(pedido=pedido, descripcion=f'Producto de prueba #{n} con descripción de largo medio',
+                    cantidad=n, precio_unitario=Decimal('9950'), precio_compra=Decimal('6965'),
+                    subtotal=Decimal(9950 * n))
+        for pedido in pedidos for n in (1, 2, 3)
+    ], batch_size=3000)
+
+
+def _payload(vista, usuario, ruta, **params):
+    """Datos (sin renderizar) de la respuesta de 'vista' para un GET con 'params'."""
+    request = APIRequestFactory().get(ruta, params)
+    force_authenticate(request, user=usuario)
+    return vista.as_view()(request).data
+
+
+def _mediana_ms(funcion, repeticiones):
+    """Mediana en milisegundos de 'repeticiones' llamadas a 'funcion'."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+class Command(BaseCommand):
+    help = 'Compara JSONRenderer de DRF con orjson y mide gzip/Brotli en payloads de BI e historial'
+
+    def add_arguments(self, parser):
+        # Pedidos sintéticos agregados (transacción revertida)
+        parser.add_argument('--pedidos', type=int, default=2000, help='Pedidos sintéticos (default: 2000)')
+        # Repeticiones por medición
+        parser.add_argument('--repeticiones', type=int, default=10, help='Repeticiones por caso (default: 10)')
+
+    # Método principal que se ejecuta cuando se llama al comando
+    def handle(self, *args, **options):
+        repeticiones = options['repeticiones']
+        with transaction.atomic():
+            if options['pedidos']:
+                _crear_pedidos(options['pedidos'])
+            rol, _ = Roles.objects.get_or_create(nombre='Gerencia')
+            usuario = User.objects.create_user(email='benchmark_json@clarotec.cl', password=None, rol=rol)
+
+            casos = [
+                ('bi/rentabilidad/', _payload(RentabilidadHistoricaAPIView, usuario, '/api/bi/rentabilidad/')),
+                ('pedidos/historial-pagos/', _payload(PedidosHistorialPagosListView, usuario,
+                                                      '/api/pedidos/historial-pagos/',
+                                                      page_size=settings.PEDIDOS_PAGINA_MAXIMA)),
+            ]
+            transaction.set_rollback(True)
+
+        for endpoint, data in casos:
+            self.stdout.write(self.style.MIGRATE_HEADING(endpoint))
+            self.stdout.write(f"  {'Renderer':<10} {'Mediana ms':>11} {'KB':>9}")
+            medianas, contenido = {}, b''
+            for nombre, renderer in RENDERERS:
+                contenido = renderer.render(data)
+                medianas[nombre] = _mediana_ms(lambda: renderer.render(data), repeticiones)
+                self.stdout.write(f"  {nombre:<10} {medianas[nombre]:>11.2f} {len(contenido) / 1024:>9.1f}")
+            self.stdout.write(self.style.SUCCESS(
+                f"  orjson {medianas['drf-json'] / medianas['orjson']:.1f}x más rápido"))
+
+            # Compresión de la salida de orjson (lo que envía CompresionMiddleware)
+            self.stdout.write(f"  {'Codificación':<12} {'Mediana ms':>9} {'KB':>9} {'Razón':>7}")
+            for codificacion in ('gzip', 'br'):
+                comprimido = comprimir(contenido, codificacion)
+                mediana = _mediana_ms(lambda: comprimir(contenido, codificacion), repeticiones)
+                self.stdout.write(f"  {codificacion:<12} {mediana:>9.2f} {len(comprimido) / 1024:>9.1f} "
+                                  f"{len(contenido) / len(comprimido):>6.1f}x")
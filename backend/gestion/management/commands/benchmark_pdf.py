@@ -0,0 +1,93 @@
+"""
+Comando de Gestión: Benchmark de Motores de PDF.
+
+PROPOSITO:
+    Compara los motores de PDF de cotización ('xhtml2pdf' y 'reportlab') sobre
+    cotizaciones sintéticas de distinto tamaño. Mide, por render y en este proceso
+    (sin pool), el tiempo (mediana de las repeticiones) y el pico de memoria asignada
+    por Python (tracemalloc, en un render aparte), incluyendo la preparación del documento.
+    No lee ni escribe la base de datos.
+
+USO:
+    python manage.py benchmark_pdf
+    python manage.py benchmark_pdf --items 5,50,500 --repeticiones 5
+"""
+import statistics  # Mediana de tiempos
+import time  # Medición de tiempos
+import tracemalloc  # Pico de memoria por render
+from decimal import Decimal  # Montos
+from django.core.management.base import BaseCommand  # Importa la clase BaseCommand
+from django.utils import timezone  # Fechas
+from gestion.models import Cliente, ItemsPedido, Pedido  # Modelos (instancias en memoria)
+from gestion.pdf import documento_pdf  # Preparación del documento por motor
+from gestion.pdf_worker import MOTORES, renderizar_documento  # Motores de PDF
+
+
+def _cotizacion(cantidad_items):
+    """Pedido en memoria (sin guardar) con 'cantidad_items' items y totales coherentes."""
+    cliente = Cliente(nombre='Benchmark', apellido='PDF', email='benchmark@clarotec.cl', empresa='Clarotec')
+    items = [
+        ItemsPedido(id=i + 1, descripcion=f'Producto de prueba #{i + 1} con descripción de largo medio',
+                    cantidad=i % 5 + 1, precio_unitario=Decimal(1990 * (i % 7 + 1)))
+        for i in range(cantidad_items)
+    ]
+    for item in items:
+        item.subtotal = item.cantidad * item.precio_unitario
+    subtotal = sum(item.subtotal for item in items)
+    iva = (subtotal * Decimal('0.19')).quantize(Decimal('1'))
+    pedido = Pedido(id=cantidad_items, cliente=cliente, region='Metropolitana', comuna='Santiago',
+                    fecha_solicitud=timezone.now(), subtotal=subtotal, recargo=Decimal('0'), neto=subtotal,
+                    iva=iva, costo_envio_estimado=Decimal('5990'))
+    return pedido, items
+
+
+def _render(motor, pedido, items):
+    """Prepara y renderiza un documento. Retorna los bytes del PDF."""
+    return renderizar_documento(motor, documento_pdf(pedido, items, motor=motor))
+
+
+def _tiempo(motor, pedido, items):
+    """Segundos de preparar y renderizar un documento."""
+    inicio = time.perf_counter()
+    _render(motor, pedido, items)
+    return time.perf_counter() - inicio
+
+
+def _memoria(motor, pedido, items):
+    """Pico de memoria (bytes) y tamaño del PDF, en un render aparte (tracemalloc ralentiza)."""
+    tracemalloc.start()
+    contenido = _render(motor, pedido, items)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return pico, len(contenido or b'')
+
+
+class Command(BaseCommand):
+    help = 'Compara tiempo y memoria por render de los motores de PDF de cotización'
+
+    def add_arguments(self, parser):
+        # Tamaños de cotización a medir
+        parser.add_argument('--items', default='5,50,500', help='Cantidades de items separadas por coma')
+        # Renders por motor y tamaño
+        parser.add_argument('--repeticiones', type=int, default=3, help='Renders por caso (default: 3)')
+
+    # Método principal que se ejecuta cuando se llama al comando
+    def handle(self, *args, **options):
+        tamanos = [int(n) for n in options['items'].split(',') if n.strip()]
+
+        # Calentamiento: importa ambos motores y carga fuentes antes de medir
+        for motor in MOTORES:
+            _render(motor, *_cotizacion(1))
+
+        self.stdout.write(f"{'Items':>6} {'Motor':>10} {'Mediana ms':>11} {'Pico MB':>8} {'KB PDF':>7}")
+        for cantidad in tamanos:
+            pedido, items = _cotizacion(cantidad)
+            medianas = {}
+            for motor in MOTORES:
+                medianas[motor] = statistics.median(
+                    _tiempo(motor, pedido, items) for _ in range(options['repeticiones']))
+                pico, tamano = _memoria(motor, pedido, items)
+                self.stdout.write(f"{cantidad:>6} {motor:>10} {medianas[motor] * 1000:>11.1f} "
+                                  f"{pico / 1024 / 1024:>8.1f} {tamano / 1024:>7.1f}")
+            aceleracion = medianas['xhtml2pdf'] / medianas['reportlab']
+            self.stdout.write(self.style.SUCCESS(f"{cantidad:>6} items: reportlab {aceleracion:.1f}x más rápido"))
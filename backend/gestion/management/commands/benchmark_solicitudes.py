@@ -0,0 +1,91 @@
+"""
+Comando de Gestión: Benchmark de Ingreso de Solicitudes.
+
+PROPOSITO:
+    Mide el rendimiento del endpoint público 'solicitudes/' (SolicitudCreateAPIView,
+    ejecutado en este proceso) para solicitudes de distinto tamaño: solicitudes por
+    segundo y consultas SQL por solicitud. La mitad de los items referencia productos
+    del catálogo y los clientes se repiten (primero se crean y luego se actualizan).
+
+    Todo ocurre dentro de una transacción que se revierte al terminar: la base de
+    datos no se modifica.
+
+USO:
+    python manage.py benchmark_solicitudes
+    python manage.py benchmark_solicitudes --items 1,20,200 --solicitudes 100
+"""
+import time  # Medición de tiempos
+from django.core.management.base import BaseCommand  # Importa la clase BaseCommand
+from django.db import connection, transaction  # Conteo de consultas y transacción revertida
+from django.test.utils import CaptureQueriesContext  # Consultas por solicitud
+from rest_framework.test import APIRequestFactory  # Ejecución de la vista en proceso
+from gestion.models import ProductoFrecuente  # Catálogo
+from gestion.views import SolicitudCreateAPIView  # Vista medida
+
+CLIENTES = 20  # Emails distintos (el resto de las solicitudes actualiza clientes existentes)
+
+
+def _payload(numero, cantidad_items, productos):
+    """Solicitud 'numero' con 'cantidad_items' items (la mitad desde el catálogo)."""
+    items = []
+    for i in range(cantidad_items):
+        item = {'tipo': 'MANUAL', 'descripcion': f'Producto solicitado #{i + 1}', 'cantidad': i % 5 + 1,
+                'referencia': 'Marca / modelo'}
+        if i % 2:
+            item.update(tipo='CATALOGO', producto_id=productos[i % len(productos)])
+        items.append(item)
+    return {
+        'cliente': {'nombre': 'Benchmark', 'apellido': f'Solicitud {numero}',
+                    'email': f'benchmark_solicitud_{numero % CLIENTES}@clarotec.cl', 'empresa': 'Clarotec'},
+        'items': items,
+        'region': 'RM',
+        'comuna': 'Santiago',
+    }
+
+
+def _enviar(vista, payload):
+    """POST de la solicitud. Falla si la vista no responde 201."""
+    response = vista(APIRequestFactory().post('/api/solicitudes/', payload, format='json'))
+    if response.status_code != 201:
+        raise RuntimeError(f'La solicitud respondió {response.status_code}: {response.data}')
+
+
+class Command(BaseCommand):
+    help = 'Mide solicitudes por segundo y consultas por solicitud del endpoint público solicitudes/'
+
+    def add_arguments(self, parser):
+        # Tamaños de solicitud a medir
+        parser.add_argument('--items', default='1,20,200', help='Cantidades de items separadas por coma')
+        # Solicitudes por tamaño
+        parser.add_argument('--solicitudes', type=int, default=50, help='Solicitudes por caso (default: 50)')
+
+    # Método principal que se ejecuta cuando se llama al comando
+    def handle(self, *args, **options):
+        tamanos = [int(n) for n in options['items'].split(',') if n.strip()]
+        cantidad = options['solicitudes']
+        vista = SolicitudCreateAPIView.as_view()
+
+        self.stdout.write(f"{'Items':>6} {'Solicitudes/s':>14} {'ms/solicitud':>13} {'Consultas':>10}")
+        with transaction.atomic():
+            productos = [p.pk for p in ProductoFrecuente.objects.bulk_create(
+                [ProductoFrecuente(nombre=f'Benchmark {i}') for i in range(10)])]
+            if not all(productos):
+                # MySQL no retorna los ids del bulk_create
+                productos = list(ProductoFrecuente.objects.filter(nombre__startswith='Benchmark ')
+                                 .values_list('pk', flat=True))
+
+            for tamano in tamanos:
+                payloads = [_payload(n, tamano, productos) for n in range(cantidad)]
+                # Consultas de una solicitud (de un cliente ya existente)
+                _enviar(vista, payloads[0])
+                with CaptureQueriesContext(connection) as consultas:
+                    _enviar(vista, payloads[0])
+
+                inicio = time.perf_counter()
+                for payload in payloads:
+                    _enviar(vista, payload)
+                segundos = time.perf_counter() - inicio
+
+                self.stdout.write(f"{tamano:>6} {cantidad / segundos:>14.1f} {segundos / cantidad * 1000:>13.2f} "
+                                  f"{len(consultas):>10}")
+            transaction.set_rollback(True)
@@ -0,0 +1,133 @@
+"""
+Comando de Gestión: Verificación de Índices con EXPLAIN.
+
+PROPOSITO:
+    Muestra el plan de ejecución (EXPLAIN) de las consultas reales de cada endpoint
+    (listados del panel con su paginación por cursor, BI, retención y búsqueda por guía)
+    e indica si usa el índice compuesto diseñado para ese camino de acceso
+    (ver Pedido.Meta.indexes y la migración 0019_indices_pedidos).
+
+    En MySQL se lee el EXPLAIN en formato JSON (campo "key": índice realmente elegido,
+    no solo los candidatos); en PostgreSQL y SQLite, el plan en texto.
+    En bases pequeñas (desarrollo) PostgreSQL prefiere recorrer la tabla completa;
+    --forzar-indices desactiva el Seq Scan durante el EXPLAIN para ver el plan que se
+    usará cuando la tabla crezca. No modifica datos.
+
+USO:
+    python manage.py explicar_indices
+    python manage.py explicar_indices --forzar-indices --estricto
+"""
+from datetime import timedelta  # Rangos de fecha de ejemplo
+from django.conf import settings  # Tamaño de página
+from django.core.management.base import BaseCommand, CommandError  # Importa la clase BaseCommand
+from django.db import connection, transaction  # Conexión (motor) y transacción del SET LOCAL
+from django.http import QueryDict  # Parámetros de filtro BI de ejemplo
+from django.utils import timezone  # Fechas
+from gestion.cambios import consulta_cambios  # Consulta de la sincronización incremental
+from gestion.bi_filters import CAMPO_FECHA_DESPACHO, filtrar_pedidos, parse_bi_filters  # Filtros BI
+from gestion.models import Cliente, Pedido  # Modelos
+from gestion.retencion import ESTADOS_VENTA, clientes_con_retencion  # Consulta de retención
+from gestion.views import (  # Vistas de listado del panel
+    PedidosAceptadosListView,
+    PedidosCotizadosListView,
+    PedidosHistorialCotizacionesListView,
+    PedidosHistorialDespachosListView,
+    PedidosHistorialPagosListView,
+    PedidosParaDespacharListView,
+    SolicitudesListAPIView
+)
+
+
+def _pagina(vista, con_cursor=False):
+    """Consulta de la primera página (o de una página intermedia) del listado de 'vista'."""
+    cursor = (timezone.now(), 0, False) if con_cursor else None
+    return vista.pagination_class().consulta(vista().get_queryset(), settings.PEDIDOS_PAGINA, cursor)
+
+
+def _filtros_bi(**params):
+    """Especificación BI a partir de parámetros de query string."""
+    query = QueryDict(mutable=True)
+    query.update(params)
+    return parse_bi_filters(query)
+
+
+def explicar(queryset, indices):
+    """Retorna (plan, usa_indice) del EXPLAIN de 'queryset': usa_indice si elige alguno de 'indices'."""
+    if connection.vendor == 'mysql':
+        plan = queryset.explain(format='JSON')
+        return plan, any(f'"key": "{indice}"' in plan for indice in indices)
+    plan = queryset.explain()
+    return plan, any(indice in plan for indice in indices)
+
+
+# Historiales de varios estados: el índice por fecha (recorrido en orden) o el de estado + fecha
+HISTORIAL_ACTUALIZACION = ('pedido_actualiz_idx', 'pedido_estado_actualiz_idx')
+HISTORIAL_DESPACHO = ('pedido_despacho_idx', 'pedido_estado_despacho_idx')
+
+
+def casos():
+    """Lista de (endpoint, queryset, índices aceptados)."""
+    hoy = timezone.localdate()
+    rango = {'start_date': (hoy - timedelta(days=90)).isoformat(), 'end_date': hoy.isoformat()}
+    cliente_id = str(Cliente.objects.values_list('id', flat=True).first() or 1)
+    return [
+        ('pedidos/solicitudes/', _pagina(SolicitudesListAPIView), ('pedido_estado_solicitud_idx',)),
+        ('pedidos/solicitudes/?cursor=', _pagina(SolicitudesListAPIView, True), ('pedido_estado_solicitud_idx',)),
+        ('pedidos/cotizados/', _pagina(PedidosCotizadosListView), ('pedido_estado_actualiz_idx',)),
+        ('pedidos/aceptados/', _pagina(PedidosAceptadosListView), ('pedido_estado_actualiz_idx',)),
+        ('pedidos/para-despachar/', _pagina(PedidosParaDespacharListView), ('pedido_estado_actualiz_idx',)),
+        ('pedidos/para-despachar/?cursor=', _pagina(PedidosParaDespacharListView, True),
+         ('pedido_estado_actualiz_idx',)),
+        ('pedidos/historial-pagos/', _pagina(PedidosHistorialPagosListView), HISTORIAL_ACTUALIZACION),
+        ('pedidos/historial-pagos/?cursor=', _pagina(PedidosHistorialPagosListView, True), HISTORIAL_ACTUALIZACION),
+        ('pedidos/historial-cotizaciones/', _pagina(PedidosHistorialCotizacionesListView), HISTORIAL_ACTUALIZACION),
+        ('pedidos/historial-despachos/', _pagina(PedidosHistorialDespachosListView), HISTORIAL_DESPACHO),
+        ('pedidos/historial-despachos/?cursor=', _pagina(PedidosHistorialDespachosListView, True),
+         HISTORIAL_DESPACHO),
+        ('pedidos/changes/?since=', consulta_cambios(Pedido.objects.all(), (timezone.now(), 0),
+                                                     settings.PEDIDOS_PAGINA_MAXIMA), ('pedido_actualiz_idx',)),
+        ('bi/ (ventas por rango de despacho)', filtrar_pedidos(_filtros_bi(**rango), CAMPO_FECHA_DESPACHO),
+         ('pedido_estado_despacho_idx',)),
+        ('pedidos/pdf/zip/ (cliente + estado + fecha)',
+         filtrar_pedidos(_filtros_bi(cliente_id=cliente_id, **rango), 'fecha_solicitud',
+                         queryset=Pedido.objects.filter(estado__in=ESTADOS_VENTA)),
+         ('pedido_cliente_estado_idx',)),
+        ('bi/retention/ (última compra por cliente)', clientes_con_retencion(), ('pedido_cliente_estado_idx',)),
+        ('despachos (búsqueda por número de guía)', Pedido.objects.filter(numero_guia='000000'),
+         ('pedido_numero_guia_idx',)),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Muestra el EXPLAIN de las consultas de cada endpoint y verifica que usen sus índices compuestos'
+
+    def add_arguments(self, parser):
+        # Desactiva el Seq Scan (solo PostgreSQL) para evaluar el plan con tablas pequeñas
+        parser.add_argument('--forzar-indices', action='store_true',
+                            help='PostgreSQL: SET LOCAL enable_seqscan = off durante el EXPLAIN')
+        # Falla (código de salida distinto de cero) si algún endpoint no usa su índice
+        parser.add_argument('--estricto', action='store_true', help='Error si algún plan no usa su índice')
+
+    # Método principal que se ejecuta cuando se llama al comando
+    def handle(self, *args, **options):
+        fallidos = []
+        with transaction.atomic():
+            if options['forzar_indices'] and connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for endpoint, queryset, indices in casos():
+                plan, usa_indice = explicar(queryset, indices)
+                if not usa_indice:
+                    fallidos.append(endpoint)
+
+                estilo = self.style.SUCCESS if usa_indice else self.style.ERROR
+                self.stdout.write(estilo(f"{'OK ' if usa_indice else 'NO '} {endpoint} -> {' | '.join(indices)}"))
+                for linea in plan.splitlines():
+                    self.stdout.write(f'      {linea}')
+
+        resumen = f'{len(fallidos)} consulta(s) sin su índice: {", ".join(fallidos)}' if fallidos else \
+            'Todas las consultas usan su índice.'
+        if fallidos and options['estricto']:
+            raise CommandError(resumen)
+        self.stdout.write(self.style.WARNING(resumen) if fallidos else self.style.SUCCESS(resumen))
@@ -19,6 +19,8 @@ from django.core.management.base import BaseCommand  # Importa la librería Base
 from django.db import transaction  # Importa la librería transaction para manejar transacciones
 from django.utils import timezone  # Importa la librería timezone para manejar fechas
 from gestion.models import Cliente, Pedido, ItemsPedido  # Importa los modelos Cliente, Pedido y ItemsPedido
+from gestion.services import recalcular_totales, recalcular_agregados_clientes  # Importa los recálculos masivos
+from gestion.bi_facts import reconstruir_ventas_diarias  # Importa la reconstrucción de la tabla de hechos BI
 
 
 # Clase Command que hereda de BaseCommand
@@ -99,6 +101,7 @@ class Command(BaseCommand):
         # --- PROCESO ETL ---
         count_created = 0
         count_skipped = 0
+        pedidos_afectados = set()  # Pedidos cuyos totales deben recalcularse al final
 
         # Iniciamos una transacción
         with transaction.atomic():
@@ -231,7 +234,7 @@ class Command(BaseCommand):
                     precio_unitario = importe_val / cantidad_raw if cantidad_raw > 0 else 0  # Precio Unitario
                     precio_compra = precio_unitario * 0.7  # Margen 30%
 
-                    ItemsPedido.objects.create(
+                    item = ItemsPedido(
                         pedido=pedido,
                         descripcion=material_raw,
                         cantidad=int(cantidad_raw),
@@ -240,6 +243,9 @@ class Command(BaseCommand):
                         subtotal=Decimal(importe_val),
                         tipo_origen='MANUAL'
                     )
+                    # Los totales del pedido se recalculan una sola vez al final del proceso
+                    item.save(actualizar_totales=False)
+                    pedidos_afectados.add(pedido.id)
 
                     # Incrementamos el contador de items creados
                     count_created += 1
@@ -249,6 +255,17 @@ class Command(BaseCommand):
                     self.stdout.write(self.style.WARNING(f'Fila {index}: Error procesando ({e}).'))
                     count_skipped += 1
 
+            # 9. Totales desnormalizados de los pedidos tocados (pasada masiva por lotes)
+            ids_afectados = sorted(pedidos_afectados)
+            for inicio in range(0, len(ids_afectados), 500):
+                recalcular_totales(Pedido.objects.filter(id__in=ids_afectados[inicio:inicio + 500]))
+
+            # 10. Tabla de hechos BI (las fechas se ajustaron con update(), se reconstruye completa)
+            reconstruir_ventas_diarias()
+
+            # 11. Agregados de compras de los clientes tocados (fechas ajustadas con update())
+            recalcular_agregados_clientes(Cliente.objects.filter(pedidos__id__in=ids_afectados).distinct())
+
         # Mostramos el resultado
         self.stdout.write(self.style.SUCCESS(
             f'Proceso completado. Items creados: {count_created}. Errores/Saltados: {count_skipped}'))
@@ -0,0 +1,48 @@
+"""
+Comando de Gestión: Purga de Claves Idempotency-Key Vencidas.
+
+PROPOSITO:
+    Elimina las claves de ClaveIdempotencia más antiguas que settings.IDEMPOTENCIA_TTL_HORAS
+    (ver gestion/idempotencia.py), en lotes de settings.IDEMPOTENCIA_LOTE, para que la
+    tabla solo contenga las claves que aún pueden recibir reintentos.
+    Puede correr como servicio (ver deploy_scripts/idempotencia_clarotec.service) o por cron.
+
+USO:
+    python manage.py purgar_idempotencia              # Barrido continuo (cada hora)
+    python manage.py purgar_idempotencia --once       # Un solo barrido (ej: cron)
+    python manage.py purgar_idempotencia --interval 600
+"""
+import time  # Espera entre barridos
+from django.core.management.base import BaseCommand  # Importa la clase BaseCommand
+from django.db import close_old_connections  # Evita conexiones a la BD caducadas en procesos largos
+from gestion.idempotencia import purgar_claves  # Importa la purga de claves vencidas
+
+
+class Command(BaseCommand):
+    help = 'Elimina las claves Idempotency-Key vencidas (ClaveIdempotencia)'
+
+    def add_arguments(self, parser):
+        # Realiza un solo barrido y termina
+        parser.add_argument('--once', action='store_true', help='Realiza un solo barrido y termina')
+        # Segundos de espera entre barridos
+        parser.add_argument('--interval', type=float, default=3600, help='Segundos entre barridos (default: 3600)')
+
+    def _purgar(self):
+        eliminadas = purgar_claves()
+        if eliminadas:
+            self.stdout.write(f"Claves vencidas eliminadas: {eliminadas}")
+
+    # Método principal que se ejecuta cuando se llama al comando
+    def handle(self, *args, **options):
+        if options['once']:
+            self._purgar()
+            return
+
+        self.stdout.write(self.style.SUCCESS('Purga de claves de idempotencia iniciada (Ctrl+C para detener).'))
+        try:
+            while True:
+                close_old_connections()
+                self._purgar()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Purga de claves de idempotencia detenida.')
@@ -0,0 +1,29 @@
+"""
+Comando de Gestión: Backfill de Totales Desnormalizados.
+
+PROPOSITO:
+    Puebla (o repara) las columnas de totales de Pedido (subtotal, recargo, neto,
+    IVA, total, costo_compra, utilidad) a partir de sus items.
+    La migración que agrega las columnas ya las puebla; el comando se usa tras
+    cargar datos sin save() (loaddata) o para reparar totales.
+
+USO:
+    python manage.py recalcular_totales_pedidos
+    python manage.py recalcular_totales_pedidos --batch-size 1000
+"""
+from django.core.management.base import BaseCommand  # Importa la clase BaseCommand
+from gestion.services import recalcular_totales  # Importa el servicio de recálculo masivo
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los totales desnormalizados de todos los pedidos a partir de sus items'
+
+    def add_arguments(self, parser):
+        # Tamaño de lote para lectura y bulk_update
+        parser.add_argument('--batch-size', type=int, default=500, help='Pedidos por lote (default: 500)')
+
+    # Método principal que se ejecuta cuando se llama al comando
+    def handle(self, *args, **options):
+        self.stdout.write('Recalculando totales de pedidos...')
+        actualizados = recalcular_totales(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Proceso completado. Pedidos actualizados: {actualizados}'))
@@ -0,0 +1,30 @@
+"""
+Comando de Gestión: Reconstrucción de Agregados de Clientes.
+
+PROPOSITO:
+    Puebla (o repara) los agregados de compras de Cliente (pedidos completados,
+    primera/última compra, región/comuna de la última compra y total gastado)
+    a partir de sus pedidos. La migración que agrega las columnas ya las puebla; el
+    comando se usa tras cargar datos sin save() (loaddata) o para reparar descuadres.
+    En operación normal se mantienen al guardar los pedidos.
+
+USO:
+    python manage.py reconstruir_agregados_clientes
+    python manage.py reconstruir_agregados_clientes --batch-size 1000
+"""
+from django.core.management.base import BaseCommand  # Importa la clase BaseCommand
+from gestion.services import recalcular_agregados_clientes  # Importa el servicio de recálculo masivo
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los agregados de compras de todos los clientes a partir de sus pedidos'
+
+    def add_arguments(self, parser):
+        # Tamaño de lote para lectura y bulk_update
+        parser.add_argument('--batch-size', type=int, default=500, help='Clientes por lote (default: 500)')
+
+    # Método principal que se ejecuta cuando se llama al comando
+    def handle(self, *args, **options):
+        self.stdout.write('Recalculando agregados de clientes...')
+        actualizados = recalcular_agregados_clientes(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Proceso completado. Clientes actualizados: {actualizados}'))
@@ -0,0 +1,30 @@
+"""
+Comando de Gestión: Reconstrucción de la Tabla de Hechos BI.
+
+PROPOSITO:
+    Reconstruye desde cero la tabla VentasDiarias (pedidos completados agregados por
+    día × región × comuna × cliente). La migración que crea la tabla ya la puebla; el
+    comando se usa tras cargar datos sin save() (loaddata, después de
+    'recalcular_totales_pedidos') o cuando se sospeche de un descuadre.
+    En operación normal la tabla se mantiene sola al guardar los pedidos.
+
+USO:
+    python manage.py reconstruir_ventas_diarias
+    python manage.py reconstruir_ventas_diarias --batch-size 5000
+"""
+from django.core.management.base import BaseCommand  # Importa la clase BaseCommand
+from gestion.bi_facts import reconstruir_ventas_diarias  # Importa el servicio de reconstrucción
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla de hechos BI VentasDiarias a partir de los pedidos completados'
+
+    def add_arguments(self, parser):
+        # Tamaño de lote para bulk_create
+        parser.add_argument('--batch-size', type=int, default=1000, help='Filas por lote (default: 1000)')
+
+    # Método principal que se ejecuta cuando se llama al comando
+    def handle(self, *args, **options):
+        self.stdout.write('Reconstruyendo tabla de hechos VentasDiarias...')
+        filas = reconstruir_ventas_diarias(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Proceso completado. Filas generadas: {filas}'))
@@ -0,0 +1,55 @@
+"""
+Comando de Gestión: Worker de la Bandeja de Salida de Correos.
+
+PROPOSITO:
+    Envía en segundo plano los correos encolados por las vistas en EmailOutbox
+    (cotizaciones, pagos, despachos, retención). Procesa lotes sobre una única
+    conexión SMTP y reintenta con espera exponencial (ver gestion/outbox.py).
+    Debe correr como servicio aparte de gunicorn (ver deploy_scripts/outbox_clarotec.service).
+
+USO:
+    python manage.py run_outbox              # Worker continuo
+    python manage.py run_outbox --once       # Un solo lote (ej: cron)
+    python manage.py run_outbox --batch-size 100 --interval 10
+"""
+import time  # Espera entre sondeos
+from django.core.management.base import BaseCommand  # Importa la clase BaseCommand
+from django.db import close_old_connections  # Evita conexiones a la BD caducadas en procesos largos
+from gestion.outbox import procesar_outbox  # Importa el procesador de la bandeja de salida
+
+
+class Command(BaseCommand):
+    help = 'Envía los correos pendientes de la bandeja de salida (EmailOutbox)'
+
+    def add_arguments(self, parser):
+        # Procesa un solo lote y termina
+        parser.add_argument('--once', action='store_true', help='Procesa un solo lote y termina')
+        # Correos por lote (por defecto settings.EMAIL_OUTBOX_LOTE)
+        parser.add_argument('--batch-size', type=int, default=None, help='Correos por lote')
+        # Segundos de espera cuando no hay correos pendientes
+        parser.add_argument('--interval', type=float, default=5, help='Segundos entre sondeos (default: 5)')
+
+    def _procesar(self, batch_size):
+        resultado = procesar_outbox(limite=batch_size)
+        if any(resultado.values()):
+            self.stdout.write(
+                f"Enviados: {resultado['enviados']} | Reintentos: {resultado['reintentos']} | "
+                f"Fallidos: {resultado['fallidos']}")
+        return resultado
+
+    # Método principal que se ejecuta cuando se llama al comando
+    def handle(self, *args, **options):
+        if options['once']:
+            self._procesar(options['batch_size'])
+            return
+
+        self.stdout.write(self.style.SUCCESS('Worker de correos iniciado (Ctrl+C para detener).'))
+        try:
+            while True:
+                close_old_connections()
+                resultado = self._procesar(options['batch_size'])
+                # Con un lote completo o en curso se sigue de inmediato; si no, se espera
+                if not any(resultado.values()):
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Worker de correos detenido.')
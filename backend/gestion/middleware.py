@@ -0,0 +1,90 @@
+"""
+Middleware de Compresión de Respuestas (Brotli / Gzip).
+
+PROPOSITO:
+    Comprime las respuestas JSON (BI e historiales) según el Accept-Encoding
+    del cliente: Brotli si lo acepta (mejor razón de compresión para JSON) y si no, gzip.
+    Reemplaza a django.middleware.gzip.GZipMiddleware (solo gzip).
+
+REGLAS:
+    - Solo respuestas no streaming de al menos settings.COMPRESION_MINIMO bytes y con
+      Content-Type en settings.COMPRESION_TIPOS (los PDF y ZIP ya vienen comprimidos;
+      la exportación ZIP en streaming no se toca). Solo JSON: a diferencia de GZipMiddleware
+      no se agrega relleno aleatorio contra BREACH, por lo que las páginas HTML (admin, API
+      navegable, formularios con token CSRF) no se comprimen.
+    - Se respeta la preferencia (q) del cliente; 'q=0' excluye la codificación.
+    - Si la versión comprimida no es más pequeña se envía la original.
+    - Agrega 'Vary: Accept-Encoding' y debilita los ETag fuertes (como GZipMiddleware).
+"""
+import gzip  # Compresión gzip
+import brotli  # Compresión Brotli
+from django.conf import settings  # Umbral, tipos y niveles
+from django.utils.cache import patch_vary_headers  # Cabecera Vary
+from django.utils.deprecation import MiddlewareMixin  # Compatibilidad de middleware
+
+# Codificaciones soportadas, en orden de preferencia ante igual q
+CODIFICACIONES = ('br', 'gzip')
+
+
+def codificacion_aceptada(accept_encoding):
+    """
+    Elige la codificación a partir de la cabecera Accept-Encoding (o None).
+    Ej: 'gzip, deflate, br' -> 'br'; 'br;q=0, gzip' -> 'gzip'; 'identity' -> None.
+    """
+    calidades = {}
+    for parte in accept_encoding.lower().split(','):
+        nombre, _, parametros = parte.strip().partition(';')
+        calidad = 1.0
+        parametro = parametros.strip()
+        if parametro.startswith('q='):
+            try:
+                calidad = float(parametro[2:])
+            except ValueError:
+                calidad = 0.0
+        calidades[nombre.strip()] = calidad
+
+    comodin = calidades.get('*', 0.0)
+    candidatas = [(calidades.get(nombre, comodin), -orden, nombre) for orden, nombre in enumerate(CODIFICACIONES)]
+    calidad, _, nombre = max(candidatas)
+    return nombre if calidad > 0 else None
+
+
+def comprimir(contenido, codificacion):
+    """Comprime 'contenido' (bytes) con la codificación indicada."""
+    if codificacion == 'br':
+        return brotli.compress(contenido, quality=settings.COMPRESION_NIVEL_BROTLI)
+    return gzip.compress(contenido, compresslevel=settings.COMPRESION_NIVEL_GZIP, mtime=0)
+
+
+class CompresionMiddleware(MiddlewareMixin):
+    """Comprime con Brotli o gzip las respuestas JSON sobre el umbral de tamaño."""
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < settings.COMPRESION_MINIMO:
+            return response
+        tipo = response.get('Content-Type', '').split(';')[0].strip()
+        if not tipo.startswith(settings.COMPRESION_TIPOS):
+            return response
+
+        # La respuesta varía según lo que acepte el cliente (cachés intermedios)
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        codificacion = codificacion_aceptada(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if codificacion is None:
+            return response
+
+        comprimido = comprimir(response.content, codificacion)
+        if len(comprimido) >= len(response.content):
+            return response
+
+        response.content = comprimido
+        response['Content-Length'] = str(len(comprimido))
+        response['Content-Encoding'] = codificacion
+
+        # El cuerpo cambió: un ETag fuerte pasa a débil (misma semántica que GZipMiddleware)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,95 @@
+# Generated by Django 5.2.8 on 2026-10-17 11:14
+
+from decimal import Decimal, ROUND_HALF_UP
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+LOTE = 500
+
+
+def poblar_totales(apps, schema_editor):
+    """
+    Puebla los totales de los pedidos existentes desde sus items (misma fórmula que
+    Pedido.derivar_totales). Las sumas de items se leen con los pedidos y se escriben
+    con bulk_update por lotes.
+    """
+    Pedido = apps.get_model('gestion', 'Pedido')
+    ItemsPedido = apps.get_model('gestion', 'ItemsPedido')
+    monto = DecimalField(max_digits=20, decimal_places=6)
+
+    def suma_items(expresion):
+        return Coalesce(
+            Subquery(ItemsPedido.objects.filter(pedido=OuterRef('pk')).values('pedido').annotate(
+                s=Sum(expresion, output_field=monto)).values('s'), output_field=monto),
+            Decimal('0'), output_field=monto)
+
+    pedidos = Pedido.objects.annotate(
+        _subtotal=suma_items(F('subtotal')),
+        _costo=suma_items(F('precio_compra') * F('cantidad')),
+    ).only('id', 'porcentaje_urgencia', 'costo_envio_estimado').order_by('id')
+
+    campos = ['subtotal', 'recargo', 'neto', 'iva', 'total', 'costo_compra', 'utilidad']
+    lote = []
+    for pedido in pedidos.iterator(chunk_size=LOTE):
+        pedido.subtotal = Decimal(str(pedido._subtotal))
+        pedido.costo_compra = Decimal(str(pedido._costo))
+        pedido.recargo = pedido.subtotal * (Decimal(str(pedido.porcentaje_urgencia)) / Decimal('100'))
+        pedido.neto = pedido.subtotal + pedido.recargo
+        pedido.iva = pedido.neto * Decimal('0.19')
+        envio = Decimal(str(pedido.costo_envio_estimado))
+        pedido.total = (pedido.neto + pedido.iva + envio).quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+        pedido.utilidad = pedido.neto - pedido.costo_compra
+        lote.append(pedido)
+        if len(lote) >= LOTE:
+            Pedido.objects.bulk_update(lote, campos)
+            lote = []
+    if lote:
+        Pedido.objects.bulk_update(lote, campos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0013_remove_cliente_apellidos_remove_cliente_nombres_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='costo_compra',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0'), help_text='Suma de precio_compra * cantidad de los items.', max_digits=20),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='iva',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0'), help_text='IVA (19%) sobre el neto.', max_digits=20),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='neto',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0'), help_text='Subtotal + recargo (base para IVA y margen).', max_digits=20),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='recargo',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0'), help_text='Recargo por urgencia sobre el subtotal.', max_digits=20),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='subtotal',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0'), help_text='Suma de subtotales de los items.', max_digits=20),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='total',
+            field=models.DecimalField(decimal_places=0, default=Decimal('0'), help_text='Neto + IVA + envío, redondeado al entero.', max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='utilidad',
+            field=models.DecimalField(decimal_places=6, default=Decimal('0'), help_text='Neto - costo de compra.', max_digits=20),
+        ),
+        # Los pedidos existentes no quedan en $0 tras migrar
+        migrations.RunPython(poblar_totales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.8 on 2026-10-17 11:19
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import CharField, Count, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+
+LOTE = 1000
+
+
+def poblar_ventas_diarias(apps, schema_editor):
+    """
+    Puebla la tabla de hechos con los pedidos completados existentes, agrupados por
+    (fecha de venta, región, comuna, cliente), igual que bi_facts.reconstruir_ventas_diarias.
+    Los totales de los pedidos ya fueron poblados por la migración 0014.
+    """
+    Pedido = apps.get_model('gestion', 'Pedido')
+    VentasDiarias = apps.get_model('gestion', 'VentasDiarias')
+
+    agregados = Pedido.objects.filter(estado='completado').annotate(
+        _fecha=TruncDate(Coalesce('fecha_despacho', 'fecha_actualizacion')),
+        _region=Coalesce('region', Value(''), output_field=CharField()),
+        _comuna=Coalesce('comuna', Value(''), output_field=CharField()),
+    ).values('_fecha', '_region', '_comuna', 'cliente_id').annotate(
+        _pedidos=Count('id'),
+        _venta=Sum('total'),
+        _neto=Sum('neto'),
+        _costo=Sum('costo_compra'),
+        _utilidad=Sum('utilidad'),
+        _iva=Sum('iva'),
+        _envios=Sum('costo_envio_estimado'),
+    ).order_by()
+
+    lote = []
+    for agregado in agregados.iterator(chunk_size=LOTE):
+        lote.append(VentasDiarias(
+            fecha=agregado['_fecha'], region=agregado['_region'], comuna=agregado['_comuna'],
+            cliente_id=agregado['cliente_id'], pedidos=agregado['_pedidos'],
+            venta=agregado['_venta'] or Decimal('0'), neto=agregado['_neto'] or Decimal('0'),
+            costo=agregado['_costo'] or Decimal('0'), utilidad=agregado['_utilidad'] or Decimal('0'),
+            iva=agregado['_iva'] or Decimal('0'), envios=agregado['_envios'] or Decimal('0'),
+        ))
+        if len(lote) >= LOTE:
+            VentasDiarias.objects.bulk_create(lote)
+            lote = []
+    if lote:
+        VentasDiarias.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0014_pedido_totales_desnormalizados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentasDiarias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(help_text='Fecha de la venta (despacho; fallback a actualización).')),
+                ('region', models.CharField(blank=True, default='', max_length=100)),
+                ('comuna', models.CharField(blank=True, default='', max_length=100)),
+                ('pedidos', models.PositiveIntegerField(default=0, help_text='Cantidad de pedidos completados.')),
+                ('venta', models.DecimalField(decimal_places=0, default=Decimal('0'), help_text='Suma de totales (con IVA y envío).', max_digits=16)),
+                ('neto', models.DecimalField(decimal_places=6, default=Decimal('0'), max_digits=20)),
+                ('costo', models.DecimalField(decimal_places=6, default=Decimal('0'), max_digits=20)),
+                ('utilidad', models.DecimalField(decimal_places=6, default=Decimal('0'), max_digits=20)),
+                ('iva', models.DecimalField(decimal_places=6, default=Decimal('0'), max_digits=20)),
+                ('envios', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=16)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to='gestion.cliente')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'region', 'comuna', 'cliente'), name='ventas_diarias_clave_unica')],
+            },
+        ),
+        # Con BI_USAR_TABLA_HECHOS activo los reportes leen esta tabla desde el primer request
+        migrations.RunPython(poblar_ventas_diarias, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-17 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0015_ventas_diarias'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionDatosBI',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
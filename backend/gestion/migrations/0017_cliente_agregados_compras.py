@@ -0,0 +1,106 @@
+# Generated by Django 5.2.8 on 2026-10-17 11:29
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, OuterRef, PositiveIntegerField, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+LOTE = 500
+# Pedido.ESTADOS_VENTA al crear las columnas
+ESTADOS_VENTA = ('completado', 'despachado', 'pagado', 'aceptado')
+
+
+def poblar_agregados(apps, schema_editor):
+    """
+    Puebla los agregados de compras de los clientes existentes desde sus pedidos, igual que
+    services.recalcular_agregados_clientes (subconsultas correlacionadas y bulk_update por lotes).
+    """
+    Cliente = apps.get_model('gestion', 'Cliente')
+    Pedido = apps.get_model('gestion', 'Pedido')
+
+    ventas = Pedido.objects.filter(cliente=OuterRef('pk'), estado__in=ESTADOS_VENTA)
+    ultima = ventas.order_by('-fecha_solicitud', '-id')
+    completados = Pedido.objects.filter(cliente=OuterRef('pk'), estado='completado').values('cliente').annotate(
+        c=Count('id')).values('c')
+    gastado = ventas.values('cliente').annotate(t=Sum('subtotal')).values('t')
+    monto = DecimalField(max_digits=20, decimal_places=0)
+
+    clientes = Cliente.objects.annotate(
+        _completados=Coalesce(Subquery(completados, output_field=PositiveIntegerField()), 0),
+        _primera=Subquery(ventas.order_by('fecha_solicitud', 'id').values('fecha_solicitud')[:1]),
+        _ultima=Subquery(ultima.values('fecha_solicitud')[:1]),
+        _region=Subquery(ultima.values('region')[:1]),
+        _comuna=Subquery(ultima.values('comuna')[:1]),
+        _gastado=Coalesce(Subquery(gastado, output_field=monto), Decimal('0'), output_field=monto),
+    ).only('id').order_by('id')
+
+    campos = ['completed_order_count', 'first_purchase_at', 'last_purchase_at',
+              'last_purchase_region', 'last_purchase_comuna', 'lifetime_value']
+    lote = []
+    for cliente in clientes.iterator(chunk_size=LOTE):
+        cliente.completed_order_count = cliente._completados
+        cliente.first_purchase_at = cliente._primera
+        cliente.last_purchase_at = cliente._ultima
+        cliente.last_purchase_region = cliente._region
+        cliente.last_purchase_comuna = cliente._comuna
+        cliente.lifetime_value = cliente._gastado
+        lote.append(cliente)
+        if len(lote) >= LOTE:
+            Cliente.objects.bulk_update(lote, campos)
+            lote = []
+    if lote:
+        Cliente.objects.bulk_update(lote, campos)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0016_version_datos_bi'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='completed_order_count',
+            field=models.PositiveIntegerField(default=0, help_text='Pedidos completados (más de 1 = cliente recurrente).'),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='first_purchase_at',
+            field=models.DateTimeField(blank=True, help_text='Fecha de la primera compra.', null=True),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='last_purchase_at',
+            field=models.DateTimeField(blank=True, help_text='Fecha de la última compra.', null=True),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='last_purchase_comuna',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='last_purchase_region',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='lifetime_value',
+            field=models.DecimalField(decimal_places=0, default=Decimal('0'), help_text='Total gastado (subtotal de las compras).', max_digits=20),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['completed_order_count'], name='cliente_pedidos_compl_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['last_purchase_at'], name='cliente_ultima_compra_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['last_purchase_region', 'last_purchase_comuna'], name='cliente_ultima_ubic_idx'),
+        ),
+        # Recurrencia y retención leen estas columnas desde el primer request
+        migrations.RunPython(poblar_agregados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-17 11:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0018_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['estado', 'fecha_actualizacion', 'id'], name='pedido_estado_actualiz_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['estado', 'fecha_despacho', 'id'], name='pedido_estado_despacho_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['fecha_actualizacion', 'id'], name='pedido_actualiz_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['fecha_despacho', 'id'], name='pedido_despacho_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['estado', 'fecha_solicitud', 'id'], name='pedido_estado_solicitud_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['cliente', 'estado', 'fecha_solicitud'], name='pedido_cliente_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['numero_guia'], name='pedido_numero_guia_idx'),
+        ),
+    ]
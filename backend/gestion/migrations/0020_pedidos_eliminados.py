@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-17 12:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0019_indices_pedidos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PedidoEliminado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pedido_id', models.PositiveBigIntegerField()),
+                ('estado', models.CharField(help_text='Estado del pedido al ser eliminado.', max_length=20)),
+                ('fecha_eliminacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha_eliminacion', 'id'], name='pedido_eliminado_fecha_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-17 12:10
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0020_pedidos_eliminados'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaveIdempotencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ambito', models.CharField(max_length=50)),
+                ('clave', models.CharField(max_length=255)),
+                ('huella', models.CharField(help_text='SHA-256 del cuerpo de la petición.', max_length=64)),
+                ('codigo_estado', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('respuesta', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha_creacion'], name='idempotencia_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ambito', 'clave'), name='idempotencia_clave_unica')],
+            },
+        ),
+    ]
@@ -10,11 +10,18 @@ MODELOS CLAVE:
     - Pedido: Transacción principal (Cotización -> Compra). Mantiene el estado.
     - ItemsPedido: Detalle de líneas de producto dentro de un pedido.
     - ProductoFrecuente: Catálogo de productos para facilitar la carga.
+    - VentasDiarias: Tabla de hechos BI (ventas completadas pre-agregadas por día).
+    - VersionDatosBI: Contador global de versión de los datos BI (invalidación de caché).
+    - EmailOutbox: Bandeja de salida de correos enviados en segundo plano (run_outbox).
+    - PedidoEliminado: Registro de pedidos borrados (bajas de la sincronización incremental).
+    - ClaveIdempotencia: Respuestas registradas por header Idempotency-Key (reintentos sin duplicados).
 """
 import uuid  # Importa el módulo uuid para generar IDs únicos
 from decimal import Decimal, ROUND_HALF_UP  # Importa el módulo decimal para manejar números con precisión
-from django.db import models  # Importa el módulo models de Django para definir modelos
+from django.db import models, transaction  # Importa models (definición de modelos) y transaction
 from django.conf import settings  # Importa el módulo settings de Django para referenciar al User model personalizado
+from django.core.serializers.json import DjangoJSONEncoder  # Importa el encoder JSON de Django (respuestas registradas)
+from django.utils import timezone  # Importa timezone para fechas con zona horaria
 
 
 # Modelo Cliente
@@ -58,6 +65,24 @@ class Cliente(models.Model):
     ]
     retention_status = models.CharField(max_length=20, choices=RETENTION_STATUS_CHOICES, default='pending')
 
+    # Agregados de compras (desnormalizados). Se mantienen al guardar/eliminar pedidos
+    # (ver Pedido.sincronizar_cliente) y se reconstruyen con 'reconstruir_agregados_clientes'.
+    completed_order_count = models.PositiveIntegerField(
+        default=0, help_text="Pedidos completados (más de 1 = cliente recurrente).")
+    first_purchase_at = models.DateTimeField(null=True, blank=True, help_text="Fecha de la primera compra.")
+    last_purchase_at = models.DateTimeField(null=True, blank=True, help_text="Fecha de la última compra.")
+    last_purchase_region = models.CharField(max_length=100, null=True, blank=True)
+    last_purchase_comuna = models.CharField(max_length=100, null=True, blank=True)
+    lifetime_value = models.DecimalField(max_digits=20, decimal_places=0, default=Decimal('0'),
+                                         help_text="Total gastado (subtotal de las compras).")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['completed_order_count'], name='cliente_pedidos_compl_idx'),
+            models.Index(fields=['last_purchase_at'], name='cliente_ultima_compra_idx'),
+            models.Index(fields=['last_purchase_region', 'last_purchase_comuna'], name='cliente_ultima_ubic_idx'),
+        ]
+
     def __str__(self):
         return f"{self.nombre_completo} ({self.empresa})"
 
@@ -98,6 +123,9 @@ class Pedido(models.Model):
         ('rechazado', 'Rechazado por Cliente'),
     ]
 
+    # Estados que cuentan como venta real (retención, primera/última compra y total gastado)
+    ESTADOS_VENTA = ('completado', 'despachado', 'pagado', 'aceptado')
+
     # Relaciones
     # on_delete=models.PROTECT: Protege la integridad referencial, evitando borrar registros con relaciones
     cliente = models.ForeignKey(Cliente, on_delete=models.PROTECT, related_name='pedidos')
@@ -162,21 +190,193 @@ class Pedido(models.Model):
     opciones_envio = models.JSONField(default=dict, blank=True, null=True,
                                       help_text="Almacena las opciones de envío calculadas (ej. {'STARKEN': 5000, 'BLUE': 4000})")
 
+    # --- TOTALES DESNORMALIZADOS (Mantenidos al escribir) ---
+    # subtotal y costo_compra provienen de los items (ver actualizar_totales).
+    # recargo, neto, iva, total y utilidad se derivan en save() a partir de ellos.
+    # 6 decimales: el recargo (% con 2 decimales) y el IVA (19%) no pierden precisión.
+    subtotal = models.DecimalField(max_digits=20, decimal_places=6, default=Decimal('0'),
+                                   help_text="Suma de subtotales de los items.")
+    recargo = models.DecimalField(max_digits=20, decimal_places=6, default=Decimal('0'),
+                                  help_text="Recargo por urgencia sobre el subtotal.")
+    neto = models.DecimalField(max_digits=20, decimal_places=6, default=Decimal('0'),
+                               help_text="Subtotal + recargo (base para IVA y margen).")
+    iva = models.DecimalField(max_digits=20, decimal_places=6, default=Decimal('0'),
+                              help_text="IVA (19%) sobre el neto.")
+    total = models.DecimalField(max_digits=14, decimal_places=0, default=Decimal('0'),
+                                help_text="Neto + IVA + envío, redondeado al entero.")
+    costo_compra = models.DecimalField(max_digits=20, decimal_places=6, default=Decimal('0'),
+                                       help_text="Suma de precio_compra * cantidad de los items.")
+    utilidad = models.DecimalField(max_digits=20, decimal_places=6, default=Decimal('0'),
+                                   help_text="Neto - costo de compra.")
+
+    CAMPOS_TOTALES = ['subtotal', 'recargo', 'neto', 'iva', 'total', 'costo_compra', 'utilidad']
+    # Campos del pedido que, al cambiar, obligan a re-derivar los totales
+    CAMPOS_BASE_TOTALES = {'porcentaje_urgencia', 'costo_envio_estimado'}
+
     @property
     def total_cotizacion(self):
         """
-        Calcula el total final del pedido incluyendo:
+        Total final del pedido (columna desnormalizada) incluyendo:
         - Subtotal de items
         - Recargo de urgencia
         - IVA (19%)
         - Costo de envío
         """
-        subtotal = sum(item.cantidad * item.precio_unitario for item in self.items.all())
-        recargo = subtotal * (self.porcentaje_urgencia / Decimal('100'))
-        neto = subtotal + recargo
-        iva = neto * Decimal('0.19')
-        total = neto + iva + self.costo_envio_estimado
-        return total.quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+        return self.total
+
+    def derivar_totales(self):
+        """
+        Recalcula recargo, neto, IVA, total y utilidad a partir de subtotal y costo_compra.
+        No consulta la base de datos.
+        """
+        subtotal = Decimal(str(self.subtotal))
+        urgencia = Decimal(str(self.porcentaje_urgencia))
+        envio = Decimal(str(self.costo_envio_estimado))
+
+        self.recargo = subtotal * (urgencia / Decimal('100'))
+        self.neto = subtotal + self.recargo
+        self.iva = self.neto * Decimal('0.19')
+        self.total = (self.neto + self.iva + envio).quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+        self.utilidad = self.neto - Decimal(str(self.costo_compra))
+
+    def actualizar_totales(self):
+        """
+        Recalcula los totales desde los items (una agregación) y los persiste con un UPDATE
+        que solo toca las columnas de totales.
+        Debe llamarse tras crear, modificar o eliminar items de forma masiva.
+        """
+        agregados = self.items.aggregate(
+            subtotal=models.Sum('subtotal'),
+            costo_compra=models.Sum(models.F('precio_compra') * models.F('cantidad'),
+                                    output_field=models.DecimalField(max_digits=20, decimal_places=6)),
+        )
+        self.subtotal = agregados['subtotal'] or Decimal('0')
+        self.costo_compra = agregados['costo_compra'] or Decimal('0')
+        self.derivar_totales()
+        # fecha_actualizacion avanza como en save() (sincronización incremental de los paneles)
+        self.fecha_actualizacion = timezone.now()
+        Pedido.objects.filter(pk=self.pk).update(
+            fecha_actualizacion=self.fecha_actualizacion,
+            **{campo: getattr(self, campo) for campo in self.CAMPOS_TOTALES})
+        self.sincronizar_bi()
+        # El subtotal alimenta el total gastado del cliente
+        self.sincronizar_cliente(forzar=True)
+
+    # --- SINCRONIZACIÓN BI (Tabla de hechos VentasDiarias) ---
+    # Campos que determinan la fila de VentasDiarias a la que aporta un pedido completado
+    CAMPOS_CLAVE_BI = ('estado', 'fecha_despacho', 'fecha_actualizacion', 'region', 'comuna', 'cliente_id')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Guarda la clave BI original para detectar salidas/cambios al guardar.
+        # Si la carga es parcial (only/defer) no se calcula para no disparar consultas extra.
+        if all(campo in instance.__dict__ for campo in cls.CAMPOS_CLAVE_BI):
+            instance._clave_bi = instance.clave_bi()
+        if all(campo in instance.__dict__ for campo in cls.CAMPOS_AGREGADOS_CLIENTE):
+            instance._agregados_cliente = instance._valores_agregados_cliente()
+        return instance
+
+    def clave_bi(self):
+        """
+        Clave (fecha, región, comuna, cliente) de VentasDiarias para este pedido,
+        o None si el pedido no está completado.
+        La fecha de venta es la de despacho (fallback a la de actualización).
+        """
+        if self.estado != 'completado':
+            return None
+        from .bi_facts import clave_ventas_diarias
+        return clave_ventas_diarias(self)
+
+    def sincronizar_bi(self):
+        """
+        Refresca las filas de VentasDiarias afectadas por este pedido (la clave
+        anterior y la actual). Solo actúa si el pedido está o estaba completado.
+        """
+        anterior = getattr(self, '_clave_bi', None)
+        actual = self.clave_bi()
+        if anterior is None and actual is None:
+            return
+        from .bi_facts import refrescar_ventas_diarias
+        refrescar_ventas_diarias(anterior, actual)
+        self._clave_bi = actual
+
+    # --- SINCRONIZACIÓN DE AGREGADOS DEL CLIENTE ---
+    # Campos del pedido que alimentan los agregados de compras de Cliente
+    CAMPOS_AGREGADOS_CLIENTE = ('estado', 'cliente_id', 'fecha_solicitud', 'region', 'comuna')
+
+    def _valores_agregados_cliente(self):
+        return tuple(getattr(self, campo) for campo in self.CAMPOS_AGREGADOS_CLIENTE)
+
+    def sincronizar_cliente(self, forzar=False):
+        """
+        Recalcula los agregados de compras del cliente (y del cliente anterior si el pedido
+        cambió de dueño) cuando el pedido es o era una venta y cambió algún campo relevante.
+        forzar=True recalcula aunque esos campos no hayan cambiado (ej: cambio de items).
+        """
+        anterior = getattr(self, '_agregados_cliente', None)
+        actual = self._valores_agregados_cliente()
+        if anterior == actual and not forzar:
+            return
+
+        clientes = set()
+        if self.estado in self.ESTADOS_VENTA:
+            clientes.add(self.cliente_id)
+        if anterior is not None and anterior[0] in self.ESTADOS_VENTA:
+            clientes.add(anterior[1])
+        if clientes:
+            from .services import recalcular_agregados_clientes
+            # Solo los pedidos completados afectan BI y ya invalidan su caché vía la tabla de hechos
+            recalcular_agregados_clientes(Cliente.objects.filter(pk__in=clientes), notificar_bi=False)
+        self._agregados_cliente = actual
+
+    def save(self, *args, **kwargs):
+        # Los totales derivados dependen de urgencia y envío: se recalculan en cada guardado
+        self.derivar_totales()
+        update_fields = kwargs.get('update_fields')
+        if update_fields:
+            # auto_now solo se escribe si está en update_fields: todo guardado avanza fecha_actualizacion
+            kwargs['update_fields'] = update_fields = set(update_fields) | {'fecha_actualizacion'}
+            if self.CAMPOS_BASE_TOTALES.intersection(update_fields):
+                kwargs['update_fields'] = update_fields | set(self.CAMPOS_TOTALES)
+        # El pedido, la tabla de hechos y los agregados del cliente se actualizan en la misma transacción
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Entradas/salidas de 'completado' (o cambios de un completado) actualizan la tabla de hechos
+            self.sincronizar_bi()
+            # Transiciones hacia/desde estados de venta actualizan los agregados del cliente
+            self.sincronizar_cliente()
+
+    def delete(self, *args, **kwargs):
+        clave = getattr(self, '_clave_bi', None) or self.clave_bi()
+        era_venta = self.estado in self.ESTADOS_VENTA
+        with transaction.atomic():
+            # Baja visible para los paneles que sincronizan por cambios (pedidos/changes/)
+            PedidoEliminado.objects.create(pedido_id=self.pk, estado=self.estado)
+            resultado = super().delete(*args, **kwargs)
+            if clave is not None:
+                from .bi_facts import refrescar_ventas_diarias
+                refrescar_ventas_diarias(clave)
+            if era_venta:
+                from .services import recalcular_agregados_clientes
+                recalcular_agregados_clientes(Cliente.objects.filter(pk=self.cliente_id), notificar_bi=False)
+        return resultado
+
+    class Meta:
+        # Índices según los caminos de acceso reales (ver 'python manage.py explicar_indices'):
+        # listados de un estado (estado + fecha de orden + id de desempate del cursor),
+        # historiales de varios estados (fecha + id: se recorre en orden filtrando el estado,
+        # que abarca la mayoría de los pedidos), BI/retención (cliente + estado + fecha)
+        # y búsqueda por número de guía.
+        indexes = [
+            models.Index(fields=['estado', 'fecha_actualizacion', 'id'], name='pedido_estado_actualiz_idx'),
+            models.Index(fields=['estado', 'fecha_despacho', 'id'], name='pedido_estado_despacho_idx'),
+            models.Index(fields=['fecha_actualizacion', 'id'], name='pedido_actualiz_idx'),
+            models.Index(fields=['fecha_despacho', 'id'], name='pedido_despacho_idx'),
+            models.Index(fields=['estado', 'fecha_solicitud', 'id'], name='pedido_estado_solicitud_idx'),
+            models.Index(fields=['cliente', 'estado', 'fecha_solicitud'], name='pedido_cliente_estado_idx'),
+            models.Index(fields=['numero_guia'], name='pedido_numero_guia_idx'),
+        ]
 
     def __str__(self):
         return f"Pedido #{self.id} - {self.cliente.nombre} ({self.get_estado_display()})"
@@ -209,9 +409,158 @@ class ItemsPedido(models.Model):
     producto_frecuente = models.ForeignKey(ProductoFrecuente, on_delete=models.SET_NULL,
                                            null=True, blank=True, help_text="Referencia al producto de catálogo si aplica.")
 
-    def save(self, *args, **kwargs):
+    def calcular_subtotal(self):
+        """Subtotal de la línea (cantidad × precio unitario). Lo usan save() y las cargas masivas."""
         self.subtotal = self.cantidad * self.precio_unitario
+        return self.subtotal
+
+    def save(self, *args, actualizar_totales=True, **kwargs):
+        self.calcular_subtotal()
         super().save(*args, **kwargs)
+        # Mantiene los totales desnormalizados del pedido.
+        # Las cargas masivas pasan actualizar_totales=False y recalculan una sola vez al final.
+        if actualizar_totales:
+            self.pedido.actualizar_totales()
+
+    def delete(self, *args, **kwargs):
+        pedido = self.pedido
+        resultado = super().delete(*args, **kwargs)
+        pedido.actualizar_totales()
+        return resultado
 
     def __str__(self):
         return f"Item: {self.descripcion[:50]}... ({self.get_tipo_origen_display()}) para Pedido #{self.pedido.id}"
+
+
+
+class VentasDiarias(models.Model):
+    """
+    Tabla de hechos BI: pedidos completados pre-agregados por día × región × comuna × cliente.
+    Se mantiene incrementalmente cuando un Pedido entra o sale de 'completado'
+    (ver gestion/bi_facts.py) y puede reconstruirse con 'reconstruir_ventas_diarias'.
+    Los dashboards agregan estas filas en lugar de unir Pedido e ItemsPedido.
+    """
+    fecha = models.DateField(help_text="Fecha de la venta (despacho; fallback a actualización).")
+    # Región/comuna vacías se guardan como '' para que la clave única agrupe correctamente
+    region = models.CharField(max_length=100, blank=True, default='')
+    comuna = models.CharField(max_length=100, blank=True, default='')
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='ventas_diarias')
+
+    pedidos = models.PositiveIntegerField(default=0, help_text="Cantidad de pedidos completados.")
+    venta = models.DecimalField(max_digits=16, decimal_places=0, default=Decimal('0'),
+                                help_text="Suma de totales (con IVA y envío).")
+    neto = models.DecimalField(max_digits=20, decimal_places=6, default=Decimal('0'))
+    costo = models.DecimalField(max_digits=20, decimal_places=6, default=Decimal('0'))
+    utilidad = models.DecimalField(max_digits=20, decimal_places=6, default=Decimal('0'))
+    iva = models.DecimalField(max_digits=20, decimal_places=6, default=Decimal('0'))
+    envios = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'region', 'comuna', 'cliente'], name='ventas_diarias_clave_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.region}/{self.comuna} cliente #{self.cliente_id}: {self.pedidos} pedidos"
+
+
+class VersionDatosBI(models.Model):
+    """
+    Contador global (fila única) de la versión de los datos BI.
+    Se incrementa cada vez que cambian los datos que consumen los endpoints de BI;
+    las respuestas cacheadas incluyen la versión en su clave, por lo que un incremento
+    invalida el caché de todos los workers (el contador vive en la base de datos).
+    """
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Versión datos BI: {self.version}"
+
+
+class EmailOutbox(models.Model):
+    """
+    Bandeja de salida de correos (patrón outbox).
+    Las vistas solo encolan el correo (en la misma transacción que el cambio de estado);
+    el worker 'run_outbox' los envía en lotes, fuera del ciclo request/response,
+    reutilizando una conexión SMTP y reintentando con espera exponencial.
+    """
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('enviando', 'Enviando'),
+        ('enviado', 'Enviado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    asunto = models.CharField(max_length=255)
+    cuerpo_texto = models.TextField()
+    cuerpo_html = models.TextField(blank=True, default='')
+    remitente = models.CharField(max_length=255)
+    destinatarios = models.JSONField(help_text="Lista de direcciones de correo.")
+    # Origen del correo (ej: 'cotizacion', 'pago_confirmado') para diagnóstico
+    tipo = models.CharField(max_length=50, blank=True, default='')
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    intentos = models.PositiveIntegerField(default=0)
+    # Próximo momento en que el worker puede (re)intentar el envío
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True, default='')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_envio = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Consulta del worker: pendientes cuyo próximo intento ya venció
+            models.Index(fields=['estado', 'proximo_intento'], name='outbox_pendientes_idx'),
+        ]
+
+    def __str__(self):
+        return f"Correo #{self.id} '{self.asunto}' ({self.estado})"
+
+
+class PedidoEliminado(models.Model):
+    """
+    Lápida de un pedido borrado.
+    La sincronización incremental (pedidos/changes/) detecta los cambios por
+    fecha_actualizacion; un pedido borrado ya no tiene fila, así que su baja se
+    registra aquí para que los paneles lo quiten de sus listados.
+    """
+    pedido_id = models.PositiveBigIntegerField()
+    estado = models.CharField(max_length=20, help_text="Estado del pedido al ser eliminado.")
+    fecha_eliminacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Consulta de cambios: bajas desde el cursor (rango sobre la fecha)
+            models.Index(fields=['fecha_eliminacion', 'id'], name='pedido_eliminado_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"Pedido #{self.pedido_id} eliminado ({self.estado})"
+
+
+class ClaveIdempotencia(models.Model):
+    """
+    Clave 'Idempotency-Key' de una petición de escritura y la respuesta que produjo
+    (ver gestion/idempotencia.py). Un reintento con la misma clave recibe la respuesta
+    registrada sin volver a ejecutar la escritura. El comando 'purgar_idempotencia'
+    elimina las claves más antiguas que settings.IDEMPOTENCIA_TTL_HORAS.
+    """
+    # Endpoint al que pertenece la clave (ej: 'solicitudes')
+    ambito = models.CharField(max_length=50)
+    clave = models.CharField(max_length=255)
+    huella = models.CharField(max_length=64, help_text="SHA-256 del cuerpo de la petición.")
+    codigo_estado = models.PositiveSmallIntegerField(null=True, blank=True)
+    respuesta = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # Búsqueda de los reintentos y exclusión de peticiones simultáneas con la misma clave
+            models.UniqueConstraint(fields=['ambito', 'clave'], name='idempotencia_clave_unica'),
+        ]
+        indexes = [
+            # Barrido de claves expiradas
+            models.Index(fields=['fecha_creacion'], name='idempotencia_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"Clave {self.ambito}:{self.clave} ({self.codigo_estado})"
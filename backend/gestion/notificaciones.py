@@ -0,0 +1,70 @@
+"""
+Correos al Cliente por Transición de Estado.
+
+PROPOSITO:
+    Suscriptores de 'pedido_transicionado' y 'pedidos_transicionados' (gestion.transiciones)
+    que encolan en EmailOutbox el correo de cada transición que lo requiere. Se ejecutan
+    dentro de la transacción de la transición: el cambio de estado y su correo se confirman
+    (o revierten) juntos. En las transiciones en lote todos los correos se insertan con un
+    solo INSERT. Se registran al iniciar la aplicación (GestionConfig.ready).
+"""
+from django.conf import settings  # URL del frontend
+from django.dispatch import receiver  # Suscripción al hook
+from .outbox import encolar_correo, encolar_correos  # Bandeja de salida de correos
+from .transiciones import pedido_transicionado, pedidos_transicionados  # Hooks posteriores a la transición
+
+
+def _enlace_portal(pedido):
+    """Enlace al portal del cliente para el pedido."""
+    return f"{settings.FRONTEND_URL}/portal/pedidos/{pedido.id_seguimiento}"
+
+
+def correo_pago_confirmado(pedido):
+    contexto = {
+        'nombre_cliente': pedido.cliente.nombre,
+        'pedido_id': pedido.id,
+        'enlace_portal': _enlace_portal(pedido),
+        'pedido': pedido
+    }
+    return {'asunto': f"Pago Confirmado - Pedido #{pedido.id} - Clarotec", 'plantilla': 'email/pago_confirmado.html',
+            'contexto': contexto, 'destinatarios': [pedido.cliente.email], 'tipo': 'pago_confirmado'}
+
+
+def correo_pago_rechazado(pedido):
+    return {'asunto': f"Problema con tu Pago - Pedido #{pedido.id} - Clarotec",
+            'plantilla': 'email/pago_rechazado.html', 'contexto': {'pedido': pedido},
+            'destinatarios': [pedido.cliente.email], 'tipo': 'pago_rechazado'}
+
+
+def correo_despacho(pedido):
+    contexto = {
+        'nombre_cliente': pedido.cliente.nombre,
+        'pedido_id': pedido.id,
+        'enlace_portal': _enlace_portal(pedido),
+        'transportista': pedido.transportista,
+        'numero_guia': pedido.numero_guia,
+    }
+    return {'asunto': f"Tu Pedido #{pedido.id} ha sido Despachado - Clarotec", 'plantilla': 'email/despacho.html',
+            'contexto': contexto, 'destinatarios': [pedido.cliente.email], 'tipo': 'despacho'}
+
+
+# Correo de cada transición que notifica al cliente
+CORREOS = {
+    'confirmar_pago': correo_pago_confirmado,
+    'rechazar_pago': correo_pago_rechazado,
+    'despachar': correo_despacho,
+}
+
+
+@receiver(pedido_transicionado, dispatch_uid='correo_transicion')
+def correo_transicion(sender, pedido, transicion, **kwargs):
+    correo = CORREOS.get(transicion.nombre)
+    if correo is not None:
+        encolar_correo(**correo(pedido))
+
+
+@receiver(pedidos_transicionados, dispatch_uid='correos_transicion_lote')
+def correos_transicion_lote(sender, pedidos, transicion, **kwargs):
+    correo = CORREOS.get(transicion.nombre)
+    if correo is not None:
+        encolar_correos([correo(pedido) for pedido in pedidos])
@@ -0,0 +1,151 @@
+"""
+Bandeja de Salida de Correos (Outbox).
+
+PROPOSITO:
+    Saca el envío SMTP del ciclo request/response. Las vistas llaman a encolar_correo(),
+    que solo renderiza la plantilla e inserta una fila en EmailOutbox (dentro de la misma
+    transacción que el cambio de estado del pedido); la latencia de la vista ya no depende
+    de Gmail ni ocupa un worker de gunicorn mientras el servidor SMTP responde o expira.
+
+ENVÍO (procesar_outbox, ejecutado por el comando 'run_outbox'):
+    - Reclama un lote de correos vencidos (select_for_update + skip_locked, de modo que
+      varios workers no toman el mismo correo) y los marca 'enviando' con un plazo de
+      bloqueo: si el worker muere, el correo vuelve a quedar disponible al vencer el plazo.
+    - Envía el lote reutilizando UNA conexión SMTP.
+    - Ante un error reintenta con espera exponencial (EMAIL_OUTBOX_BACKOFF * 2^(intentos-1))
+      hasta EMAIL_OUTBOX_MAX_INTENTOS, luego marca el correo como 'fallido'.
+"""
+from datetime import timedelta  # Plazos de reintento y bloqueo
+from django.conf import settings  # Configuración del proyecto
+from django.core.mail import EmailMultiAlternatives, get_connection  # Mensajes y conexión SMTP
+from django.db import transaction  # Reclamo atómico del lote
+from django.db.models import Q  # Condiciones compuestas
+from django.template.loader import render_to_string  # Renderizado de plantillas
+from django.utils import timezone  # Fecha actual
+from django.utils.html import strip_tags  # Versión en texto plano
+from .models import EmailOutbox  # Modelo de la bandeja de salida
+
+# Largo máximo del error guardado por intento
+LARGO_MAXIMO_ERROR = 1000
+
+
+def _correo(asunto, plantilla, contexto, destinatarios, tipo=''):
+    """Fila de EmailOutbox (sin guardar) con la plantilla HTML renderizada."""
+    html_message = render_to_string(plantilla, contexto)
+    return EmailOutbox(
+        asunto=asunto,
+        cuerpo_texto=strip_tags(html_message),
+        cuerpo_html=html_message,
+        remitente=settings.DEFAULT_FROM_EMAIL,
+        destinatarios=list(destinatarios),
+        tipo=tipo,
+    )
+
+
+def encolar_correo(asunto, plantilla, contexto, destinatarios, tipo=''):
+    """
+    Renderiza la plantilla HTML y encola el correo para envío en segundo plano.
+    Retorna la fila de EmailOutbox creada.
+    """
+    correo = _correo(asunto, plantilla, contexto, destinatarios, tipo=tipo)
+    correo.save()
+    return correo
+
+
+def encolar_correos(correos):
+    """
+    Encola varios correos con un solo INSERT (ej: transiciones de estado en lote).
+    'correos' son diccionarios con los argumentos de encolar_correo.
+    Retorna la cantidad encolada.
+    """
+    return len(EmailOutbox.objects.bulk_create([_correo(**correo) for correo in correos]))
+
+
+def espera_reintento(intentos):
+    """Espera antes del próximo intento tras 'intentos' fallos (exponencial con tope)."""
+    segundos = settings.EMAIL_OUTBOX_BACKOFF * 2 ** (intentos - 1)
+    return timedelta(seconds=min(segundos, settings.EMAIL_OUTBOX_BACKOFF_MAXIMO))
+
+
+def _reclamar_lote(limite, ahora):
+    """
+    Marca como 'enviando' hasta 'limite' correos vencidos y los retorna.
+    Incluye correos 'enviando' cuyo plazo de bloqueo expiró (worker caído).
+    """
+    vencidos = Q(estado__in=['pendiente', 'enviando'], proximo_intento__lte=ahora)
+    with transaction.atomic():
+        ids = list(EmailOutbox.objects.select_for_update(skip_locked=True).filter(vencidos).order_by(
+            'proximo_intento', 'id').values_list('id', flat=True)[:limite])
+        EmailOutbox.objects.filter(id__in=ids).update(
+            estado='enviando', proximo_intento=ahora + timedelta(seconds=settings.EMAIL_OUTBOX_BLOQUEO))
+    return list(EmailOutbox.objects.filter(id__in=ids).order_by('id'))
+
+
+def _mensaje(correo, conexion):
+    """Construye el mensaje de Django (texto plano + alternativa HTML) de un correo encolado."""
+    mensaje = EmailMultiAlternatives(correo.asunto, correo.cuerpo_texto, correo.remitente,
+                                     correo.destinatarios, connection=conexion)
+    if correo.cuerpo_html:
+        mensaje.attach_alternative(correo.cuerpo_html, 'text/html')
+    return mensaje
+
+
+def _registrar_fallo(correo, error, ahora):
+    """Programa el reintento del correo o lo marca como fallido si agotó los intentos."""
+    correo.intentos += 1
+    correo.ultimo_error = str(error)[:LARGO_MAXIMO_ERROR] or error.__class__.__name__
+    if correo.intentos >= settings.EMAIL_OUTBOX_MAX_INTENTOS:
+        correo.estado = 'fallido'
+    else:
+        correo.estado = 'pendiente'
+        correo.proximo_intento = ahora + espera_reintento(correo.intentos)
+    correo.save(update_fields=['intentos', 'ultimo_error', 'estado', 'proximo_intento'])
+
+
+def _abrir(conexion):
+    """Abre la conexión SMTP. Retorna la excepción si el servidor es inalcanzable (None si abrió)."""
+    try:
+        conexion.open()
+    except Exception as e:
+        return e
+    return None
+
+
+def procesar_outbox(limite=None, ahora=None):
+    """
+    Envía un lote de correos pendientes sobre una única conexión SMTP.
+    Retorna: {'enviados': n, 'reintentos': n, 'fallidos': n}
+    """
+    ahora = ahora or timezone.now()
+    resultado = {'enviados': 0, 'reintentos': 0, 'fallidos': 0}
+
+    correos = _reclamar_lote(limite or settings.EMAIL_OUTBOX_LOTE, ahora)
+    if not correos:
+        return resultado
+
+    conexion = get_connection(fail_silently=False)
+    error_conexion = _abrir(conexion)
+
+    for correo in correos:
+        try:
+            if error_conexion is not None:
+                raise error_conexion
+            _mensaje(correo, conexion).send()
+        except Exception as e:
+            _registrar_fallo(correo, e, ahora)
+            resultado['fallidos' if correo.estado == 'fallido' else 'reintentos'] += 1
+            # La conexión puede haber quedado inutilizable: se reabre para el resto del lote
+            if error_conexion is None:
+                conexion.close()
+                error_conexion = _abrir(conexion)
+            continue
+
+        correo.estado = 'enviado'
+        correo.intentos += 1
+        correo.fecha_envio = timezone.now()
+        correo.ultimo_error = ''
+        correo.save(update_fields=['estado', 'intentos', 'fecha_envio', 'ultimo_error'])
+        resultado['enviados'] += 1
+
+    conexion.close()
+    return resultado
@@ -0,0 +1,197 @@
+"""
+Paginación por Cursor (Keyset) de los Listados de Pedidos.
+
+PROPOSITO:
+    Los listados del panel (solicitudes, cotizados, aceptados, para despachar e
+    historiales) crecen sin límite. En lugar de devolver todos los pedidos o de usar
+    OFFSET (cuyo costo crece con la página), cada página continúa desde la última fila
+    vista: WHERE (fecha, id) < (fecha_cursor, id_cursor) ORDER BY fecha, id LIMIT n.
+    El costo y el tamaño de cada respuesta son constantes aunque crezca el historial.
+
+DISEÑO:
+    - El orden es el del listado original (campo de fecha) con desempate estable por id.
+    - El cursor es opaco (base64 de JSON con el valor de la fecha, el id y la dirección).
+    - Las fechas nulas (fecha_despacho de pedidos antiguos) van al final en ambos motores.
+    - Respuesta con el formato de DRF: {'next': url, 'previous': url, 'results': [...]}.
+    - Tamaño de página: ?page_size=N, acotado por settings.PEDIDOS_PAGINA_MAXIMA
+      (por defecto settings.PEDIDOS_PAGINA).
+"""
+import base64  # Codificación del cursor
+import binascii  # Errores de decodificación base64
+import json  # Contenido del cursor
+from django.conf import settings  # Tamaños de página
+from django.core.exceptions import ValidationError  # Fecha del cursor mal formada
+from django.db.models import F, Q  # Orden y condiciones
+from rest_framework.exceptions import NotFound  # Cursor inválido
+from rest_framework.pagination import BasePagination  # Clase base de paginación
+from rest_framework.response import Response  # Respuesta paginada
+from rest_framework.utils.urls import remove_query_param, replace_query_param  # Enlaces de página
+
+
+class PaginacionKeyset(BasePagination):
+    """
+    Paginación por cursor sobre (campo, id). Las subclases definen 'campo' y 'descendente'.
+    """
+    campo = None  # Campo de fecha que ordena el listado
+    descendente = True  # Más recientes primero
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    mensaje_cursor_invalido = 'Cursor inválido.'
+
+    def get_page_size(self, request):
+        """Tamaño pedido en ?page_size=, acotado a [1, PEDIDOS_PAGINA_MAXIMA]."""
+        try:
+            tamano = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.PEDIDOS_PAGINA
+        if tamano <= 0:
+            return settings.PEDIDOS_PAGINA
+        return min(tamano, settings.PEDIDOS_PAGINA_MAXIMA)
+
+    # --- Cursor ---
+
+    def _codificar(self, fila, reverso):
+        """Cursor opaco que apunta a 'fila' (en la dirección indicada)."""
+        return self.codificar_cursor(getattr(fila, self.campo), fila.pk, reverso)
+
+    def codificar_cursor(self, valor, pk, reverso=False):
+        """Cursor opaco que apunta a la posición (valor, pk)."""
+        contenido = {'v': valor.isoformat() if valor is not None else None, 'id': pk, 'r': reverso}
+        return base64.urlsafe_b64encode(json.dumps(contenido).encode()).decode()
+
+    def decodificar_cursor(self, texto, campo_modelo):
+        """Retorna (valor, id, reverso) del cursor. NotFound si está mal formado."""
+        try:
+            contenido = json.loads(base64.urlsafe_b64decode(texto.encode()))
+            valor = contenido['v']
+            if valor is not None:
+                valor = campo_modelo.to_python(valor)
+            return valor, int(contenido['id']), bool(contenido['r'])
+        except (binascii.Error, ValueError, TypeError, KeyError, AttributeError, ValidationError):
+            raise NotFound(self.mensaje_cursor_invalido)
+
+    # --- Consultas ---
+
+    def _orden(self, reverso):
+        """ORDER BY (campo, id) con nulos al final; invertido al ir hacia atrás."""
+        descendente = self.descendente != reverso
+        nulos = {'nulls_first': True} if reverso else {'nulls_last': True}
+        if descendente:
+            return (F(self.campo).desc(**nulos), '-id')
+        return (F(self.campo).asc(**nulos), 'id')
+
+    def _siguientes(self, valor, pk, nulo_posible):
+        """Filas posteriores a (valor, pk) en el orden del listado (nulos al final)."""
+        menor = 'lt' if self.descendente else 'gt'
+        if valor is None:
+            return Q(**{f'{self.campo}__isnull': True, f'id__{menor}': pk})
+        # Cota simple sobre la fecha (rango de índice) más el desempate por id
+        condicion = Q(**{f'{self.campo}__{menor}e': valor}) & (
+            Q(**{f'{self.campo}__{menor}': valor}) | Q(**{f'id__{menor}': pk}))
+        if nulo_posible:
+            condicion |= Q(**{f'{self.campo}__isnull': True})
+        return condicion
+
+    def _anteriores(self, valor, pk):
+        """Filas anteriores a (valor, pk) en el orden del listado (nulos al final)."""
+        mayor = 'gt' if self.descendente else 'lt'
+        if valor is None:
+            return Q(**{f'{self.campo}__isnull': False}) | Q(**{f'{self.campo}__isnull': True, f'id__{mayor}': pk})
+        return Q(**{f'{self.campo}__{mayor}e': valor}) & (
+            Q(**{f'{self.campo}__{mayor}': valor}) | Q(**{f'id__{mayor}': pk}))
+
+    def consulta(self, queryset, tamano, cursor=None):
+        """
+        QuerySet de una página: filtro del cursor (valor, id, reverso), orden y LIMIT tamano + 1
+        (la fila extra indica si hay más páginas en esa dirección).
+        """
+        reverso = False
+        if cursor is not None:
+            valor, pk, reverso = cursor
+            if reverso:
+                queryset = queryset.filter(self._anteriores(valor, pk))
+            else:
+                nulo_posible = queryset.model._meta.get_field(self.campo).null
+                queryset = queryset.filter(self._siguientes(valor, pk, nulo_posible))
+        return queryset.order_by(*self._orden(reverso))[:tamano + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Retorna la página de filas posterior (o anterior) al cursor recibido."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        texto = request.query_params.get(self.cursor_query_param)
+        self.con_cursor = bool(texto)
+        cursor = self.decodificar_cursor(texto, queryset.model._meta.get_field(self.campo)) if texto else None
+        self.reverso = bool(cursor and cursor[2])
+
+        filas = list(self.consulta(queryset, self.page_size, cursor))
+        self.hay_mas = len(filas) > self.page_size
+        self.page = filas[:self.page_size]
+        if self.reverso:
+            self.page.reverse()
+        return self.page
+
+    # --- Respuesta ---
+
+    def _enlace(self, fila, reverso):
+        """URL de la página siguiente/anterior (conserva filtros y page_size)."""
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self._codificar(fila, reverso))
+
+    def get_next_link(self):
+        # Hacia atrás siempre existe la página desde la que se llegó
+        if not self.page or not (self.hay_mas or self.reverso):
+            return None
+        return self._enlace(self.page[-1], reverso=False)
+
+    def get_previous_link(self):
+        if self.reverso:
+            if self.hay_mas:
+                return self._enlace(self.page[0], reverso=True)
+            return None
+        if not self.con_cursor:
+            return None
+        if not self.page:
+            # Página vacía al final: se vuelve al inicio del listado
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self._enlace(self.page[0], reverso=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class PaginacionPorActualizacion(PaginacionKeyset):
+    """Más recientemente actualizados primero (cotizados, aceptados, historiales)."""
+    campo = 'fecha_actualizacion'
+
+
+class PaginacionPorActualizacionAntigua(PaginacionKeyset):
+    """Más antiguos primero (cola de despacho: el que más espera, primero)."""
+    campo = 'fecha_actualizacion'
+    descendente = False
+
+
+class PaginacionPorSolicitud(PaginacionKeyset):
+    """Solicitudes más recientes primero."""
+    campo = 'fecha_solicitud'
+
+
+class PaginacionPorDespacho(PaginacionKeyset):
+    """Despachos más recientes primero (pedidos sin fecha de despacho al final)."""
+    campo = 'fecha_despacho'
@@ -0,0 +1,263 @@
+"""
+PDF de Cotización con Caché Direccionado por Contenido.
+
+PROPOSITO:
+    Renderizar 'pdf/pedido_pdf.html' con xhtml2pdf cuesta cientos de milisegundos de CPU
+    en un worker síncrono, y los clientes abren el mismo PDF muchas veces desde el portal.
+    Este módulo calcula una VERSIÓN del PDF (hash de todo lo que el documento muestra) y:
+    - Guarda el PDF renderizado en el caché settings.PDF_CACHE_ALIAS bajo esa versión.
+    - Usa la versión como ETag, de modo que el navegador revalida con If-None-Match
+      y recibe un 304 sin que se lea ni renderice nada.
+
+VERSIÓN (invalidación):
+    Incluye fecha_actualizacion y los totales del pedido (cambian al editar el envío o los
+    items), un hash de los items, los datos del cliente mostrados y la fecha del día (el
+    documento imprime la validez de la cotización). Cualquier edición produce otra versión;
+    las entradas antiguas simplemente dejan de usarse y expiran por TTL.
+    FORMATO_PDF debe incrementarse al modificar la plantilla.
+
+RENDER:
+    El documento se prepara en el worker y la conversión a PDF (CPU intensiva) se delega
+    al pool de procesos de gestion/pdf_service.py. pdfs_de_pedidos() convierte en paralelo
+    los PDFs de varios pedidos que no estén en caché. Motores (settings.PDF_MOTOR):
+    - 'xhtml2pdf': renderiza la plantilla HTML y la convierte con xhtml2pdf.
+    - 'reportlab': arma el mismo documento con reportlab platypus (gestion/pdf_reportlab.py)
+      a partir de textos formateados con los mismos filtros que la plantilla.
+
+EXPORTACIÓN MASIVA (zip_cotizaciones):
+    Genera un ZIP en streaming: los pedidos se procesan en lotes pequeños (convertidos en
+    paralelo, reutilizando el caché) y cada PDF se emite al cliente apenas se escribe en el
+    archivo. Solo un lote vive en memoria a la vez, sin importar cuántas cotizaciones incluya.
+"""
+import hashlib  # Hash de la versión
+import zipfile  # Archivo ZIP de la exportación masiva
+from django.conf import settings  # Configuración del proyecto
+from django.contrib.humanize.templatetags.humanize import intcomma  # Separador de miles
+from django.core.cache import caches  # Backends de caché
+from django.db.models import Prefetch  # Carga de items por lote
+from django.template.defaultfilters import date as formato_fecha, floatformat  # Filtros de la plantilla
+from django.template.loader import render_to_string  # Renderizado de plantillas
+from django.utils import timezone  # Fecha actual
+from django.utils.text import Truncator  # Truncado de descripciones
+from . import pdf_service  # Pool de procesos de renderizado
+from .models import ItemsPedido, Pedido  # Modelos
+from .pdf_worker import MOTOR_REPORTLAB  # Motores de PDF
+
+# Plantilla del documento
+PLANTILLA_PDF = 'pdf/pedido_pdf.html'
+
+# Versión del formato del documento (incrementar al cambiar la plantilla)
+FORMATO_PDF = 1
+
+# Validez de 15 días hábiles (simplificado a 21 días corridos)
+DIAS_VALIDEZ = 21
+
+# Campos del pedido y del cliente que aparecen en el documento
+CAMPOS_PEDIDO_PDF = ('fecha_actualizacion', 'fecha_solicitud', 'region', 'comuna', 'porcentaje_urgencia',
+                     'subtotal', 'recargo', 'neto', 'iva', 'costo_envio_estimado')
+CAMPOS_CLIENTE_PDF = ('nombre', 'apellido', 'empresa', 'email', 'telefono')
+CAMPOS_ITEM_PDF = ('id', 'descripcion', 'cantidad', 'precio_unitario', 'subtotal')
+
+
+def _cache():
+    """Backend de caché de PDFs."""
+    return caches[settings.PDF_CACHE_ALIAS]
+
+
+def cache_pdf_habilitado():
+    """El caché de PDFs se desactiva con PDF_CACHE_TTL = 0."""
+    return settings.PDF_CACHE_TTL > 0
+
+
+def items_pdf(pedido):
+    """Items del pedido en el orden en que se imprimen (usa el prefetch si existe)."""
+    return sorted(pedido.items.all(), key=lambda item: item.id)
+
+
+def version_pdf(pedido, items, hoy=None):
+    """Hash (hex) de todo el contenido que muestra el PDF del pedido (y del motor que lo genera)."""
+    partes = [f'formato={FORMATO_PDF}', f'motor={settings.PDF_MOTOR}', f'pedido={pedido.pk}',
+              f'hoy={hoy or timezone.localdate()}']
+    partes += [f'{campo}={getattr(pedido, campo)}' for campo in CAMPOS_PEDIDO_PDF]
+    partes += [f'cliente.{campo}={getattr(pedido.cliente, campo)}' for campo in CAMPOS_CLIENTE_PDF]
+    for item in items:
+        partes.append('item=' + '|'.join(str(getattr(item, campo)) for campo in CAMPOS_ITEM_PDF))
+    return hashlib.sha256('\n'.join(partes).encode('utf-8')).hexdigest()
+
+
+def contexto_pdf(pedido, items):
+    """Contexto de la plantilla del PDF (totales desnormalizados del pedido)."""
+    ahora = timezone.now()
+    costo_envio = pedido.costo_envio_estimado
+    return {
+        'pedido': pedido,
+        'items': items,
+        'subtotal': pedido.subtotal,
+        'recargo': pedido.recargo,
+        'neto': pedido.neto,
+        'iva': pedido.iva,
+        'costo_envio': costo_envio,
+        'total': pedido.neto + pedido.iva + costo_envio,
+        'validez': ahora + timezone.timedelta(days=DIAS_VALIDEZ),
+        'fecha_actual': ahora,
+    }
+
+
+def _html_pdf(pedido, items):
+    """HTML de la cotización listo para convertir."""
+    return render_to_string(PLANTILLA_PDF, contexto_pdf(pedido, items))
+
+
+def _monto(valor):
+    """Monto como en la plantilla: floatformat:0 | intcomma."""
+    return intcomma(floatformat(valor, 0))
+
+
+def datos_reportlab(pedido, items):
+    """
+    Textos del documento para el motor 'reportlab', formateados con los mismos
+    filtros que 'pdf/pedido_pdf.html' (solo tipos simples: se envían al pool).
+    """
+    contexto = contexto_pdf(pedido, items)
+    cliente = pedido.cliente
+    totales = [('Subtotal:', _monto(contexto['subtotal']))]
+    if contexto['recargo'] > 0:
+        totales.append((f'Recargo Urgencia ({pedido.porcentaje_urgencia}%):', _monto(contexto['recargo'])))
+    totales += [('Neto:', _monto(contexto['neto'])), ('IVA (19%):', _monto(contexto['iva']))]
+    if contexto['costo_envio'] > 0:
+        totales.append(('Costo de Envío:', _monto(contexto['costo_envio'])))
+
+    return {
+        'numero': str(pedido.id),
+        'fecha': formato_fecha(pedido.fecha_solicitud, 'd/m/Y'),
+        'validez': formato_fecha(contexto['validez'], 'd/m/Y'),
+        'cliente_nombre': f'{cliente.nombre} {cliente.apellido}',
+        'cliente_empresa': cliente.empresa or '-',
+        'cliente_email': cliente.email,
+        'cliente_telefono': cliente.telefono or '-',
+        'direccion': f'{pedido.comuna}, {pedido.region}' if pedido.region else '',
+        'items': [
+            {
+                'descripcion': Truncator(item.descripcion).chars(300),
+                'cantidad': str(item.cantidad),
+                'precio_unitario': _monto(item.precio_unitario),
+                'subtotal': _monto(item.subtotal),
+            }
+            for item in items
+        ],
+        'totales': totales,
+        'total': _monto(contexto['total']),
+    }
+
+
+def documento_pdf(pedido, items, motor=None):
+    """Documento a convertir según el motor: HTML renderizado o textos para reportlab."""
+    if (motor or settings.PDF_MOTOR) == MOTOR_REPORTLAB:
+        return datos_reportlab(pedido, items)
+    return _html_pdf(pedido, items)
+
+
+def _clave(version):
+    """Clave de caché del PDF de una versión."""
+    return f'pdf:cotizacion:{version}'
+
+
+def obtener_pdf(pedido, items, version):
+    """
+    PDF del pedido para la versión dada, desde caché o renderizándolo.
+    Retorna (contenido, desde_cache); contenido es None si el render falló.
+    Lanza pdf_service.ServicioPDFOcupado / TiempoPDFAgotado.
+    """
+    return pdfs_de_pedidos([(pedido, items, version)])[0]
+
+
+def pdfs_de_pedidos(documentos):
+    """
+    PDFs de varios pedidos: los que faltan en caché se convierten en paralelo en el pool.
+    'documentos': lista de (pedido, items, version).
+    Retorna una lista de (contenido, desde_cache) en el mismo orden.
+    """
+    cache = _cache() if cache_pdf_habilitado() else None
+    en_cache = cache.get_many([_clave(v) for _, _, v in documentos]) if cache is not None else {}
+
+    resultados = [(en_cache.get(_clave(version)), True) for _, _, version in documentos]
+    faltantes = [i for i, (contenido, _) in enumerate(resultados) if contenido is None]
+    if not faltantes:
+        return resultados
+
+    pendientes = [documento_pdf(documentos[i][0], documentos[i][1]) for i in faltantes]
+    for i, contenido in zip(faltantes, pdf_service.renderizar_lote(pendientes, motor=settings.PDF_MOTOR)):
+        resultados[i] = (contenido, False)
+        if cache is not None and contenido is not None:
+            cache.set(_clave(documentos[i][2]), contenido, timeout=settings.PDF_CACHE_TTL)
+    return resultados
+
+
+def nombre_pdf(pedido_id):
+    """Nombre del archivo PDF de la cotización (igual que la descarga individual)."""
+    return f"Cotizacion_{pedido_id}.pdf"
+
+
+class _SalidaZip:
+    """
+    Destino no posicionable de zipfile: acumula lo escrito hasta que el generador lo emite.
+    (zipfile detecta que no admite tell/seek y escribe el archivo de forma secuencial).
+    """
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def extraer(self):
+        """Bytes escritos desde la última extracción."""
+        datos, self._partes = b''.join(self._partes), []
+        return datos
+
+
+def _lotes(ids, tamano):
+    """Divide la lista de IDs en lotes consecutivos."""
+    for inicio in range(0, len(ids), tamano):
+        yield ids[inicio:inicio + tamano]
+
+
+def zip_cotizaciones(pedido_ids, tamano_lote=None):
+    """
+    Generador de bytes de un ZIP con el PDF de cada pedido indicado.
+    Los PDFs que no se pudieron generar se listan en 'errores.txt' al final del archivo.
+    """
+    tamano_lote = tamano_lote or settings.PDF_ZIP_LOTE
+    salida = _SalidaZip()
+    errores = []
+    # Los PDF ya vienen comprimidos: se almacenan sin volver a comprimir
+    with zipfile.ZipFile(salida, mode='w', compression=zipfile.ZIP_STORED) as archivo:
+        for lote in _lotes(pedido_ids, tamano_lote):
+            pedidos = Pedido.objects.filter(id__in=lote).select_related('cliente').prefetch_related(
+                Prefetch('items', queryset=ItemsPedido.objects.order_by('id'))).order_by('id')
+            documentos = []
+            for pedido in pedidos:
+                items = items_pdf(pedido)
+                documentos.append((pedido, items, version_pdf(pedido, items)))
+
+            try:
+                resultados = pdfs_de_pedidos(documentos)
+            except (pdf_service.ServicioPDFOcupado, pdf_service.TiempoPDFAgotado) as e:
+                errores += [f"Pedido #{pedido.id}: {e}" for pedido, _, _ in documentos]
+                continue
+
+            for (pedido, _, _), (contenido, _) in zip(documentos, resultados):
+                if contenido is None:
+                    errores.append(f"Pedido #{pedido.id}: error al generar el PDF")
+                    continue
+                archivo.writestr(nombre_pdf(pedido.id), contenido)
+                yield salida.extraer()
+
+        if errores:
+            archivo.writestr('errores.txt', '\n'.join(errores))
+    # Directorio central del ZIP (escrito al cerrar el archivo)
+    yield salida.extraer()
@@ -0,0 +1,215 @@
+"""
+Motor Nativo de PDF de Cotización (reportlab platypus).
+
+PROPOSITO:
+    Construye el mismo documento que 'pdf/pedido_pdf.html' directamente con reportlab,
+    sin el paso de parseo HTML/CSS de xhtml2pdf (más rápido y con menos memoria por render,
+    ver 'python manage.py benchmark_pdf'). Se activa con settings.PDF_MOTOR = 'reportlab'.
+
+    Recibe un diccionario de textos YA FORMATEADOS (ver pdf.datos_reportlab), de modo que
+    fechas y montos coinciden con los filtros de la plantilla HTML. Como pdf_worker, este
+    módulo NO importa Django: se ejecuta dentro de los procesos del pool de PDFs.
+
+DISEÑO (equivalente a la plantilla):
+    Carta, márgenes de 2 cm, Helvetica. Encabezado de dos columnas con línea azul,
+    recuadro gris de datos del cliente, tabla de items con encabezado azul que se repite
+    en cada página (anchos 50/10/20/20 %), totales al 40 % alineados a la derecha,
+    términos y condiciones y pie de página.
+"""
+from io import BytesIO  # Buffer en memoria
+from xml.sax.saxutils import escape  # Escape del marcado de Paragraph
+from reportlab.lib import colors  # Colores
+from reportlab.lib.enums import TA_CENTER, TA_RIGHT  # Alineaciones
+from reportlab.lib.pagesizes import letter  # Tamaño carta
+from reportlab.lib.styles import ParagraphStyle  # Estilos de párrafo
+from reportlab.lib.units import cm  # Unidades
+from reportlab.pdfbase.pdfmetrics import stringWidth  # Ancho de texto
+from reportlab.platypus import (  # Elementos de diagramación
+    ListFlowable,
+    ListItem,
+    Paragraph,
+    SimpleDocTemplate,
+    Spacer,
+    Table,
+    TableStyle
+)
+
+# Paleta de la plantilla HTML
+AZUL = colors.HexColor('#0056b3')
+TEXTO = colors.HexColor('#333333')
+GRIS_TEXTO = colors.HexColor('#666666')
+GRIS_FONDO = colors.HexColor('#f8f9fa')
+GRIS_LINEA = colors.HexColor('#eeeeee')
+GRIS_BORDE = colors.HexColor('#dddddd')
+GRIS_PIE = colors.HexColor('#777777')
+GRIS_TERMINOS = colors.HexColor('#555555')
+
+MARGEN = 2 * cm
+
+TERMINOS = (
+    'Los precios están expresados en Pesos Chilenos (CLP).',
+    'La validez de esta cotización es de 15 días hábiles.',
+    'Los tiempos de entrega están sujetos a disponibilidad de stock.',
+    'Para confirmar su pedido, por favor realice el pago y envíe el comprobante.',
+)
+
+
+def _estilo(nombre, **kwargs):
+    """Estilo de párrafo sobre la base del 'body' de la plantilla (Helvetica 12px, #333)."""
+    base = {'fontName': 'Helvetica', 'fontSize': 12, 'leading': 18, 'textColor': TEXTO}
+    base.update(kwargs)
+    return ParagraphStyle(nombre, **base)
+
+
+ESTILOS = {
+    'empresa': _estilo('empresa', fontName='Helvetica-Bold', fontSize=24, leading=28, textColor=AZUL),
+    'empresa_linea': _estilo('empresa_linea', fontSize=10, leading=12, textColor=GRIS_TEXTO),
+    'titulo': _estilo('titulo', fontName='Helvetica-Bold', fontSize=18, leading=22, alignment=TA_RIGHT),
+    'detalle': _estilo('detalle', alignment=TA_RIGHT),
+    'seccion': _estilo('seccion', fontName='Helvetica-Bold', fontSize=14, leading=18, textColor=AZUL),
+    'normal': _estilo('normal'),
+    'th': _estilo('th', fontName='Helvetica-Bold', fontSize=11, leading=14, textColor=colors.white),
+    'td': _estilo('td', fontSize=11, leading=14),
+    'td_centro': _estilo('td_centro', fontSize=11, leading=14, alignment=TA_CENTER),
+    'td_derecha': _estilo('td_derecha', fontSize=11, leading=14, alignment=TA_RIGHT),
+    'total': _estilo('total', alignment=TA_RIGHT),
+    'total_final': _estilo('total_final', fontName='Helvetica-Bold', fontSize=14, leading=18,
+                           textColor=AZUL, alignment=TA_RIGHT),
+    'terminos_titulo': _estilo('terminos_titulo', fontName='Helvetica-Bold', fontSize=10, leading=14,
+                               textColor=GRIS_TERMINOS),
+    'terminos': _estilo('terminos', fontSize=10, leading=14, textColor=GRIS_TERMINOS),
+    'pie': _estilo('pie', fontSize=10, leading=14, textColor=GRIS_PIE, alignment=TA_CENTER),
+}
+
+
+def _p(texto, estilo):
+    """Párrafo con el texto escapado (los datos del pedido no son marcado)."""
+    return Paragraph(escape(texto), ESTILOS[estilo])
+
+
+def _encabezado(datos, ancho):
+    """Empresa a la izquierda y número/fechas a la derecha, con línea azul inferior."""
+    empresa = [
+        _p('Clarotec', 'empresa'),
+        _p('Soluciones Tecnológicas Integrales', 'empresa_linea'),
+        _p('Santiago, Chile', 'empresa_linea'),
+        _p('contacto@clarotec.cl', 'empresa_linea'),
+    ]
+    detalle = [
+        _p('COTIZACIÓN', 'titulo'),
+        Paragraph(f"<b>N°:</b> #{escape(datos['numero'])}", ESTILOS['detalle']),
+        Paragraph(f"<b>Fecha:</b> {escape(datos['fecha'])}", ESTILOS['detalle']),
+        Paragraph(f"<b>Válido hasta:</b> {escape(datos['validez'])}", ESTILOS['detalle']),
+    ]
+    tabla = Table([[empresa, detalle]], colWidths=[ancho / 2, ancho / 2])
+    tabla.setStyle(TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 0),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+        ('LINEBELOW', (0, 0), (-1, 0), 2, AZUL),
+    ]))
+    return tabla
+
+
+def _cliente(datos, ancho):
+    """Recuadro gris con los datos del cliente."""
+    filas = [
+        [_p('Datos del Cliente', 'seccion'), '', '', ''],
+        [_p('Nombre:', 'normal'), _p(datos['cliente_nombre'], 'normal'),
+         _p('Empresa:', 'normal'), _p(datos['cliente_empresa'], 'normal')],
+        [Paragraph(f"<b>Email:</b> {escape(datos['cliente_email'])}", ESTILOS['normal']), '',
+         Paragraph(f"<b>Teléfono:</b> {escape(datos['cliente_telefono'])}", ESTILOS['normal']), ''],
+    ]
+    estilo = [
+        ('SPAN', (0, 0), (-1, 0)),
+        ('SPAN', (0, 2), (1, 2)),
+        ('SPAN', (2, 2), (3, 2)),
+        ('BACKGROUND', (0, 0), (-1, -1), GRIS_FONDO),
+        ('LINEBELOW', (0, 0), (-1, 0), 1, GRIS_BORDE),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 15),
+        ('TOPPADDING', (0, 0), (-1, 0), 15),
+        ('BOTTOMPADDING', (0, -1), (-1, -1), 15),
+    ]
+    if datos['direccion']:
+        filas.append([Paragraph(f"<b>Dirección de Envío:</b> {escape(datos['direccion'])}", ESTILOS['normal']),
+                      '', '', ''])
+        estilo.append(('SPAN', (0, 3), (-1, 3)))
+    tabla = Table(filas, colWidths=[ancho * 0.18, ancho * 0.32, ancho * 0.18, ancho * 0.32])
+    tabla.setStyle(TableStyle(estilo))
+    return tabla
+
+
+def _items(datos, ancho):
+    """Tabla de items."""
+    filas = [[_p('Descripción', 'th'), Paragraph('Cant.', ESTILOS['th']),
+              Paragraph('Precio Unit.', ESTILOS['th']), Paragraph('Total', ESTILOS['th'])]]
+    for item in datos['items']:
+        filas.append([
+            _p(item['descripcion'], 'td'),
+            _p(item['cantidad'], 'td_centro'),
+            _p(f"${item['precio_unitario']}", 'td_derecha'),
+            _p(f"${item['subtotal']}", 'td_derecha'),
+        ])
+    # Encabezado repetido en cada página (tablas de cientos de items)
+    tabla = Table(filas, colWidths=[ancho * 0.5, ancho * 0.1, ancho * 0.2, ancho * 0.2], repeatRows=1)
+    tabla.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), AZUL),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('ALIGN', (1, 0), (1, 0), 'CENTER'),
+        ('LINEBELOW', (0, 1), (-1, -1), 1, GRIS_LINEA),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('LEFTPADDING', (0, 0), (-1, -1), 8),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+    ]))
+    return tabla
+
+
+def _totales(datos, ancho):
+    """Tabla de totales (40 % del ancho, alineada a la derecha)."""
+    filas = [[Paragraph(f'<b>{escape(etiqueta)}</b>', ESTILOS['total']), _p(f'${monto}', 'total')]
+             for etiqueta, monto in datos['totales']]
+    filas.append([_p('TOTAL:', 'total_final'), _p(f"${datos['total']}", 'total_final')])
+    # Como en HTML: 40 % del ancho, ampliado si una etiqueta o monto no cabe sin cortarse
+    ancho_montos = stringWidth(f"${datos['total']}", 'Helvetica-Bold', 14) + 12
+    ancho_etiquetas = max(stringWidth(etiqueta, 'Helvetica-Bold', 12) for etiqueta, _ in datos['totales']) + 12
+    ancho_tabla = max(ancho * 0.4, ancho_etiquetas + ancho_montos)
+    tabla = Table(filas, colWidths=[ancho_tabla - ancho_montos, ancho_montos], hAlign='RIGHT')
+    tabla.setStyle(TableStyle([
+        ('LINEABOVE', (0, -1), (-1, -1), 2, TEXTO),
+        ('TOPPADDING', (0, 0), (-1, -1), 5),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+        ('LEFTPADDING', (0, 0), (-1, -1), 5),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 5),
+    ]))
+    return tabla
+
+
+def cotizacion_pdf(datos):
+    """Genera el PDF de la cotización a partir de los textos formateados. Retorna los bytes."""
+    result = BytesIO()
+    doc = SimpleDocTemplate(result, pagesize=letter, leftMargin=MARGEN, rightMargin=MARGEN,
+                            topMargin=MARGEN, bottomMargin=MARGEN, title=f"Cotización #{datos['numero']}")
+    ancho = doc.width
+
+    historia = [
+        _encabezado(datos, ancho),
+        Spacer(1, 20),
+        _cliente(datos, ancho),
+        Spacer(1, 20),
+        _items(datos, ancho),
+        Spacer(1, 20),
+        _totales(datos, ancho),
+        Spacer(1, 30),
+        _p('Términos y Condiciones:', 'terminos_titulo'),
+        ListFlowable([ListItem(_p(t, 'terminos'), leftIndent=12) for t in TERMINOS],
+                     bulletType='bullet', bulletFontSize=6, leftIndent=12),
+        Spacer(1, 50),
+        Table([['']], colWidths=[ancho], style=[('LINEABOVE', (0, 0), (-1, 0), 1, GRIS_LINEA)]),
+        _p('Gracias por preferir a Clarotec.', 'pie'),
+        _p('Este documento es una cotización y no representa una factura fiscal.', 'pie'),
+    ]
+    doc.build(historia)
+    return result.getvalue()
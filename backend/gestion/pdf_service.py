@@ -0,0 +1,180 @@
+"""
+Servicio de Renderizado de PDFs (Pool de Procesos).
+
+PROPOSITO:
+    La conversión a PDF (xhtml2pdf o reportlab) es CPU intensiva. En lugar de ejecutarla en
+    el propio worker de gunicorn, se delega a un pool acotado de procesos hijos:
+    - Pool caliente: cada proceso importa xhtml2pdf/reportlab y renderiza un documento
+      mínimo al iniciar (fuentes cargadas una sola vez). iniciar_pool() lo crea al
+      arrancar el worker (ver clarotec_api/wsgi.py).
+    - Tiempo máximo por trabajo (PDF_TIMEOUT): un documento que se cuelga no retiene
+      el worker indefinidamente; el pool se reinicia para matar el proceso atascado.
+    - Límite de concurrencia (PDF_MAX_CONCURRENCIA): trabajos en curso por worker; si no
+      se libera un cupo en PDF_ESPERA_COLA segundos se rechaza (ServicioPDFOcupado).
+    - API por lotes (renderizar_lote): varios documentos en paralelo en distintos núcleos.
+    - Métricas (estadisticas): profundidad de cola, tiempos de render, timeouts y rechazos.
+      Son por proceso (cada worker de gunicorn tiene su propio pool).
+
+    Con PDF_POOL_WORKERS = 0 el render se ejecuta en el mismo proceso (sin pool).
+"""
+import atexit  # Cierre del pool al terminar el proceso
+import multiprocessing  # Pool de procesos
+import os  # PID del proceso
+import threading  # Cerrojo y semáforo
+import time  # Medición de tiempos
+from django.conf import settings  # Configuración del proyecto
+from .pdf_worker import MOTOR_XHTML2PDF, calentar, renderizar_medido  # Funciones del proceso hijo
+
+
+class ServicioPDFOcupado(Exception):
+    """No hay cupo en el pool de PDFs dentro del tiempo de espera."""
+
+
+class TiempoPDFAgotado(Exception):
+    """Un render superó PDF_TIMEOUT."""
+
+
+_cerrojo = threading.Lock()
+_pool = None
+_semaforo = None
+_metricas = {
+    'en_cola': 0,
+    'en_cola_max': 0,
+    'renders': 0,
+    'errores': 0,
+    'timeouts': 0,
+    'rechazos': 0,
+    'render_total_s': 0.0,
+    'render_max_s': 0.0,
+    'espera_total_s': 0.0,
+}
+
+
+def pool_habilitado():
+    """El pool se desactiva con PDF_POOL_WORKERS = 0 (render en el mismo proceso)."""
+    return settings.PDF_POOL_WORKERS > 0
+
+
+def iniciar_pool():
+    """Crea (si no existe) el pool caliente de este proceso. Retorna el pool, o None si está deshabilitado."""
+    global _pool, _semaforo
+    if not pool_habilitado():
+        return None
+    with _cerrojo:
+        if _pool is None:
+            contexto = multiprocessing.get_context(settings.PDF_POOL_CONTEXTO)
+            _pool = contexto.Pool(processes=settings.PDF_POOL_WORKERS, initializer=calentar,
+                                  maxtasksperchild=settings.PDF_POOL_MAX_TAREAS)
+            _semaforo = threading.BoundedSemaphore(settings.PDF_MAX_CONCURRENCIA)
+        return _pool
+
+
+def cerrar_pool():
+    """Termina los procesos del pool (se recrea en el próximo uso)."""
+    global _pool, _semaforo
+    with _cerrojo:
+        pool, _pool, _semaforo = _pool, None, None
+        # Los trabajos en curso del pool terminado ya no liberarán cupo ni descontarán la cola
+        _metricas['en_cola'] = 0
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+
+
+atexit.register(cerrar_pool)
+
+
+def _sumar(**valores):
+    """Acumula contadores de métricas (seguro entre hilos)."""
+    with _cerrojo:
+        for clave, valor in valores.items():
+            _metricas[clave] += valor
+        _metricas['en_cola_max'] = max(_metricas['en_cola_max'], _metricas['en_cola'])
+
+
+def _registrar_render(contenido, segundos, espera=0.0):
+    """Registra un render terminado (tiempo de CPU en el hijo y espera en cola)."""
+    _sumar(renders=1, render_total_s=segundos, errores=int(contenido is None), espera_total_s=espera)
+    with _cerrojo:
+        _metricas['render_max_s'] = max(_metricas['render_max_s'], segundos)
+
+
+def _encolar(pool, semaforo, motor, documento):
+    """Reserva un cupo y envía un trabajo al pool. Retorna (AsyncResult, instante de envío)."""
+    if not semaforo.acquire(timeout=settings.PDF_ESPERA_COLA):
+        _sumar(rechazos=1)
+        raise ServicioPDFOcupado('El servicio de PDFs está ocupado, intente nuevamente.')
+
+    def liberar(_):
+        # Callback del hilo de resultados del pool (éxito o error).
+        # Si el pool fue reiniciado entretanto, su cola ya se descontó en cerrar_pool().
+        semaforo.release()
+        if semaforo is _semaforo:
+            _sumar(en_cola=-1)
+
+    _sumar(en_cola=1)
+    envio = time.monotonic()
+    return pool.apply_async(renderizar_medido, (motor, documento), callback=liberar, error_callback=liberar), envio
+
+
+def renderizar_lote(documentos, motor=MOTOR_XHTML2PDF):
+    """
+    Convierte varios documentos a PDF en paralelo con el motor indicado
+    (HTML para 'xhtml2pdf', textos formateados para 'reportlab').
+    Retorna la lista de PDFs (bytes, o None si el documento tuvo error) en el mismo orden.
+    Lanza ServicioPDFOcupado o TiempoPDFAgotado.
+    """
+    pool = iniciar_pool()
+    if pool is None:
+        resultados = []
+        for documento in documentos:
+            contenido, segundos = renderizar_medido(motor, documento)
+            _registrar_render(contenido, segundos)
+            resultados.append(contenido)
+        return resultados
+
+    semaforo = _semaforo
+    trabajos = [_encolar(pool, semaforo, motor, documento) for documento in documentos]
+
+    resultados = []
+    for trabajo, envio in trabajos:
+        # Tiempo máximo contado desde el envío de cada trabajo
+        restante = max(0, envio + settings.PDF_TIMEOUT - time.monotonic())
+        try:
+            contenido, segundos = trabajo.get(timeout=restante)
+        except multiprocessing.TimeoutError:
+            _sumar(timeouts=1)
+            # Único modo de detener un render colgado: reiniciar el pool
+            cerrar_pool()
+            raise TiempoPDFAgotado(f'El render del PDF superó {settings.PDF_TIMEOUT} segundos.')
+        _registrar_render(contenido, segundos, espera=max(0.0, time.monotonic() - envio - segundos))
+        resultados.append(contenido)
+    return resultados
+
+
+def renderizar(documento, motor=MOTOR_XHTML2PDF):
+    """Convierte un documento a PDF (bytes, o None si hubo error)."""
+    return renderizar_lote([documento], motor=motor)[0]
+
+
+def estadisticas():
+    """Métricas del servicio en este proceso."""
+    with _cerrojo:
+        m = dict(_metricas)
+    renders = m['renders']
+    return {
+        'pid': os.getpid(),
+        'pool_enabled': pool_habilitado(),
+        'pool_started': _pool is not None,
+        'workers': settings.PDF_POOL_WORKERS,
+        'max_concurrency': settings.PDF_MAX_CONCURRENCIA,
+        'queue_depth': m['en_cola'],
+        'queue_depth_max': m['en_cola_max'],
+        'renders': renders,
+        'errors': m['errores'],
+        'timeouts': m['timeouts'],
+        'rejected': m['rechazos'],
+        'render_avg_ms': round(m['render_total_s'] / renders * 1000, 1) if renders else 0.0,
+        'render_max_ms': round(m['render_max_s'] * 1000, 1),
+        'queue_wait_avg_ms': round(m['espera_total_s'] / renders * 1000, 1) if renders else 0.0,
+    }
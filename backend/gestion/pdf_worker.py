@@ -0,0 +1,55 @@
+"""
+Proceso Hijo del Servicio de PDFs.
+
+PROPOSITO:
+    Funciones que se ejecutan dentro de los procesos del pool de renderizado
+    (ver gestion/pdf_service.py). Solo convierten a PDF documentos ya preparados:
+    HTML renderizado (motor 'xhtml2pdf') o textos formateados (motor 'reportlab').
+    NO importan Django, de modo que los procesos hijos no necesitan configurar el
+    proyecto ni abren conexiones a la base de datos.
+"""
+import time  # Medición del tiempo de render
+from io import BytesIO  # Buffers en memoria
+
+# Motores disponibles (settings.PDF_MOTOR)
+MOTOR_XHTML2PDF = 'xhtml2pdf'
+MOTOR_REPORTLAB = 'reportlab'
+MOTORES = (MOTOR_XHTML2PDF, MOTOR_REPORTLAB)
+
+# Documento mínimo usado para precargar fuentes y estilos de reportlab
+HTML_CALENTAMIENTO = '<html><body><p>Clarotec</p></body></html>'
+
+
+def html_a_pdf(html_string):
+    """Convierte HTML a PDF. Retorna los bytes, o None si xhtml2pdf reporta error."""
+    from xhtml2pdf import pisa  # Importado en el proceso hijo (ya cargado si el pool está caliente)
+
+    result = BytesIO()
+    pdf = pisa.pisaDocument(BytesIO(html_string.encode("UTF-8")), result)
+    if pdf.err:
+        return None
+    return result.getvalue()
+
+
+def renderizar_documento(motor, documento):
+    """Convierte un documento con el motor indicado. Retorna los bytes, o None si hubo error."""
+    if motor == MOTOR_REPORTLAB:
+        from .pdf_reportlab import cotizacion_pdf  # Importado en el proceso hijo
+        return cotizacion_pdf(documento)
+    return html_a_pdf(documento)
+
+
+def renderizar_medido(motor, documento):
+    """Convierte un documento. Retorna (PDF o None, segundos que tomó el render)."""
+    inicio = time.perf_counter()
+    contenido = renderizar_documento(motor, documento)
+    return contenido, time.perf_counter() - inicio
+
+
+def calentar():
+    """
+    Inicializador de cada proceso del pool: importa xhtml2pdf/reportlab y renderiza
+    un documento mínimo para que fuentes y tablas de estilos queden cargadas una sola vez.
+    """
+    html_a_pdf(HTML_CALENTAMIENTO)
+    from . import pdf_reportlab  # noqa: F401  Estilos y fuentes del motor nativo
@@ -0,0 +1,72 @@
+"""
+Renderer JSON Rápido (orjson).
+
+PROPOSITO:
+    Reemplaza al JSONRenderer de DRF (json de la librería estándar con un encoder en
+    Python) como renderer por defecto. orjson serializa en C los dict/list/str/int/float,
+    datetime, date, time y UUID; solo los tipos restantes pasan por _por_defecto.
+
+COMPATIBILIDAD CON JSONRenderer:
+    - Decimal se entrega como número (float), igual que el encoder de DRF.
+    - datetime en ISO 8601 con 'Z' para UTC (orjson conserva los microsegundos).
+    - Claves de diccionario no string (ej. enteros) se convierten a string.
+    - QuerySet, generadores, textos perezosos (gettext_lazy), timedelta y bytes.
+    - Sangría (browsable API o 'Accept: application/json; indent=4'): 2 espacios.
+"""
+import datetime  # timedelta
+from decimal import Decimal  # Montos
+import orjson  # Serialización JSON en C
+from django.db.models.query import QuerySet  # Consultas sin evaluar
+from django.utils.encoding import force_str  # Textos perezosos
+from django.utils.functional import Promise  # Textos perezosos
+from rest_framework.renderers import BaseRenderer  # Clase base de renderers
+
+OPCIONES = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def _por_defecto(obj):
+    """Tipos que orjson no serializa de forma nativa (mismas reglas que el encoder de DRF)."""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, QuerySet):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, 'tolist'):
+        # Escalares y arreglos de numpy / pandas
+        return obj.tolist()
+    if hasattr(obj, '__getitem__'):
+        try:
+            return dict(obj)
+        except (TypeError, ValueError):
+            pass
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f'Tipo no serializable a JSON: {type(obj).__name__}')
+
+
+def dumps(data, indent=False):
+    """Serializa 'data' a bytes JSON (UTF-8)."""
+    return orjson.dumps(data, default=_por_defecto, option=OPCIONES | (orjson.OPT_INDENT_2 if indent else 0))
+
+
+class ORJSONRenderer(BaseRenderer):
+    """Renderer 'application/json' basado en orjson."""
+    media_type = 'application/json'
+    format = 'json'
+    charset = None  # JSON es UTF-8 (RFC 8259): sin parámetro charset, como JSONRenderer
+
+    def _indent(self, accepted_media_type, renderer_context):
+        """True si la petición (o la browsable API) pide la respuesta con sangría."""
+        if accepted_media_type and 'indent=' in accepted_media_type:
+            return True
+        return bool((renderer_context or {}).get('indent'))
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return dumps(data, indent=self._indent(accepted_media_type, renderer_context))
@@ -0,0 +1,92 @@
+"""
+Consultas de Retención de Clientes (Churn).
+
+PROPOSITO:
+    Construye, en UNA sola consulta anotada, la vista de retención de cada cliente:
+    fecha/región/comuna de la última compra, último producto, total gastado y estado
+    (activo / en riesgo / perdido). Reemplaza el recorrido cliente por cliente, que
+    emitía varias consultas por cada Cliente.
+    La última compra y el total gastado se leen de los agregados persistidos en Cliente
+    (columnas indexadas); solo el último producto requiere una subconsulta.
+
+CLASIFICACIÓN (según días completos desde la última compra):
+    - active: <= 30 días
+    - risk:   31 - 90 días
+    - lost:   > 90 días, o sin compras
+"""
+from datetime import timedelta  # Umbrales de inactividad
+from django.db.models import Case, CharField, F, IntegerField, OuterRef, Subquery, Value, When  # Expresiones ORM
+from django.utils import timezone  # Fecha actual
+from .models import Cliente, Pedido, ItemsPedido  # Modelos
+
+# Estados que cuentan como venta real para retención
+ESTADOS_VENTA = Pedido.ESTADOS_VENTA
+
+# Umbrales de clasificación (días completos sin comprar)
+DIAS_ACTIVO = 30
+DIAS_RIESGO = 90
+
+# Días informados para clientes sin compras
+DIAS_SIN_COMPRAS = 999
+
+# Orden de prioridad del listado: primero en riesgo, luego perdidos, luego activos
+PRIORIDAD_ESTADO = {'risk': 0, 'lost': 1, 'active': 2}
+
+
+def _ultima_compra():
+    """Subconsulta de la última compra (por fecha de solicitud) del cliente externo."""
+    return Pedido.objects.filter(
+        cliente=OuterRef('pk'), estado__in=ESTADOS_VENTA
+    ).order_by('-fecha_solicitud', '-id')
+
+
+def clientes_con_retencion(queryset=None, ahora=None):
+    """
+    Anota cada cliente con su información de retención:
+        _ultima_fecha, _ultimo_pedido_id, _region, _comuna, _ultimo_producto,
+        _total_gastado, _estado_retencion, _prioridad
+    Todas las columnas se resuelven en la base de datos (columnas de Cliente y subconsultas).
+    """
+    if queryset is None:
+        queryset = Cliente.objects.all()
+    ahora = ahora or timezone.now()
+
+    # Primer item del último pedido ("excusa de conversación")
+    ultimo_producto = ItemsPedido.objects.filter(
+        pedido_id=OuterRef('_ultimo_pedido_id')
+    ).order_by('id').values('descripcion')[:1]
+
+    # Días completos sin comprar <= N  <=>  última compra posterior a (ahora - (N + 1) días)
+    limite_activo = ahora - timedelta(days=DIAS_ACTIVO + 1)
+    limite_riesgo = ahora - timedelta(days=DIAS_RIESGO + 1)
+
+    return queryset.annotate(
+        # Agregados persistidos en Cliente (ver services.recalcular_agregados_clientes)
+        _ultima_fecha=F('last_purchase_at'),
+        _region=F('last_purchase_region'),
+        _comuna=F('last_purchase_comuna'),
+        _total_gastado=F('lifetime_value'),
+        _ultimo_pedido_id=Subquery(_ultima_compra().values('id')[:1]),
+    ).annotate(
+        _ultimo_producto=Subquery(ultimo_producto),
+        _estado_retencion=Case(
+            When(_ultima_fecha__isnull=True, then=Value('lost')),
+            When(_ultima_fecha__gt=limite_activo, then=Value('active')),
+            When(_ultima_fecha__gt=limite_riesgo, then=Value('risk')),
+            default=Value('lost'),
+            output_field=CharField()
+        ),
+    ).annotate(
+        _prioridad=Case(
+            *[When(_estado_retencion=estado, then=Value(prioridad)) for estado, prioridad in PRIORIDAD_ESTADO.items()],
+            default=Value(len(PRIORIDAD_ESTADO)),
+            output_field=IntegerField()
+        )
+    )
+
+
+def dias_inactivo(ultima_fecha, ahora=None):
+    """Días completos desde la última compra (DIAS_SIN_COMPRAS si nunca compró)."""
+    if ultima_fecha is None:
+        return DIAS_SIN_COMPRAS
+    return ((ahora or timezone.now()) - ultima_fecha).days
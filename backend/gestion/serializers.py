@@ -13,7 +13,11 @@ SERIALIZADORES CLAVE:
 """
 from rest_framework import serializers  # Serializadores de datos
 from .models import Cliente, Pedido, ItemsPedido, ProductoFrecuente  # Modelos de datos
+from django.contrib.auth import get_user_model  # Modelo de usuario
 from django.db import transaction  # Transacciones de base de datos
+from django.db.models import Exists, OuterRef, Prefetch  # Anotaciones y precarga
+from decimal import Decimal  # Totales de la solicitud
+from .services import upsert_cliente  # Upsert de clientes por email
 
 # 1. Serializers independientes (sin dependencias de otros serializers)
 
@@ -44,22 +48,114 @@ class ItemSolicitudInputSerializer(serializers.Serializer):
     producto_id = serializers.IntegerField(required=False, allow_null=True)
 
 
+def anotar_usuario_registrado(queryset):
+    """
+    Anota 'usuario_registrado' (existe un User con el email del cliente) con un EXISTS
+    en la misma consulta, para que ClienteSerializer no consulte una vez por cliente.
+    """
+    return queryset.annotate(
+        usuario_registrado=Exists(get_user_model().objects.filter(email=OuterRef('email'))))
+
+
+def _columnas(serializer, calculadas=None):
+    """
+    Columnas del modelo que lee 'serializer' (siempre incluye 'id').
+    'calculadas' mapea propiedades del modelo a las columnas de las que dependen.
+    """
+    concretos = {campo.name for campo in serializer.Meta.model._meta.concrete_fields}
+    columnas = {'id'}
+    for campo in serializer.fields.values():
+        if campo.source in concretos:
+            columnas.add(campo.source)
+        columnas.update((calculadas or {}).get(campo.source, ()))
+    return columnas
+
+
+def precargar_pedidos(queryset, seleccion=None, columnas_extra=()):
+    """
+    Precarga lo que PedidoSerializer lee de cada pedido (cliente anotado e items).
+    Un listado cuesta 3 consultas (pedidos, clientes, items) sin importar su tamaño.
+    El total sale de la columna desnormalizada Pedido.total (sin consultar items).
+
+    Con una selección de campos (gestion.campos) solo se cargan las columnas pedidas
+    (más 'columnas_extra', p. ej. la columna del cursor de paginación) y solo se
+    precargan las relaciones pedidas, con sus columnas.
+    """
+    if seleccion is None:
+        return queryset.prefetch_related(
+            Prefetch('cliente', queryset=anotar_usuario_registrado(Cliente.objects.all())),
+            'items'
+        )
+
+    serializer = PedidoSerializer(context={'seleccion': seleccion})
+    queryset = queryset.only(*(_columnas(serializer, PedidoSerializer.COLUMNAS_CALCULADAS) | set(columnas_extra)))
+
+    precargas = []
+    cliente = serializer.fields.get('cliente')
+    if isinstance(cliente, ClienteSerializer):
+        clientes = Cliente.objects.only(*_columnas(cliente))
+        if 'es_usuario_registrado' in cliente.fields:
+            clientes = anotar_usuario_registrado(clientes)
+        precargas.append(Prefetch('cliente', queryset=clientes))
+    items = serializer.fields.get('items')
+    if items is not None:
+        # Items anidados con sus columnas, o solo sus ids
+        columnas = _columnas(items.child) if isinstance(items, serializers.ListSerializer) else {'id'}
+        precargas.append(Prefetch('items', queryset=ItemsPedido.objects.only('pedido', *columnas)))
+    return queryset.prefetch_related(*precargas)
+
+
+class CamposDinamicosMixin:
+    """Acepta 'campos' (iterable, None = todos) para limitar los campos serializados."""
+
+    def __init__(self, *args, campos=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if campos is not None:
+            for nombre in set(self.fields) - set(campos):
+                self.fields.pop(nombre)
+
+
 # Serializador para ClienteSerializer
-class ClienteSerializer(serializers.ModelSerializer):
+class ClienteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     es_usuario_registrado = serializers.SerializerMethodField()
 
     class Meta:
         model = Cliente
-        fields = '__all__'
+        fields = ['id', 'nombre', 'apellido', 'empresa', 'email', 'telefono', 'fecha_creacion',
+                  'last_retention_email_sent_at', 'retention_status', 'completed_order_count',
+                  'first_purchase_at', 'last_purchase_at', 'last_purchase_region', 'last_purchase_comuna',
+                  'lifetime_value', 'es_usuario_registrado']
+        # Agregados de compras: los mantiene Pedido.sincronizar_cliente, no se editan por la API
+        read_only_fields = ['completed_order_count', 'first_purchase_at', 'last_purchase_at',
+                            'last_purchase_region', 'last_purchase_comuna', 'lifetime_value']
 
     def get_es_usuario_registrado(self, obj):
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        return User.objects.filter(email=obj.email).exists()
+        # Valor anotado (anotar_usuario_registrado); si no viene, se consulta
+        registrado = getattr(obj, 'usuario_registrado', None)
+        if registrado is None:
+            registrado = get_user_model().objects.filter(email=obj.email).exists()
+        return registrado
+
+    def update(self, instance, validated_data):
+        # Solo se escriben las columnas recibidas: un save() completo reescribiría los agregados
+        # de compras leídos al inicio de la petición sobre los recalculados entretanto
+        for campo, valor in validated_data.items():
+            setattr(instance, campo, valor)
+        instance.save(update_fields=list(validated_data))
+        return instance
+
+
+# Serializador para ClientePublicoSerializer
+class ClientePublicoSerializer(serializers.ModelSerializer):
+    """Datos de contacto del cliente para los endpoints públicos (sin agregados ni datos de retención)."""
+
+    class Meta:
+        model = Cliente
+        fields = ['id', 'nombre', 'apellido', 'empresa', 'email', 'telefono']
 
 
 # Serializador para ItemsPedidoSerializer
-class ItemsPedidoSerializer(serializers.ModelSerializer):
+class ItemsPedidoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = ItemsPedido
         fields = ['id', 'descripcion', 'cantidad', 'tipo_origen', 'referencia',
@@ -89,79 +185,47 @@ class SolicitudCreacionSerializer(serializers.Serializer):
     comuna = serializers.CharField(required=False, allow_blank=True)
 
     def create(self, validated_data):
-        print("--- INICIO CREATE SOLICITUD ---")
-        print("Data validada:", validated_data)
-        try:
-            cliente_data = validated_data['cliente']
-            items_data = validated_data['items']
-
-            with transaction.atomic():
-                # 1. Crear o actualizar Cliente
-                print(f"Procesando cliente: {cliente_data.get('email')}")
-                # Construimos el nombre legado por compatibilidad temporal (opcional)
-                # full_name_legacy = f"{cliente_data['nombre']} {cliente_data['apellido']}".strip()
-
-                cliente, created = Cliente.objects.get_or_create(
-                    email=cliente_data['email'],
-                    defaults={
-                        'nombre': cliente_data['nombre'],
-                        'apellido': cliente_data['apellido'],
-                        # 'nombre': full_name_legacy,  # YA NO EXISTE EL CAMPO FISICO
-                        'empresa': cliente_data.get('empresa', ''),
-                        'telefono': cliente_data.get('telefono', '')
-                    }
+        """
+        Crea la solicitud con un número fijo de consultas, sin importar cuántos items traiga:
+        upsert del cliente, productos de catálogo con un in_bulk, el pedido con sus totales
+        ya calculados y todos los items con un bulk_create.
+        """
+        items_data = validated_data['items']
+        with transaction.atomic():
+            # 1. Crear o actualizar Cliente (tolera envíos simultáneos del mismo email nuevo)
+            cliente = upsert_cliente(validated_data['cliente'])
+
+            # 2. Productos de catálogo referenciados (los ids inexistentes se ignoran)
+            ids_productos = {item['producto_id'] for item in items_data if item.get('producto_id')}
+            productos = ProductoFrecuente.objects.in_bulk(ids_productos) if ids_productos else {}
+
+            items = [
+                ItemsPedido(
+                    descripcion=item_data['descripcion'],
+                    cantidad=item_data['cantidad'],
+                    tipo_origen=item_data['tipo'],
+                    referencia=item_data.get('referencia', ''),
+                    producto_frecuente=productos.get(item_data.get('producto_id'))
                 )
-
-                # Si el cliente ya existía, actualizamos sus datos nuevos si vienen
-                if not created:
-                    cliente.nombre = cliente_data['nombre']
-                    cliente.apellido = cliente_data['apellido']
-                    # Si empresa/telefono vienen vacíos, no los borramos, mantenemos lo que había
-                    if cliente_data.get('empresa'):
-                        cliente.empresa = cliente_data['empresa']
-                    if cliente_data.get('telefono'):
-                        cliente.telefono = cliente_data['telefono']
-
-                    # Actualizar campo legado 'nombre' para mantener consistencia con Frontend
-                    # cliente.nombre = f"{cliente.nombre} {cliente.apellido}".strip()
-                    cliente.save()
-
-                print(f"Cliente obtenido/creado: {cliente.id} (Creado: {created})")
-
-                # 2. Crear Pedido
-                pedido = Pedido.objects.create(
-                    cliente=cliente,
-                    region=validated_data.get('region', ''),
-                    comuna=validated_data.get('comuna', '')
-                )
-                print(f"Pedido creado: {pedido.id}")
-
-                # 3. Crear Items
-                for item_data in items_data:
-                    print(f"Procesando item: {item_data}")
-                    producto_frecuente = None
-                    if item_data.get('producto_id'):
-                        try:
-                            producto_frecuente = ProductoFrecuente.objects.get(id=item_data['producto_id'])
-                        except ProductoFrecuente.DoesNotExist:
-                            print(f"Producto frecuente ID {item_data['producto_id']} no encontrado.")
-                            pass
-
-                    ItemsPedido.objects.create(
-                        pedido=pedido,
-                        descripcion=item_data['descripcion'],
-                        cantidad=item_data['cantidad'],
-                        tipo_origen=item_data['tipo'],
-                        referencia=item_data.get('referencia', ''),
-                        producto_frecuente=producto_frecuente
-                    )
-                print("Todos los items creados correctamente.")
-                return pedido
-        except Exception as e:
-            print(f"ERROR CRÍTICO EN CREATE SOLICITUD: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            raise e
+                for item_data in items_data
+            ]
+            for item in items:
+                item.calcular_subtotal()
+
+            # 3. Crear Pedido con los totales de sus items (save() deriva el resto)
+            pedido = Pedido.objects.create(
+                cliente=cliente,
+                region=validated_data.get('region', ''),
+                comuna=validated_data.get('comuna', ''),
+                subtotal=sum((item.subtotal for item in items), Decimal('0')),
+                costo_compra=sum((item.precio_compra * item.cantidad for item in items), Decimal('0'))
+            )
+
+            # 4. Crear Items en un solo INSERT (sin recalcular los totales por item)
+            for item in items:
+                item.pedido = pedido
+            ItemsPedido.objects.bulk_create(items)
+            return pedido
 
 
 # Serializador para PedidoSerializer
@@ -179,6 +243,32 @@ class PedidoSerializer(serializers.ModelSerializer):
             'total_cotizacion'
         ]
 
+    # Propiedades del modelo y columnas de las que dependen (ver precargar_pedidos)
+    COLUMNAS_CALCULADAS = {'total_cotizacion': ('total',)}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Selección de campos del listado (?fields= / ?expand=, ver gestion.campos)
+        seleccion = self.context.get('seleccion')
+        if seleccion is None:
+            return
+        for nombre in set(self.fields) - seleccion.campos:
+            self.fields.pop(nombre)
+        if 'cliente' in self.fields:
+            self.fields['cliente'] = (
+                ClienteSerializer(read_only=True, campos=seleccion.campos_de('cliente'))
+                if 'cliente' in seleccion.expandir else serializers.PrimaryKeyRelatedField(read_only=True))
+        if 'items' in self.fields:
+            self.fields['items'] = (
+                ItemsPedidoSerializer(many=True, read_only=True, campos=seleccion.campos_de('items'))
+                if 'items' in seleccion.expandir else serializers.PrimaryKeyRelatedField(many=True, read_only=True))
+
+
+# Serializador para SolicitudRespuestaSerializer
+class SolicitudRespuestaSerializer(PedidoSerializer):
+    """Respuesta del endpoint público de solicitudes: el cliente sin agregados ni datos de retención."""
+    cliente = ClientePublicoSerializer(read_only=True)
+
 
 # Serializador para PedidoDetailUpdateSerializer
 class PedidoDetailUpdateSerializer(serializers.ModelSerializer):
@@ -195,56 +285,79 @@ class PedidoDetailUpdateSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'cliente', 'fecha_solicitud', 'fecha_actualizacion', 'id_seguimiento']
 
-    def update(self, instance, validated_data):
-        items_data = validated_data.pop('items', [])
-
-        instance.porcentaje_urgencia = validated_data.get('porcentaje_urgencia', instance.porcentaje_urgencia)
-        instance.costo_envio_estimado = validated_data.get('costo_envio_estimado', instance.costo_envio_estimado)
-
-        # Nuevos campos de envío
-        instance.region = validated_data.get('region', instance.region)
-        instance.comuna = validated_data.get('comuna', instance.comuna)
-        instance.metodo_envio = validated_data.get('metodo_envio', instance.metodo_envio)
-        instance.nombre_transporte_custom = validated_data.get(
-            'nombre_transporte_custom', instance.nombre_transporte_custom)
-        instance.opciones_envio = validated_data.get('opciones_envio', instance.opciones_envio)
+    # Campos de un item editables desde la cotización
+    CAMPOS_ITEM = ('descripcion', 'cantidad', 'precio_unitario', 'precio_compra')
 
-        instance.save()
-
-        print("Pedido principal actualizado con urgencia y envío.")
-        print("Datos de ítems a procesar (items_data):", items_data)
-
-        # Actualizar items existentes
-        items_existentes = {item.id: item for item in instance.items.all()}
+    def update(self, instance, validated_data):
+        # Sin 'items' en el payload los items no se tocan; con 'items' es la lista completa
+        items_data = validated_data.pop('items', None)
 
-        for item_data in items_data:
-            item_id = item_data.get('id')
-            print(f"\nProcesando item ID: {item_id}")
-            print(f"Datos del item: {item_data}")
+        with transaction.atomic():
+            instance.porcentaje_urgencia = validated_data.get('porcentaje_urgencia', instance.porcentaje_urgencia)
+            instance.costo_envio_estimado = validated_data.get('costo_envio_estimado', instance.costo_envio_estimado)
 
-            if item_id and item_id in items_existentes:
-                item = items_existentes[item_id]
+            # Nuevos campos de envío
+            instance.region = validated_data.get('region', instance.region)
+            instance.comuna = validated_data.get('comuna', instance.comuna)
+            instance.metodo_envio = validated_data.get('metodo_envio', instance.metodo_envio)
+            instance.nombre_transporte_custom = validated_data.get(
+                'nombre_transporte_custom', instance.nombre_transporte_custom)
+            instance.opciones_envio = validated_data.get('opciones_envio', instance.opciones_envio)
 
-                # Actualizar cada campo explícitamente
-                if 'descripcion' in item_data:
-                    item.descripcion = item_data['descripcion']
-                if 'cantidad' in item_data:
-                    item.cantidad = item_data['cantidad']
-                if 'precio_unitario' in item_data:
-                    item.precio_unitario = item_data['precio_unitario']
-                if 'precio_compra' in item_data:
-                    item.precio_compra = item_data['precio_compra']
+            instance.save()
 
-                item.save()
-            else:
-                print(f"Item ID {item_id} no encontrado en items existentes")
+            if items_data is not None:
+                self.sincronizar_items(instance, items_data)
 
         return instance
 
+    def sincronizar_items(self, instance, items_data):
+        """
+        Deja los items del pedido iguales a 'items_data' con un número fijo de consultas:
+        los items con id se actualizan (un bulk_update, solo si cambiaron), los items sin id
+        se crean (un bulk_create) y los que no vienen se eliminan (un DELETE).
+        Los totales del pedido se recalculan una sola vez al final.
+        """
+        existentes = {item.id: item for item in instance.items.all()}
+        ajenos = sorted({datos['id'] for datos in items_data if datos.get('id') and datos['id'] not in existentes})
+        if ajenos:
+            raise serializers.ValidationError(
+                {'items': [f"El item {item_id} no pertenece al pedido #{instance.id}." for item_id in ajenos]})
+
+        actualizados, nuevos, recibidos = [], [], set()
+        for datos in items_data:
+            campos = {campo: datos[campo] for campo in self.CAMPOS_ITEM if campo in datos}
+            item = existentes.get(datos.get('id'))
+            if item is None:
+                if 'descripcion' not in campos:
+                    raise serializers.ValidationError({'items': ['Los items nuevos requieren descripción.']})
+                item = ItemsPedido(pedido=instance, **campos)
+                item.calcular_subtotal()
+                nuevos.append(item)
+                continue
+
+            recibidos.add(item.id)
+            cambios = {campo: valor for campo, valor in campos.items() if getattr(item, campo) != valor}
+            if cambios:
+                for campo, valor in cambios.items():
+                    setattr(item, campo, valor)
+                item.calcular_subtotal()
+                actualizados.append(item)
+
+        eliminados = [item_id for item_id in existentes if item_id not in recibidos]
+        if eliminados:
+            ItemsPedido.objects.filter(id__in=eliminados).delete()
+        if actualizados:
+            ItemsPedido.objects.bulk_update(actualizados, [*self.CAMPOS_ITEM, 'subtotal'])
+        if nuevos:
+            ItemsPedido.objects.bulk_create(nuevos)
+        if eliminados or actualizados or nuevos:
+            instance.actualizar_totales()
+
 
 # Serializador para PedidoDetailSerializer
 class PedidoDetailSerializer(serializers.ModelSerializer):
-    cliente = ClienteSerializer(read_only=True)
+    cliente = ClientePublicoSerializer(read_only=True)  # Endpoint público (portal del cliente)
     items = ItemsPedidoSerializer(many=True, read_only=True)
 
     class Meta:
@@ -6,9 +6,18 @@ PROPOSITO:
 
 SERVICIOS:
     - ShippingCalculator: Calcula costos de envío por región/comuna.
+    - recalcular_totales: Recalcula masivamente los totales desnormalizados de Pedido.
+    - recalcular_agregados_clientes: Recalcula los agregados de compras de Cliente.
+    - upsert_cliente: Crea o actualiza un cliente por email en una sola sentencia.
 """
 # backend/gestion/services.py
+from decimal import Decimal  # Precisión monetaria
 from django.conf import settings  # noqa
+from django.db import connection  # Capacidades del motor (upsert)
+from django.db.models import Count, DecimalField, F, OuterRef, PositiveIntegerField, Subquery, Sum  # Expresiones ORM
+from django.db.models.functions import Coalesce  # Valor por defecto en SQL
+from .models import Cliente, Pedido, ItemsPedido  # Modelos
+from .bi_cache import notificar_cambio_bi  # Invalidación del caché BI
 
 
 # Clase ShippingCalculator (Calculadora de Envíos)
@@ -80,3 +89,133 @@ class ShippingCalculator:
 
         costo_final = int(precio_base * multiplicador)
         return costo_final, zona
+
+
+def _suma_items_pedido(expresion):
+    """Subconsulta escalar: suma de 'expresion' sobre los items del pedido externo (0 si no hay items)."""
+    monto = DecimalField(max_digits=20, decimal_places=6)
+    return Coalesce(
+        Subquery(
+            ItemsPedido.objects.filter(pedido=OuterRef('pk')).values('pedido').annotate(
+                s=Sum(expresion, output_field=monto)).values('s'),
+            output_field=monto
+        ),
+        Decimal('0'),
+        output_field=monto
+    )
+
+
+def recalcular_totales(pedidos=None, batch_size=500):
+    """
+    Recalcula los totales desnormalizados (subtotal, recargo, neto, IVA, total,
+    costo_compra, utilidad) de un conjunto de pedidos.
+    Las sumas de items se obtienen en la misma consulta que lee los pedidos y la
+    escritura se hace con bulk_update por lotes (memoria acotada).
+    Retorna: cantidad de pedidos actualizados.
+    """
+    if pedidos is None:
+        pedidos = Pedido.objects.all()
+
+    anotados = pedidos.annotate(
+        _subtotal=_suma_items_pedido(F('subtotal')),
+        _costo=_suma_items_pedido(F('precio_compra') * F('cantidad')),
+    ).only('id', 'porcentaje_urgencia', 'costo_envio_estimado').order_by('id')
+
+    actualizados = 0
+    lote = []
+    for pedido in anotados.iterator(chunk_size=batch_size):
+        pedido.subtotal = pedido._subtotal
+        pedido.costo_compra = pedido._costo
+        pedido.derivar_totales()
+        lote.append(pedido)
+        if len(lote) >= batch_size:
+            Pedido.objects.bulk_update(lote, Pedido.CAMPOS_TOTALES)
+            actualizados += len(lote)
+            lote = []
+
+    if lote:
+        Pedido.objects.bulk_update(lote, Pedido.CAMPOS_TOTALES)
+        actualizados += len(lote)
+
+    # Los endpoints BI leen estos totales: se invalida su caché
+    if actualizados:
+        notificar_cambio_bi()
+
+    return actualizados
+
+
+# Campos de agregados de compras de Cliente (ver Cliente.completed_order_count y siguientes)
+CAMPOS_AGREGADOS_CLIENTE = ['completed_order_count', 'first_purchase_at', 'last_purchase_at',
+                            'last_purchase_region', 'last_purchase_comuna', 'lifetime_value']
+
+
+def recalcular_agregados_clientes(clientes=None, batch_size=500, notificar_bi=True):
+    """
+    Recalcula los agregados de compras (pedidos completados, primera/última compra,
+    región/comuna de la última compra y total gastado) de un conjunto de clientes.
+    Todos los valores se obtienen en la misma consulta que lee los clientes
+    (subconsultas correlacionadas) y se escriben con bulk_update por lotes.
+    notificar_bi=False omite la invalidación del caché BI (el llamador ya la gestiona).
+    Retorna: cantidad de clientes actualizados.
+    """
+    if clientes is None:
+        clientes = Cliente.objects.all()
+
+    ventas = Pedido.objects.filter(cliente=OuterRef('pk'), estado__in=Pedido.ESTADOS_VENTA)
+    ultima = ventas.order_by('-fecha_solicitud', '-id')
+    completados = Pedido.objects.filter(cliente=OuterRef('pk'), estado='completado').values('cliente').annotate(
+        c=Count('id')).values('c')
+    gastado = ventas.values('cliente').annotate(t=Sum('subtotal')).values('t')
+    monto = DecimalField(max_digits=20, decimal_places=0)
+
+    anotados = clientes.annotate(
+        _completados=Coalesce(Subquery(completados, output_field=PositiveIntegerField()), 0),
+        _primera=Subquery(ventas.order_by('fecha_solicitud', 'id').values('fecha_solicitud')[:1]),
+        _ultima=Subquery(ultima.values('fecha_solicitud')[:1]),
+        _region=Subquery(ultima.values('region')[:1]),
+        _comuna=Subquery(ultima.values('comuna')[:1]),
+        _gastado=Coalesce(Subquery(gastado, output_field=monto), Decimal('0'), output_field=monto),
+    ).only('id').order_by('id')
+
+    actualizados = 0
+    lote = []
+    for cliente in anotados.iterator(chunk_size=batch_size):
+        cliente.completed_order_count = cliente._completados
+        cliente.first_purchase_at = cliente._primera
+        cliente.last_purchase_at = cliente._ultima
+        cliente.last_purchase_region = cliente._region
+        cliente.last_purchase_comuna = cliente._comuna
+        cliente.lifetime_value = cliente._gastado
+        lote.append(cliente)
+        if len(lote) >= batch_size:
+            Cliente.objects.bulk_update(lote, CAMPOS_AGREGADOS_CLIENTE)
+            actualizados += len(lote)
+            lote = []
+
+    if lote:
+        Cliente.objects.bulk_update(lote, CAMPOS_AGREGADOS_CLIENTE)
+        actualizados += len(lote)
+
+    # La recurrencia de clientes alimenta los endpoints BI: se invalida su caché
+    if actualizados and notificar_bi:
+        notificar_cambio_bi()
+
+    return actualizados
+
+
+def upsert_cliente(datos):
+    """
+    Crea o actualiza el cliente de 'datos' (ClienteInputSerializer) por su email, con un
+    solo INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE. A diferencia de get_or_create,
+    dos solicitudes simultáneas de un email nuevo no fallan por la restricción única.
+    Siempre actualiza nombre y apellido; empresa y teléfono solo si vienen informados.
+    Retorna el cliente leído de la base de datos.
+    """
+    campos = ['nombre', 'apellido'] + [campo for campo in ('empresa', 'telefono') if datos.get(campo)]
+    # MySQL no admite indicar la columna del conflicto (usa cualquier clave única)
+    objetivo = {'unique_fields': ['email']} if connection.features.supports_update_conflicts_with_target else {}
+    Cliente.objects.bulk_create(
+        [Cliente(email=datos['email'], nombre=datos['nombre'], apellido=datos['apellido'],
+                 empresa=datos.get('empresa', ''), telefono=datos.get('telefono', ''))],
+        update_conflicts=True, update_fields=campos, **objetivo)
+    return Cliente.objects.get(email=datos['email'])
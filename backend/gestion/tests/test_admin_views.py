@@ -8,7 +8,9 @@ import pytest  # Importa el framework de pruebas
 from rest_framework.test import APIClient  # Importa el cliente de pruebas de Django Rest Framework
 from rest_framework import status  # Importa los códigos de estado HTTP
 from django.urls import reverse  # Importa la función para resolver URLs
-from gestion.models import Pedido, Cliente  # Importa los modelos de Pedido y Cliente
+from django.db import connection  # Importa la conexión para contar consultas
+from django.test.utils import CaptureQueriesContext  # Importa el capturador de consultas SQL
+from gestion.models import Pedido, Cliente, ItemsPedido  # Importa los modelos de Pedido, Cliente e ItemsPedido
 from usuarios.models import User, Roles  # Importa los modelos de User y Roles
 
 # Clase de pruebas para las vistas del panel administrativo
@@ -83,6 +85,93 @@ class TestAdminViews:
             # O, en caso de usar paginación, que contenga la clave 'results'.
             assert isinstance(response.data, list) or 'results' in response.data
 
+    def test_listas_consultas_constantes(self):
+        """
+        Prueba de Consultas Constantes: el costo de un listado no depende de la cantidad de pedidos.
+        """
+        # Función auxiliar: cuenta las consultas SQL de una petición GET al historial de pagos.
+        def consultas_historial():
+            with CaptureQueriesContext(connection) as contexto:
+                response = self.client.get(reverse('panel-pedidos-historial-pagos'), {'page_size': 500})
+            assert response.status_code == status.HTTP_200_OK
+            return len(contexto.captured_queries), response.data['results']
+
+        # Función auxiliar: crea 'cantidad' pedidos completados de clientes distintos, con 2 ítems cada uno.
+        def crear_pedidos(cantidad, inicio):
+            for i in range(inicio, inicio + cantidad):
+                cliente = Cliente.objects.create(nombre=f"Cliente {i}", email=f"historial{i}@test.com")
+                pedido = Pedido.objects.create(cliente=cliente, estado='completado')
+                ItemsPedido.objects.create(pedido=pedido, descripcion="Item A", cantidad=1, precio_unitario=1000)
+                ItemsPedido.objects.create(pedido=pedido, descripcion="Item B", cantidad=2, precio_unitario=500)
+
+        # Primer escenario: 2 pedidos en el historial.
+        crear_pedidos(2, 0)
+        consultas_pocos, _ = consultas_historial()
+
+        # Segundo escenario: 40 pedidos más (uno de sus clientes es un usuario registrado).
+        crear_pedidos(40, 2)
+        User.objects.create_user(email='historial5@test.com', password='123')
+        consultas_muchos, resultados = consultas_historial()
+
+        # La cantidad de consultas es la misma con 2 o con 42 pedidos (pedidos, clientes, ítems).
+        assert consultas_muchos == consultas_pocos == 3
+        assert len(resultados) == 42
+
+        # Los datos precargados son correctos: ítems, total y marca de usuario registrado.
+        assert all(len(p['items']) == 2 for p in resultados)
+        assert all(p['total_cotizacion'] == 2380 for p in resultados)
+        registrados = [p['cliente']['email'] for p in resultados if p['cliente']['es_usuario_registrado']]
+        assert registrados == ['historial5@test.com']
+
+    def test_listas_seleccion_de_campos(self):
+        """
+        Prueba de Selección de Campos: ?fields= / ?expand= reducen la respuesta y las columnas consultadas.
+        """
+        # Crea un pedido completado con opciones de envío y dos ítems.
+        pedido = Pedido.objects.create(cliente=self.cliente, estado='completado', opciones_envio={'STARKEN': 5000})
+        item = ItemsPedido.objects.create(pedido=pedido, descripcion="Item A", cantidad=3, precio_unitario=1000)
+        ItemsPedido.objects.create(pedido=pedido, descripcion="Item B", cantidad=1, precio_unitario=500)
+        url = reverse('panel-pedidos-historial-pagos')
+
+        # Función auxiliar: GET con parámetros; retorna el primer resultado y el SQL ejecutado.
+        def listar(params):
+            with CaptureQueriesContext(connection) as contexto:
+                response = self.client.get(url, params)
+            assert response.status_code == status.HTTP_200_OK
+            return response.data['results'][0], [q['sql'] for q in contexto.captured_queries]
+
+        # Columnas del panel con el nombre del cliente: 2 consultas (pedidos y clientes), sin ítems.
+        fila, consultas = listar({'fields': 'id,estado,cliente.nombre,total_cotizacion'})
+        assert set(fila) == {'id', 'estado', 'cliente', 'total_cotizacion'}
+        assert fila['cliente'] == {'nombre': 'View Client'}
+        assert len(consultas) == 2
+        # La consulta de pedidos no lee columnas no pedidas (p. ej. el JSON de opciones de envío).
+        assert 'opciones_envio' not in consultas[0]
+        # La de clientes no anota la marca de usuario registrado (no se pidió).
+        assert 'usuarios_user' not in consultas[1]
+
+        # Cliente e ítems sin expandir: solo sus ids, sin cargar clientes.
+        fila, consultas = listar({'fields': 'id,cliente,items'})
+        assert fila['cliente'] == self.cliente.id
+        assert sorted(fila['items']) == sorted(pedido.items.values_list('id', flat=True))
+        assert len(consultas) == 2
+        assert 'descripcion' not in consultas[1]
+
+        # Ítems expandidos con un subconjunto de campos: la descripción no se consulta.
+        fila, consultas = listar({'fields': 'id,items.id,items.cantidad'})
+        assert {'id': item.id, 'cantidad': 3} in fila['items']
+        assert 'descripcion' not in consultas[1]
+
+        # Sin parámetros se mantiene la representación completa.
+        fila, _ = listar({})
+        assert fila['opciones_envio'] == {'STARKEN': 5000}
+        assert 'es_usuario_registrado' in fila['cliente']
+
+        # Un campo desconocido responde 400 indicando cuál.
+        response = self.client.get(url, {'fields': 'id,clave_secreta', 'expand': 'cliente'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert "Campo desconocido: 'clave_secreta'." in response.data['fields']
+
     def test_marcar_como_despachado(self):
         """
         Pruebas de la acción operativa: Marcar como Despachado.
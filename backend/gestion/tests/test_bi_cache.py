@@ -0,0 +1,93 @@
+"""
+Módulo de Pruebas: Caché Versionado de BI.
+
+Verifica que las respuestas de BI se sirvan desde caché mientras los datos no cambien,
+que una transición de estado (confirmación de recepción) invalide el caché
+incrementando la versión global y que los contadores de aciertos/fallos se expongan.
+"""
+import pytest  # Importa el framework de pruebas
+from decimal import Decimal  # Importa el tipo Decimal para cálculos precisos
+from django.core.cache import caches  # Importa los backends de caché
+from django.urls import reverse  # Importa la función para resolver URLs
+from django.utils import timezone  # Importa la utilidad de fecha y hora
+from rest_framework.test import APIClient  # Importa el cliente de pruebas de DRF
+from gestion.bi_cache import obtener_version  # Importa la lectura de la versión de datos BI
+from gestion.models import Pedido, Cliente, ItemsPedido  # Importa los modelos
+from usuarios.models import User, Roles  # Importa los modelos de usuario y roles
+
+
+@pytest.mark.django_db  # Marca la clase para que se ejecute con la base de datos de pruebas
+class TestBICache:
+    @pytest.fixture(autouse=True)
+    def _activar_cache(self, settings):
+        """Activa el caché BI (desactivado por defecto en test_settings) y lo vacía."""
+        settings.BI_CACHE_TTL = 60
+        caches[settings.BI_CACHE_ALIAS].clear()
+
+    def setup_method(self):
+        """
+        Inicialización de Datos de Prueba.
+        """
+        # Usuario de Gerencia autenticado para consultar BI.
+        self.client = APIClient()
+        role, _ = Roles.objects.get_or_create(nombre='Gerencia')
+        self.user = User.objects.create_user(email='bi_cache@test.com', password='123', rol=role)
+        self.client.force_authenticate(user=self.user)
+
+        # Un pedido completado y otro despachado pendiente de confirmación.
+        cliente = Cliente.objects.create(nombre="Cache", email="cache@test.com")
+        completado = Pedido.objects.create(cliente=cliente, estado='completado', fecha_despacho=timezone.now())
+        ItemsPedido.objects.create(pedido=completado, descripcion="A", cantidad=1, precio_unitario=10000,
+                                   precio_compra=5000)
+        self.despachado = Pedido.objects.create(cliente=cliente, estado='despachado', fecha_despacho=timezone.now(),
+                                                costo_envio_estimado=Decimal('0'))
+        ItemsPedido.objects.create(pedido=self.despachado, descripcion="B", cantidad=1, precio_unitario=20000,
+                                   precio_compra=8000)
+
+    def test_hit_miss_e_invalidacion(self, django_capture_on_commit_callbacks):
+        """
+        Verifica MISS -> HIT y la invalidación al completar un pedido.
+        """
+        url = reverse('bi-kpis')
+
+        # Primera consulta: se calcula y se guarda.
+        r1 = self.client.get(url, {'month[]': [timezone.now().strftime('%Y-%m')]})
+        assert r1['X-BI-Cache'] == 'MISS'
+        assert r1.data['total_pedidos'] == 1
+
+        # Misma consulta: se sirve desde caché.
+        r2 = self.client.get(url, {'month[]': [timezone.now().strftime('%Y-%m')]})
+        assert r2['X-BI-Cache'] == 'HIT'
+        assert r2.data == r1.data
+
+        # El cliente confirma la recepción: la versión se incrementa al confirmar la transacción.
+        version_inicial = obtener_version()
+        with django_capture_on_commit_callbacks(execute=True):
+            response = self.client.post(reverse('portal-confirmar-recepcion',
+                                                args=[self.despachado.id_seguimiento]))
+        assert response.status_code == 200
+        assert obtener_version() > version_inicial
+
+        # La consulta se recalcula e incluye el nuevo pedido completado.
+        r3 = self.client.get(url, {'month[]': [timezone.now().strftime('%Y-%m')]})
+        assert r3['X-BI-Cache'] == 'MISS'
+        assert r3.data['total_pedidos'] == 2
+
+        # Las estadísticas reflejan 1 acierto y 2 fallos en KPIs.
+        stats = self.client.get(reverse('bi-cache-stats')).data
+        assert stats['endpoints']['kpis'] == {'hits': 1, 'misses': 2, 'hit_rate': 33.3}
+        assert stats['version'] == obtener_version()
+
+    def test_filtros_equivalentes_comparten_clave(self):
+        """
+        Verifica que filtros equivalentes en distinto orden usen la misma entrada de caché.
+        """
+        url = reverse('bi-dashboard-stats')
+
+        # Primera consulta con los filtros en un orden.
+        r1 = self.client.get(url + '?region[]=RM&region[]=SUR')
+        assert r1['X-BI-Cache'] == 'MISS'
+
+        # Mismos filtros en otro orden (y formato single separado por comas): acierto.
+        r2 = self.client.get(url + '?region=SUR,RM')
+        assert r2['X-BI-Cache'] == 'HIT'
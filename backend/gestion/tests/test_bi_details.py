@@ -138,3 +138,71 @@ class TestBIDetails:
 
         # Verifica que la respuesta incluya la llave 'regions'.
         assert 'regions' in response.data
+
+    def test_kpis_agregados_en_sql(self):
+        """
+        Prueba de KPIs calculados en la base de datos (mismo redondeo que el cálculo iterativo).
+        """
+        url = reverse('bi-kpis')
+
+        # Solicita los KPIs sin filtros (incluye los 3 pedidos completados).
+        response = self.client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        data = response.data
+
+        # Validación Matemática:
+        # P1: Neto 11.000 (10% urgencia), IVA 2.090, Envío 5.000 -> Total 18.090, Costo 5.000
+        # P2: Neto 10.000, IVA 1.900, Envío 5.000 -> Total 16.900, Costo 5.000
+        # P3: Neto 50.000, IVA 9.500, Envío 5.000 -> Total 64.500, Costo 40.000
+        assert data['total_neto'] == 71000
+        assert data['total_ingresos'] == 99490
+        assert data['total_costos'] == 50000
+        assert data['total_utilidad'] == 21000
+        assert data['total_iva'] == 13490
+        assert data['total_envios'] == 15000
+        assert data['total_pedidos'] == 3
+
+        # Margen: 21.000 / 71.000 = 29,58% -> redondeado a 1 decimal.
+        assert data['margen_operacional'] == 29.6
+
+        # Recurrencia: 1 de 2 clientes tiene más de un pedido completado.
+        assert data['clientes_recurrentes'] == 1
+        assert data['clientes_nuevos'] == 1
+        assert data['tasa_recurrencia'] == 50.0
+
+    def test_bundle_equivale_a_endpoints_individuales(self):
+        """
+        Prueba del Bundle BI: un solo request entrega las mismas secciones que los endpoints individuales.
+        """
+        url = reverse('bi-bundle')
+
+        individuales = {
+            'rentabilidad': 'bi-rentabilidad',
+            'kpis': 'bi-kpis',
+            'dashboard': 'bi-dashboard-stats',
+            'filter_options': 'bi-filter-options',
+        }
+
+        # Filtros de región y de tipo de cliente (el bundle evalúa los recurrentes una sola vez).
+        for filtros in ({'region[]': ['Metropolitana']}, {'client_type[]': ['recurring']}):
+            response = self.client.get(url, filtros)
+            assert response.status_code == status.HTTP_200_OK
+
+            # Cada sección coincide con la respuesta de su endpoint individual.
+            for seccion, nombre_url in individuales.items():
+                esperado = self.client.get(reverse(nombre_url), filtros).data
+                assert response.data[seccion] == esperado, seccion
+
+    def test_bundle_selecciona_secciones(self):
+        """
+        Prueba de selección de secciones del Bundle BI y validación de secciones desconocidas.
+        """
+        url = reverse('bi-bundle')
+
+        # Solo se calculan las secciones solicitadas.
+        response = self.client.get(url, {'sections': 'kpis,dashboard'})
+        assert set(response.data.keys()) == {'kpis', 'dashboard'}
+
+        # Una sección inexistente retorna 400.
+        response = self.client.get(url, {'sections': 'kpis,ventas'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,163 @@
+"""
+Módulo de Pruebas: Tabla de Hechos BI (VentasDiarias).
+
+Verifica que la tabla de hechos se mantenga incrementalmente cuando un pedido
+entra o sale de 'completado' (o cambian sus items), que el comando de
+reconstrucción produzca el mismo resultado y que los KPIs calculados sobre
+la tabla coincidan con los calculados sobre los pedidos (y que 'bi/kpis/' no
+cambie según BI_USAR_TABLA_HECHOS).
+"""
+import pytest  # Importa el framework de pruebas
+from datetime import datetime  # Importa utilidades de fecha
+from decimal import Decimal  # Importa el tipo Decimal para cálculos precisos
+from django.core.management import call_command  # Importa la ejecución de comandos de gestión
+from django.http import QueryDict  # Importa QueryDict para simular query params
+from django.utils import timezone  # Importa la utilidad de zona horaria
+from gestion.bi_bundle import ContextoBI, seccion_kpis  # Importa la sección de KPIs
+from gestion.bi_filters import parse_bi_filters, filtrar_pedidos, filtrar_ventas_diarias  # Compiladores de filtros
+from gestion.bi_metrics import calcular_kpis, calcular_kpis_hechos  # Motores de KPIs
+from gestion.models import Pedido, Cliente, ItemsPedido, VentasDiarias  # Importa los modelos
+
+
+def _aware(*args):
+    """Crea un datetime con zona horaria a partir de sus componentes."""
+    return timezone.make_aware(datetime(*args))
+
+
+def _filas():
+    """Estado actual de la tabla de hechos como lista comparable."""
+    return list(VentasDiarias.objects.order_by('fecha', 'region', 'comuna', 'cliente_id').values_list(
+        'fecha', 'region', 'comuna', 'cliente_id', 'pedidos', 'venta', 'neto', 'costo', 'utilidad', 'iva', 'envios'))
+
+
+@pytest.mark.django_db  # Marca la clase para que se ejecute con la base de datos de pruebas
+class TestVentasDiarias:
+    def setup_method(self):
+        """
+        Inicialización de Datos de Prueba.
+        """
+        # Crea dos clientes para verificar la agrupación por cliente.
+        self.cliente_a = Cliente.objects.create(nombre="Hechos A", email="hechos_a@test.com")
+        self.cliente_b = Cliente.objects.create(nombre="Hechos B", email="hechos_b@test.com")
+
+    def test_mantenimiento_incremental(self):
+        """
+        Verifica entradas, cambios de items y salidas de 'completado'.
+        """
+        # Un pedido en cotización no aporta a la tabla de hechos.
+        pedido = Pedido.objects.create(cliente=self.cliente_a, estado='cotizado', region='RM', comuna='Santiago',
+                                       costo_envio_estimado=Decimal('5000'))
+        ItemsPedido.objects.create(pedido=pedido, descripcion="Item", cantidad=2, precio_unitario=10000,
+                                   precio_compra=6000)
+        assert VentasDiarias.objects.count() == 0
+
+        # Al completarse se crea la fila del día de despacho.
+        pedido = Pedido.objects.get(pk=pedido.pk)
+        pedido.estado = 'completado'
+        pedido.fecha_despacho = _aware(2025, 3, 10, 15, 0)
+        pedido.save()
+
+        fila = VentasDiarias.objects.get()
+        # Neto 20.000, IVA 3.800, Envío 5.000 -> Total 28.800; Costo 12.000; Utilidad 8.000.
+        assert fila.fecha.isoformat() == '2025-03-10'
+        assert (fila.region, fila.comuna, fila.cliente_id) == ('RM', 'Santiago', self.cliente_a.id)
+        assert fila.pedidos == 1
+        assert fila.venta == Decimal('28800')
+        assert fila.costo == Decimal('12000')
+        assert fila.utilidad == Decimal('8000')
+
+        # Agregar un item a un pedido completado actualiza la fila.
+        ItemsPedido.objects.create(pedido=pedido, descripcion="Extra", cantidad=1, precio_unitario=1000,
+                                   precio_compra=500)
+        fila.refresh_from_db()
+        assert fila.neto == Decimal('21000')
+        assert fila.costo == Decimal('12500')
+
+        # Un segundo pedido del mismo día y cliente se suma a la misma fila.
+        Pedido.objects.create(cliente=self.cliente_a, estado='completado', region='RM', comuna='Santiago',
+                              fecha_despacho=_aware(2025, 3, 10, 9, 0))
+        fila.refresh_from_db()
+        assert fila.pedidos == 2
+
+        # Cambiar la fecha de despacho mueve el aporte a otro día.
+        pedido = Pedido.objects.get(pk=pedido.pk)
+        pedido.fecha_despacho = _aware(2025, 3, 11, 10, 0)
+        pedido.save()
+        assert VentasDiarias.objects.get(fecha='2025-03-10').pedidos == 1
+        assert VentasDiarias.objects.get(fecha='2025-03-11').neto == Decimal('21000')
+
+        # Al salir de 'completado' (ej: rechazo) la fila desaparece.
+        pedido.estado = 'rechazado'
+        pedido.save()
+        assert not VentasDiarias.objects.filter(fecha='2025-03-11').exists()
+
+    def test_reconstruccion_coincide_con_incremental(self):
+        """
+        Verifica que el comando de reconstrucción genere las mismas filas que el mantenimiento incremental.
+        """
+        # Pedidos completados de distintos clientes, días y regiones (incluye región vacía).
+        p1 = Pedido.objects.create(cliente=self.cliente_a, estado='completado', region='RM',
+                                   fecha_despacho=_aware(2025, 1, 5, 12, 0))
+        ItemsPedido.objects.create(pedido=p1, descripcion="I1", cantidad=1, precio_unitario=10000, precio_compra=5000)
+        p2 = Pedido.objects.create(cliente=self.cliente_b, estado='completado',
+                                   fecha_despacho=_aware(2025, 2, 7, 12, 0))
+        ItemsPedido.objects.create(pedido=p2, descripcion="I2", cantidad=3, precio_unitario=2000, precio_compra=1000)
+        Pedido.objects.create(cliente=self.cliente_b, estado='solicitud')
+
+        incremental = _filas()
+        assert len(incremental) == 2
+
+        # Se corrompe la tabla y se reconstruye con el comando de gestión.
+        VentasDiarias.objects.all().delete()
+        call_command('reconstruir_ventas_diarias', stdout=None)
+
+        assert _filas() == incremental
+
+    def test_kpis_hechos_coinciden_con_pedidos(self):
+        """
+        Verifica que los KPIs calculados sobre la tabla de hechos coincidan con los calculados sobre pedidos.
+        """
+        # El cliente A tiene dos pedidos completados (recurrente); el B, uno (nuevo).
+        for cliente, dia in ((self.cliente_a, 1), (self.cliente_a, 15), (self.cliente_b, 20)):
+            pedido = Pedido.objects.create(cliente=cliente, estado='completado', region='SUR',
+                                           porcentaje_urgencia=Decimal('10.00'),
+                                           costo_envio_estimado=Decimal('3500'),
+                                           fecha_despacho=_aware(2025, 4, dia, 12, 0))
+            ItemsPedido.objects.create(pedido=pedido, descripcion="K", cantidad=dia, precio_unitario=1990,
+                                       precio_compra=1200)
+
+        spec = parse_bi_filters(QueryDict('month[]=2025-04'))
+        kpis_pedidos = calcular_kpis(filtrar_pedidos(spec))
+        kpis_hechos = calcular_kpis_hechos(filtrar_ventas_diarias(spec))
+
+        assert kpis_hechos == kpis_pedidos
+        assert kpis_hechos['total_pedidos'] == 3
+        assert kpis_hechos['clientes_recurrentes'] == 1
+
+        # La segmentación por tipo de cliente también se respeta sobre los hechos.
+        spec_nuevos = parse_bi_filters(QueryDict('month[]=2025-04&client_type[]=new'))
+        assert set(filtrar_ventas_diarias(spec_nuevos).values_list('cliente_id', flat=True)) == {self.cliente_b.id}
+
+    def test_kpis_no_dependen_de_la_tabla_de_hechos(self, settings):
+        """
+        Verifica que 'bi/kpis/' entregue lo mismo con y sin la tabla de hechos: con filtro de
+        fechas se filtra siempre por fecha_actualizacion (no por la fecha de venta).
+        """
+        # Un pedido despachado en abril de 2025 y actualizado hoy.
+        pedido = Pedido.objects.create(cliente=self.cliente_a, estado='completado', region='SUR',
+                                       fecha_despacho=_aware(2025, 4, 10, 12, 0))
+        ItemsPedido.objects.create(pedido=pedido, descripcion="K", cantidad=2, precio_unitario=1990,
+                                   precio_compra=1200)
+        mes_actual = timezone.localtime(Pedido.objects.get(pk=pedido.pk).fecha_actualizacion).strftime('%Y-%m')
+
+        def kpis(query, usar_hechos):
+            settings.BI_USAR_TABLA_HECHOS = usar_hechos
+            return seccion_kpis(ContextoBI(parse_bi_filters(QueryDict(query))))
+
+        # Mes de venta: fuera del filtro por fecha de actualización en ambos casos.
+        assert kpis('month[]=2025-04', True) == kpis('month[]=2025-04', False)
+        assert kpis('month[]=2025-04', True)['total_pedidos'] == 0
+        # Mes de actualización y sin filtro de fechas: el pedido aparece en ambos casos.
+        assert kpis(f'month[]={mes_actual}', True) == kpis(f'month[]={mes_actual}', False)
+        assert kpis('', True) == kpis('', False)
+        assert kpis('', True)['total_pedidos'] == 1
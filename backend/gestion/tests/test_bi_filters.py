@@ -0,0 +1,146 @@
+"""
+Módulo de Pruebas: Compilador de Filtros BI.
+
+Verifica que los query params de BI se normalicen en una especificación canónica
+y que el QuerySet compilado respete rangos semi-abiertos, meses fusionados y
+segmentación de clientes.
+"""
+import pytest  # Importa el framework de pruebas
+from datetime import datetime, date  # Importa utilidades de fecha
+from django.http import QueryDict  # Importa QueryDict para simular query params
+from django.utils import timezone  # Importa la utilidad de zona horaria
+from gestion.bi_filters import parse_bi_filters, filtrar_pedidos, rangos_de_meses  # Importa el compilador
+from gestion.models import Pedido, Cliente  # Importa los modelos de Pedido y Cliente
+
+
+def _aware(*args):
+    """Crea un datetime con zona horaria a partir de sus componentes."""
+    return timezone.make_aware(datetime(*args))
+
+
+def test_spec_canonica_y_hashable():
+    """
+    Verifica que filtros equivalentes en distinto orden generen la misma especificación.
+    """
+    # Construye dos query strings con los mismos filtros en distinto orden.
+    spec_a = parse_bi_filters(QueryDict('month[]=2025-02&month[]=2025-01&region=SUR,RM&cliente_id[]=3&cliente_id[]=1'))
+    spec_b = parse_bi_filters(QueryDict('region[]=RM&region[]=SUR&month[]=2025-1&month[]=2025-02&cliente_id[]=1&cliente_id[]=3'))
+
+    # Verifica igualdad, hash y clave de caché idénticos.
+    assert spec_a == spec_b
+    assert hash(spec_a) == hash(spec_b)
+    assert spec_a.clave() == spec_b.clave()
+
+    # Verifica la normalización de los meses.
+    assert spec_a.months == ('2025-01', '2025-02')
+
+
+def test_client_type_ambos_no_filtra():
+    """
+    Verifica que seleccionar 'new' y 'recurring' a la vez equivalga a no filtrar.
+    """
+    spec = parse_bi_filters(QueryDict('client_type[]=new&client_type[]=recurring'))
+    assert spec.client_type is None
+
+    # El parámetro single (compatibilidad) también se acepta.
+    assert parse_bi_filters(QueryDict('client_type=new')).client_type == 'new'
+
+
+def test_meses_consecutivos_se_fusionan():
+    """
+    Verifica que meses consecutivos se fusionen en un solo rango semi-abierto.
+    """
+    rangos = rangos_de_meses(('2024-12', '2025-01', '2025-03'))
+
+    # Diciembre y Enero forman un solo rango; Marzo queda separado.
+    assert len(rangos) == 2
+    assert rangos[0] == (_aware(2024, 12, 1), _aware(2025, 2, 1))
+    assert rangos[1] == (_aware(2025, 3, 1), _aware(2025, 4, 1))
+
+
+@pytest.mark.django_db  # Marca la prueba para que se ejecute con la base de datos de pruebas
+def test_filtrar_pedidos_rango_inclusivo():
+    """
+    Verifica que end_date incluya todo el día y que los meses filtren correctamente.
+    """
+    cliente = Cliente.objects.create(nombre="Filtro", email="filtro@test.com")
+
+    # Pedido despachado al final del día límite (debe incluirse).
+    p1 = Pedido.objects.create(cliente=cliente, estado='completado', fecha_despacho=_aware(2025, 1, 31, 23, 59))
+    # Pedido despachado al inicio del mes siguiente (debe excluirse).
+    Pedido.objects.create(cliente=cliente, estado='completado', fecha_despacho=_aware(2025, 2, 1, 0, 0))
+
+    spec = parse_bi_filters(QueryDict('start_date=2025-01-01&end_date=2025-01-31'))
+    assert spec.end_date == date(2025, 1, 31)
+    assert list(filtrar_pedidos(spec).values_list('id', flat=True)) == [p1.id]
+
+    # El mismo resultado usando el filtro por mes.
+    spec_mes = parse_bi_filters(QueryDict('month[]=2025-01'))
+    assert list(filtrar_pedidos(spec_mes).values_list('id', flat=True)) == [p1.id]
+
+
+@pytest.mark.django_db  # Marca la prueba para que se ejecute con la base de datos de pruebas
+def test_filtrar_pedidos_tipo_cliente():
+    """
+    Verifica la segmentación Nuevo/Recurrente con la subconsulta única.
+    """
+    recurrente = Cliente.objects.create(nombre="Rec", email="rec@test.com")
+    nuevo = Cliente.objects.create(nombre="Nuevo", email="nuevo@test.com")
+
+    # Dos pedidos completados convierten al cliente en recurrente.
+    Pedido.objects.create(cliente=recurrente, estado='completado')
+    Pedido.objects.create(cliente=recurrente, estado='completado')
+    Pedido.objects.create(cliente=nuevo, estado='completado')
+
+    spec_new = parse_bi_filters(QueryDict('client_type[]=new'))
+    spec_rec = parse_bi_filters(QueryDict('client_type[]=recurring'))
+
+    assert set(filtrar_pedidos(spec_new).values_list('cliente_id', flat=True)) == {nuevo.id}
+    assert set(filtrar_pedidos(spec_rec).values_list('cliente_id', flat=True)) == {recurrente.id}
+
+    # Excluir la faceta 'client_types' devuelve todos los pedidos.
+    assert filtrar_pedidos(spec_new.sin('client_types')).count() == 3
+
+
+@pytest.mark.django_db  # Marca la prueba para que se ejecute con la base de datos de pruebas
+@pytest.mark.parametrize('usar_hechos', [True, False])
+def test_facetas_una_pasada_con_conteos(usar_hechos):
+    """
+    Verifica las facetas con exclusión y sus conteos, con y sin tabla de hechos.
+    """
+    from gestion.bi_facetas import calcular_facetas  # Importa el motor de facetas
+
+    a = Cliente.objects.create(nombre="Faceta A", email="faceta_a@test.com")
+    b = Cliente.objects.create(nombre="Faceta B", email="faceta_b@test.com")
+
+    # Enero: A en RM/Santiago (2 pedidos) y B en SUR/Temuco. Febrero: B en RM/Maipu.
+    for cliente, region, comuna, fecha in (
+        (a, 'RM', 'Santiago', _aware(2025, 1, 10, 12, 0)),
+        (a, 'RM', 'Santiago', _aware(2025, 1, 11, 12, 0)),
+        (b, 'SUR', 'Temuco', _aware(2025, 1, 20, 12, 0)),
+        (b, 'RM', 'Maipu', _aware(2025, 2, 5, 12, 0)),
+    ):
+        Pedido.objects.create(cliente=cliente, estado='completado', region=region, comuna=comuna,
+                              fecha_despacho=fecha, fecha_actualizacion=fecha)
+    # fecha_actualizacion es auto_now: se fija con update() para la ruta sin tabla de hechos.
+    for pedido in Pedido.objects.all():
+        Pedido.objects.filter(pk=pedido.pk).update(fecha_actualizacion=pedido.fecha_despacho)
+
+    # Filtro: Enero + Región RM.
+    spec = parse_bi_filters(QueryDict('month[]=2025-01&region[]=RM'))
+    facetas = calcular_facetas(spec, usar_hechos=usar_hechos)
+
+    # Clientes: todo excepto clientes -> solo A (B no compró en RM en Enero).
+    assert facetas['clients'] == [a.id]
+    assert facetas['counts']['clients'] == {a.id: 2}
+
+    # Regiones: se excluye el filtro de región -> RM y SUR en Enero.
+    assert facetas['regions'] == ['RM', 'SUR']
+    assert facetas['counts']['regions'] == {'RM': 2, 'SUR': 1}
+
+    # Comunas: la región SÍ limita -> solo Santiago en Enero.
+    assert facetas['comunas'] == ['Santiago']
+
+    # Meses: se excluye el filtro temporal -> Enero y Febrero en RM (del más reciente al más antiguo).
+    assert facetas['months'] == ['2025-02', '2025-01']
+    assert facetas['counts']['months'] == {'2025-02': 1, '2025-01': 2}
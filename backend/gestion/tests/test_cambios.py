@@ -0,0 +1,138 @@
+"""
+Módulo de Pruebas: Sincronización Incremental de los Paneles (pedidos/changes/).
+
+Valida que el sondeo entregue solo los pedidos actualizados desde el cursor, con
+lápidas por panel para las salidas de estado y los pedidos eliminados, que el cursor
+avance (y se pagine) sin perder cambios, y que cada usuario reciba solo sus paneles.
+"""
+from datetime import timedelta  # Desplazamiento de fechas
+import pytest  # Importa el framework de pruebas
+from django.db import connection  # Importa la conexión para contar consultas
+from django.test.utils import CaptureQueriesContext  # Importa el capturador de consultas SQL
+from django.urls import reverse  # Importa la función para resolver URLs
+from django.utils import timezone  # Fechas con zona horaria
+from rest_framework import status  # Importa los códigos de estado HTTP
+from rest_framework.test import APIClient  # Importa el cliente de pruebas
+from gestion.models import Cliente, Pedido  # Importa los modelos de Cliente y Pedido
+from usuarios.models import User, Roles  # Importa los modelos de User y Roles
+
+
+@pytest.mark.django_db  # Marca la clase para que se ejecute con la base de datos de pruebas
+class TestCambiosPedidos:
+    def setup_method(self):
+        """
+        Usuario de Gerencia autenticado (todos los paneles) y un cliente para los pedidos.
+        """
+        self.client = APIClient()
+        self.url = reverse('panel-pedidos-cambios')
+        self.cliente = Cliente.objects.create(nombre="Cambios", email="cambios_cliente@test.com")
+        self._autenticar('Gerencia')
+
+    def _autenticar(self, rol):
+        """Autentica el cliente HTTP con un usuario del rol indicado."""
+        role, _ = Roles.objects.get_or_create(nombre=rol)
+        usuario = User.objects.create_user(email=f'cambios_{rol.lower()}@test.com', password='123', rol=role)
+        self.client.force_authenticate(user=usuario)
+
+    def _pedido(self, estado, hace):
+        """Crea un pedido y fija su fecha_actualizacion 'hace' un tiempo (update, sin auto_now)."""
+        pedido = Pedido.objects.create(cliente=self.cliente, estado=estado)
+        Pedido.objects.filter(pk=pedido.pk).update(fecha_actualizacion=timezone.now() - hace)
+        return pedido
+
+    def test_sondeo_incremental(self, settings):
+        """
+        Verifica que cada sondeo entregue solo lo cambiado desde el anterior, con lápidas por panel.
+        """
+        settings.PEDIDOS_CAMBIOS_MARGEN = 0
+        cotizado = self._pedido('cotizado', timedelta(hours=2))
+        aceptado = self._pedido('aceptado', timedelta(minutes=10))
+
+        # Desde hace una hora: solo el pedido aceptado.
+        desde = (timezone.now() - timedelta(hours=1)).isoformat()
+        response = self.client.get(self.url, {'since': desde})
+        assert response.status_code == status.HTTP_200_OK
+        assert [p['id'] for p in response.data['pedidos']] == [aceptado.id]
+        paneles = response.data['paneles']
+        assert paneles['aceptados'] == {'actualizados': [aceptado.id], 'bajas': []}
+        assert paneles['historial-cotizaciones']['actualizados'] == [aceptado.id]
+        # Cualquier otro panel lo recibe como lápida (no pertenece a él).
+        assert paneles['cotizados'] == {'actualizados': [], 'bajas': [aceptado.id]}
+
+        # Con el cursor devuelto, el siguiente sondeo no trae nada.
+        vacio = self.client.get(self.url, {'since': response.data['cursor']})
+        assert vacio.data['pedidos'] == [] and vacio.data['hay_mas'] is False
+        assert all(panel == {'actualizados': [], 'bajas': []} for panel in vacio.data['paneles'].values())
+
+        # El cliente acepta la cotización: sale de 'cotizados' y entra a 'aceptados'.
+        cotizado.estado = 'aceptado'
+        cotizado.save()
+        cambio = self.client.get(self.url, {'since': vacio.data['cursor']})
+        assert [p['id'] for p in cambio.data['pedidos']] == [cotizado.id]
+        assert cambio.data['paneles']['cotizados']['bajas'] == [cotizado.id]
+        assert cambio.data['paneles']['aceptados']['actualizados'] == [cotizado.id]
+
+        # Un pedido eliminado es una lápida en los paneles de su estado.
+        pk = aceptado.pk
+        aceptado.delete()
+        baja = self.client.get(self.url, {'since': cambio.data['cursor']})
+        assert baja.data['paneles']['aceptados']['bajas'] == [pk]
+        assert baja.data['paneles']['cotizados']['bajas'] == []
+
+    def test_paginacion_y_margen(self, settings):
+        """
+        Verifica que muchos cambios se entreguen en tandas y que el cursor quede detrás del margen.
+        """
+        settings.PEDIDOS_CAMBIOS_MARGEN = 0
+        settings.PEDIDOS_PAGINA_MAXIMA = 2
+        ids = [self._pedido('solicitud', timedelta(minutes=m)).id for m in (5, 4, 3)]
+
+        # Primera tanda de 2 (más antiguos primero) con 'hay_mas'; la segunda completa el resto.
+        desde = (timezone.now() - timedelta(hours=1)).isoformat()
+        primera = self.client.get(self.url, {'since': desde, 'paneles': 'solicitudes'})
+        assert primera.data['hay_mas'] is True
+        assert primera.data['paneles'] == {'solicitudes': {'actualizados': ids[:2], 'bajas': []}}
+        segunda = self.client.get(self.url, {'since': primera.data['cursor'], 'paneles': 'solicitudes'})
+        assert segunda.data['hay_mas'] is False
+        assert segunda.data['paneles']['solicitudes']['actualizados'] == ids[2:]
+
+        # Con margen, un cambio reciente se vuelve a entregar (transacciones que confirman tarde).
+        settings.PEDIDOS_CAMBIOS_MARGEN = 60
+        reciente = self._pedido('solicitud', timedelta(seconds=1))
+        for _ in range(2):
+            repetido = self.client.get(self.url, {'since': segunda.data['cursor'], 'paneles': 'solicitudes'})
+            assert repetido.data['paneles']['solicitudes']['actualizados'] == [reciente.id]
+
+    def test_sondeo_vacio_con_dos_consultas(self, settings):
+        """
+        Verifica que sin cambios el sondeo cueste dos consultas (rango de pedidos y lápidas).
+        """
+        for m in range(20):
+            self._pedido('cotizado', timedelta(days=1, minutes=m))
+
+        # Sin ?since= solo se entrega el cursor de partida.
+        inicio = self.client.get(self.url)
+        assert inicio.data['pedidos'] == [] and inicio.data['cursor']
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(self.url, {'since': inicio.data['cursor'], 'fields': 'id,estado'})
+        assert response.data['pedidos'] == []
+        assert len(consultas) == 2
+
+    def test_paneles_por_rol_y_errores(self):
+        """
+        Verifica que cada rol reciba solo sus paneles y los errores de parámetros.
+        """
+        self._pedido('cotizado', timedelta(minutes=1))
+        desde = (timezone.now() - timedelta(hours=1)).isoformat()
+
+        # El despachador no ve el pedido cotizado, solo la lápida en sus paneles.
+        self._autenticar('Despachador')
+        response = self.client.get(self.url, {'since': desde})
+        assert set(response.data['paneles']) == {'para-despachar', 'historial-despachos'}
+        assert response.data['pedidos'] == []
+
+        # Panel desconocido o 'since' inválido: 400. Sin paneles accesibles: 403.
+        assert self.client.get(self.url, {'paneles': 'todos'}).status_code == status.HTTP_400_BAD_REQUEST
+        assert self.client.get(self.url, {'since': 'ayer'}).status_code == status.HTTP_400_BAD_REQUEST
+        assert self.client.get(self.url, {'paneles': 'cotizados'}).status_code == status.HTTP_403_FORBIDDEN
@@ -6,11 +6,22 @@ incluyendo la generación de archivos (PDF), envío de correos electrónicos y
 la creación de solicitudes por usuarios no autenticados (público).
 """
 import pytest  # Importa el framework de pruebas
+import zipfile  # Importa zipfile para leer el ZIP exportado
+from io import BytesIO  # Importa BytesIO para leer PDFs en memoria
 from rest_framework.test import APIClient  # Importa el cliente de pruebas de Django Rest Framework
 from rest_framework import status  # Importa los códigos de estado HTTP
 from django.urls import reverse  # Importa la función para resolver URLs
+from gestion import pdf_service  # Importa el servicio de render de PDFs (métricas)
+from gestion.outbox import procesar_outbox  # Importa el procesador de la bandeja de salida de correos
 from django.core import mail  # Importa el módulo de correo electrónico de Django
-from gestion.models import Cliente, Pedido, ItemsPedido  # Importa los modelos de Cliente, Pedido y ItemsPedido
+from django.core.cache import caches  # Importa los backends de caché
+from django.conf import settings  # Importa la configuración del proyecto
+from django.db import connection  # Importa la conexión para contar consultas
+from django.test.utils import CaptureQueriesContext  # Importa el capturador de consultas SQL
+from gestion.models import Cliente, ClaveIdempotencia, Pedido, ItemsPedido, ProductoFrecuente  # Modelos
+from gestion.idempotencia import purgar_claves  # Importa la purga de claves Idempotency-Key vencidas
+from django.utils import timezone  # Importa timezone para vencer claves
+from datetime import timedelta  # Importa timedelta para vencer claves
 from usuarios.models import User, Roles  # Importa los modelos de User y Roles
 
 
@@ -66,6 +77,131 @@ class TestIntegrations:
         # Consulta la base de datos para confirmar que existe un Pedido asociado al email dado.
         assert Pedido.objects.filter(cliente__email='public@test.com').exists()
 
+    def test_agregados_cliente_no_se_exponen_ni_editan(self):
+        """
+        Verifica que los endpoints públicos no entreguen los agregados de compras del cliente
+        y que el personal no pueda sobrescribirlos por la API.
+        """
+        # Cliente existente con historial de compras.
+        cliente = Cliente.objects.create(nombre="Historial", email="historial@test.com",
+                                         completed_order_count=3, lifetime_value=900000)
+        data = {'cliente': {'nombre': 'Historial', 'apellido': 'Cliente', 'email': 'historial@test.com'},
+                'items': [{'tipo': 'MANUAL', 'descripcion': 'Repuesto', 'cantidad': 1}],
+                'region': 'RM', 'comuna': 'Santiago'}
+
+        # La solicitud anónima con su email no devuelve los agregados.
+        self.client.logout()
+        response = self.client.post(reverse('solicitud-create'), data, format='json')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert 'lifetime_value' not in response.data['cliente']
+        assert 'completed_order_count' not in response.data['cliente']
+
+        # Tampoco el portal público del pedido.
+        pedido = Pedido.objects.get(pk=response.data['id'])
+        portal = self.client.get(reverse('portal-pedido-detail', args=[pedido.id_seguimiento]))
+        assert 'lifetime_value' not in portal.data['cliente']
+
+        # El personal los ve, pero un PATCH no los modifica.
+        self.client.force_authenticate(user=self.user)
+        url = reverse('cliente-crud-detail', args=[cliente.id])
+        response = self.client.patch(url, {'completed_order_count': 99, 'lifetime_value': 5}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['completed_order_count'] == 3
+        cliente.refresh_from_db()
+        assert (cliente.completed_order_count, cliente.lifetime_value) == (3, 900000)
+
+    # Prueba la carga masiva de la solicitud y el upsert del cliente
+    def test_solicitud_consultas_constantes(self):
+        """
+        Verifica que la solicitud cueste las mismas consultas con 1 o 50 items,
+        que resuelva los productos de catálogo y que actualice al cliente existente.
+        """
+        self.client.logout()
+        url = reverse('solicitud-create')
+        producto = ProductoFrecuente.objects.create(nombre='Casco', descripcion='Casco de seguridad')
+
+        def _solicitud(cantidad, **cliente):
+            """Payload con 'cantidad' items (uno de catálogo y uno con producto inexistente)."""
+            items = [{'tipo': 'MANUAL', 'descripcion': f'Item {i}', 'cantidad': i + 1} for i in range(cantidad)]
+            items[0].update(tipo='CATALOGO', producto_id=producto.id)
+            items[-1].setdefault('producto_id', 999999)
+            datos = {'nombre': 'Carga', 'apellido': 'Masiva', 'email': 'masiva@test.com', **cliente}
+            return {'cliente': datos, 'items': items, 'region': 'RM', 'comuna': 'Santiago'}
+
+        # Primera solicitud (cliente nuevo) y segunda con 50 items: mismas consultas.
+        consultas = []
+        for cantidad, cliente in ((1, {'empresa': 'Clarotec'}), (50, {'nombre': 'Carga 2', 'empresa': ''})):
+            with CaptureQueriesContext(connection) as capturadas:
+                response = self.client.post(url, _solicitud(cantidad, **cliente), format='json')
+            assert response.status_code == status.HTTP_201_CREATED
+            assert len(response.data['items']) == cantidad
+            consultas.append(len(capturadas))
+        assert consultas[0] == consultas[1]
+
+        # Un solo cliente: el nombre se actualiza y la empresa vacía no borra la existente.
+        cliente = Cliente.objects.get(email='masiva@test.com')
+        assert (cliente.nombre, cliente.empresa) == ('Carga 2', 'Clarotec')
+        assert cliente.pedidos.count() == 2
+
+        # Items con su producto de catálogo (el inexistente queda sin producto) y subtotal coherente.
+        pedido = cliente.pedidos.order_by('-id').first()
+        items = list(pedido.items.order_by('id'))
+        assert items[0].producto_frecuente_id == producto.id
+        assert items[-1].producto_frecuente_id is None
+        assert all(item.subtotal == item.cantidad * item.precio_unitario for item in items)
+        assert pedido.subtotal == sum(item.subtotal for item in items)
+
+    # Prueba los reintentos de la solicitud con Idempotency-Key
+    def test_solicitud_idempotente(self):
+        """
+        Verifica que un reintento con la misma Idempotency-Key devuelva la respuesta registrada
+        con una sola consulta y sin crear otro pedido, y la expiración de las claves.
+        """
+        self.client.logout()
+        url = reverse('solicitud-create')
+        data = {
+            'cliente': {'nombre': 'Reintento', 'apellido': 'Web', 'email': 'reintento@test.com'},
+            'items': [{'tipo': 'MANUAL', 'descripcion': 'Guantes', 'cantidad': 10}],
+        }
+
+        # Primer envío: 201 y la clave queda registrada con la respuesta.
+        primera = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='envio-1')
+        assert primera.status_code == status.HTTP_201_CREATED
+        assert ClaveIdempotencia.objects.filter(clave='envio-1', codigo_estado=201).exists()
+
+        # Reintento: misma respuesta, marcada como repetida, con una sola búsqueda por índice.
+        with CaptureQueriesContext(connection) as consultas:
+            reintento = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='envio-1')
+        assert reintento.status_code == status.HTTP_201_CREATED
+        assert reintento['Idempotent-Replayed'] == 'true'
+        assert reintento.data['id'] == primera.data['id']
+        assert reintento.data['id_seguimiento'] == primera.data['id_seguimiento']
+        assert len(consultas) == 1
+        assert Pedido.objects.filter(cliente__email='reintento@test.com').count() == 1
+
+        # La misma clave con otro contenido se rechaza (422).
+        otro = {**data, 'items': [{'tipo': 'MANUAL', 'descripcion': 'Botas', 'cantidad': 1}]}
+        response = self.client.post(url, otro, format='json', HTTP_IDEMPOTENCY_KEY='envio-1')
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+        # Un error de validación no registra la clave: el envío corregido se procesa.
+        invalido = self.client.post(url, {'cliente': data['cliente']}, format='json', HTTP_IDEMPOTENCY_KEY='envio-2')
+        assert invalido.status_code == status.HTTP_400_BAD_REQUEST
+        assert self.client.post(url, otro, format='json', HTTP_IDEMPOTENCY_KEY='envio-2').status_code == 201
+
+        # Clave registrada sin respuesta (petición en curso): 409.
+        ClaveIdempotencia.objects.create(ambito='solicitudes', clave='envio-3', huella='x')
+        response = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='envio-3')
+        assert response.status_code == status.HTTP_409_CONFLICT
+
+        # Las claves vencidas se purgan; una clave vencida vuelve a procesar la petición.
+        vencida = timezone.now() - timedelta(hours=settings.IDEMPOTENCIA_TTL_HORAS + 1)
+        ClaveIdempotencia.objects.filter(clave__in=['envio-2', 'envio-3']).update(fecha_creacion=vencida)
+        assert purgar_claves() == 2
+        ClaveIdempotencia.objects.filter(clave='envio-1').update(fecha_creacion=vencida)
+        nueva = self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY='envio-1')
+        assert nueva.status_code == status.HTTP_201_CREATED and nueva.data['id'] != primera.data['id']
+
     # Prueba la generación correcta del documento PDF de cotización
     def test_generar_pdf_cotizacion(self):
         """
@@ -96,6 +232,118 @@ class TestIntegrations:
         # Verifica que el cuerpo de la respuesta tenga bytes (no esté vacío).
         assert len(response.content) > 100
 
+    # Prueba el caché y la revalidación (ETag) del PDF de cotización
+    def test_pdf_cotizacion_cache_y_etag(self):
+        """
+        Verifica que el PDF se sirva desde caché, responda 304 con If-None-Match
+        y cambie de versión al editar los items.
+        """
+        # Limpia el caché de PDFs para partir en frío.
+        caches[settings.PDF_CACHE_ALIAS].clear()
+
+        # Crea un pedido con un ítem.
+        cliente = Cliente.objects.create(nombre="PDF", apellido="Cache", email="pdf_cache@test.com")
+        pedido = Pedido.objects.create(cliente=cliente, estado='cotizado')
+        item = ItemsPedido.objects.create(pedido=pedido, descripcion="Item PDF", cantidad=1, precio_unitario=1000)
+        url = reverse('generar-pdf', args=[pedido.id])
+
+        # Primera descarga: se renderiza (MISS) e incluye ETag.
+        primera = self.client.get(url)
+        assert primera['X-PDF-Cache'] == 'MISS'
+        etag = primera['ETag']
+
+        # Segunda descarga: mismos bytes servidos desde caché (HIT).
+        segunda = self.client.get(url)
+        assert segunda['X-PDF-Cache'] == 'HIT'
+        assert segunda.content == primera.content
+
+        # Revalidación con el ETag vigente: 304 sin cuerpo.
+        revalidacion = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert revalidacion.status_code == status.HTTP_304_NOT_MODIFIED
+        assert revalidacion.content == b''
+
+        # Editar un ítem cambia la versión: el ETag anterior ya no aplica y se vuelve a renderizar.
+        item.cantidad = 3
+        item.save()
+        editado = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert editado.status_code == status.HTTP_200_OK
+        assert editado['ETag'] != etag
+        assert editado['X-PDF-Cache'] == 'MISS'
+
+    # Prueba el motor nativo (reportlab) del PDF de cotización
+    def test_pdf_motor_reportlab_equivalente(self, settings):
+        """
+        Verifica que el motor 'reportlab' genere un PDF con el mismo contenido que la plantilla HTML.
+        """
+        from pypdf import PdfReader  # Lector de PDF (dependencia de xhtml2pdf)
+
+        # Pedido con recargo y envío para cubrir todas las filas de totales.
+        cliente = Cliente.objects.create(nombre="PDF", apellido="Nativo", email="pdf_nativo@test.com")
+        pedido = Pedido.objects.create(cliente=cliente, estado='cotizado', region='RM', comuna='Santiago',
+                                       porcentaje_urgencia=10, costo_envio_estimado=4500)
+        ItemsPedido.objects.create(pedido=pedido, descripcion="Notebook <14\"> & cargador", cantidad=2,
+                                   precio_unitario=350000)
+        url = reverse('generar-pdf', args=[pedido.id])
+
+        # Descarga el PDF con cada motor y extrae su texto.
+        textos = {}
+        for motor in ('xhtml2pdf', 'reportlab'):
+            settings.PDF_MOTOR = motor
+            response = self.client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            lector = PdfReader(BytesIO(response.content))
+            textos[motor] = ' '.join(' '.join(pagina.extract_text() for pagina in lector.pages).split())
+
+        # Ambos motores muestran los mismos datos, montos formateados y textos fijos.
+        for fragmento in (f'#{pedido.id}', 'PDF Nativo', 'Notebook <14"> & cargador', '$350,000', '$700,000',
+                          'Recargo Urgencia (10.00%):', '$70,000', 'Costo de Envío:', '$4,500', 'TOTAL:',
+                          'Santiago, RM', 'no representa una factura fiscal'):
+            assert fragmento in textos['xhtml2pdf']
+            assert fragmento in textos['reportlab']
+
+    # Prueba la exportación masiva de cotizaciones en ZIP
+    def test_exportar_cotizaciones_zip(self):
+        """
+        Verifica que la exportación filtre los pedidos, reutilice los PDFs en caché
+        y entregue un ZIP en streaming con un PDF por cotización.
+        """
+        # Autentica y limpia el caché de PDFs.
+        self.client.force_authenticate(user=self.user)
+        caches[settings.PDF_CACHE_ALIAS].clear()
+
+        # Tres cotizaciones del cliente, una solicitud sin cotizar y una cotización de otro cliente.
+        cliente = Cliente.objects.create(nombre="Zip", email="zip@test.com")
+        otro = Cliente.objects.create(nombre="Otro", email="otro_zip@test.com")
+        pedidos = [Pedido.objects.create(cliente=cliente, estado=estado)
+                   for estado in ('cotizado', 'aceptado', 'completado')]
+        for pedido in pedidos:
+            ItemsPedido.objects.create(pedido=pedido, descripcion="Item ZIP", cantidad=1, precio_unitario=1000)
+        Pedido.objects.create(cliente=cliente, estado='solicitud')
+        Pedido.objects.create(cliente=otro, estado='cotizado')
+
+        # Se descarga antes uno de los PDFs: queda en caché.
+        self.client.get(reverse('generar-pdf', args=[pedidos[0].id]))
+        renders_previos = pdf_service.estadisticas()['renders']
+
+        # Exporta las cotizaciones del cliente.
+        response = self.client.get(reverse('pedidos-pdf-zip'), {'cliente_id': cliente.id})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        assert response['Content-Type'] == 'application/zip'
+        assert response['X-Total-Cotizaciones'] == '3'
+
+        # El ZIP contiene un PDF por cotización (sin la solicitud ni el pedido del otro cliente).
+        archivo = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        assert sorted(archivo.namelist()) == sorted(f"Cotizacion_{p.id}.pdf" for p in pedidos)
+        assert all(archivo.read(nombre).startswith(b'%PDF') for nombre in archivo.namelist())
+
+        # Solo se renderizaron los dos PDFs que no estaban en caché.
+        assert pdf_service.estadisticas()['renders'] - renders_previos == 2
+
+        # Un filtro sin resultados responde 404.
+        response = self.client.get(reverse('pedidos-pdf-zip'), {'cliente_id': cliente.id, 'estado': 'rechazado'})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
     # Prueba el servicio de envío de correos electrónicos
     def test_enviar_email_cotizacion(self):
         """
@@ -117,6 +365,11 @@ class TestIntegrations:
         # Verifica respuesta exitosa.
         assert response.status_code == status.HTTP_200_OK
 
+        # La vista solo encola: aún no se ha enviado nada por SMTP.
+        assert len(mail.outbox) == 0
+
+        # El worker de la bandeja de salida envía el correo encolado.
+        procesar_outbox()
         # Verifica que la bandeja de salida simulada de Django (mail.outbox) tenga 1 mensaje nuevo.
         assert len(mail.outbox) == 1
 
@@ -0,0 +1,125 @@
+"""
+Módulo de Pruebas: Bandeja de Salida de Correos (EmailOutbox).
+
+Valida que los correos encolados se envíen en lotes sobre una sola conexión SMTP,
+y que los fallos se reintenten con espera exponencial hasta marcarse como fallidos.
+"""
+import pytest  # Importa el framework de pruebas
+from datetime import timedelta  # Importa timedelta para manejar intervalos de tiempo
+from django.core import mail  # Importa el módulo mail para inspeccionar los correos enviados
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend  # Backend en memoria de Django
+from django.core.management import call_command  # Importa la ejecución de comandos de gestión
+from django.utils import timezone  # Importa timezone para manejar fechas
+from gestion.models import EmailOutbox  # Importa el modelo de la bandeja de salida
+from gestion.outbox import encolar_correo, procesar_outbox  # Importa el servicio de la bandeja de salida
+
+
+class BackendContador(LocmemBackend):
+    """Backend en memoria que cuenta cuántas conexiones se abren."""
+    aperturas = 0
+
+    def open(self):
+        BackendContador.aperturas += 1
+        return True
+
+
+class BackendCaido(LocmemBackend):
+    """Backend que simula un servidor SMTP inalcanzable."""
+
+    def open(self):
+        raise TimeoutError('Tiempo de espera agotado al conectar con el servidor SMTP')
+
+
+def _encolar(n):
+    """Encola 'n' correos de retención de prueba."""
+    return [
+        encolar_correo(f"Correo {i}", 'email/retention_risk.html', {'nombre_cliente': 'Outbox', 'days_inactive': 40},
+                       [f"outbox{i}@test.com"], tipo='retencion')
+        for i in range(n)
+    ]
+
+
+@pytest.mark.django_db  # Habilita el acceso a la base de datos para la prueba
+def test_lote_se_envia_con_una_conexion(settings):
+    """
+    Verifica que un lote completo se envíe reutilizando una única conexión SMTP.
+    """
+    # Backend que cuenta las aperturas de conexión.
+    settings.EMAIL_BACKEND = 'gestion.tests.test_outbox.BackendContador'
+    BackendContador.aperturas = 0
+
+    # Encola tres correos: aún no se envía nada.
+    _encolar(3)
+    assert len(mail.outbox) == 0
+
+    # Un solo procesamiento envía los tres correos con una única conexión.
+    resultado = procesar_outbox()
+    assert resultado == {'enviados': 3, 'reintentos': 0, 'fallidos': 0}
+    assert BackendContador.aperturas == 1
+    assert len(mail.outbox) == 3
+
+    # Todos quedan marcados como enviados, con versión HTML y texto plano.
+    assert EmailOutbox.objects.filter(estado='enviado', fecha_envio__isnull=False).count() == 3
+    assert mail.outbox[0].alternatives[0][1] == 'text/html'
+
+    # Un segundo procesamiento no reenvía nada.
+    assert procesar_outbox() == {'enviados': 0, 'reintentos': 0, 'fallidos': 0}
+
+
+@pytest.mark.django_db  # Habilita el acceso a la base de datos para la prueba
+def test_reintentos_con_espera_exponencial(settings):
+    """
+    Verifica que un fallo SMTP reprograme el correo con espera exponencial
+    y que al agotar los intentos quede marcado como fallido.
+    """
+    # Servidor SMTP caído y configuración de reintentos acotada.
+    settings.EMAIL_BACKEND = 'gestion.tests.test_outbox.BackendCaido'
+    settings.EMAIL_OUTBOX_MAX_INTENTOS = 3
+    settings.EMAIL_OUTBOX_BACKOFF = 60
+    correo, = _encolar(1)
+    ahora = timezone.now()
+
+    # Primer fallo: vuelve a 'pendiente' con 60 segundos de espera.
+    assert procesar_outbox(ahora=ahora) == {'enviados': 0, 'reintentos': 1, 'fallidos': 0}
+    correo.refresh_from_db()
+    assert correo.estado == 'pendiente'
+    assert correo.intentos == 1
+    assert correo.proximo_intento == ahora + timedelta(seconds=60)
+    assert 'SMTP' in correo.ultimo_error
+
+    # Antes de vencer la espera el worker no lo toma.
+    assert procesar_outbox(ahora=ahora + timedelta(seconds=30))['reintentos'] == 0
+
+    # Segundo fallo: la espera se duplica.
+    ahora += timedelta(seconds=60)
+    procesar_outbox(ahora=ahora)
+    correo.refresh_from_db()
+    assert correo.proximo_intento == ahora + timedelta(seconds=120)
+
+    # Tercer fallo: agota los intentos y queda como fallido.
+    assert procesar_outbox(ahora=ahora + timedelta(seconds=120))['fallidos'] == 1
+    correo.refresh_from_db()
+    assert correo.estado == 'fallido'
+    assert correo.intentos == 3
+
+    # Con el servidor restablecido, el comando no reintenta correos fallidos.
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+    call_command('run_outbox', once=True)
+    assert len(mail.outbox) == 0
+
+
+@pytest.mark.django_db  # Habilita el acceso a la base de datos para la prueba
+def test_correo_de_worker_caido_se_recupera():
+    """
+    Verifica que un correo que quedó 'enviando' (worker caído) se reintente al vencer su bloqueo.
+    """
+    # Simula un correo reclamado por un worker que murió hace una hora.
+    correo, = _encolar(1)
+    EmailOutbox.objects.filter(pk=correo.pk).update(
+        estado='enviando', proximo_intento=timezone.now() - timedelta(hours=1))
+
+    # El comando (modo un solo lote) lo envía.
+    call_command('run_outbox', once=True)
+    correo.refresh_from_db()
+    assert correo.estado == 'enviado'
+    assert mail.outbox[0].to == ['outbox0@test.com']
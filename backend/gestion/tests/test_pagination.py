@@ -0,0 +1,194 @@
+"""
+Módulo de Pruebas: Paginación por Cursor de los Listados de Pedidos.
+
+Valida que los listados del panel se recorran completos y sin duplicados página a
+página (con empates de fecha resueltos por id), hacia adelante y hacia atrás, que el
+tamaño de página sea configurable y acotado, que los pedidos sin fecha de despacho
+queden al final del historial de despachos, que la búsqueda y el rango de fechas se apliquen
+a todo el listado antes de paginar, y que las páginas usen los índices compuestos.
+"""
+from datetime import timedelta  # Desplazamiento de fechas
+from io import StringIO  # Salida del comando de gestión
+import pytest  # Importa el framework de pruebas
+from django.core.management import call_command  # Ejecución de comandos de gestión
+from django.urls import reverse  # Importa la función para resolver URLs
+from django.utils import timezone  # Fechas con zona horaria
+from rest_framework import status  # Importa los códigos de estado HTTP
+from rest_framework.test import APIClient  # Importa el cliente de pruebas
+from gestion.models import Cliente, Pedido  # Importa los modelos de Cliente y Pedido
+from usuarios.models import User, Roles  # Importa los modelos de User y Roles
+
+
+def _recorrer(client, url, **params):
+    """Sigue los enlaces 'next' desde la primera página. Retorna (ids, respuestas)."""
+    respuestas = [client.get(url, params)]
+    while respuestas[-1].data['next']:
+        respuestas.append(client.get(respuestas[-1].data['next']))
+    ids = [p['id'] for r in respuestas for p in r.data['results']]
+    return ids, respuestas
+
+
+@pytest.mark.django_db  # Marca la clase para que se ejecute con la base de datos de pruebas
+class TestPaginacionPedidos:
+    def setup_method(self):
+        """
+        Usuario de Gerencia autenticado y un cliente para los pedidos.
+        """
+        # Cliente HTTP autenticado como Gerencia (acceso a todos los listados).
+        self.client = APIClient()
+        role, _ = Roles.objects.get_or_create(nombre='Gerencia')
+        self.client.force_authenticate(
+            user=User.objects.create_user(email='paginacion@test.com', password='123', rol=role))
+        self.cliente = Cliente.objects.create(nombre="Paginación", email="paginacion_cliente@test.com")
+
+    def _pedidos(self, estado, fechas, campo='fecha_actualizacion'):
+        """Crea un pedido por fecha y fija 'campo' con update() (sin pasar por auto_now)."""
+        pedidos = []
+        for fecha in fechas:
+            pedido = Pedido.objects.create(cliente=self.cliente, estado=estado)
+            Pedido.objects.filter(pk=pedido.pk).update(**{campo: fecha})
+            pedidos.append(pedido.pk)
+        return pedidos
+
+    def test_recorrido_completo_con_empates(self):
+        """
+        Verifica que el historial se recorra completo, en orden y sin duplicados
+        aunque varios pedidos compartan la misma fecha.
+        """
+        # Siete pedidos: tres empatados en la misma fecha, el resto en fechas distintas.
+        ahora = timezone.now()
+        fechas = [ahora, ahora, ahora, ahora - timedelta(days=1), ahora - timedelta(days=2),
+                  ahora + timedelta(days=1), ahora - timedelta(days=3)]
+        ids = self._pedidos('aceptado', fechas)
+        # Un pedido en otro estado no aparece en el listado.
+        self._pedidos('cotizado', [ahora])
+
+        # Páginas de 2: cuatro páginas, la última con un solo pedido.
+        url = reverse('panel-pedidos-aceptados')
+        recorridos, respuestas = _recorrer(self.client, url, page_size=2)
+        assert [len(r.data['results']) for r in respuestas] == [2, 2, 2, 1]
+
+        # Orden: fecha descendente y, en empates, id descendente.
+        esperado = [pk for _, pk in sorted(zip(fechas, ids), key=lambda par: (par[0], par[1]), reverse=True)]
+        assert recorridos == esperado
+
+        # La primera página no tiene 'previous'; la última no tiene 'next'.
+        assert respuestas[0].data['previous'] is None
+        assert respuestas[-1].data['next'] is None
+
+        # Hacia atrás desde la última página se recorren las mismas páginas en orden inverso.
+        atras = [respuestas[-1]]
+        while atras[-1].data['previous']:
+            atras.append(self.client.get(atras[-1].data['previous']))
+        assert [[p['id'] for p in r.data['results']] for r in reversed(atras)] == \
+            [[p['id'] for p in r.data['results']] for r in respuestas]
+
+    def test_pedidos_creados_entre_paginas(self):
+        """
+        Verifica que un pedido actualizado mientras se recorre no desplace ni duplique filas.
+        """
+        ahora = timezone.now()
+        ids = self._pedidos('cotizado', [ahora - timedelta(hours=h) for h in range(4)])
+        url = reverse('panel-pedidos-cotizados')
+
+        # Primera página de 2.
+        primera = self.client.get(url, {'page_size': 2})
+        assert [p['id'] for p in primera.data['results']] == ids[:2]
+
+        # Llega un pedido nuevo (más reciente) antes de pedir la segunda página.
+        self._pedidos('cotizado', [ahora + timedelta(hours=1)])
+
+        # La segunda página continúa exactamente después de la primera.
+        segunda = self.client.get(primera.data['next'])
+        assert [p['id'] for p in segunda.data['results']] == ids[2:]
+
+    def test_cola_de_despacho_mas_antiguos_primero(self):
+        """
+        Verifica que la cola de despacho conserve su orden ascendente (el que más espera primero).
+        """
+        ahora = timezone.now()
+        ids = self._pedidos('pago_confirmado', [ahora - timedelta(days=d) for d in range(5)])
+
+        recorridos, _ = _recorrer(self.client, reverse('panel-pedidos-despachar'), page_size=2)
+        assert recorridos == list(reversed(ids))
+
+    def test_historial_despachos_sin_fecha_al_final(self):
+        """
+        Verifica que los pedidos sin fecha de despacho aparezcan al final del historial.
+        """
+        ahora = timezone.now()
+        con_fecha = self._pedidos('despachado', [ahora - timedelta(days=d) for d in range(3)], 'fecha_despacho')
+        sin_fecha = self._pedidos('completado', [None, None, None], 'fecha_despacho')
+
+        recorridos, _ = _recorrer(self.client, reverse('panel-pedidos-historial-despachos'), page_size=2)
+        assert recorridos == con_fecha + list(reversed(sin_fecha))
+
+    def test_busqueda_y_fechas_antes_de_paginar(self):
+        """
+        Verifica que ?search= y ?start_date=/end_date= filtren todo el listado en el servidor,
+        incluidos los pedidos que aún no estaban en las páginas cargadas.
+        """
+        # Doce pedidos aceptados del cliente genérico, uno por día hacia atrás.
+        ahora = timezone.now()
+        self._pedidos('aceptado', [ahora - timedelta(days=d) for d in range(12)])
+        # Un pedido antiguo de otro cliente: quedaría fuera de la primera página de 5.
+        otro = Cliente.objects.create(nombre="Ferretería", apellido="Buscada", empresa="Aceros Sur",
+                                      email="buscada@test.com")
+        antiguo = Pedido.objects.create(cliente=otro, estado='aceptado')
+        Pedido.objects.filter(pk=antiguo.pk).update(fecha_actualizacion=ahora - timedelta(days=30))
+        url = reverse('panel-pedidos-aceptados')
+
+        # La búsqueda por empresa, apellido, email o ID encuentra el pedido desde la primera página.
+        for termino in ('aceros', 'BUSCADA', 'buscada@test', f'#{antiguo.pk}'):
+            response = self.client.get(url, {'search': termino, 'page_size': 5})
+            assert [p['id'] for p in response.data['results']] == [antiguo.pk]
+            assert response.data['next'] is None
+
+        # El rango de fechas (inclusivo) se aplica antes del cursor y se conserva en los enlaces.
+        desde = timezone.localtime(ahora - timedelta(days=31)).date()
+        hasta = timezone.localtime(ahora - timedelta(days=29)).date()
+        recorridos, _ = _recorrer(self.client, url, start_date=desde.isoformat(), end_date=hasta.isoformat(),
+                                  page_size=1)
+        assert recorridos == [antiguo.pk]
+
+        # Una búsqueda sin coincidencias devuelve una página vacía.
+        assert self.client.get(url, {'search': 'no-existe'}).data['results'] == []
+
+    def test_tamano_de_pagina(self, settings):
+        """
+        Verifica el tamaño por defecto, el máximo permitido y el rechazo de cursores inválidos.
+        """
+        settings.PEDIDOS_PAGINA = 3
+        settings.PEDIDOS_PAGINA_MAXIMA = 4
+        self._pedidos('solicitud', [timezone.now() - timedelta(minutes=m) for m in range(6)], 'fecha_solicitud')
+        url = reverse('panel-solicitudes-list')
+
+        # Sin parámetro: tamaño por defecto.
+        assert len(self.client.get(url).data['results']) == 3
+        # Mayor al máximo: se acota.
+        assert len(self.client.get(url, {'page_size': 100}).data['results']) == 4
+        # Valor no numérico: tamaño por defecto.
+        assert len(self.client.get(url, {'page_size': 'todos'}).data['results']) == 3
+
+        # Un cursor alterado responde 404.
+        response = self.client.get(url, {'cursor': 'no-es-un-cursor'})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_explain_usa_indices_compuestos(self):
+        """
+        Verifica con EXPLAIN que las páginas de los listados de un estado usen su índice compuesto.
+        """
+        # Ejecuta el comando de verificación y captura su salida.
+        salida = StringIO()
+        call_command('explicar_indices', stdout=salida)
+        texto = salida.getvalue()
+
+        # Listados de un solo estado (primera página y página con cursor) y búsqueda por guía.
+        for linea in ('OK  pedidos/solicitudes/ -> pedido_estado_solicitud_idx',
+                      'OK  pedidos/solicitudes/?cursor= -> pedido_estado_solicitud_idx',
+                      'OK  pedidos/cotizados/ -> pedido_estado_actualiz_idx',
+                      'OK  pedidos/para-despachar/?cursor= -> pedido_estado_actualiz_idx',
+                      'OK  bi/ (ventas por rango de despacho) -> pedido_estado_despacho_idx',
+                      'OK  bi/retention/ (última compra por cliente) -> pedido_cliente_estado_idx',
+                      'OK  despachos (búsqueda por número de guía) -> pedido_numero_guia_idx'):
+            assert linea in texto
@@ -0,0 +1,87 @@
+"""
+Módulo de Pruebas: Servicio de Render de PDFs (Pool de Procesos).
+
+Valida el render en paralelo por lotes en el pool caliente, el tiempo máximo por
+trabajo (con reinicio del pool) y la exposición de métricas.
+"""
+import pytest  # Importa el framework de pruebas
+from django.urls import reverse  # Importa la función reverse para obtener URLs
+from rest_framework import status  # Importa los códigos de estado HTTP
+from rest_framework.test import APIClient  # Importa el cliente de pruebas
+from gestion import pdf_service  # Importa el servicio de render de PDFs
+from usuarios.models import User, Roles  # Importa los modelos de User y Roles
+
+
+def _html(n):
+    """Documento HTML de prueba con 'n' filas."""
+    filas = ''.join(f'<tr><td>Item {i}</td><td>{i * 1000}</td></tr>' for i in range(n))
+    return f'<html><body><h1>Cotización</h1><table>{filas}</table></body></html>'
+
+
+@pytest.fixture
+def pool(settings):
+    """Activa un pool de 2 procesos para la prueba y lo cierra al terminar."""
+    settings.PDF_POOL_WORKERS = 2
+    settings.PDF_MAX_CONCURRENCIA = 2
+    pdf_service.cerrar_pool()
+    yield
+    pdf_service.cerrar_pool()
+
+
+def test_lote_en_pool(pool):
+    """
+    Verifica que un lote mayor que el límite de concurrencia se renderice completo y en orden.
+    """
+    antes = pdf_service.estadisticas()['renders']
+
+    # Cuatro documentos con solo dos cupos: los trabajos esperan cupo en lugar de rechazarse.
+    pdfs = pdf_service.renderizar_lote([_html(n) for n in (1, 5, 10, 20)])
+
+    # Todos son PDFs válidos, y el de más filas es el más pesado (se respeta el orden).
+    assert all(pdf.startswith(b'%PDF') for pdf in pdfs)
+    assert len(pdfs[3]) > len(pdfs[0])
+
+    # Métricas: renders contabilizados y cola vacía al terminar.
+    stats = pdf_service.estadisticas()
+    assert stats['pool_started'] is True
+    assert stats['renders'] - antes == 4
+    assert stats['queue_depth'] == 0
+    assert stats['queue_depth_max'] >= 1
+    assert stats['render_avg_ms'] > 0
+
+
+def test_timeout_reinicia_el_pool(pool, settings):
+    """
+    Verifica que un render que supera PDF_TIMEOUT falle y reinicie el pool.
+    """
+    # Sin margen de tiempo: el trabajo no alcanza a terminar.
+    settings.PDF_TIMEOUT = 0
+    timeouts = pdf_service.estadisticas()['timeouts']
+
+    with pytest.raises(pdf_service.TiempoPDFAgotado):
+        pdf_service.renderizar(_html(50))
+
+    # El pool se descartó (se recrea en el próximo uso) y se registró el timeout.
+    stats = pdf_service.estadisticas()
+    assert stats['pool_started'] is False
+    assert stats['timeouts'] == timeouts + 1
+
+    # Con tiempo suficiente el servicio vuelve a funcionar.
+    settings.PDF_TIMEOUT = 30
+    assert pdf_service.renderizar(_html(1)).startswith(b'%PDF')
+
+
+@pytest.mark.django_db  # Habilita el acceso a la base de datos para la prueba
+def test_endpoint_metricas_pdf():
+    """
+    Verifica que Gerencia pueda consultar las métricas del servicio de PDFs.
+    """
+    # Usuario de Gerencia autenticado.
+    role, _ = Roles.objects.get_or_create(nombre='Gerencia')
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user(email='pdf_metrics@test.com', password='123', rol=role))
+
+    # Consulta de métricas.
+    response = client.get(reverse('pdf-metrics'))
+    assert response.status_code == status.HTTP_200_OK
+    assert {'queue_depth', 'render_avg_ms', 'timeouts', 'rejected'} <= set(response.data)
@@ -81,3 +81,188 @@ class TestPedidos:
 
         # Verifica que el tipo de dato retornado sea Decimal (importante para precisión financiera).
         assert isinstance(pedido.total_cotizacion, Decimal)
+
+    def test_totales_desnormalizados_se_mantienen(self):
+        """
+        Verifica que las columnas de totales se mantengan al editar items, urgencia y envío.
+        """
+        # Crea un pedido con un ítem de 10.000 (costo 6.000).
+        cliente = Cliente.objects.create(nombre="Totales", email="totales@test.com")
+        pedido = Pedido.objects.create(cliente=cliente)
+        item = ItemsPedido.objects.create(pedido=pedido, descripcion="Item", cantidad=1,
+                                          precio_unitario=Decimal('10000'), precio_compra=Decimal('6000'))
+
+        # Recarga desde BD para validar lo persistido (no solo el objeto en memoria).
+        pedido.refresh_from_db()
+        assert pedido.subtotal == Decimal('10000')
+        assert pedido.costo_compra == Decimal('6000')
+        assert pedido.total == Decimal('11900')  # 10.000 + 19% IVA
+
+        # Modifica la cantidad del ítem: el subtotal y la utilidad deben actualizarse.
+        item.cantidad = 3
+        item.save()
+        pedido.refresh_from_db()
+        assert pedido.subtotal == Decimal('30000')
+        assert pedido.utilidad == Decimal('12000')  # 30.000 - 18.000
+
+        # Cambia urgencia y envío: se re-derivan neto, IVA y total sin tocar items.
+        pedido.porcentaje_urgencia = Decimal('10.00')
+        pedido.costo_envio_estimado = Decimal('5000')
+        pedido.save()
+        pedido.refresh_from_db()
+        assert pedido.neto == Decimal('33000')
+        assert pedido.total == Decimal('44270')  # 33.000 + 6.270 + 5.000
+
+        # Elimina el ítem: los totales vuelven al costo de envío.
+        item.delete()
+        pedido.refresh_from_db()
+        assert pedido.subtotal == Decimal('0')
+        assert pedido.total == Decimal('5000')
+
+    def test_backfill_totales(self):
+        """
+        Verifica que el comando de backfill pueble los totales de pedidos existentes.
+        """
+        from django.core.management import call_command  # Importa call_command para ejecutar comandos
+
+        cliente = Cliente.objects.create(nombre="Backfill", email="backfill@test.com")
+        pedido = Pedido.objects.create(cliente=cliente)
+        ItemsPedido.objects.create(pedido=pedido, descripcion="Item", cantidad=2, precio_unitario=Decimal('5000'))
+
+        # Simula filas antiguas sin totales (columnas en cero).
+        Pedido.objects.filter(id=pedido.id).update(subtotal=0, neto=0, iva=0, total=0)
+
+        # Ejecuta el comando de backfill.
+        call_command('recalcular_totales_pedidos')
+
+        pedido.refresh_from_db()
+        assert pedido.subtotal == Decimal('10000')
+        assert pedido.total == Decimal('11900')
+
+    def test_agregados_cliente_se_mantienen(self):
+        """
+        Verifica que los agregados de compras del cliente se actualicen en las transiciones de estado
+        y que el comando de reconstrucción los repare.
+        """
+        from django.core.management import call_command  # Importa la ejecución de comandos de gestión
+
+        cliente = Cliente.objects.create(nombre="Agregados", email="agregados@test.com")
+
+        # Una solicitud no es venta: el cliente sigue sin compras.
+        p1 = Pedido.objects.create(cliente=cliente, region='RM', comuna='Santiago')
+        ItemsPedido.objects.create(pedido=p1, descripcion="A", cantidad=2, precio_unitario=1000)
+        cliente.refresh_from_db()
+        assert cliente.last_purchase_at is None
+        assert cliente.lifetime_value == 0
+
+        # Al aceptarse cuenta como compra (fecha, ubicación y total gastado), pero no como completado.
+        p1 = Pedido.objects.get(pk=p1.pk)
+        p1.estado = 'aceptado'
+        p1.save()
+        cliente.refresh_from_db()
+        assert cliente.last_purchase_at == p1.fecha_solicitud
+        assert cliente.last_purchase_comuna == 'Santiago'
+        assert cliente.lifetime_value == Decimal('2000')
+        assert cliente.completed_order_count == 0
+
+        # Dos pedidos completados convierten al cliente en recurrente.
+        p1.estado = 'completado'
+        p1.save()
+        p2 = Pedido.objects.create(cliente=cliente, estado='completado', region='SUR', comuna='Temuco')
+        ItemsPedido.objects.create(pedido=p2, descripcion="B", cantidad=1, precio_unitario=500)
+        cliente.refresh_from_db()
+        assert cliente.completed_order_count == 2
+        assert cliente.first_purchase_at == p1.fecha_solicitud
+        assert cliente.last_purchase_region == 'SUR'
+        assert cliente.lifetime_value == Decimal('2500')
+
+        # Un rechazo saca al pedido de las ventas.
+        p2 = Pedido.objects.get(pk=p2.pk)
+        p2.estado = 'rechazado'
+        p2.save()
+        cliente.refresh_from_db()
+        assert cliente.completed_order_count == 1
+        assert cliente.last_purchase_region == 'RM'
+
+        # Se corrompen los agregados y el comando los reconstruye.
+        Cliente.objects.filter(pk=cliente.pk).update(completed_order_count=0, lifetime_value=0)
+        call_command('reconstruir_agregados_clientes', stdout=None)
+        cliente.refresh_from_db()
+        assert cliente.completed_order_count == 1
+        assert cliente.lifetime_value == Decimal('2000')
+
+    def test_seleccionar_envio_valida_costo(self):
+        """
+        Verifica que el portal rechace un costo de envío ausente o no numérico (400, sin tocar
+        el pedido) y que un costo válido re-derive el total.
+        """
+        from django.urls import reverse  # Importa la función para resolver URLs
+        from rest_framework.test import APIClient  # Importa el cliente de pruebas
+
+        # Pedido con un ítem de 10.000 (total 11.900 sin envío).
+        cliente = Cliente.objects.create(nombre="Envío", email="envio@test.com")
+        pedido = Pedido.objects.create(cliente=cliente, estado='cotizado')
+        ItemsPedido.objects.create(pedido=pedido, descripcion="Item", cantidad=1, precio_unitario=Decimal('10000'))
+        url = reverse('portal-seleccionar-envio', args=[pedido.id_seguimiento])
+        client = APIClient()
+
+        # Costo ausente, no numérico o negativo: 400 y el pedido no cambia.
+        for datos in ({'metodo_envio': 'STARKEN'}, {'metodo_envio': 'STARKEN', 'costo': 'gratis'},
+                      {'metodo_envio': 'STARKEN', 'costo': -1}):
+            assert client.post(url, datos, format='json').status_code == 400
+        pedido.refresh_from_db()
+        assert (pedido.metodo_envio, pedido.total) == (None, Decimal('11900'))
+
+        # Costo válido: se guarda el método y el total incluye el envío.
+        assert client.post(url, {'metodo_envio': 'STARKEN', 'costo': '4500'}, format='json').status_code == 200
+        pedido.refresh_from_db()
+        assert (pedido.metodo_envio, pedido.total) == ('STARKEN', Decimal('16400'))
+
+    def test_edicion_cotizacion_sincroniza_items_en_lote(self):
+        """
+        Verifica que editar una cotización grande actualice, agregue y elimine items con un número
+        fijo de consultas, manteniendo los subtotales y totales del pedido.
+        """
+        from django.db import connection  # Importa la conexión para contar consultas
+        from django.test.utils import CaptureQueriesContext  # Importa el capturador de consultas SQL
+        from django.urls import reverse  # Importa la función para resolver URLs
+        from rest_framework.test import APIClient  # Importa el cliente de pruebas
+        from usuarios.models import User, Roles  # Importa los modelos de User y Roles
+
+        rol, _ = Roles.objects.get_or_create(nombre='Vendedor')
+        client = APIClient()
+        client.force_authenticate(user=User.objects.create_user(email='items_lote@test.com', password='123', rol=rol))
+        cliente = Cliente.objects.create(nombre="Lote", email="items_lote_cliente@test.com")
+        pedido = Pedido.objects.create(cliente=cliente)
+        ItemsPedido.objects.bulk_create([
+            ItemsPedido(pedido=pedido, descripcion=f"Item {i}", cantidad=1, precio_unitario=100, subtotal=100)
+            for i in range(120)
+        ])
+        ids = list(pedido.items.order_by('id').values_list('id', flat=True))
+        url = reverse('panel-pedido-detail', args=[pedido.id])
+
+        # Se duplica el precio de los primeros 60, se mantienen 59 sin cambios, se elimina el último y se agregan 2.
+        items = [{'id': pk, 'descripcion': f"Item {i}", 'cantidad': 1, 'precio_unitario': 200 if i < 60 else 100}
+                 for i, pk in enumerate(ids[:-1])]
+        items += [{'descripcion': "Nuevo", 'cantidad': 3, 'precio_unitario': 50} for _ in range(2)]
+        with CaptureQueriesContext(connection) as consultas:
+            response = client.put(url, {'items': items, 'costo_envio_estimado': 0}, format='json')
+        assert response.status_code == 200
+        # El número de consultas no depende de la cantidad de items.
+        assert len(consultas) < 40
+
+        # Subtotales por item y total del pedido: 60*200 + 59*100 + 2*150 = 18200.
+        pedido.refresh_from_db()
+        assert pedido.estado == 'cotizado'
+        assert pedido.items.count() == 121
+        assert not pedido.items.filter(id=ids[-1]).exists()
+        assert pedido.items.get(id=ids[0]).subtotal == Decimal('200')
+        assert pedido.items.filter(descripcion="Nuevo").first().subtotal == Decimal('150')
+        assert pedido.subtotal == Decimal('18200')
+
+        # Un id de item de otro pedido se rechaza sin modificar nada.
+        otro = Pedido.objects.create(cliente=cliente)
+        ajeno = ItemsPedido.objects.create(pedido=otro, descripcion="Ajeno", cantidad=1, precio_unitario=10)
+        response = client.put(url, {'items': [{'id': ajeno.id, 'descripcion': "Ajeno", 'cantidad': 9}]}, format='json')
+        assert response.status_code == 400
+        assert pedido.items.count() == 121
@@ -0,0 +1,129 @@
+"""
+Módulo de Pruebas: Renderer orjson y Compresión de Respuestas.
+
+Valida que el ORJSONRenderer entregue los mismos valores que el JSONRenderer de DRF
+para los tipos del proyecto (Decimal, UUID, fechas, textos perezosos), y que el
+middleware negocie Brotli / gzip solo sobre el umbral y sin tocar las respuestas streaming.
+"""
+import gzip  # Descompresión gzip
+import json  # Lectura del JSON renderizado
+import uuid  # Identificadores de seguimiento
+from datetime import date, datetime, timezone as dt_timezone  # Fechas
+from decimal import Decimal  # Montos
+import brotli  # Descompresión Brotli
+import pytest  # Importa el framework de pruebas
+from django.http import HttpResponse, StreamingHttpResponse  # Respuestas de prueba
+from django.test import RequestFactory  # Peticiones de prueba para el middleware
+from django.urls import reverse  # Importa la función para resolver URLs
+from django.utils.translation import gettext_lazy  # Texto perezoso
+from rest_framework.renderers import JSONRenderer  # Renderer estándar de DRF
+from rest_framework.test import APIClient  # Importa el cliente de pruebas
+from gestion.middleware import CompresionMiddleware, codificacion_aceptada  # Middleware de compresión
+from gestion.models import Cliente, Pedido  # Importa los modelos de Cliente y Pedido
+from gestion.renderers import ORJSONRenderer  # Renderer orjson
+from usuarios.models import User, Roles  # Importa los modelos de User y Roles
+
+
+def test_renderer_tipos_nativos():
+    """
+    Verifica que orjson produzca el mismo JSON que DRF para los tipos usados en las respuestas.
+    """
+    seguimiento = uuid.uuid4()
+    data = {
+        'total': Decimal('71043.50'),
+        'id_seguimiento': seguimiento,
+        'fecha': date(2025, 3, 1),
+        'mensaje': gettext_lazy('Pedido confirmado'),
+        'por_mes': {1: 10, 2: 20},
+        'items': (x for x in [1, 2]),
+    }
+    # Mismo contenido que el renderer de DRF (los generadores se consumen, por eso se recrea).
+    esperado = json.loads(JSONRenderer().render({**data, 'items': [1, 2]}))
+    assert json.loads(ORJSONRenderer().render(data)) == esperado
+    assert esperado['total'] == 71043.5 and esperado['id_seguimiento'] == str(seguimiento)
+
+    # datetime UTC con sufijo 'Z' (orjson conserva los microsegundos).
+    fecha = datetime(2025, 3, 1, 12, 30, 0, 123456, tzinfo=dt_timezone.utc)
+    assert ORJSONRenderer().render({'f': fecha}) == b'{"f":"2025-03-01T12:30:00.123456Z"}'
+
+    # Sin datos no hay cuerpo; 'indent' en el media type activa la sangría.
+    assert ORJSONRenderer().render(None) == b''
+    assert b'\n  "a": 1' in ORJSONRenderer().render({'a': 1}, 'application/json; indent=4')
+
+    # Un tipo desconocido falla igual que con json (TypeError).
+    with pytest.raises(TypeError):
+        ORJSONRenderer().render({'x': object()})
+
+
+def test_negociacion_de_codificacion():
+    """
+    Verifica la elección de codificación según Accept-Encoding y sus valores q.
+    """
+    # Brotli tiene prioridad ante igual preferencia.
+    assert codificacion_aceptada('gzip, deflate, br') == 'br'
+    # Solo gzip, o Brotli excluido con q=0.
+    assert codificacion_aceptada('gzip') == 'gzip'
+    assert codificacion_aceptada('br;q=0, gzip') == 'gzip'
+    # Preferencia explícita del cliente.
+    assert codificacion_aceptada('br;q=0.5, gzip;q=0.9') == 'gzip'
+    # Comodín y sin codificaciones soportadas.
+    assert codificacion_aceptada('*') == 'br'
+    assert codificacion_aceptada('identity') is None
+    assert codificacion_aceptada('') is None
+
+
+def test_middleware_umbral_y_streaming(settings):
+    """
+    Verifica que solo se compriman respuestas JSON sobre el umbral y no las streaming ni el HTML.
+    """
+    settings.COMPRESION_MINIMO = 100
+    peticion = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+    middleware = CompresionMiddleware(lambda request: None)
+
+    # Bajo el umbral: intacta.
+    pequena = middleware.process_response(peticion, HttpResponse(b'{}', content_type='application/json'))
+    assert not pequena.has_header('Content-Encoding')
+
+    # Sobre el umbral: gzip, con Content-Length, Vary y ETag débil.
+    cuerpo = json.dumps([{'estado': 'completado'}] * 50).encode()
+    respuesta = HttpResponse(cuerpo, content_type='application/json')
+    respuesta['ETag'] = '"abc"'
+    respuesta = middleware.process_response(peticion, respuesta)
+    assert respuesta['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(respuesta.content) == cuerpo
+    assert respuesta['Content-Length'] == str(len(respuesta.content))
+    assert 'Accept-Encoding' in respuesta['Vary']
+    assert respuesta['ETag'] == 'W/"abc"'
+
+    # Tipos ya comprimidos (PDF) y respuestas streaming (exportación ZIP) no se tocan.
+    pdf = middleware.process_response(peticion, HttpResponse(cuerpo, content_type='application/pdf'))
+    assert not pdf.has_header('Content-Encoding')
+    # HTML (admin, API navegable con token CSRF) tampoco: sin relleno contra BREACH.
+    html = middleware.process_response(peticion, HttpResponse(cuerpo, content_type='text/html; charset=utf-8'))
+    assert not html.has_header('Content-Encoding')
+    streaming = middleware.process_response(
+        peticion, StreamingHttpResponse(iter([cuerpo]), content_type='application/zip'))
+    assert not streaming.has_header('Content-Encoding')
+
+
+@pytest.mark.django_db  # Marca la prueba para que se ejecute con la base de datos de pruebas
+def test_listado_comprimido_con_brotli(settings):
+    """
+    Verifica de punta a punta que un listado se entregue con orjson y comprimido con Brotli.
+    """
+    settings.COMPRESION_MINIMO = 200
+    client = APIClient()
+    role, _ = Roles.objects.get_or_create(nombre='Gerencia')
+    client.force_authenticate(user=User.objects.create_user(email='brotli@test.com', password='123', rol=role))
+    cliente = Cliente.objects.create(nombre="Compresión", email="compresion@test.com")
+    for _ in range(5):
+        Pedido.objects.create(cliente=cliente, estado='pago_confirmado')
+
+    # El navegador acepta Brotli: el cuerpo llega comprimido y se descomprime al JSON original.
+    response = client.get(reverse('panel-pedidos-historial-pagos'), HTTP_ACCEPT_ENCODING='gzip, br')
+    assert response['Content-Type'] == 'application/json'
+    assert response['Content-Encoding'] == 'br'
+    data = json.loads(brotli.decompress(response.content))
+    assert len(data['results']) == 5
+    # Los montos Decimal llegan como números.
+    assert isinstance(data['results'][0]['total_cotizacion'], float)
@@ -9,8 +9,10 @@ from rest_framework.test import APIClient  # Importa el cliente de pruebas
 from rest_framework import status  # Importa los códigos de estado HTTP
 from django.urls import reverse  # Importa la función reverse para obtener URLs
 from django.utils import timezone  # Importa el módulo timezone para manejar fechas
+from gestion.outbox import procesar_outbox  # Importa el procesador de la bandeja de salida de correos
 from django.core import mail  # Importa el módulo mail para manejar correos electrónicos
 from datetime import timedelta  # Importa la clase timedelta para manejar intervalos de tiempo
+from django.db.models.signals import pre_save  # Importa la señal previa al guardado
 from gestion.models import Pedido, Cliente  # Importa los modelos de Pedido y Cliente
 from usuarios.models import User, Roles  # Importa los modelos de User y Roles
 
@@ -54,6 +56,12 @@ class TestRetention:
         # Valida éxito.
         assert response.status_code == status.HTTP_200_OK
 
+        # La vista solo encola (y así lo informa): aún no se ha enviado nada por SMTP.
+        assert response.data['message'] == 'Correo encolado para lost@test.com'
+        assert len(mail.outbox) == 0
+
+        # El worker de la bandeja de salida envía el correo encolado.
+        procesar_outbox()
         # Verifica encolado de correo.
         assert len(mail.outbox) == 1
 
@@ -101,5 +109,47 @@ class TestRetention:
         # Valida cambio de estado a 'rechazado'.
         assert pedido.estado == 'rechazado'
 
+        # La vista solo encola: aún no se ha enviado nada por SMTP.
+        assert len(mail.outbox) == 0
+
+        # El worker de la bandeja de salida envía el correo encolado.
+        procesar_outbox()
         # Valida envío de correo de notificación al cliente.
         assert len(mail.outbox) == 1
+
+        # Segundo rechazo: conflicto (400) con el estado actual, sin otro correo.
+        repetido = self.client.post(url)
+        assert repetido.status_code == status.HTTP_400_BAD_REQUEST
+        assert repetido.data['estado_actual'] == 'rechazado'
+        # Un pedido inexistente responde 404.
+        assert self.client.post(reverse('rechazar-pago', args=[999999])).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_guardado_no_pisa_agregados_recalculados(self):
+        """
+        Verifica que las escrituras sobre el cliente (correo y estado de retención, edición
+        por el CRUD) no reescriban los agregados de compras recalculados después de leerlo.
+        """
+        # Simula un recálculo concurrente: justo antes de cada guardado del cliente (ya leído
+        # por la vista) otra transacción fija sus agregados en la base de datos.
+        def recalculo_concurrente(sender, instance, **kwargs):
+            Cliente.objects.filter(pk=instance.pk).update(completed_order_count=3, lifetime_value=9000)
+
+        pre_save.connect(recalculo_concurrente, sender=Cliente)
+        try:
+            # Envío de correo de retención, cambio manual de estado y edición por el CRUD.
+            respuestas = [
+                self.client.post(reverse('bi-retention-email', args=[self.cliente.id])),
+                self.client.post(reverse('bi-retention-status', args=[self.cliente.id]), {'status': 'recovered'}),
+                self.client.patch(reverse('cliente-crud-detail', args=[self.cliente.id]),
+                                  {'telefono': '+56911111111'}, format='json'),
+            ]
+        finally:
+            pre_save.disconnect(recalculo_concurrente, sender=Cliente)
+        assert [r.status_code for r in respuestas] == [status.HTTP_200_OK] * 3
+
+        # Los cambios de cada vista se guardaron y los agregados recalculados sobrevivieron.
+        self.cliente.refresh_from_db()
+        assert self.cliente.retention_status == 'recovered'
+        assert self.cliente.last_retention_email_sent_at is not None
+        assert self.cliente.telefono == '+56911111111'
+        assert (self.cliente.completed_order_count, self.cliente.lifetime_value) == (3, 9000)
@@ -0,0 +1,193 @@
+"""
+Módulo de Pruebas: Motor de Transiciones de Estado (gestion.transiciones).
+
+Valida que cada transición sea un único UPDATE condicional que solo toca las columnas
+que cambian, que los conflictos (estado ya cambiado) se informen sin modificar el pedido,
+que el hook posterior reciba la transición y que los correos, agregados del cliente y la
+tabla de hechos BI se mantengan como con Pedido.save(), también en las transiciones en lote
+(confirmar pago, despacho y manifiesto CSV del courier).
+"""
+import pytest  # Importa el framework de pruebas
+from decimal import Decimal  # Importa el tipo Decimal para manejar números con precisión
+from django.db import connection  # Importa la conexión para contar consultas
+from django.test.utils import CaptureQueriesContext  # Importa el capturador de consultas SQL
+from django.urls import reverse  # Importa la función para resolver URLs
+from rest_framework import status  # Importa los códigos de estado HTTP
+from rest_framework.test import APIClient  # Importa el cliente de pruebas
+from gestion.models import Cliente, EmailOutbox, ItemsPedido, Pedido, VentasDiarias  # Importa los modelos
+from gestion.transiciones import ConflictoTransicion, pedido_transicionado, transicionar  # Importa el motor
+from usuarios.models import User, Roles  # Importa los modelos de User y Roles
+
+
+@pytest.mark.django_db  # Marca la clase para que se ejecute con la base de datos de pruebas
+class TestTransiciones:
+    def setup_method(self):
+        """
+        Usuario de Gerencia autenticado y un pedido aceptado con un item.
+        """
+        self.client = APIClient()
+        role, _ = Roles.objects.get_or_create(nombre='Gerencia')
+        self.client.force_authenticate(user=User.objects.create_user(email='transiciones@test.com', password='123',
+                                                                     rol=role))
+        self.cliente = Cliente.objects.create(nombre="Transiciones", email="transiciones_cliente@test.com")
+        self.pedido = Pedido.objects.create(cliente=self.cliente, estado='aceptado', region='RM', comuna='Santiago')
+        ItemsPedido.objects.create(pedido=self.pedido, descripcion="Item", cantidad=2, precio_unitario=1000)
+
+    def test_update_condicional_y_conflicto(self):
+        """
+        Verifica que la transición sea un solo UPDATE con el estado de origen en el WHERE
+        y que repetirla responda el conflicto sin cambiar el pedido.
+        """
+        url = reverse('confirmar-pago', args=[self.pedido.id])
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(url)
+        assert response.status_code == status.HTTP_200_OK
+
+        # Un único UPDATE de pedido: condicionado al estado y sin reescribir las columnas de totales.
+        updates = [q['sql'] for q in consultas if q['sql'].startswith('UPDATE "gestion_pedido"')]
+        assert len(updates) == 1
+        assert '"estado" IN' in updates[0]
+        assert '"subtotal"' not in updates[0]
+        self.pedido.refresh_from_db()
+        assert self.pedido.estado == 'pago_confirmado'
+        # El correo de confirmación se encoló con la transición.
+        assert EmailOutbox.objects.filter(tipo='pago_confirmado').count() == 1
+
+        # Segundo clic: conflicto informado con el estado actual, sin otro correo.
+        repetido = self.client.post(url)
+        assert repetido.status_code == status.HTTP_400_BAD_REQUEST
+        assert repetido.data['estado_actual'] == 'pago_confirmado'
+        assert EmailOutbox.objects.filter(tipo='pago_confirmado').count() == 1
+
+        # Un pedido inexistente sigue respondiendo 404.
+        assert self.client.post(reverse('confirmar-pago', args=[999999])).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_hook_y_sincronizacion(self):
+        """
+        Verifica el hook posterior, los agregados del cliente y la entrada a la tabla de hechos BI.
+        """
+        recibidas = []
+
+        def suscriptor(sender, pedido, transicion, **kwargs):
+            recibidas.append((pedido.id, transicion.nombre, pedido.estado))
+
+        pedido_transicionado.connect(suscriptor)
+        try:
+            # Salir de 'aceptado' (venta) hacia 'pago_confirmado' recalcula los agregados del cliente.
+            self.cliente.refresh_from_db()
+            assert self.cliente.lifetime_value == Decimal('2000')
+            transicionar('confirmar_pago', pk=self.pedido.id)
+            self.cliente.refresh_from_db()
+            assert self.cliente.lifetime_value == 0
+
+            # El despacho fija sus columnas y la recepción entra a 'completado' (tabla de hechos BI).
+            transicionar('despachar', pk=self.pedido.id, campos={'transportista': 'Starken', 'numero_guia': 'G-1'})
+            transicionar('confirmar_recepcion', id_seguimiento=self.pedido.id_seguimiento)
+        finally:
+            pedido_transicionado.disconnect(suscriptor)
+
+        assert recibidas == [(self.pedido.id, 'confirmar_pago', 'pago_confirmado'),
+                             (self.pedido.id, 'despachar', 'despachado'),
+                             (self.pedido.id, 'confirmar_recepcion', 'completado')]
+        assert VentasDiarias.objects.get(cliente=self.cliente).pedidos == 1
+        self.cliente.refresh_from_db()
+        assert self.cliente.completed_order_count == 1
+
+        # Conflicto directo sobre el motor y campos no declarados por la transición.
+        with pytest.raises(ConflictoTransicion) as conflicto:
+            transicionar('rechazar', pk=self.pedido.id)
+        assert conflicto.value.estado_actual == 'completado'
+        with pytest.raises(ValueError):
+            transicionar('confirmar_pago', pk=self.pedido.id, campos={'numero_guia': 'X'})
+
+    def test_confirmar_pago_en_lote(self):
+        """
+        Verifica que el lote aplique la transición con un único UPDATE, encole los correos con
+        un solo INSERT e informe el resultado de cada pedido.
+        """
+        aceptados = [self.pedido.id] + [
+            Pedido.objects.create(cliente=self.cliente, estado='aceptado').id for _ in range(9)]
+        cotizado = Pedido.objects.create(cliente=self.cliente, estado='cotizado')
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(reverse('confirmar-pago-lote'),
+                                        {'ids': aceptados + [cotizado.id, 999999]}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['aplicados'] == 10 and response.data['rechazados'] == 2
+        assert response.data['resultados'][-2:] == [
+            {'id': cotizado.id, 'resultado': 'conflicto', 'estado_actual': 'cotizado'},
+            {'id': 999999, 'resultado': 'no_encontrado'},
+        ]
+        assert Pedido.objects.filter(id__in=aceptados, estado='pago_confirmado').count() == 10
+
+        # Un UPDATE de pedidos y un INSERT de correos para todo el lote.
+        sql = [q['sql'] for q in consultas]
+        assert len([q for q in sql if q.startswith('UPDATE "gestion_pedido"')]) == 1
+        assert len([q for q in sql if q.startswith('INSERT INTO "gestion_emailoutbox"')]) == 1
+        assert EmailOutbox.objects.filter(tipo='pago_confirmado').count() == 10
+
+        # Lista vacía: 400 para todo el lote.
+        url = reverse('confirmar-pago-lote')
+        assert self.client.post(url, {'ids': []}, format='json').status_code == status.HTTP_400_BAD_REQUEST
+
+        # IDs que no son enteros (decimal, booleano, texto con espacios) se rechazan uno a uno sin
+        # convertirse a otro pedido: [1.9] no confirma el pedido 1.
+        otro = Pedido.objects.create(cliente=self.cliente, estado='aceptado')
+        response = self.client.post(url, {'ids': [otro.id + 0.9, True, f'  {otro.id} ', 'x', str(otro.id)]},
+                                    format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert [r['resultado'] for r in response.data['resultados']] == ['invalido'] * 4 + ['aplicado']
+        assert response.data['resultados'][2]['id'] == f'  {otro.id} '
+        assert response.data['aplicados'] == 1 and response.data['rechazados'] == 4
+
+    def test_despacho_en_lote_y_manifiesto(self):
+        """
+        Verifica el despacho en lote con guía por pedido y la carga del manifiesto CSV del courier.
+        """
+        from django.core.files.uploadedfile import SimpleUploadedFile  # Importa el archivo subido de prueba
+
+        pagados = [Pedido.objects.create(cliente=self.cliente, estado='pago_confirmado').id for _ in range(4)]
+        Pedido.objects.create(cliente=self.cliente, estado='despachado', numero_guia='G-USADA')
+
+        response = self.client.post(reverse('marcar-despachado-lote'), {'despachos': [
+            {'id': pagados[0], 'transportista': 'Starken', 'numero_guia': 'G-1'},
+            {'id': pagados[1], 'transportista': 'Chilexpress', 'numero_guia': 'G-2'},
+            {'id': pagados[2], 'transportista': 'Starken', 'numero_guia': 'G-USADA'},
+            {'id': self.pedido.id, 'transportista': 'Starken'},
+        ]}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert [r['resultado'] for r in response.data['resultados']] == ['aplicado', 'aplicado', 'invalido', 'invalido']
+
+        # Cada pedido recibe su propia guía y transportista en el mismo UPDATE.
+        p0, p1 = Pedido.objects.get(id=pagados[0]), Pedido.objects.get(id=pagados[1])
+        assert (p0.estado, p0.transportista, p0.numero_guia) == ('despachado', 'Starken', 'G-1')
+        assert (p1.transportista, p1.numero_guia) == ('Chilexpress', 'G-2')
+        assert p0.fecha_despacho is not None
+        assert EmailOutbox.objects.filter(tipo='despacho').count() == 2
+
+        # Manifiesto separado por punto y coma, con transportista por defecto del formulario.
+        manifiesto = f"Pedido;Guia\n#{pagados[2]};BX-10\n{pagados[3]};BX-11\n{pagados[0]};BX-12\n".encode()
+        response = self.client.post(reverse('marcar-despachado-manifiesto'), {
+            'archivo': SimpleUploadedFile('manifiesto.csv', manifiesto, content_type='text/csv'),
+            'transportista': 'Blue Express',
+        }, format='multipart')
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data['aplicados'] == 2
+        assert response.data['resultados'][2] == {'id': pagados[0], 'resultado': 'conflicto',
+                                                  'estado_actual': 'despachado'}
+        assert Pedido.objects.get(id=pagados[3]).numero_guia == 'BX-11'
+        assert Pedido.objects.get(id=pagados[2]).transportista == 'Blue Express'
+
+        # Una fila con un número de pedido no válido se informa sin rechazar el resto del manifiesto.
+        otro = Pedido.objects.create(cliente=self.cliente, estado='pago_confirmado')
+        con_error = SimpleUploadedFile('manifiesto.csv', f"pedido,guia\nABC,BX-20\n{otro.id},BX-21\n".encode(),
+                                       content_type='text/csv')
+        response = self.client.post(reverse('marcar-despachado-manifiesto'), {
+            'archivo': con_error, 'transportista': 'Starken'}, format='multipart')
+        assert response.status_code == status.HTTP_200_OK
+        assert [r['resultado'] for r in response.data['resultados']] == ['invalido', 'aplicado']
+
+        # Un manifiesto sin la columna de guía se rechaza completo.
+        sin_guia = SimpleUploadedFile('manifiesto.csv', f"pedido\n{pagados[0]}\n".encode(), content_type='text/csv')
+        response = self.client.post(reverse('marcar-despachado-manifiesto'), {'archivo': sin_guia}, format='multipart')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
@@ -78,3 +78,58 @@ class TestClientRetentionView:
 
         # Verifica que el nombre del cliente retornado coincida con el criterio esperado.
         assert response.data['clients'][0]['nombre'] == "C1 Test"
+
+    def test_clasificacion_orden_y_paginacion_en_sql(self, django_assert_max_num_queries):
+        """
+        Prueba de clasificación (activo/riesgo/perdido), orden, filtros y paginación en SQL.
+        """
+        from datetime import timedelta  # Importa la utilidad de tiempo
+        from django.utils import timezone  # Importa la utilidad de zona horaria
+        from gestion.models import Pedido, ItemsPedido  # Importa los modelos de Pedido e ItemsPedido
+        from gestion.services import recalcular_agregados_clientes  # Importa el recálculo de agregados
+
+        url = reverse('bi-retention')
+        ahora = timezone.now()
+
+        # Crea clientes con su última compra hace 10 días (activo), 60 días (riesgo) y 200 días (perdido).
+        for nombre, dias, region, monto in (("Activo", 10, 'RM', 1000), ("Riesgo", 60, 'SUR', 5000),
+                                            ("Perdido", 200, 'RM', 3000)):
+            cliente = Cliente.objects.create(nombre=nombre, email=f"{nombre.lower()}@test.com")
+            pedido = Pedido.objects.create(cliente=cliente, estado='completado', region=region)
+            # fecha_solicitud es auto_now_add: se ajusta con update().
+            Pedido.objects.filter(pk=pedido.pk).update(fecha_solicitud=ahora - timedelta(days=dias))
+            ItemsPedido.objects.create(pedido=pedido, descripcion=f"Producto {nombre}", cantidad=1,
+                                       precio_unitario=monto)
+
+        # update() no pasa por save(): se recalculan los agregados de compras de los clientes.
+        recalcular_agregados_clientes()
+
+        # El listado completo se resuelve con un número constante de consultas (no una por cliente).
+        with django_assert_max_num_queries(6):
+            response = self.client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+
+        # Resumen: C1 y C2 (sin compras) cuentan como perdidos.
+        assert response.data['summary'] == {'active': 1, 'risk': 1, 'lost': 3, 'total_clients': 5}
+
+        # Orden: Riesgo primero, luego Perdidos por mayor gasto, luego Activos.
+        nombres = [c['nombres'] for c in response.data['clients']]
+        assert nombres[0] == "Riesgo"
+        assert nombres[1] == "Perdido"
+        assert nombres[-1] == "Activo"
+
+        # Datos de la última compra.
+        riesgo = response.data['clients'][0]
+        assert riesgo['days_inactive'] == 60
+        assert riesgo['last_product'] == "Producto Riesgo"
+        assert riesgo['region'] == 'SUR'
+        assert riesgo['total_spent'] == 5000
+
+        # Filtro por región de la última compra.
+        response = self.client.get(url, {'region[]': ['RM']})
+        assert {c['nombres'] for c in response.data['clients']} == {"Activo", "Perdido"}
+
+        # Paginación: segunda página de tamaño 2.
+        response = self.client.get(url, {'page': 2, 'page_size': 2})
+        assert len(response.data['clients']) == 2
+        assert response.data['pagination'] == {'page': 2, 'page_size': 2, 'total': 5}
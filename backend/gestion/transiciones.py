@@ -0,0 +1,174 @@
+"""
+Transiciones de Estado del Pedido.
+
+PROPOSITO:
+    Las vistas de acción (confirmar pago, despachar, aceptar, rechazar...) leían el pedido,
+    validaban el estado en Python y guardaban la fila completa: dos viajes a la base de datos,
+    todas las columnas reescritas y dos clics simultáneos podían aplicar ambas transiciones.
+    Aquí cada transición es un único UPDATE condicional:
+
+        UPDATE pedido SET estado=<destino>, fecha_actualizacion=<ahora>, <campos>
+        WHERE id=<id> AND estado IN (<origen>)
+
+    que solo toca las columnas que cambian. Si no actualiza ninguna fila, el pedido no existe
+    (Pedido.DoesNotExist) o su estado ya no lo permite (ConflictoTransicion); de dos peticiones
+    simultáneas solo una aplica la transición.
+
+LOTE:
+    transicionar_lote() aplica una transición a varios pedidos en una transacción: bloquea y
+    lee sus estados (una consulta), actualiza los aplicables con un único UPDATE (los campos
+    propios de cada pedido con CASE ... WHEN) e informa por pedido los rechazados.
+
+HOOK:
+    Tras la transición se emite 'pedido_transicionado' (dentro de la misma transacción) con el
+    pedido recargado y la Transicion aplicada; en lote, 'pedidos_transicionados' una sola vez
+    con la lista de pedidos. Los correos al cliente se suscriben en
+    gestion.notificaciones; un suscriptor que deba esperar la confirmación (ej: invalidar
+    un caché) usa transaction.on_commit.
+
+SINCRONIZACIÓN:
+    Como el UPDATE no pasa por Pedido.save(), el motor actualiza los agregados del cliente
+    (transiciones hacia/desde estados de venta) y la tabla de hechos BI (entrada a 'completado').
+"""
+from dataclasses import dataclass, field  # Definición inmutable de las transiciones
+from django.dispatch import Signal  # Hook posterior a la transición
+from django.db import transaction  # Transición, sincronización y hook en una transacción
+from django.db.models import Case, F, Value, When  # Campos por pedido en el UPDATE en lote
+from django.utils import timezone  # Fecha de actualización
+from .models import Cliente, Pedido  # Modelos
+from .services import recalcular_agregados_clientes  # Agregados de compras del cliente
+
+# Emitida tras cada transición aplicada. Argumentos: pedido (recargado), transicion (Transicion).
+pedido_transicionado = Signal()
+# Emitida tras cada transición en lote. Argumentos: pedidos (lista recargada), transicion (Transicion).
+pedidos_transicionados = Signal()
+
+
+class ConflictoTransicion(Exception):
+    """El estado actual del pedido no admite la transición (ya cambió o nunca la admitió)."""
+
+    def __init__(self, transicion, estado_actual):
+        self.transicion = transicion
+        self.estado_actual = estado_actual
+        super().__init__(f'La transición "{transicion.nombre}" requiere un pedido en estado '
+                         f'{", ".join(transicion.origen)}; el estado actual es {estado_actual}.')
+
+
+@dataclass(frozen=True)
+class Transicion:
+    """
+    Transición 'nombre' de los estados 'origen' a 'destino'.
+    'campos' son las columnas adicionales que la transición puede fijar (ej: datos de despacho).
+    """
+    nombre: str
+    origen: tuple
+    destino: str
+    campos: tuple = field(default=())
+
+    def __post_init__(self):
+        # Salir de 'completado' cambia la clave BI anterior, que el UPDATE no conoce: va por save()
+        if 'completado' in self.origen:
+            raise ValueError(f'La transición "{self.nombre}" no puede salir de "completado".')
+
+
+# Tabla de transiciones del ciclo de vida del pedido
+TRANSICIONES = {t.nombre: t for t in (
+    # Portal del cliente
+    Transicion('aceptar_cotizacion', ('cotizado',), 'aceptado'),
+    Transicion('rechazar_cotizacion', ('cotizado',), 'rechazado'),
+    Transicion('confirmar_recepcion', ('despachado',), 'completado'),
+    # Administración
+    Transicion('confirmar_pago', ('aceptado',), 'pago_confirmado'),
+    Transicion('rechazar_pago', ('aceptado',), 'rechazado'),
+    # Despacho
+    Transicion('despachar', ('pago_confirmado',), 'despachado',
+               campos=('transportista', 'numero_guia', 'fecha_despacho')),
+    # Rechazo manual de una solicitud o cotización
+    Transicion('rechazar', ('solicitud', 'cotizado', 'aceptado'), 'rechazado'),
+)}
+
+
+def _sincronizar(pedidos, transicion):
+    """Agregados de los clientes y tabla de hechos BI (lo que Pedido.save() haría tras la transición)."""
+    if transicion.destino in Pedido.ESTADOS_VENTA or set(transicion.origen) & set(Pedido.ESTADOS_VENTA):
+        clientes = {pedido.cliente_id for pedido in pedidos}
+        recalcular_agregados_clientes(Cliente.objects.filter(pk__in=clientes), notificar_bi=False)
+    if transicion.destino == 'completado':
+        for pedido in pedidos:
+            # Entrada a 'completado': no había clave BI anterior
+            pedido._clave_bi = None
+            pedido.sincronizar_bi()
+
+
+def _validar_campos(transicion, campos):
+    no_permitidos = set(campos) - set(transicion.campos)
+    if no_permitidos:
+        raise ValueError(f'La transición "{transicion.nombre}" no fija los campos {", ".join(sorted(no_permitidos))}.')
+
+
+def transicionar(nombre, campos=None, **filtro):
+    """
+    Aplica la transición 'nombre' al pedido identificado por 'filtro' (ej: pk=..., id_seguimiento=...)
+    con un UPDATE condicional, fijando además 'campos' (solo los declarados por la transición).
+    Retorna el pedido actualizado (con su cliente).
+    Lanza Pedido.DoesNotExist si no existe y ConflictoTransicion si su estado no lo permite.
+    """
+    transicion = TRANSICIONES[nombre]
+    campos = campos or {}
+    _validar_campos(transicion, campos)
+
+    with transaction.atomic():
+        actualizados = Pedido.objects.filter(estado__in=transicion.origen, **filtro).update(
+            estado=transicion.destino, fecha_actualizacion=timezone.now(), **campos)
+        if not actualizados:
+            # Solo en el caso de conflicto se consulta el estado actual para informarlo
+            estado_actual = Pedido.objects.filter(**filtro).values_list('estado', flat=True).first()
+            if estado_actual is None:
+                raise Pedido.DoesNotExist('Pedido no encontrado.')
+            raise ConflictoTransicion(transicion, estado_actual)
+
+        pedido = Pedido.objects.select_related('cliente').get(**filtro)
+        _sincronizar([pedido], transicion)
+        pedido_transicionado.send(sender=Pedido, pedido=pedido, transicion=transicion)
+    return pedido
+
+
+def transicionar_lote(nombre, ids, campos=None, campos_por_pedido=None):
+    """
+    Aplica la transición 'nombre' a los pedidos 'ids' en una transacción, con un único UPDATE.
+    'campos' se fijan en todos los pedidos y 'campos_por_pedido' ({id: {campo: valor}}) en cada uno.
+    Retorna (aplicados, rechazados): la lista de pedidos actualizados (con su cliente, en el orden
+    de 'ids') y {id: estado actual} de los que no admitían la transición (None si no existen).
+    """
+    transicion = TRANSICIONES[nombre]
+    campos = campos or {}
+    campos_por_pedido = campos_por_pedido or {}
+    _validar_campos(transicion, campos)
+    for valores in campos_por_pedido.values():
+        _validar_campos(transicion, valores)
+    ids = list(dict.fromkeys(ids))
+
+    with transaction.atomic():
+        # Los pedidos quedan bloqueados hasta el final: su estado no cambia entre la lectura y el UPDATE
+        estados = dict(Pedido.objects.select_for_update().filter(pk__in=ids).values_list('id', 'estado'))
+        aplicables = [pk for pk in ids if estados.get(pk) in transicion.origen]
+        rechazados = {pk: estados.get(pk) for pk in ids if estados.get(pk) not in transicion.origen}
+        if not aplicables:
+            return [], rechazados
+
+        valores = {'estado': transicion.destino, 'fecha_actualizacion': timezone.now(), **campos}
+        for campo in transicion.campos:
+            por_pedido = {pk: campos_por_pedido[pk][campo] for pk in aplicables
+                          if campo in campos_por_pedido.get(pk, {})}
+            if por_pedido:
+                modelo = Pedido._meta.get_field(campo)
+                valores[campo] = Case(*[When(pk=pk, then=Value(valor, output_field=modelo))
+                                        for pk, valor in por_pedido.items()],
+                                      default=F(campo), output_field=modelo)
+        Pedido.objects.filter(pk__in=aplicables, estado__in=transicion.origen).update(**valores)
+
+        por_id = Pedido.objects.select_related('cliente').in_bulk(aplicables)
+        pedidos = [por_id[pk] for pk in aplicables]
+        _sincronizar(pedidos, transicion)
+        pedidos_transicionados.send(sender=Pedido, pedidos=pedidos, transicion=transicion)
+    return pedidos, rechazados
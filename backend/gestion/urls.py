@@ -11,16 +11,20 @@ from .views import (  # Importa las vistas
     SolicitudCreateAPIView,  # Importa SolicitudCreateAPIView
     SolicitudesListAPIView,  # Importa SolicitudesListAPIView
     PedidoDetailAPIView,  # Importa PedidoDetailAPIView
+    PedidosCambiosView,  # Importa PedidosCambiosView
     PortalPedidoDetailAPIView,  # Importa PortalPedidoDetailAPIView
     PedidoAccionAPIView,  # Importa PedidoAccionAPIView
     EnviarCotizacionAPIView,  # Importa EnviarCotizacionAPIView
     PedidosAceptadosListView,  # Importa PedidosAceptadosListView
     PedidosHistorialPagosListView,  # Importa PedidosHistorialPagosListView
     ConfirmarPagoView,  # Importa ConfirmarPagoView
+    ConfirmarPagoLoteView,  # Importa ConfirmarPagoLoteView
     PedidosCotizadosListView,  # Importa PedidosCotizadosListView
     PedidosParaDespacharListView,  # Importa PedidosParaDespacharListView
     PedidosHistorialDespachosListView,  # Importa PedidosHistorialDespachosListView
     MarcarComoDespachadoView,  # Importa MarcarComoDespachadoView
+    MarcarDespachadoLoteView,  # Importa MarcarDespachadoLoteView
+    ManifiestoDespachoView,  # Importa ManifiestoDespachoView
     ConfirmarRecepcionView,  # Importa ConfirmarRecepcionView
     ProductoFrecuenteListAPIView,  # Importa ProductoFrecuenteListAPIView
     ProductoFrecuenteViewSet,  # Importa ProductoFrecuenteViewSet
@@ -40,6 +44,10 @@ from .views import (  # Importa las vistas
     RechazarPagoView,  # Importa RechazarPagoView
     ClientHistoryAPIView,  # Importa ClientHistoryAPIView
     BIFilterOptionsView,  # Importa BIFilterOptionsView
+    BICacheStatsView,  # Importa BICacheStatsView
+    BIBundleView,  # Importa BIBundleView
+    PDFMetricsView,  # Importa PDFMetricsView
+    ExportarCotizacionesZipView,  # Importa ExportarCotizacionesZipView
     RechazarPedidoView  # Importa RechazarPedidoView
 )
 
@@ -64,6 +72,8 @@ urlpatterns = [
     path('pedidos/<int:pk>/', PedidoDetailAPIView.as_view(), name='panel-pedido-detail'),
     path('pedidos/<int:pk>/enviar-cotizacion/', EnviarCotizacionAPIView.as_view(), name='enviar-cotizacion'),
     path('pedidos/<int:pk>/pdf/', GenerarPDFAPIView.as_view(), name='generar-pdf'),
+    path('pedidos/pdf/zip/', ExportarCotizacionesZipView.as_view(), name='pedidos-pdf-zip'),
+    path('pdf/metrics/', PDFMetricsView.as_view(), name='pdf-metrics'),
     path('pedidos/<int:pk>/rechazar/', RechazarPedidoView.as_view(), name='pedidos-rechazar-manual'),
 
     # Business Intelligence
@@ -75,6 +85,7 @@ urlpatterns = [
     path('pedidos/aceptados/', PedidosAceptadosListView.as_view(), name='panel-pedidos-aceptados'),
     path('pedidos/historial-pagos/', PedidosHistorialPagosListView.as_view(), name='panel-pedidos-historial-pagos'),
     path('pedidos/<int:pk>/confirmar-pago/', ConfirmarPagoView.as_view(), name='confirmar-pago'),
+    path('pedidos/confirmar-pago/lote/', ConfirmarPagoLoteView.as_view(), name='confirmar-pago-lote'),
     path('pedidos/<int:pk>/rechazar-pago/', RechazarPagoView.as_view(), name='rechazar-pago'),
 
     # Panel Vendedores (Seguimiento)
@@ -87,6 +98,12 @@ urlpatterns = [
          PedidosHistorialDespachosListView.as_view(),
          name='panel-pedidos-historial-despachos'),
     path('pedidos/<int:pk>/marcar-despachado/', MarcarComoDespachadoView.as_view(), name='marcar-despachado'),
+    path('pedidos/marcar-despachado/lote/', MarcarDespachadoLoteView.as_view(), name='marcar-despachado-lote'),
+    path('pedidos/marcar-despachado/manifiesto/', ManifiestoDespachoView.as_view(),
+         name='marcar-despachado-manifiesto'),
+
+    # Sincronización incremental de los paneles (sondeo de cambios)
+    path('pedidos/changes/', PedidosCambiosView.as_view(), name='panel-pedidos-cambios'),
 
     # Portal Cliente
     path('portal/pedidos/<uuid:id_seguimiento>/', PortalPedidoDetailAPIView.as_view(), name='portal-pedido-detail'),
@@ -108,4 +125,6 @@ urlpatterns = [
     path('bi/dashboard-stats/', BIDashboardDataView.as_view(), name='bi-dashboard-stats'),
     path('bi/info-logistica/', InfoLogisticaAPIView.as_view(), name='bi-info-logistica'),
     path('bi/filter-options/', BIFilterOptionsView.as_view(), name='bi-filter-options'),
+    path('bi/bundle/', BIBundleView.as_view(), name='bi-bundle'),
+    path('bi/cache-stats/', BICacheStatsView.as_view(), name='bi-cache-stats'),
 ]
@@ -9,26 +9,29 @@ PROPOSITO:
 VISTAS PRINCIPALES:
     - SolicitudCreateAPIView: Creación de cotizaciones públicas (sin login).
     - PedidoDetailAPIView/PedidoAccionAPIView: Gestión de pedidos (Backend).
-    - EnviarCotizacionAPIView: Lógica de envío de correos.
+    - EnviarCotizacionAPIView: Envío de cotizaciones por correo (encolado en EmailOutbox).
     - BIDashboardDataView: Métricas agregadas para el dashboard de BI.
     - ClientRetentionView: Lógica de retención de clientes (Churn).
 """
-from rest_framework import generics, permissions, status, viewsets  # Importa las dependencias
-from decimal import Decimal  # Importa Decimal
-from datetime import datetime  # Importa datetime
-from django.db.models import Count, Sum, F, Q, Value, CharField  # Importa Count, Sum, F, Q, Value, CharField
-# Importa Concat, ExtractYear, ExtractMonth, LPad, Cast
-from django.db.models.functions import Concat, ExtractYear, ExtractMonth, LPad, Cast
+import csv  # Lectura de manifiestos de despacho
+import io  # Texto del manifiesto como archivo
+from rest_framework import generics, permissions, serializers, status, viewsets  # Importa las dependencias
+from django.db.models import Count, Q  # Importa Count, Q
 from rest_framework.response import Response  # Importa Response
 from rest_framework.views import APIView  # Importa APIView
+from rest_framework.exceptions import ValidationError  # Importa ValidationError (400)
+from rest_framework.parsers import FormParser, MultiPartParser  # Importa los parsers de archivos
 from .models import Pedido, ProductoFrecuente, Cliente, ItemsPedido  # Importa los modelos
 from .serializers import (  # Importa los serializers
     SolicitudCreacionSerializer,  # Importa SolicitudCreacionSerializer
     PedidoSerializer,  # Importa PedidoSerializer
     PedidoDetailUpdateSerializer,  # Importa PedidoDetailUpdateSerializer
     PedidoDetailSerializer,  # Importa PedidoDetailSerializer
+    SolicitudRespuestaSerializer,  # Importa SolicitudRespuestaSerializer
     ProductoFrecuenteSerializer,  # Importa ProductoFrecuenteSerializer
-    ClienteSerializer  # Importa ClienteSerializer
+    ClienteSerializer,  # Importa ClienteSerializer
+    anotar_usuario_registrado,  # Importa la anotación de cliente registrado
+    precargar_pedidos  # Importa la precarga de listados de pedidos
 )
 from .permissions import (  # Importa los permisos
     IsVendedorOrGerencia,  # Importa IsVendedorOrGerencia
@@ -37,15 +40,41 @@ from .permissions import (  # Importa los permisos
     IsGerencia,  # Importa IsGerencia
     IsStaffMember  # Importa IsStaffMember
 )
-from django.core.mail import send_mail  # Importa send_mail
-from django.template.loader import render_to_string  # Importa render_to_string
-from django.utils.html import strip_tags  # Importa strip_tags
+from django.db import transaction  # Importa transaction
 from django.conf import settings  # Importa settings
 from django.utils import timezone  # Importa timezone
 from .services import ShippingCalculator  # Importa ShippingCalculator
-from django.http import HttpResponse  # Importa HttpResponse
-from xhtml2pdf import pisa  # Importa pisa
-from io import BytesIO  # Importa BytesIO
+from .outbox import encolar_correo  # Importa la bandeja de salida de correos
+from .campos import parse_seleccion  # Importa la selección de campos (?fields= / ?expand=)
+from .cambios import cambios, paneles_permitidos, parse_since  # Importa la sincronización incremental
+from .idempotencia import respuesta_idempotente  # Importa las escrituras idempotentes (Idempotency-Key)
+from .transiciones import ConflictoTransicion, transicionar, transicionar_lote  # Importa el motor de transiciones
+from .pagination import (  # Importa la paginación por cursor de los listados
+    PaginacionPorActualizacion,
+    PaginacionPorActualizacionAntigua,
+    PaginacionPorDespacho,
+    PaginacionPorSolicitud
+)
+from .bi_filters import parse_bi_filters, q_rango_fechas, filtrar_pedidos  # Importa el compilador de filtros BI
+from .retencion import clientes_con_retencion, dias_inactivo  # Importa las consultas de retención
+from .bi_bundle import (  # Importa las secciones BI
+    ContextoBI,
+    seccion_rentabilidad,
+    seccion_kpis,
+    seccion_dashboard,
+    seccion_filter_options,
+    parse_secciones,
+    construir_bundle
+)
+from .bi_cache import cache_respuesta_bi, estadisticas as estadisticas_cache_bi  # Importa el caché BI
+from django.http import HttpResponse, StreamingHttpResponse  # Importa HttpResponse y StreamingHttpResponse
+from django.utils.cache import get_conditional_response  # Importa la evaluación de If-None-Match
+from .pdf import items_pdf, version_pdf, obtener_pdf, zip_cotizaciones  # Importa el PDF de cotización con caché
+from .pdf_service import (  # Importa el servicio de render de PDFs
+    ServicioPDFOcupado,
+    TiempoPDFAgotado,
+    estadisticas as estadisticas_pdf
+)
 
 
 # Clase SolicitudCreateAPIView
@@ -57,13 +86,15 @@ class SolicitudCreateAPIView(generics.CreateAPIView):
     # permission_classes es el conjunto de permisos que se van a aplicar
     permission_classes = [permissions.AllowAny]
 
+    # Los reintentos del formulario con la misma Idempotency-Key no duplican el pedido
+    @respuesta_idempotente('solicitudes')
     def create(self, request, *args, **kwargs):
         input_serializer = self.get_serializer(data=request.data)
         if not input_serializer.is_valid():
             return Response(input_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         # orm proteccion automatica para inyeccion sql
         pedido_creado = input_serializer.save()
-        output_serializer = PedidoSerializer(pedido_creado, context={'request': request})
+        output_serializer = SolicitudRespuestaSerializer(pedido_creado, context={'request': request})
         headers = self.get_success_headers(output_serializer.data)
         return Response(output_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
@@ -76,13 +107,62 @@ class ProductoFrecuenteListAPIView(generics.ListAPIView):
     permission_classes = [permissions.AllowAny]
 
 
+class SeleccionCamposMixin:
+    """
+    Listados de pedidos con selección de campos (?fields= / ?expand=, ver gestion.campos):
+    el serializer entrega solo lo pedido y la consulta carga solo esas columnas y relaciones.
+    """
+
+    def get_seleccion(self):
+        if not hasattr(self, '_seleccion'):
+            request = getattr(self, 'request', None)
+            self._seleccion = parse_seleccion(request.query_params, PedidoSerializer) if request else None
+        return self._seleccion
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['seleccion'] = self.get_seleccion()
+        return context
+
+    def precargar(self, queryset):
+        """Precarga de PedidoSerializer según la selección (incluye la columna del cursor)."""
+        extra = (self.pagination_class.campo,) if self.pagination_class else ()
+        return precargar_pedidos(queryset, self.get_seleccion(), extra)
+
+
+class FiltrosPanelMixin:
+    """
+    Búsqueda y rango de fechas de los listados del panel, aplicados en SQL antes de la
+    paginación por cursor (el filtro cubre todo el listado, no solo las páginas cargadas):
+    ?search= (ID exacto, o nombre, apellido, empresa o email del cliente) y
+    ?start_date=&end_date= (YYYY-MM-DD, inclusivos, mismo formato que los filtros BI) sobre 'campo_fecha'.
+    """
+    campo_fecha = 'fecha_actualizacion'  # Fecha que muestra el panel
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        busqueda = self.request.query_params.get('search', '').strip()
+        if busqueda:
+            condicion = (Q(cliente__nombre__icontains=busqueda) | Q(cliente__apellido__icontains=busqueda) |
+                         Q(cliente__empresa__icontains=busqueda) | Q(cliente__email__icontains=busqueda))
+            if busqueda.lstrip('#').isdigit():
+                condicion |= Q(pk=int(busqueda.lstrip('#')))
+            queryset = queryset.filter(condicion)
+        q_fechas = q_rango_fechas(parse_bi_filters(self.request.query_params), self.campo_fecha)
+        if q_fechas is not None:
+            queryset = queryset.filter(q_fechas)
+        return queryset
+
+
 # Clase SolicitudesListAPIView
-class SolicitudesListAPIView(generics.ListAPIView):
+class SolicitudesListAPIView(FiltrosPanelMixin, SeleccionCamposMixin, generics.ListAPIView):
     serializer_class = PedidoSerializer
     permission_classes = [IsVendedorOrGerencia]
+    pagination_class = PaginacionPorSolicitud  # Más recientes primero, por cursor
+    campo_fecha = 'fecha_solicitud'
 
     def get_queryset(self):
-        return Pedido.objects.filter(estado='solicitud').order_by('-fecha_solicitud')
+        return self.precargar(Pedido.objects.filter(estado='solicitud'))
 
 
 # Clase PedidoDetailAPIView
@@ -146,37 +226,25 @@ class PedidoAccionAPIView(APIView):
 
     def post(self, request, id_seguimiento):
 
-        try:
-
-            pedido = Pedido.objects.get(id_seguimiento=id_seguimiento)
-
-            accion = request.data.get('accion')
+        accion = request.data.get('accion')
 
-            if accion not in ['aceptar', 'rechazar']:
+        if accion not in ['aceptar', 'rechazar']:
 
-                return Response({'error': 'Acción no válida.'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'error': 'Acción no válida.'}, status=status.HTTP_400_BAD_REQUEST)
 
-            if pedido.estado != 'cotizado':
-
-                return Response(
-                    {
-                        'error': f'No se puede realizar esta acción. El estado actual del pedido es "{
-                            pedido.get_estado_display()}".'},
-                    status=status.HTTP_400_BAD_REQUEST)
-
-            if accion == 'aceptar':
-
-                pedido.estado = 'aceptado'
-
-            elif accion == 'rechazar':
+        try:
 
-                pedido.estado = 'rechazado'
+            transicionar(f'{accion}_cotizacion', id_seguimiento=id_seguimiento)
 
-            pedido.save()
+            return Response({'status': f'pedido {accion}'}, status=status.HTTP_200_OK)
 
-            print(f"El cliente ha '{accion}' el Pedido #{pedido.id}")
+        except ConflictoTransicion as e:
 
-            return Response({'status': f'pedido {accion}'}, status=status.HTTP_200_OK)
+            estado = dict(Pedido.ESTADO_CHOICES).get(e.estado_actual, e.estado_actual)
+            return Response(
+                {'error': f'No se puede realizar esta acción. El estado actual del pedido es "{estado}".',
+                 'estado_actual': e.estado_actual},
+                status=status.HTTP_400_BAD_REQUEST)
 
         except Pedido.DoesNotExist:
 
@@ -222,19 +290,9 @@ class EnviarCotizacionAPIView(APIView):
 
             }
 
-            html_message = render_to_string('email/cotizacion.html', contexto)
-
-            plain_message = strip_tags(html_message)
-
-            from_email = settings.DEFAULT_FROM_EMAIL
-
-            to = pedido.cliente.email
-
-            # Ensure UTF-8 encoding is handled correctly by Django's send_mail
+            # Se encola: el worker 'run_outbox' lo envía fuera del request
 
-            send_mail(asunto, plain_message, from_email, [to], html_message=html_message)
-
-            print(f"Correo de cotización para el Pedido #{pedido.id} enviado a la consola.")
+            encolar_correo(asunto, 'email/cotizacion.html', contexto, [pedido.cliente.email], tipo='cotizacion')
 
             return Response({'message': 'Correo enviado exitosamente.'}, status=status.HTTP_200_OK)
 
@@ -260,25 +318,14 @@ class ConfirmarRecepcionView(APIView):
 
         try:
 
-            pedido = Pedido.objects.get(id_seguimiento=id_seguimiento)
-
-            if pedido.estado != 'despachado':
-
-                return Response(
-
-                    {'error': 'Este pedido aún no ha sido despachado.'},
-
-                    status=status.HTTP_400_BAD_REQUEST
+            transicionar('confirmar_recepcion', id_seguimiento=id_seguimiento)
 
-                )
-
-            pedido.estado = 'completado'
-
-            pedido.save()
+            return Response({'status': 'pedido completado'}, status=status.HTTP_200_OK)
 
-            print(f"El cliente ha confirmado la recepción del Pedido #{pedido.id}.")
+        except ConflictoTransicion as e:
 
-            return Response({'status': 'pedido completado'}, status=status.HTTP_200_OK)
+            return Response({'error': 'Este pedido aún no ha sido despachado.', 'estado_actual': e.estado_actual},
+                            status=status.HTTP_400_BAD_REQUEST)
 
         except Pedido.DoesNotExist:
 
@@ -308,7 +355,7 @@ class ClienteViewSet(viewsets.ModelViewSet):
 
     """
 
-    queryset = Cliente.objects.all()
+    queryset = anotar_usuario_registrado(Cliente.objects.all())
 
     serializer_class = ClienteSerializer
 
@@ -378,17 +425,26 @@ class SeleccionarEnvioAPIView(APIView):
 
             metodo = request.data.get('metodo_envio')  # STARKEN, CHILEXPRESS, BLUE, OTRO
 
-            costo = request.data.get('costo')
-
             if not metodo:
 
                 return Response({'error': 'Debe seleccionar un método de envío.'}, status=status.HTTP_400_BAD_REQUEST)
 
+            # El costo re-deriva los totales del pedido: se valida con las reglas de su columna
+            try:
+
+                costo = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0).run_validation(
+                    request.data.get('costo'))
+
+            except ValidationError:
+
+                return Response({'error': 'El costo de envío debe ser un número válido.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+
             pedido.metodo_envio = metodo
 
             pedido.costo_envio_estimado = costo
 
-            pedido.save()
+            pedido.save(update_fields=['metodo_envio', 'costo_envio_estimado'])
 
             return Response({'status': 'Método de envío actualizado correctly'}, status=status.HTTP_200_OK)
 
@@ -403,6 +459,9 @@ class GenerarPDFAPIView(APIView):
 
     Genera un PDF descargable de la cotización usando xhtml2pdf.
 
+    El PDF se sirve desde caché mientras el pedido no cambie y soporta revalidación
+    con ETag / If-None-Match (304 sin renderizar). Ver gestion/pdf.py.
+
     """
 
     permission_classes = [permissions.AllowAny]
@@ -411,84 +470,120 @@ class GenerarPDFAPIView(APIView):
 
         try:
 
-            pedido = Pedido.objects.get(pk=pk)
+            pedido = Pedido.objects.select_related('cliente').get(pk=pk)
 
-            items = pedido.items.all()
+        except Pedido.DoesNotExist:
 
-            # Cálculos para el PDF
+            return Response({'error': 'Pedido no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
 
-            subtotal = sum(item.cantidad * item.precio_unitario for item in items)
+        items = items_pdf(pedido)
 
-            recargo = subtotal * (pedido.porcentaje_urgencia / Decimal('100'))
+        # Versión del documento: cambia con cualquier edición de items, envío o datos mostrados
 
-            # Cálculo de IVA (19%) sobre el subtotal + recargo
+        version = version_pdf(pedido, items)
 
-            neto = subtotal + recargo
+        etag = f'"{version}"'
 
-            iva = neto * Decimal('0.19')
+        # El navegador ya tiene esta versión: 304 sin renderizar
 
-            costo_envio = pedido.costo_envio_estimado
+        no_modificado = get_conditional_response(request, etag=etag)
 
-            total = neto + iva + costo_envio
+        if no_modificado is not None:
 
-            # Validez de 15 días hábiles (simplificado a 21 días corridos)
+            no_modificado['ETag'] = etag
 
-            validez = timezone.now() + timezone.timedelta(days=21)
+            return no_modificado
 
-            contexto = {
+        try:
 
-                'pedido': pedido,
+            contenido, desde_cache = obtener_pdf(pedido, items, version)
 
-                'items': items,
+        except (ServicioPDFOcupado, TiempoPDFAgotado) as e:
 
-                'subtotal': subtotal,
+            # Pool saturado o render colgado: el cliente puede reintentar
 
-                'recargo': recargo,
+            response = Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-                'neto': neto,
+            response['Retry-After'] = '5'
 
-                'iva': iva,
+            return response
 
-                'costo_envio': costo_envio,
+        if contenido is None:
 
-                'total': total,
+            return Response({'error': 'Error al generar PDF'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-                'validez': validez,
+        response = HttpResponse(contenido, content_type='application/pdf')
 
-                'fecha_actual': timezone.now(),
+        filename = f"Cotizacion_{pedido.id}.pdf"
 
-            }
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
 
-            # Renderizamos el HTML
+        response['ETag'] = etag
 
-            html_string = render_to_string('pdf/pedido_pdf.html', contexto)
+        # El navegador puede guardarlo, pero debe revalidar antes de reutilizarlo
 
-            # Generar PDF
+        response['Cache-Control'] = 'private, no-cache'
 
-            result = BytesIO()
+        response['X-PDF-Cache'] = 'HIT' if desde_cache else 'MISS'
 
-            pdf = pisa.pisaDocument(BytesIO(html_string.encode("UTF-8")), result)
+        return response
 
-            if not pdf.err:
 
-                response = HttpResponse(result.getvalue(), content_type='application/pdf')
+class ExportarCotizacionesZipView(APIView):
 
-                filename = f"Cotizacion_{pedido.id}.pdf"
+    """
 
-                response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    Exporta en un ZIP (streaming) el PDF de cotización de todos los pedidos que cumplen el filtro.
 
-                return response
+    Filtros (mismos parámetros que BI, sobre la fecha de solicitud): month[], start_date/end_date,
 
-            else:
+    cliente_id[], region[], comuna[]; además estado[] (por defecto, todo pedido ya cotizado).
 
-                return Response({'error': 'Error al generar PDF'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    """
 
-        except Pedido.DoesNotExist:
+    permission_classes = [IsAdministrativaOrGerencia]
 
-            return Response({'error': 'Pedido no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+    # Estados en los que el pedido ya tiene una cotización
+
+    ESTADOS_COTIZACION = [estado for estado, _ in Pedido.ESTADO_CHOICES if estado != 'solicitud']
+
+    def get(self, request):
+
+        spec = parse_bi_filters(request.query_params)
+
+        estados = request.query_params.getlist('estado[]') or request.query_params.getlist('estado')
+
+        estados = [e for e in estados if e in self.ESTADOS_COTIZACION] or self.ESTADOS_COTIZACION
+
+        queryset = filtrar_pedidos(spec, campo_fecha='fecha_solicitud',
+                                   queryset=Pedido.objects.filter(estado__in=estados))
+
+        # Solo los IDs quedan en memoria; los pedidos se cargan por lotes al generar el ZIP
+
+        pedido_ids = list(queryset.order_by('id').values_list('id', flat=True))
+
+        if not pedido_ids:
 
+            return Response({'error': 'No hay cotizaciones para los filtros indicados.'},
+                            status=status.HTTP_404_NOT_FOUND)
 
-class PedidosAceptadosListView(generics.ListAPIView):
+        if len(pedido_ids) > settings.PDF_ZIP_MAXIMO:
+
+            return Response({'error': f'La exportación supera el máximo de {settings.PDF_ZIP_MAXIMO} cotizaciones. '
+                                      'Acote el filtro.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(zip_cotizaciones(pedido_ids), content_type='application/zip')
+
+        filename = f"Cotizaciones_{timezone.localdate():%Y%m%d}.zip"
+
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+
+        response['X-Total-Cotizaciones'] = str(len(pedido_ids))
+
+        return response
+
+
+class PedidosAceptadosListView(FiltrosPanelMixin, SeleccionCamposMixin, generics.ListAPIView):
 
     """
 
@@ -500,12 +595,14 @@ class PedidosAceptadosListView(generics.ListAPIView):
 
     permission_classes = [IsAdministrativaOrGerencia]
 
+    pagination_class = PaginacionPorActualizacion  # Más recientes primero, por cursor
+
     def get_queryset(self):
 
-        return Pedido.objects.filter(estado='aceptado').order_by('-fecha_actualizacion')
+        return self.precargar(Pedido.objects.filter(estado='aceptado'))
 
 
-class PedidosHistorialCotizacionesListView(generics.ListAPIView):
+class PedidosHistorialCotizacionesListView(FiltrosPanelMixin, SeleccionCamposMixin, generics.ListAPIView):
 
     """
 
@@ -517,16 +614,18 @@ class PedidosHistorialCotizacionesListView(generics.ListAPIView):
 
     permission_classes = [IsVendedorOrGerencia]
 
+    pagination_class = PaginacionPorActualizacion  # Más recientes primero, por cursor
+
     def get_queryset(self):
 
         # Estados que se consideran "historial"
 
         estados_historial = ['aceptado', 'rechazado', 'completado', 'despachado', 'pago_confirmado']
 
-        return Pedido.objects.filter(estado__in=estados_historial).order_by('-fecha_actualizacion')
+        return self.precargar(Pedido.objects.filter(estado__in=estados_historial))
 
 
-class PedidosHistorialPagosListView(generics.ListAPIView):
+class PedidosHistorialPagosListView(FiltrosPanelMixin, SeleccionCamposMixin, generics.ListAPIView):
 
     """
 
@@ -538,10 +637,110 @@ class PedidosHistorialPagosListView(generics.ListAPIView):
 
     permission_classes = [IsAdministrativaOrGerencia]
 
+    pagination_class = PaginacionPorActualizacion  # Más recientes primero, por cursor
+
     def get_queryset(self):
 
-        return Pedido.objects.filter(estado__in=['pago_confirmado', 'rechazado',
-                                     'despachado', 'completado']).order_by('-fecha_actualizacion')
+        return self.precargar(
+            Pedido.objects.filter(estado__in=['pago_confirmado', 'rechazado', 'despachado', 'completado']))
+
+
+class TransicionLoteMixin:
+
+    """
+
+    Lectura de la lista de pedidos y respuesta por pedido de las transiciones en lote.
+
+    """
+
+    @staticmethod
+    def id_pedido(valor):
+
+        """ID de pedido de una entrada del lote: entero (no booleano) o texto solo de dígitos. None si no es válido."""
+
+        if isinstance(valor, int) and not isinstance(valor, bool):
+
+            return valor if valor > 0 else None
+
+        if isinstance(valor, str) and valor.isascii() and valor.isdigit():
+
+            return int(valor)
+
+        return None
+
+    def ids_lote(self, valores, campo='ids'):
+
+        """
+
+        ID de pedido de cada entrada del lote (None si la entrada no es un ID válido: 1.9, true o
+
+        " 3 " no se convierten a otro pedido). Lanza ValidationError (en 'campo') si no hay una
+
+        lista o si excede el máximo.
+
+        """
+
+        if not isinstance(valores, list) or not valores:
+
+            raise ValidationError({campo: 'Se requiere una lista de pedidos.'})
+
+        if len(valores) > settings.TRANSICIONES_LOTE_MAXIMO:
+
+            raise ValidationError({campo: f'El lote supera el máximo de {settings.TRANSICIONES_LOTE_MAXIMO} pedidos.'})
+
+        return [self.id_pedido(valor) for valor in valores]
+
+    def respuesta_lote(self, valores, ids, aplicados, rechazados, invalidos=None):
+
+        """
+
+        Resultado de cada entrada en el orden recibido ('valores' tal como llegaron e 'ids' de
+
+        ids_lote): 'aplicado', 'conflicto' (con su estado actual), 'no_encontrado' o 'invalido'
+
+        (con el error, sin intentar la transición). Un pedido repetido se informa una vez.
+
+        """
+
+        invalidos = invalidos or {}
+
+        aplicados = {pedido.id for pedido in aplicados}
+
+        resultados, vistos = [], set()
+
+        for valor, pk in zip(valores, ids):
+
+            if pk is None:
+
+                resultados.append({'id': valor, 'resultado': 'invalido',
+                                   'error': 'El ID de pedido debe ser un número entero.'})
+
+                continue
+
+            if pk in vistos:
+
+                continue
+
+            vistos.add(pk)
+
+            if pk in invalidos:
+
+                resultados.append({'id': pk, 'resultado': 'invalido', 'error': invalidos[pk]})
+
+            elif pk in aplicados:
+
+                resultados.append({'id': pk, 'resultado': 'aplicado'})
+
+            elif rechazados.get(pk) is None:
+
+                resultados.append({'id': pk, 'resultado': 'no_encontrado'})
+
+            else:
+
+                resultados.append({'id': pk, 'resultado': 'conflicto', 'estado_actual': rechazados[pk]})
+
+        return Response({'aplicados': len(aplicados), 'rechazados': len(resultados) - len(aplicados),
+                         'resultados': resultados}, status=status.HTTP_200_OK)
 
 
 class ConfirmarPagoView(APIView):
@@ -549,6 +748,7 @@ class ConfirmarPagoView(APIView):
     """
 
     Endpoint para que administración confirme el pago de un pedido.
+    El correo de confirmación se encola en la misma transacción (gestion.notificaciones).
 
     """
 
@@ -558,51 +758,46 @@ class ConfirmarPagoView(APIView):
 
         try:
 
-            pedido = Pedido.objects.get(pk=pk)
+            transicionar('confirmar_pago', pk=pk)
 
-            if pedido.estado != 'aceptado':
+            return Response({'status': 'pago confirmado'}, status=status.HTTP_200_OK)
 
-                return Response({'error': 'El pedido no está en estado aceptado.'}, status=status.HTTP_400_BAD_REQUEST)
+        except ConflictoTransicion as e:
 
-            pedido.estado = 'pago_confirmado'
+            return Response({'error': 'El pedido no está en estado aceptado.', 'estado_actual': e.estado_actual},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-            pedido.save()
+        except Pedido.DoesNotExist:
 
-            # Enviar correo de confirmación de pago
+            return Response({'error': 'Pedido no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
 
-            try:
 
-                asunto = f"Pago Confirmado - Pedido #{pedido.id} - Clarotec"
+class ConfirmarPagoLoteView(TransicionLoteMixin, APIView):
 
-                id_seguimiento = str(pedido.id_seguimiento)
-                enlace_portal = f"{settings.FRONTEND_URL}/portal/pedidos/{id_seguimiento}"
+    """
+
+    Confirma el pago de varios pedidos en una transacción (cierre del día de administración).
 
-                contexto = {
-                    'nombre_cliente': pedido.cliente.nombre,
-                    'pedido_id': pedido.id,
-                    'enlace_portal': enlace_portal,
-                    'pedido': pedido
-                }
+    POST {"ids": [1, 2, 3]}: los pedidos en estado aceptado pasan a pago_confirmado con un único
 
-                html_message = render_to_string('email/pago_confirmado.html', contexto)
+    UPDATE y sus correos se encolan con un solo INSERT; el resto se informa en 'resultados'.
 
-                plain_message = strip_tags(html_message)
+    """
 
-                send_mail(asunto, plain_message, settings.DEFAULT_FROM_EMAIL,
-                          [pedido.cliente.email], html_message=html_message)
+    permission_classes = [IsAdministrativaOrGerencia]
 
-            except Exception as e:
+    def post(self, request):
 
-                print(f"Error enviando correo de pago: {e}")
+        valores = request.data.get('ids')
 
-            return Response({'status': 'pago confirmado'}, status=status.HTTP_200_OK)
+        ids = self.ids_lote(valores)
 
-        except Pedido.DoesNotExist:
+        aplicados, rechazados = transicionar_lote('confirmar_pago', [pk for pk in ids if pk is not None])
 
-            return Response({'error': 'Pedido no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+        return self.respuesta_lote(valores, ids, aplicados, rechazados)
 
 
-class PedidosCotizadosListView(generics.ListAPIView):
+class PedidosCotizadosListView(FiltrosPanelMixin, SeleccionCamposMixin, generics.ListAPIView):
 
     """
 
@@ -614,12 +809,14 @@ class PedidosCotizadosListView(generics.ListAPIView):
 
     permission_classes = [IsVendedorOrGerencia]
 
+    pagination_class = PaginacionPorActualizacion  # Más recientes primero, por cursor
+
     def get_queryset(self):
 
-        return Pedido.objects.filter(estado='cotizado').order_by('-fecha_actualizacion')
+        return self.precargar(Pedido.objects.filter(estado='cotizado'))
 
 
-class PedidosParaDespacharListView(generics.ListAPIView):
+class PedidosParaDespacharListView(FiltrosPanelMixin, SeleccionCamposMixin, generics.ListAPIView):
 
     """
 
@@ -631,12 +828,14 @@ class PedidosParaDespacharListView(generics.ListAPIView):
 
     permission_classes = [IsDespachadorOrGerencia]
 
+    pagination_class = PaginacionPorActualizacionAntigua  # El que más espera primero, por cursor
+
     def get_queryset(self):
 
-        return Pedido.objects.filter(estado='pago_confirmado').order_by('fecha_actualizacion')
+        return self.precargar(Pedido.objects.filter(estado='pago_confirmado'))
 
 
-class PedidosHistorialDespachosListView(generics.ListAPIView):
+class PedidosHistorialDespachosListView(FiltrosPanelMixin, SeleccionCamposMixin, generics.ListAPIView):
 
     """
 
@@ -648,9 +847,44 @@ class PedidosHistorialDespachosListView(generics.ListAPIView):
 
     permission_classes = [IsDespachadorOrGerencia]
 
+    pagination_class = PaginacionPorDespacho  # Despachos más recientes primero, por cursor
+
     def get_queryset(self):
 
-        return Pedido.objects.filter(estado__in=['despachado', 'completado']).order_by('-fecha_despacho')
+        return self.precargar(Pedido.objects.filter(estado__in=['despachado', 'completado']))
+
+
+class PedidosCambiosView(SeleccionCamposMixin, generics.GenericAPIView):
+
+    """
+
+    Sincronización incremental de los paneles (ver gestion.cambios).
+    GET ?since=<cursor|fecha ISO>&paneles=aceptados,historial-pagos&fields=...
+    Solo se entregan los paneles a los que el usuario tiene acceso.
+
+    """
+
+    serializer_class = PedidoSerializer
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        nombres = [n.strip() for n in request.query_params.get('paneles', '').split(',') if n.strip()]
+        paneles = paneles_permitidos(request, self, nombres)
+        if not paneles:
+            return Response({'error': 'No tiene acceso a ningún panel de pedidos.'},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        desde = parse_since(request.query_params.get('since'))
+        # El estado y la fecha de actualización deciden los paneles aunque no se pidan en ?fields=
+        queryset = precargar_pedidos(Pedido.objects.all(), self.get_seleccion(), ('estado', 'fecha_actualizacion'))
+        pedidos, por_panel, cursor, hay_mas = cambios(queryset, desde, paneles)
+        return Response({
+            'cursor': cursor,
+            'hay_mas': hay_mas,
+            'pedidos': self.get_serializer(pedidos, many=True).data,
+            'paneles': por_panel,
+        })
 
 
 class MarcarComoDespachadoView(APIView):
@@ -658,6 +892,7 @@ class MarcarComoDespachadoView(APIView):
     """
 
     Endpoint para marcar un pedido como despachado.
+    El correo de despacho se encola en la misma transacción (gestion.notificaciones).
 
     """
 
@@ -665,75 +900,208 @@ class MarcarComoDespachadoView(APIView):
 
     def post(self, request, pk):
 
+        transportista = request.data.get('transportista')
+
+        numero_guia = request.data.get('numero_guia')
+
+        if not transportista or not numero_guia:
+
+            return Response({'error': 'Se requiere transportista y número de guía.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
         try:
 
-            pedido = Pedido.objects.get(pk=pk)
+            transicionar('despachar', pk=pk, campos={
+                'transportista': transportista, 'numero_guia': numero_guia, 'fecha_despacho': timezone.now()})
 
-            if pedido.estado != 'pago_confirmado':
+            return Response({'status': 'pedido despachado'}, status=status.HTTP_200_OK)
 
-                return Response({'error': 'El pedido no está listo para despacho.'}, status=status.HTTP_400_BAD_REQUEST)
+        except ConflictoTransicion as e:
 
-            transportista = request.data.get('transportista')
+            return Response({'error': 'El pedido no está listo para despacho.', 'estado_actual': e.estado_actual},
+                            status=status.HTTP_400_BAD_REQUEST)
 
-            numero_guia = request.data.get('numero_guia')
+        except Pedido.DoesNotExist:
 
-            if not transportista or not numero_guia:
+            return Response({'error': 'Pedido no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
 
-                return Response({'error': 'Se requiere transportista y número de guía.'},
-                                status=status.HTTP_400_BAD_REQUEST)
 
-            pedido.transportista = transportista
+class MarcarDespachadoLoteView(TransicionLoteMixin, APIView):
 
-            pedido.numero_guia = numero_guia
+    """
 
-            pedido.estado = 'despachado'
+    Marca como despachados varios pedidos en una transacción.
 
-            pedido.fecha_despacho = timezone.now()
+    POST {"despachos": [{"id": 1, "transportista": "Starken", "numero_guia": "123"}, ...]}
 
-            pedido.save()
+    Un despacho sin transportista o número de guía, o con una guía repetida en el lote o ya
 
-            # Enviar correo de despacho
+    asignada a otro pedido, se informa como 'invalido' sin impedir el resto del lote.
 
-            try:
+    """
 
-                id_seguimiento_con_guiones = str(pedido.id_seguimiento)
+    permission_classes = [IsDespachadorOrGerencia]
 
-                dominio_frontend = settings.FRONTEND_URL
+    def post(self, request):
 
-                enlace_portal = f"{dominio_frontend}/portal/pedidos/{id_seguimiento_con_guiones}"
+        despachos = request.data.get('despachos')
 
-                asunto = f"Tu Pedido #{pedido.id} ha sido Despachado - Clarotec"
+        if not isinstance(despachos, list) or not all(isinstance(despacho, dict) for despacho in despachos):
 
-                contexto = {
+            raise ValidationError({'despachos': 'Se requiere una lista de despachos (id, transportista, numero_guia).'})
 
-                    'nombre_cliente': pedido.cliente.nombre,
+        valores = [despacho.get('id') for despacho in despachos]
 
-                    'pedido_id': pedido.id,
+        return self.despachar_lote(valores, self.ids_lote(valores, 'despachos'), despachos)
 
-                    'enlace_portal': enlace_portal,
+    def despachar_lote(self, valores, ids, despachos):
 
-                    'transportista': transportista,
+        """Valida cada despacho y aplica la transición 'despachar' a los válidos con un único UPDATE."""
 
-                    'numero_guia': numero_guia,
+        invalidos, campos_por_pedido = {}, {}
 
-                }
+        guias = [str(despacho.get('numero_guia') or '').strip() for despacho in despachos]
 
-                html_message = render_to_string('email/despacho.html', contexto)
+        # Guías ya asignadas a otro pedido: una búsqueda por el índice de número de guía
 
-                plain_message = strip_tags(html_message)
+        asignadas = dict(Pedido.objects.filter(numero_guia__in=[g for g in guias if g])
+                         .values_list('numero_guia', 'id'))
 
-                send_mail(asunto, plain_message, settings.DEFAULT_FROM_EMAIL,
-                          [pedido.cliente.email], html_message=html_message)
+        vistas = set()
 
-            except Exception as e:
+        for pk, despacho, guia in zip(ids, despachos, guias):
 
-                print(f"Error enviando correo de despacho: {e}")
+            transportista = str(despacho.get('transportista') or '').strip()
 
-            return Response({'status': 'pedido despachado'}, status=status.HTTP_200_OK)
+            if pk is None:
 
-        except Pedido.DoesNotExist:
+                continue  # Entrada sin un ID válido (se informa en respuesta_lote)
 
-            return Response({'error': 'Pedido no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+            if pk in campos_por_pedido or pk in invalidos:
+
+                invalidos[pk] = 'El pedido aparece más de una vez en el lote.'
+
+            elif not transportista or not guia:
+
+                invalidos[pk] = 'Se requiere transportista y número de guía.'
+
+            elif guia in vistas or asignadas.get(guia, pk) != pk:
+
+                invalidos[pk] = f'El número de guía {guia} ya está asignado a otro pedido.'
+
+            else:
+
+                campos_por_pedido[pk] = {'transportista': transportista, 'numero_guia': guia}
+
+            vistas.add(guia)
+
+        for pk in invalidos:
+
+            campos_por_pedido.pop(pk, None)
+
+        aplicados, rechazados = [], {}
+
+        if campos_por_pedido:
+
+            aplicados, rechazados = transicionar_lote(
+
+                'despachar', list(campos_por_pedido), campos={'fecha_despacho': timezone.now()},
+
+                campos_por_pedido=campos_por_pedido)
+
+        return self.respuesta_lote(valores, ids, aplicados, rechazados, invalidos)
+
+
+class ManifiestoDespachoView(MarcarDespachadoLoteView):
+
+    """
+
+    Variante de MarcarDespachadoLoteView que recibe el manifiesto CSV del courier.
+
+    POST multipart: 'archivo' (CSV con encabezado; columnas pedido, numero_guia y opcionalmente
+
+    transportista, separadas por coma o punto y coma) y 'transportista' (valor por defecto
+
+    para las filas que no lo traen).
+
+    """
+
+    parser_classes = [MultiPartParser, FormParser]
+
+    # Nombres de columna aceptados para cada dato del despacho
+
+    COLUMNAS = {
+
+        'id': ('pedido', 'id', 'pedido_id', 'referencia'),
+
+        'numero_guia': ('numero_guia', 'guia', 'n_guia', 'tracking'),
+
+        'transportista': ('transportista', 'courier'),
+
+    }
+
+    def post(self, request):
+
+        archivo = request.FILES.get('archivo')
+
+        if archivo is None:
+
+            raise ValidationError({'archivo': 'Se requiere el archivo del manifiesto.'})
+
+        try:
+
+            texto = archivo.read().decode('utf-8-sig')
+
+        except UnicodeDecodeError:
+
+            raise ValidationError({'archivo': 'El manifiesto debe estar codificado en UTF-8.'})
+
+        despachos = self.leer_manifiesto(texto, request.data.get('transportista', ''))
+
+        valores = [despacho['id'] for despacho in despachos]
+
+        return self.despachar_lote(valores, self.ids_lote(valores, 'archivo'), despachos)
+
+    def leer_manifiesto(self, texto, transportista):
+
+        """Despachos del manifiesto (una fila por pedido). Lanza ValidationError si el formato no es válido."""
+
+        try:
+
+            dialecto = csv.Sniffer().sniff(texto[:4096], delimiters=',;')
+
+        except csv.Error:
+
+            dialecto = csv.excel
+
+        lector = csv.DictReader(io.StringIO(texto), dialect=dialecto)
+
+        encabezados = {(nombre or '').strip().lower(): nombre for nombre in lector.fieldnames or []}
+
+        columnas = {dato: next((encabezados[n] for n in nombres if n in encabezados), None)
+
+                    for dato, nombres in self.COLUMNAS.items()}
+
+        if columnas['id'] is None or columnas['numero_guia'] is None:
+
+            raise ValidationError({'archivo': 'El manifiesto requiere las columnas pedido y numero_guia.'})
+
+        despachos = []
+
+        for fila in lector:
+
+            despachos.append({
+
+                # Un número de pedido no válido se informa en su fila, sin rechazar el manifiesto
+                'id': (fila.get(columnas['id']) or '').strip().lstrip('#'),
+
+                'numero_guia': fila.get(columnas['numero_guia']),
+
+                'transportista': (columnas['transportista'] and fila.get(columnas['transportista'])) or transportista,
+
+            })
+
+        return despachos
 
 
 class SincronizarProductosAPIView(APIView):
@@ -812,131 +1180,11 @@ class RentabilidadHistoricaAPIView(APIView):
 
     permission_classes = [IsGerencia]
 
+    @cache_respuesta_bi('rentabilidad')
     def get(self, request):
-
-        # Filtramos solo pedidos completados (o despachados/pagados si se prefiere, pero completado es el final)
-
-        pedidos = Pedido.objects.filter(estado='completado').order_by('fecha_despacho')
-
-        # --- FILTROS ---
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-
-        # Filtro Meses Multiple: ?month[]=2025-01&month[]=2025-02
-        # Si vienen meses, ignoramos start_date/end_date (o los complementamos, pero por UI es uno u otro)
-        months = request.query_params.getlist('month[]')
-
-        if months:
-            q_months = Q()
-            for m in months:
-                # m formt: "YYYY-MM"
-                try:
-                    y, m_num = m.split('-')
-                    q_months |= Q(fecha_despacho__year=y, fecha_despacho__month=m_num)
-                except ValueError:
-                    pass
-            if q_months:
-                pedidos = pedidos.filter(q_months)
-        else:
-            # Fallback a Rango de Fechas normal
-            if start_date:
-                pedidos = pedidos.filter(fecha_despacho__date__gte=start_date)
-            if end_date:
-                pedidos = pedidos.filter(fecha_despacho__date__lte=end_date)
-
-        # Filtro Clientes Multiple: ?cliente_id[]=1&cliente_id[]=2
-        cliente_ids = request.query_params.getlist('cliente_id[]')
-        if cliente_ids:
-            pedidos = pedidos.filter(cliente_id__in=cliente_ids)
-        elif request.query_params.get('cliente_id'):
-            # Fallback single
-            pedidos = pedidos.filter(cliente_id=request.query_params.get('cliente_id'))
-
-        # Filtros Multi-Select (Region y Comuna)
-        regions = request.query_params.getlist('region[]')
-        if not regions and request.query_params.get('region'):
-            regions = request.query_params.get('region').split(',')
-
-        comunas = request.query_params.getlist('comuna[]')
-        if not comunas and request.query_params.get('comuna'):
-            comunas = request.query_params.get('comuna').split(',')
-
-        if regions:
-            pedidos = pedidos.filter(region__in=regions)
-        if comunas:
-            pedidos = pedidos.filter(comuna__in=comunas)
-
-        # Filtro Tipo de Cliente Multiple
-        client_types = request.query_params.getlist('client_type[]')
-        # Compatibility with single param if frontend sends client_type=new
-        if not client_types and request.query_params.get('client_type'):
-            client_types = [request.query_params.get('client_type')]
-
-        if client_types:
-            # Logic:
-            # If 'new' only -> filter new.
-            # If 'recurring' only -> filter recurring.
-            # If both -> do nothing (Show all).
-
-            filter_new = 'new' in client_types
-            filter_recurring = 'recurring' in client_types
-
-            if filter_new and not filter_recurring:
-                # Solo nuevos
-                recurring_client_ids = Pedido.objects.filter(estado='completado').values('cliente').annotate(
-                    count=Count('id')
-                ).filter(count__gt=1).values_list('cliente_id', flat=True)
-                pedidos = pedidos.exclude(cliente_id__in=recurring_client_ids)
-
-            elif filter_recurring and not filter_new:
-                # Solo recurrentes
-                recurring_client_ids = Pedido.objects.filter(estado='completado').values('cliente').annotate(
-                    count=Count('id')
-                ).filter(count__gt=1).values_list('cliente_id', flat=True)
-                pedidos = pedidos.filter(cliente_id__in=recurring_client_ids)
-
-        data = []
-
-        for p in pedidos:
-            # Calcular costos e ingresos
-            items = p.items.all()
-
-            total_venta = sum(item.subtotal for item in items)
-
-            # Recargo urgencia
-
-            recargo = total_venta * (p.porcentaje_urgencia / Decimal('100'))
-
-            ingreso_neto = total_venta + recargo
-
-            costo_compra_total = sum(item.precio_compra * item.cantidad for item in items)
-
-            ganancia = ingreso_neto - costo_compra_total
-
-            margen = 0
-
-            if ingreso_neto > 0:
-
-                margen = (ganancia / ingreso_neto) * 100
-
-            data.append({
-
-                'id': p.id,
-
-                # Fecha para el eje X (Fallback a actualizacion)
-                'fecha': p.fecha_despacho.strftime('%Y-%m-%d') if p.fecha_despacho else p.fecha_actualizacion.strftime('%Y-%m-%d'),
-
-                'cliente': p.cliente.nombre,
-
-                'ganancia': float(ganancia),  # Decimal a float para JSON
-
-                'margen': round(float(margen), 2),
-
-                'total_venta': float(ingreso_neto)
-
-            })
-
-        return Response(data, status=status.HTTP_200_OK)
+        # Filtramos solo pedidos completados (ver bi_bundle.seccion_rentabilidad)
+        contexto = ContextoBI(parse_bi_filters(request.query_params))
+        return Response(seccion_rentabilidad(contexto), status=status.HTTP_200_OK)
 
 
 class MetricasKPIView(APIView):
@@ -949,170 +1197,11 @@ class MetricasKPIView(APIView):
 
     permission_classes = [IsGerencia]
 
+    @cache_respuesta_bi('kpis')
     def get(self, request):
-
-        # 1. Filtros Base (Mismos que RentabilidadHistorica)
-
-        pedidos = Pedido.objects.filter(estado='completado')
-
-        # --- FILTROS ---
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-
-        # Filtro Meses Multiple: ?month[]=2025-01
-        months = request.query_params.getlist('month[]')
-
-        if months:
-            q_months = Q()
-            for m in months:
-                try:
-                    y, m_num = m.split('-')
-                    # Usamos fecha_actualizacion para KPI View consistencia
-                    q_months |= Q(fecha_actualizacion__year=y, fecha_actualizacion__month=m_num)
-                except ValueError:
-                    pass
-            if q_months:
-                pedidos = pedidos.filter(q_months)
-        else:
-            if start_date:
-                pedidos = pedidos.filter(fecha_actualizacion__date__gte=start_date)
-            if end_date:
-                pedidos = pedidos.filter(fecha_actualizacion__date__lte=end_date)
-
-        # Filtro Clientes Multiple
-        cliente_ids = request.query_params.getlist('cliente_id[]')
-        if cliente_ids:
-            pedidos = pedidos.filter(cliente_id__in=cliente_ids)
-        elif request.query_params.get('cliente_id'):
-            pedidos = pedidos.filter(cliente_id=request.query_params.get('cliente_id'))
-
-        # Filtros Multi-Select (Region y Comuna)
-        regions = request.query_params.getlist('region[]')
-        if not regions and request.query_params.get('region'):
-            regions = request.query_params.get('region').split(',')
-
-        comunas = request.query_params.getlist('comuna[]')
-        if not comunas and request.query_params.get('comuna'):
-            comunas = request.query_params.get('comuna').split(',')
-
-        if regions:
-            pedidos = pedidos.filter(region__in=regions)
-        if comunas:
-            pedidos = pedidos.filter(comuna__in=comunas)
-
-        # Filtro Tipo de Cliente Multiple
-        client_types = request.query_params.getlist('client_type[]')
-        if not client_types and request.query_params.get('client_type'):
-            client_types = [request.query_params.get('client_type')]
-
-        if client_types:
-            filter_new = 'new' in client_types
-            filter_recurring = 'recurring' in client_types
-
-            if filter_new and not filter_recurring:
-                recurring_client_ids = Pedido.objects.filter(estado='completado').values('cliente').annotate(
-                    count=Count('id')
-                ).filter(count__gt=1).values_list('cliente_id', flat=True)
-                pedidos = pedidos.exclude(cliente_id__in=recurring_client_ids)
-
-            elif filter_recurring and not filter_new:
-                recurring_client_ids = Pedido.objects.filter(estado='completado').values('cliente').annotate(
-                    count=Count('id')
-                ).filter(count__gt=1).values_list('cliente_id', flat=True)
-                pedidos = pedidos.filter(cliente_id__in=recurring_client_ids)
-
-        # --- KPI 1: Tasa de Recurrencia ---
-        # Lógica: De los clientes que aparecen en los pedidos filtrados, ¿cuántos
-        # son recurrentes (históricamente > 1 compra)?
-
-        # Obtener IDs de clientes en el set filtrado
-        clientes_en_periodo_ids = pedidos.values_list('cliente_id', flat=True).distinct()
-        total_clientes_periodo = len(clientes_en_periodo_ids)
-
-        clientes_recurrentes_count = 0
-        clientes_nuevos_count = 0
-
-        if total_clientes_periodo > 0:
-            # Consultar historial completo de estos clientes
-            # Anotamos cada cliente con su conteo total de pedidos completados históricos
-            clientes_stats = Pedido.objects.filter(
-                cliente_id__in=clientes_en_periodo_ids,
-                estado='completado'
-            ).values('cliente').annotate(total_historico=Count('id'))
-
-            for stat in clientes_stats:
-                if stat['total_historico'] > 1:
-                    clientes_recurrentes_count += 1
-                else:
-                    clientes_nuevos_count += 1
-
-            tasa_recurrencia = (clientes_recurrentes_count / total_clientes_periodo) * 100
-        else:
-            tasa_recurrencia = 0
-
-        # --- KPI 2: Margen Operacional Global ---
-        # Lógica: Sumar (Ingresos - Costos) / Ingresos de todos los pedidos filtrados.
-        # Reutilizamos lógica de cálculo iterativo por simplicidad y consistencia con RentabilidadHistoricaView
-        # (Aunque podría optimizarse con agregaciones complejas, el cálculo de urgencia lo hace difícil en DB pura sin funciones complejas)
-
-        total_ingresos_netos = Decimal('0.00')  # Subtotal + Recargo (Sin IVA/Envio)
-        total_facturado_real = Decimal('0.00')  # Con IVA y Envio
-        total_costos_global = Decimal('0.00')
-        total_utilidad_neta = Decimal('0.00')
-        total_iva = Decimal('0.00')
-        total_envios = Decimal('0.00')
-
-        # Iteramos sobre el queryset filtrado 'pedidos' (que ya tiene prefetch de items idealmente, pero aquí no lo forzamos por ahora)
-        # Para optimizar, hacemos prefetch
-        pedidos_con_items = pedidos.prefetch_related('items')
-
-        for p in pedidos_con_items:
-            # Sumar items
-            subtotal_pedido = Decimal('0.00')
-            costo_pedido = Decimal('0.00')
-
-            for item in p.items.all():
-                subtotal_pedido += item.subtotal
-                costo_pedido += (item.precio_compra * item.cantidad)
-
-            # Ingreso Neto (Base para margen)
-            recargo = subtotal_pedido * (p.porcentaje_urgencia / Decimal('100'))
-            ingreso_neto_pedido = subtotal_pedido + recargo
-
-            # IVA
-            iva_pedido = ingreso_neto_pedido * Decimal('0.19')
-            envio_pedido = p.costo_envio_estimado
-
-            # Acumuladores
-            total_ingresos_netos += ingreso_neto_pedido
-            total_facturado_real += p.total_cotizacion  # Usamos propiedad del modelo (Gross Model)
-            total_costos_global += costo_pedido
-
-            # Desgloses
-            total_iva += iva_pedido
-            total_envios += envio_pedido
-
-            # Utilidad Neta Real (Neto - Costo)
-            total_utilidad_neta += (ingreso_neto_pedido - costo_pedido)
-
-        margen_operacional_global = 0
-        if total_ingresos_netos > 0:
-            # Margen = Utilidad / Ingresos Netos (Sin IVA)
-            margen_operacional_global = (total_utilidad_neta / total_ingresos_netos) * 100
-
-        return Response({
-            'tasa_recurrencia': round(tasa_recurrencia, 1),
-            'clientes_nuevos': clientes_nuevos_count,
-            'clientes_recurrentes': clientes_recurrentes_count,
-            'margen_operacional': round(float(margen_operacional_global), 1),
-            'total_ingresos': int(round(total_facturado_real)),  # Bruto Real (Entero)
-            'total_neto': int(round(total_ingresos_netos)),  # Neto (Entero)
-            'total_costos': int(round(total_costos_global)),
-            'total_utilidad': int(round(total_utilidad_neta)),
-            'total_iva': int(round(total_iva)),
-            'total_envios': int(round(total_envios)),
-            'total_pedidos': pedidos.count()
-        }, status=status.HTTP_200_OK)
+        # KPIs calculados íntegramente en la base de datos (ver bi_bundle.seccion_kpis)
+        contexto = ContextoBI(parse_bi_filters(request.query_params))
+        return Response(seccion_kpis(contexto), status=status.HTTP_200_OK)
 
 
 class InfoLogisticaAPIView(APIView):
@@ -1157,162 +1246,11 @@ class BIDashboardDataView(APIView):
     """
     permission_classes = [IsGerencia]
 
+    @cache_respuesta_bi('dashboard')
     def get(self, request):
         # Filtros Base (Igual que los otros endpoints de BI)
-        pedidos = Pedido.objects.filter(estado='completado')
-
-        # --- FILTROS ---
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-
-        # Filtro Meses Multiple: ?month[]=2025-01
-        months = request.query_params.getlist('month[]')
-
-        if months:
-            q_months = Q()
-            for m in months:
-                try:
-                    y, m_num = m.split('-')
-                    # Usamos fecha_despacho para BIDashboardDataView
-                    q_months |= Q(fecha_despacho__year=y, fecha_despacho__month=m_num)
-                except ValueError:
-                    pass
-            if q_months:
-                pedidos = pedidos.filter(q_months)
-        else:
-            if start_date:
-                pedidos = pedidos.filter(fecha_despacho__date__gte=start_date)
-            if end_date:
-                pedidos = pedidos.filter(fecha_despacho__date__lte=end_date)
-
-        # Filtro Clientes Multiple
-        cliente_ids = request.query_params.getlist('cliente_id[]')
-        if cliente_ids:
-            pedidos = pedidos.filter(cliente_id__in=cliente_ids)
-        elif request.query_params.get('cliente_id'):
-            pedidos = pedidos.filter(cliente_id=request.query_params.get('cliente_id'))
-
-        # Filtros Multi-Select (Region y Comuna)
-        regions = request.query_params.getlist('region[]')
-        if not regions and request.query_params.get('region'):
-            regions = request.query_params.get('region').split(',')
-
-        comunas = request.query_params.getlist('comuna[]')
-        if not comunas and request.query_params.get('comuna'):
-            comunas = request.query_params.get('comuna').split(',')
-
-        if regions:
-            pedidos = pedidos.filter(region__in=regions)
-        if comunas:
-            pedidos = pedidos.filter(comuna__in=comunas)
-
-        # Filtro Tipo de Cliente Multiple
-        client_types = request.query_params.getlist('client_type[]')
-        if not client_types and request.query_params.get('client_type'):
-            client_types = [request.query_params.get('client_type')]
-
-        if client_types:
-            filter_new = 'new' in client_types
-            filter_recurring = 'recurring' in client_types
-
-            if filter_new and not filter_recurring:
-                recurring_client_ids = Pedido.objects.filter(estado='completado').values('cliente').annotate(
-                    count=Count('id')
-                ).filter(count__gt=1).values_list('cliente_id', flat=True)
-                pedidos = pedidos.exclude(cliente_id__in=recurring_client_ids)
-
-            elif filter_recurring and not filter_new:
-                recurring_client_ids = Pedido.objects.filter(estado='completado').values('cliente').annotate(
-                    count=Count('id')
-                ).filter(count__gt=1).values_list('cliente_id', flat=True)
-                pedidos = pedidos.filter(cliente_id__in=recurring_client_ids)
-
-        # 1. Top 10 Productos (Por Ingresos)
-        # Necesitamos unir con ItemsPedido
-        top_products_qs = ItemsPedido.objects.filter(pedido__in=pedidos).values('descripcion').annotate(
-            total_vendido=Sum('subtotal'),
-            cantidad_total=Sum('cantidad')
-        ).order_by('-total_vendido')[:10]
-
-        top_products = [
-            {
-                # Truncar nombre largo
-                'name': item['descripcion'][:20] + '...' if len(item['descripcion']) > 20 else item['descripcion'],
-                'full_name': item['descripcion'],
-                'value': float(item['total_vendido']),
-                'cantidad': item['cantidad_total']
-            }
-            for item in top_products_qs
-        ]
-
-        # 2. Ventas por Región
-        # Corrección: Agrupar desde ItemsPedido es más seguro para sumas
-        sales_by_region_qs = ItemsPedido.objects.filter(pedido__in=pedidos).values('pedido__region').annotate(
-            total_ventas=Sum('subtotal')
-        ).order_by('-total_ventas')
-
-        sales_by_region = [
-            {
-                'name': item['pedido__region'],
-                'value': float(item['total_ventas'])
-            }
-            for item in sales_by_region_qs
-        ]
-
-        # 3. Tendencia Mensual de Ingresos (Cálculo corregido en Python para usar total_cotizacion)
-        monthly_data = {}
-
-        # Iteramos sobre los pedidos únicos para sumar sus totales reales (incluyendo IVA, etc)
-        # pedidos ya está filtrado por fechas/cliente/region etc
-        # Hacemos prefetch de items para optimizar el cálculo de costos dentro del bucle si es necesario
-        pedidos_trend = pedidos.prefetch_related('items')
-
-        for p in pedidos_trend:
-            fecha = p.fecha_despacho if p.fecha_despacho else p.fecha_actualizacion
-            month_key = fecha.strftime('%Y-%m')
-
-            if month_key not in monthly_data:
-                monthly_data[month_key] = {
-                    'ventas': Decimal('0.00'),
-                    'costos': Decimal('0.00'),
-                    'utilidad': Decimal('0.00')
-                }
-
-            # Ventas: Usamos el TOTAL REAL (Subtotal + Recargo + IVA + Envío)
-            monthly_data[month_key]['ventas'] += p.total_cotizacion
-
-            # Costos: Suma de costo de compra de items
-            costo_pedido = sum(item.precio_compra * item.cantidad for item in p.items.all())
-            monthly_data[month_key]['costos'] += costo_pedido
-
-            # Utilidad Neta: (Subtotal + Recargo) - Costos
-            # No usamos total_cotizacion aquí porque incluye IVA y Envío
-            subtotal_items = sum(item.subtotal for item in p.items.all())
-            recargo = subtotal_items * (p.porcentaje_urgencia / Decimal('100'))
-            ingreso_neto_real = subtotal_items + recargo
-
-            monthly_data[month_key]['utilidad'] += (ingreso_neto_real - costo_pedido)
-
-        # Convertir diccionario a lista ordenada
-        monthly_trend = []
-        for month_key in sorted(monthly_data.keys()):
-            ventas = monthly_data[month_key]['ventas']
-            costos = monthly_data[month_key]['costos']
-            # La utilidad ya fue sumada correctamente en el bucle
-            utilidad = monthly_data[month_key]['utilidad']
-
-            monthly_trend.append({
-                'name': month_key,
-                'ventas': float(ventas),
-                'costos': float(costos),
-                'utilidad': float(utilidad)
-            })
-
-        return Response({
-            'top_products': top_products,
-            'sales_by_region': sales_by_region,
-            'monthly_trend': monthly_trend
-        }, status=status.HTTP_200_OK)
+        contexto = ContextoBI(parse_bi_filters(request.query_params))
+        return Response(seccion_dashboard(contexto), status=status.HTTP_200_OK)
 
 
 class ClientRetentionView(APIView):
@@ -1323,25 +1261,29 @@ class ClientRetentionView(APIView):
     - En Riesgo (30 - 90 días sin comprar)
     - Perdido (> 90 días sin comprar)
 
-    Soporta filtros por región y comuna (basado en la última compra).
+    Soporta filtros por región y comuna (basado en la última compra), búsqueda y rango
+    de fechas de la última compra. Paginación opcional: ?page=1&page_size=50.
+    Toda la clasificación, filtrado, orden y paginación se resuelve en SQL (ver retencion.py).
     """
     permission_classes = [IsVendedorOrGerencia]
 
-    def get(self, request):
-        # Filtros
-        regions = request.query_params.getlist('region[]')
-        if not regions and request.query_params.get('region'):
-            regions = request.query_params.get('region').split(',')
-
-        comunas = request.query_params.getlist('comuna[]')
-        if not comunas and request.query_params.get('comuna'):
-            comunas = request.query_params.get('comuna').split(',')
+    # Tamaño máximo de página permitido
+    MAX_PAGE_SIZE = 500
 
+    def get(self, request):
+        # Filtros (mismo formato que los endpoints BI: region[]/region, comuna[]/comuna, start_date, end_date)
+        spec = parse_bi_filters(request.query_params)
         search_query = request.query_params.get('search', '').lower()
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
 
-        # Obtenemos todos los clientes
+        # Paginación opcional
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = request.query_params.get('page_size')
+            page_size = min(max(int(page_size), 1), self.MAX_PAGE_SIZE) if page_size else None
+        except ValueError:
+            return Response({'error': 'Parámetros de paginación inválidos.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
         clientes = Cliente.objects.all()
 
         # Filtro de Búsqueda (Nombre, Email, Empresa)
@@ -1352,88 +1294,37 @@ class ClientRetentionView(APIView):
                 Q(empresa__icontains=search_query)
             )
 
-        data = []
-        now = timezone.now()
-
-        # Contadores para las tarjetas de resumen
-        summary = {
-            'active': 0,
-            'risk': 0,
-            'lost': 0,
-            'total_clients': 0
-        }
-
-        for cliente in clientes:
-            # Buscar la última fecha de un pedido COMPLETADO o DESPACHADO (Venta real)
-            last_order_qs = Pedido.objects.filter(
-                cliente=cliente,
-                estado__in=['completado', 'despachado', 'pagado', 'aceptado']
-            )
-
-            # Filtro de Fechas (sobre la última compra)
-            # Nota: Esto es sutil. Si filtramos por fecha, ¿queremos clientes cuya ÚLTIMA compra fue en ese rango?
-            # Sí, para ver "quién compró por última vez en Enero".
-
-            last_order = last_order_qs.order_by('-fecha_solicitud').first()
-
-            # --- FILTRADO POR FECHA DE ÚLTIMA COMPRA ---
-            if start_date or end_date:
-                if not last_order:
-                    continue  # Si no tiene compras, no entra en rango de fechas
-
-                last_date = last_order.fecha_solicitud.date()
-                if start_date and last_date < datetime.strptime(start_date, '%Y-%m-%d').date():
-                    continue
-                if end_date and last_date > datetime.strptime(end_date, '%Y-%m-%d').date():
-                    continue
-
-            # --- FILTRADO POR REGIÓN/COMUNA ---
-            if regions or comunas:
-                if not last_order:
-                    continue
-
-                if regions and last_order.region not in regions:
-                    continue
-                if comunas and last_order.comuna not in comunas:
-                    continue
-
-            # Calcular Total Gastado (Lifetime Value)
-            total_spent = ItemsPedido.objects.filter(
-                pedido__cliente=cliente,
-                pedido__estado__in=['completado', 'despachado', 'pagado', 'aceptado']
-            ).aggregate(total=Sum(F('cantidad') * F('precio_unitario')))['total'] or 0
-
-            days_inactive = -1
-            status_label = 'N/A'
-            last_product = "Sin compras"
-
-            if last_order:
-                diff = now - last_order.fecha_solicitud
-                days_inactive = diff.days
-
-                # Clasificación
-                if days_inactive <= 30:
-                    status_label = 'active'
-                    summary['active'] += 1
-                elif days_inactive <= 90:
-                    status_label = 'risk'
-                    summary['risk'] += 1
-                else:
-                    status_label = 'lost'
-                    summary['lost'] += 1
-
-                # Obtener último producto comprado para "excusa de conversación"
-                last_item = last_order.items.first()
-                if last_item:
-                    last_product = last_item.descripcion
-            else:
-                status_label = 'lost'
-                summary['lost'] += 1
-                days_inactive = 999
-
-            summary['total_clients'] += 1
-
-            data.append({
+        clientes = clientes_con_retencion(clientes, ahora=now)
+
+        # --- FILTRADO POR FECHA DE ÚLTIMA COMPRA ---
+        # Clientes cuya ÚLTIMA compra fue en el rango (ej: "quién compró por última vez en Enero").
+        # Los clientes sin compras quedan fuera (la comparación con NULL es falsa).
+        q_fechas = q_rango_fechas(spec, '_ultima_fecha')
+        if q_fechas is not None:
+            clientes = clientes.filter(q_fechas)
+
+        # --- FILTRADO POR REGIÓN/COMUNA (de la última compra) ---
+        if spec.regions:
+            clientes = clientes.filter(_region__in=spec.regions)
+        if spec.comunas:
+            clientes = clientes.filter(_comuna__in=spec.comunas)
+
+        # Contadores para las tarjetas de resumen (sobre todo el conjunto filtrado)
+        summary = clientes.aggregate(
+            active=Count('id', filter=Q(_estado_retencion='active')),
+            risk=Count('id', filter=Q(_estado_retencion='risk')),
+            lost=Count('id', filter=Q(_estado_retencion='lost')),
+            total_clients=Count('id'),
+        )
+
+        # Orden: En Riesgo, Perdidos, Activos; dentro de cada grupo, mayor gasto primero
+        clientes = clientes.order_by('_prioridad', '-_total_gastado', 'id')
+        if page_size:
+            inicio = (page - 1) * page_size
+            clientes = clientes[inicio:inicio + page_size]
+
+        data = [
+            {
                 'id': cliente.id,
                 'nombre': f"{cliente.nombre} {cliente.apellido}".strip(),  # Concatenado para visualización
                 'nombres': cliente.nombre,
@@ -1441,28 +1332,27 @@ class ClientRetentionView(APIView):
                 'email': cliente.email,
                 'telefono': cliente.telefono,
                 'empresa': cliente.empresa,
-                'days_inactive': days_inactive,
-                'status': status_label,
-                'total_spent': total_spent,
-                'last_product': last_product,
-                'last_order_date': last_order.fecha_solicitud if last_order else None,
-                'region': last_order.region if last_order else None,
-                'comuna': last_order.comuna if last_order else None,
+                'days_inactive': dias_inactivo(cliente._ultima_fecha, now),
+                'status': cliente._estado_retencion,
+                'total_spent': cliente._total_gastado,
+                'last_product': cliente._ultimo_producto or "Sin compras",
+                'last_order_date': cliente._ultima_fecha,
+                'region': cliente._region,
+                'comuna': cliente._comuna,
                 'last_retention_email_sent_at': cliente.last_retention_email_sent_at,
                 'retention_status': cliente.retention_status,
                 'retention_status_display': cliente.get_retention_status_display()
-            })
-
-        def sort_key(item):
-            priority = {'risk': 0, 'lost': 1, 'active': 2}
-            return (priority.get(item['status'], 3), -item['total_spent'])
-
-        data.sort(key=sort_key)
+            }
+            for cliente in clientes
+        ]
 
-        return Response({
+        respuesta = {
             'summary': summary,
             'clients': data
-        })
+        }
+        if page_size:
+            respuesta['pagination'] = {'page': page, 'page_size': page_size, 'total': summary['total_clients']}
+        return Response(respuesta)
 
 
 class SendRetentionEmailView(APIView):
@@ -1476,18 +1366,9 @@ class SendRetentionEmailView(APIView):
         try:
             cliente = Cliente.objects.get(pk=client_id)
 
-            # Buscar última compra para personalizar el correo
-            last_order = Pedido.objects.filter(
-                cliente=cliente,
-                estado__in=['completado', 'despachado', 'pagado', 'aceptado']
-            ).order_by('-fecha_solicitud').first()
-
-            days_inactive = 0
-
-            if last_order:
-                days_inactive = (timezone.now() - last_order.fecha_solicitud).days
-            else:
-                days_inactive = 999  # Nunca compró o muy antiguo
+            # Días sin comprar según la última compra persistida en el cliente
+            # (999 si nunca compró o muy antiguo)
+            days_inactive = dias_inactivo(cliente.last_purchase_at)
 
             # Selección de Plantilla
             template_name = 'email/retention_risk.html'
@@ -1500,30 +1381,24 @@ class SendRetentionEmailView(APIView):
                 'days_inactive': days_inactive if days_inactive > 0 else "varios",
             }
 
-            # Renderizar correo
-            html_message = render_to_string(template_name, contexto)
-            plain_message = strip_tags(html_message)
-
             asunto = f"¡Te extrañamos en Clarotec, {cliente.nombre}!"
-            from_email = settings.DEFAULT_FROM_EMAIL
-            to = cliente.email
 
-            send_mail(asunto, plain_message, from_email, [to], html_message=html_message)
+            # Encolar correo y actualizar estado del cliente en una sola transacción
+            with transaction.atomic():
+                encolar_correo(asunto, template_name, contexto, [cliente.email], tipo='retencion')
 
-            # Actualizar estado del cliente
-            cliente.last_retention_email_sent_at = timezone.now()
-            cliente.retention_status = 'contacted'
-            cliente.save()
+                cliente.last_retention_email_sent_at = timezone.now()
+                cliente.retention_status = 'contacted'
+                # Solo las columnas de retención (no se reescriben los agregados de compras)
+                cliente.save(update_fields=['last_retention_email_sent_at', 'retention_status'])
 
+            # El envío lo hace el worker de la bandeja de salida (gestion.outbox)
             return Response({'status': 'success',
-                             'message': f'Correo enviado a {cliente.email}'},
+                             'message': f'Correo encolado para {cliente.email}'},
                             status=status.HTTP_200_OK)
 
         except Cliente.DoesNotExist:
             return Response({'error': 'Cliente no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
-        except Exception as e:
-            print(f"Error enviando correo de retención: {e}")
-            return Response({'error': 'Error al enviar el correo.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 class UpdateClientStatusView(APIView):
@@ -1544,7 +1419,7 @@ class UpdateClientStatusView(APIView):
                 return Response({'error': 'Estado inválido.'}, status=status.HTTP_400_BAD_REQUEST)
 
             cliente.retention_status = new_status
-            cliente.save()
+            cliente.save(update_fields=['retention_status'])
 
             return Response({'status': 'success', 'message': 'Estado actualizado.'}, status=status.HTTP_200_OK)
 
@@ -1555,32 +1430,21 @@ class UpdateClientStatusView(APIView):
 class RechazarPagoView(APIView):
     """
     Endpoint para que un administrativo rechace el pago de un pedido.
-    Cambia el estado a 'rechazado' y notifica al cliente.
+    Cambia el estado a 'rechazado' y notifica al cliente (gestion.notificaciones).
     """
     permission_classes = [IsVendedorOrGerencia]  # Administrativa tambien
 
     def post(self, request, pk):
         try:
-            pedido = Pedido.objects.get(pk=pk, estado='aceptado')  # Solo rechazar si está en espera de pago/aceptado
-
-            # Cambiar estado a Rechazado
-            pedido.estado = 'rechazado'
-            pedido.save()
-
-            # Enviar correo
-            try:
-                asunto = f"Problema con tu Pago - Pedido #{pedido.id} - Clarotec"
-                html_message = render_to_string('email/pago_rechazado.html', {'pedido': pedido})
-                plain_message = strip_tags(html_message)
-                send_mail(asunto, plain_message, settings.DEFAULT_FROM_EMAIL,
-                          [pedido.cliente.email], html_message=html_message)
-            except Exception as e:
-                print(f"Error enviando correo de rechazo: {e}")
-
+            # Solo rechazar si está en espera de pago/aceptado
+            transicionar('rechazar_pago', pk=pk)
             return Response({'status': 'pago rechazado'}, status=status.HTTP_200_OK)
 
+        except ConflictoTransicion as e:
+            return Response({'error': 'El pedido no está en estado aceptado.', 'estado_actual': e.estado_actual},
+                            status=status.HTTP_400_BAD_REQUEST)
         except Pedido.DoesNotExist:
-            return Response({'error': 'Pedido no encontrado o estado incorrecto.'}, status=status.HTTP_404_NOT_FOUND)
+            return Response({'error': 'Pedido no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
 
 
 class ClientHistoryAPIView(APIView):
@@ -1592,22 +1456,22 @@ class ClientHistoryAPIView(APIView):
 
         # 2. Buscar pedidos asociados a ese email (a través del Cliente)
         # Nota: El link es por email, ya que el usuario 'Cliente' y la ficha 'Cliente' comparten email.
-        pedidos = Pedido.objects.filter(cliente__email=user_email).order_by('-fecha_solicitud')
+        # El conteo de items se anota en la misma consulta (sin una consulta por pedido)
+        pedidos = Pedido.objects.filter(cliente__email=user_email).annotate(
+            items_count=Count('items')).order_by('-fecha_solicitud')
 
         # 3. Serializar (Usamos el serializer de lista o detalle simplificado)
         # Reutilizamos PedidoSerializer o construimos una respuesta custom
         data = []
         for p in pedidos:
-            # Usar la propiedad del modelo que incluye IVA y recargos
-            total = p.total_cotizacion
-
             data.append({
                 'id': p.id,
                 'fecha_solicitud': p.fecha_solicitud,
                 'estado': p.estado,
-                'total_cotizacion': total,
+                # Total desnormalizado (incluye IVA, recargos y envío)
+                'total_cotizacion': p.total_cotizacion,
                 'id_seguimiento': p.id_seguimiento,
-                'items_count': p.items.count()
+                'items_count': p.items_count
             })
 
         return Response(data, status=status.HTTP_200_OK)
@@ -1622,150 +1486,67 @@ class BIFilterOptionsView(APIView):
     """
     permission_classes = [permissions.IsAuthenticated]
 
-    def _get_filtered_queryset(self, request, exclude_params=[]):
-        """
-        Helper para construir un QuerySet aplicando todos los filtros
-        EXCEPTO los especificados en 'exclude_params'.
-        """
-        pedidos = Pedido.objects.filter(estado='completado')
-
-        # 1. Filtros FECHAS (Globales, impactan a todos menos quizás a Meses si se excluye)
-        # Nota: 'month[]' y 'start_date' actúan como filtro temporal.
-        # Si excluimos 'months', NO aplicamos ni month[] ni start_date/end_date
-        # para que aparezcan todos los tiempos disponibles.
-
-        apply_time_filter = 'months' not in exclude_params
-
-        if apply_time_filter:
-            months = request.query_params.getlist('month[]')
-            start_date = request.query_params.get('start_date')
-            end_date = request.query_params.get('end_date')
-
-            if months:
-                q_months = Q()
-                for m_str in months:
-                    try:
-                        year, month = m_str.split('-')
-                        q_months |= Q(fecha_actualizacion__year=year, fecha_actualizacion__month=month)
-                    except ValueError:
-                        pass
-                if q_months:
-                    pedidos = pedidos.filter(q_months)
-            else:
-                if start_date:
-                    pedidos = pedidos.filter(fecha_actualizacion__date__gte=start_date)
-                if end_date:
-                    pedidos = pedidos.filter(fecha_actualizacion__date__lte=end_date)
-
-        # 2. Clientes
-        if 'clients' not in exclude_params:
-            cliente_ids = request.query_params.getlist('cliente_id[]')
-            if cliente_ids:
-                pedidos = pedidos.filter(cliente_id__in=cliente_ids)
-            elif request.query_params.get('cliente_id'):
-                pedidos = pedidos.filter(cliente_id=request.query_params.get('cliente_id'))
-
-        # 3. Tipos de Cliente
-        if 'client_types' not in exclude_params:
-            client_types = request.query_params.getlist('client_type[]')
-            if client_types:
-                filter_new = 'new' in client_types
-                filter_recurring = 'recurring' in client_types
-
-                # Sub-query común para identificar recurrentes
-                recurring_qs = Pedido.objects.filter(estado='completado').values('cliente').annotate(
-                    cnt=Count('id')).filter(cnt__gt=1).values('cliente')
-
-                if filter_new and not filter_recurring:
-                    pedidos = pedidos.exclude(cliente_id__in=recurring_qs)
-                elif filter_recurring and not filter_new:
-                    pedidos = pedidos.filter(cliente_id__in=recurring_qs)
-
-        # 4. Región
-        apply_region = 'regions' not in exclude_params
-        if apply_region:
-            regions = request.query_params.getlist('region[]')
-            if not regions and request.query_params.get('region'):
-                regions = request.query_params.get('region').split(',')
-            if regions:
-                pedidos = pedidos.filter(region__in=regions)
-
-        # 5. Comuna
-        # (Generalmente depende de región, pero en facetas cruzadas, si filtro comuna, limito clientes)
-        if 'comunas' not in exclude_params:
-            comunas = request.query_params.getlist('comuna[]')
-            if not comunas and request.query_params.get('comuna'):
-                comunas = request.query_params.get('comuna').split(',')
-            if comunas:
-                pedidos = pedidos.filter(comuna__in=comunas)
-
-        return pedidos
+    @cache_respuesta_bi('filter-options')
+    def get(self, request):
+        contexto = ContextoBI(parse_bi_filters(request.query_params))
+        return Response(seccion_filter_options(contexto), status=status.HTTP_200_OK)
+
 
+class BIBundleView(APIView):
+    """
+    Endpoint que entrega en un solo documento JSON las secciones del dashboard de Gerencia
+    (rentabilidad, kpis, dashboard, filter_options), evaluando los filtros una sola vez.
+    Uso: GET bi/bundle/?sections=kpis,dashboard&month[]=2025-01 (sin 'sections' = todas)
+    """
+    permission_classes = [IsGerencia]
+
+    @cache_respuesta_bi('bundle', parametros_extra=('sections',))
     def get(self, request):
-        # Generar QuerySets independientes para cada faceta
-
-        # 1. Clientes Disponibles (Filtrado por todo EXCEPTO Clientes)
-        # CORRECCIÓN: 'client_types' SÍ debe filtrar a los clientes.
-        # Si selecciono "Nuevos", solo quiero ver clientes nuevos en la lista.
-        qs_clients = self._get_filtered_queryset(request, exclude_params=['clients'])
-        available_client_ids = qs_clients.values_list('cliente_id', flat=True).distinct()
-
-        # 2. Regiones Disponibles (Filtrado por todo EXCEPTO Region/Comuna)
-        # Nota: Si selecciono una Comuna, ¿debo ver otras Regiones? Sí, para poder cambiar.
-        qs_regions = self._get_filtered_queryset(request, exclude_params=['regions', 'comunas'])
-        available_regions = qs_regions.exclude(
-            region__isnull=True).exclude(
-            region='').values_list(
-            'region',
-            flat=True).distinct()
-
-        # 3. Comunas Disponibles
-        # AQUI hay un matiz: Las comunas SI deben limitarse por la REGIÓN seleccionada (Jerárquico),
-        # pero NO por la Comuna seleccionada (para permitir cambiar de comuna dentro de la región).
-        # Así que excluimos 'comunas' pero MANTENEMOS 'regions' (por defecto no está en exclude).
-        qs_comunas = self._get_filtered_queryset(request, exclude_params=['comunas'])
-        available_comunas = qs_comunas.exclude(
-            comuna__isnull=True).exclude(
-            comuna='').values_list(
-            'comuna',
-            flat=True).distinct()
-
-        # 4. Meses Disponibles (Filtrado por todo EXCEPTO Fecha)
-        qs_months = self._get_filtered_queryset(request, exclude_params=['months'])
-        available_months = qs_months.annotate(
-            month_str=Concat(
-                ExtractYear('fecha_actualizacion'),
-                Value('-'),
-                LPad(Cast(ExtractMonth('fecha_actualizacion'), CharField()), 2, Value('0')),
-                output_field=CharField()
-            )
-        ).values_list('month_str', flat=True).distinct().order_by('-month_str')
+        try:
+            secciones = parse_secciones(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        bundle = construir_bundle(parse_bi_filters(request.query_params), secciones)
+        return Response(bundle, status=status.HTTP_200_OK)
+
+
+class BICacheStatsView(APIView):
+    """
+    Endpoint de diagnóstico del caché BI.
+    Retorna la versión de datos vigente y los aciertos/fallos por endpoint (para ajustar el TTL).
+    """
+    permission_classes = [IsGerencia]
+
+    def get(self, request):
+        return Response(estadisticas_cache_bi(), status=status.HTTP_200_OK)
 
-        return Response({
-            'clients': list(available_client_ids),
-            'regions': list(available_regions),
-            'comunas': list(available_comunas),
-            'months': list(available_months)
-        }, status=status.HTTP_200_OK)
+
+class PDFMetricsView(APIView):
+    """
+    Endpoint de diagnóstico del servicio de render de PDFs.
+    Retorna profundidad de cola, tiempos de render, timeouts y rechazos del worker que atiende el request.
+    """
+    permission_classes = [IsGerencia]
+
+    def get(self, request):
+        return Response(estadisticas_pdf(), status=status.HTTP_200_OK)
 
 
 class RechazarPedidoView(APIView):
     """
     Endpoint para rechazar/cancelar manualmente una solicitud o cotización.
-    Cambia el estado a 'rechazado'.
+    Cambia el estado a 'rechazado' (desde solicitud, cotizado o aceptado).
     """
     permission_classes = [IsVendedorOrGerencia]
 
     def post(self, request, pk):
         try:
-            pedido = Pedido.objects.get(pk=pk)
-            # Validar estados permitidos para rechazar
-            if pedido.estado not in ['solicitud', 'cotizado', 'aceptado']:  # Aceptado tb por si acaso
-                return Response({'error': f'No se puede rechazar un pedido en estado {pedido.estado}.'},
-                                status=status.HTTP_400_BAD_REQUEST)
-
-            pedido.estado = 'rechazado'
-            pedido.save()
+            transicionar('rechazar', pk=pk)
             return Response({'status': 'Pedido rechazado correctamente'}, status=status.HTTP_200_OK)
+        except ConflictoTransicion as e:
+            return Response({'error': f'No se puede rechazar un pedido en estado {e.estado_actual}.',
+                             'estado_actual': e.estado_actual},
+                            status=status.HTTP_400_BAD_REQUEST)
         except Pedido.DoesNotExist:
             return Response({'error': 'Pedido no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
@@ -130,6 +130,20 @@ sudo systemctl daemon-reload
 sudo systemctl restart gunicorn_clarotec
 sudo systemctl enable gunicorn_clarotec
 
+# Worker de correos (los requests solo encolan; este servicio envía por SMTP)
+sudo sed -i "s/User=ubuntu/User=$USER/g" $TARGET_DIR/deploy_scripts/outbox_clarotec.service
+sudo cp $TARGET_DIR/deploy_scripts/outbox_clarotec.service /etc/systemd/system/
+sudo systemctl daemon-reload
+sudo systemctl restart outbox_clarotec
+sudo systemctl enable outbox_clarotec
+
+# Purga de claves Idempotency-Key vencidas (reintentos del formulario de solicitudes)
+sudo sed -i "s/User=ubuntu/User=$USER/g" $TARGET_DIR/deploy_scripts/idempotencia_clarotec.service
+sudo cp $TARGET_DIR/deploy_scripts/idempotencia_clarotec.service /etc/systemd/system/
+sudo systemctl daemon-reload
+sudo systemctl restart idempotencia_clarotec
+sudo systemctl enable idempotencia_clarotec
+
 # 7. Configurar Nginx
 echo -e "${GREEN}--> Configurando Nginx...${NC}"
 sudo cp $TARGET_DIR/deploy_scripts/nginx.conf /etc/nginx/sites-available/proyecto_clarotec
@@ -0,0 +1,19 @@
+import React from 'react';
+
+// Botón para cargar la siguiente página de un listado paginado por cursor.
+// 'note' es un aviso opcional bajo el botón (ej: qué abarca el orden de la tabla).
+const LoadMoreButton = ({ nextUrl, loading, onLoadMore, note }) => {
+    // Sin página siguiente no se muestra nada
+    if (!nextUrl) return null;
+
+    return (
+        <div className="text-center mt-3">
+            <button className="btn btn-outline-primary" onClick={onLoadMore} disabled={loading}>
+                {loading ? 'Cargando...' : 'Cargar más'}
+            </button>
+            {note && <div className="form-text">{note}</div>}
+        </div>
+    );
+};
+
+export default LoadMoreButton;
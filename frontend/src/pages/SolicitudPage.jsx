@@ -6,7 +6,7 @@
  * - Integra 3 métodos de entrada: Link, Manual y Catálogo.
  * - Gestiona el carrito de compras temporal antes de enviar al backend.
  */
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useCart } from '../context/CartContext';
 import { useAuth } from '../hooks/useAuth';
 import LinkInput from '../components/quotation/LinkInput';
@@ -35,6 +35,9 @@ const SolicitudPage = () => {
         comuna: ''
     });
     const [submitStatus, setSubmitStatus] = useState({ loading: false, success: false, error: '' });
+    // Clave de idempotencia del envío actual: los reintentos del mismo contenido la reutilizan
+    // para que el backend no cree un pedido duplicado ({ payload, key })
+    const idempotencyRef = useRef(null);
     const [comunasDisponibles, setComunasDisponibles] = useState([]);
 
     // Estado para búsqueda y paginación del catálogo
@@ -131,8 +134,20 @@ const SolicitudPage = () => {
             }))
         };
 
+        // Nueva clave solo si cambió el contenido de la solicitud
+        const contenido = JSON.stringify(payload);
+        if (!idempotencyRef.current || idempotencyRef.current.payload !== contenido) {
+            const key = window.crypto?.randomUUID
+                ? window.crypto.randomUUID()
+                : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+            idempotencyRef.current = { payload: contenido, key };
+        }
+
         try {
-            await axios.post(`${config.API_URL}/solicitudes/`, payload);
+            await axios.post(`${config.API_URL}/solicitudes/`, payload, {
+                headers: { 'Idempotency-Key': idempotencyRef.current.key }
+            });
+            idempotencyRef.current = null;
             setSubmitStatus({ loading: false, success: true, error: '' });
             clearCart();
             setClientData({ nombre: '', apellido: '', email: '', empresa: '', telefono: '', region: '', comuna: '' });
@@ -204,7 +204,11 @@ describe('SolicitudPage Component', () => {
         // Verificamos que se llamó con la URL correcta.
         expect(axios.post).toHaveBeenCalledWith(
             expect.stringContaining('/api/solicitudes/'),
-            expect.any(Object) // Payload
+            expect.any(Object), // Payload
+            // Clave de idempotencia para que los reintentos no dupliquen la solicitud
+            expect.objectContaining({
+                headers: expect.objectContaining({ 'Idempotency-Key': expect.any(String) })
+            })
         );
 
         // 6. Verificamos pantalla de éxito.
@@ -101,7 +101,7 @@ const ClientRetentionPage = () => {
             await axios.post(`${config.API_URL}/bi/retention/email/${clientId}/`, {}, {
                 headers: { Authorization: `Bearer ${token}` }
             });
-            setToastMessage(`Correo enviado exitosamente a ${clientEmail}`);
+            setToastMessage(`Correo encolado para ${clientEmail}`);
             setToastVariant('success');
             setShowToast(true);
             fetchData(); // Recargar para actualizar fecha de contacto
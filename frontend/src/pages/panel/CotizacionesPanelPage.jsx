@@ -2,7 +2,9 @@ import React, { useState, useEffect, useCallback } from 'react';
 import { Link } from 'react-router-dom';
 import axios from 'axios';
 import PaginationControl from '../../components/common/PaginationControl';
+import LoadMoreButton from '../../components/common/LoadMoreButton';
 import config from '../../config';
+import { fetchPage, panelFilterParams, useDebouncedValue } from '../../utils/pagination';
 
 const CotizacionesPanelPage = () => {
     const [cotizaciones, setCotizaciones] = useState([]);
@@ -12,8 +14,11 @@ const CotizacionesPanelPage = () => {
     const [endDate, setEndDate] = useState('');
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
+    const [nextUrl, setNextUrl] = useState(null); // Siguiente página del servidor
+    const [loadingMore, setLoadingMore] = useState(false);
     const [currentPage, setCurrentPage] = useState(1);
     const itemsPerPage = 10;
+    const debouncedSearch = useDebouncedValue(searchTerm);
 
     const [activeTab, setActiveTab] = useState('pendientes'); // 'pendientes' or 'historial'
 
@@ -30,8 +35,15 @@ const CotizacionesPanelPage = () => {
     };
 
 
-    const fetchCotizaciones = useCallback(async () => {
+    // Al cambiar de pestaña se muestra el indicador de carga; al cambiar los filtros no
+    // (la página completa se reemplaza por el indicador y el buscador perdería el foco)
+    const changeTab = (tab) => {
+        if (tab === activeTab) return;
         setLoading(true);
+        setActiveTab(tab);
+    };
+
+    const fetchCotizaciones = useCallback(async () => {
         try {
             const token = localStorage.getItem('accessToken');
             let url = `${config.API_URL}/pedidos/cotizados/`;
@@ -40,18 +52,34 @@ const CotizacionesPanelPage = () => {
                 url = `${config.API_URL}/pedidos/historial-cotizaciones/`;
             }
 
-            const response = await axios.get(url, {
-                headers: { 'Authorization': `Bearer ${token}` }
-            });
-            setCotizaciones(response.data);
-            setFilteredCotizaciones(response.data);
+            // Búsqueda y fechas se filtran en el servidor (todo el listado, no solo lo cargado)
+            const page = await fetchPage(url + panelFilterParams({ search: debouncedSearch, startDate, endDate }), token);
+            setCotizaciones(page.results);
+            setFilteredCotizaciones(page.results);
+            setNextUrl(page.next);
         } catch (err) {
             console.error("Error al obtener las cotizaciones:", err);
             setError('No se pudieron cargar las cotizaciones.');
         } finally {
             setLoading(false);
         }
-    }, [activeTab]);
+    }, [activeTab, debouncedSearch, startDate, endDate]);
+
+    // Agrega la siguiente página del listado a los resultados ya cargados
+    const loadMore = async () => {
+        setLoadingMore(true);
+        try {
+            const token = localStorage.getItem('accessToken');
+            const page = await fetchPage(nextUrl, token);
+            setCotizaciones(prev => [...prev, ...page.results]);
+            setNextUrl(page.next);
+        } catch (err) {
+            console.error("Error al cargar más resultados:", err);
+            setError('No se pudieron cargar más resultados.');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
 
     useEffect(() => {
         fetchCotizaciones();
@@ -179,7 +207,7 @@ const CotizacionesPanelPage = () => {
                 <li className="nav-item">
                     <button
                         className={`nav-link ${activeTab === 'pendientes' ? 'active' : ''}`}
-                        onClick={() => setActiveTab('pendientes')}
+                        onClick={() => changeTab('pendientes')}
                     >
                         Pendientes
                     </button>
@@ -187,7 +215,7 @@ const CotizacionesPanelPage = () => {
                 <li className="nav-item">
                     <button
                         className={`nav-link ${activeTab === 'historial' ? 'active' : ''}`}
-                        onClick={() => setActiveTab('historial')}
+                        onClick={() => changeTab('historial')}
                     >
                         Historial
                     </button>
@@ -352,6 +380,10 @@ const CotizacionesPanelPage = () => {
                             onPageChange={setCurrentPage}
                         />
                     )}
+
+                    {/* Siguiente página del servidor (paginación por cursor) */}
+                    <LoadMoreButton nextUrl={nextUrl} loading={loadingMore} onLoadMore={loadMore}
+                        note="El orden por columna se aplica a los resultados cargados." />
                 </>
             )}
         </div>
@@ -2,7 +2,17 @@ import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 import { Modal, Button } from 'react-bootstrap';
 import PaginationControl from '../../components/common/PaginationControl';
+import LoadMoreButton from '../../components/common/LoadMoreButton';
 import config from '../../config';
+import { fetchPage, panelFilterParams, useDebouncedValue } from '../../utils/pagination';
+import { usePedidoChanges } from '../../utils/changes';
+
+// Campos que usa este panel (el listado no trae precios ni opciones de envío)
+const CAMPOS_LISTADO = [
+    'id', 'estado', 'fecha_actualizacion', 'fecha_despacho', 'metodo_envio', 'nombre_transporte_custom',
+    'transportista', 'numero_guia', 'cliente.nombre', 'cliente.empresa', 'cliente.email',
+    'items.id', 'items.descripcion', 'items.cantidad'
+].join(',');
 
 const COURIERS_LABELS = {
     'STARKEN': 'Starken',
@@ -121,13 +131,19 @@ const DespachosPanelPage = () => {
     const [endDate, setEndDate] = useState('');
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
+    const [nextUrl, setNextUrl] = useState(null); // Siguiente página del servidor
+    const [loadingMore, setLoadingMore] = useState(false);
     const [selectedPedido, setSelectedPedido] = useState(null); // For dispatch modal
     const [viewPedido, setViewPedido] = useState(null); // For view details modal
     const [currentPage, setCurrentPage] = useState(1);
     const [activeTab, setActiveTab] = useState('por_despachar'); // 'por_despachar' | 'historial'
     const [sortConfig, setSortConfig] = useState({ key: 'id', direction: 'desc' });
 
+    // Sincroniza el listado con los cambios de su panel (pedidos/changes/)
+    usePedidoChanges(activeTab === 'por_despachar' ? 'para-despachar' : 'historial-despachos', CAMPOS_LISTADO, setPedidos);
+
     const itemsPerPage = 10;
+    const debouncedSearch = useDebouncedValue(searchTerm);
 
     const fetchPedidos = React.useCallback(async () => {
         setLoading(true);
@@ -138,23 +154,42 @@ const DespachosPanelPage = () => {
                 ? `${config.API_URL}/pedidos/para-despachar/`
                 : `${config.API_URL}/pedidos/historial-despachos/`;
 
-            const response = await axios.get(endpoint, {
-                headers: { 'Authorization': `Bearer ${token}` }
-            });
-            setPedidos(response.data);
-            setFilteredPedidos(response.data);
+            // Búsqueda y fechas se filtran en el servidor (todo el listado, no solo lo cargado)
+            const filtros = panelFilterParams({ search: debouncedSearch, startDate, endDate }, CAMPOS_LISTADO);
+            const page = await fetchPage(`${endpoint}${filtros}`, token);
+            setPedidos(page.results);
+            setFilteredPedidos(page.results);
+            setNextUrl(page.next);
         } catch (err) {
             console.error("Error fetching pedidos:", err);
             setError('No se pudieron cargar los pedidos.');
         } finally {
             setLoading(false);
         }
-    }, [activeTab]);
+    }, [activeTab, debouncedSearch, startDate, endDate]);
+
+    // Agrega la siguiente página del listado a los resultados ya cargados
+    const loadMore = async () => {
+        setLoadingMore(true);
+        try {
+            const token = localStorage.getItem('accessToken');
+            const page = await fetchPage(nextUrl, token);
+            setPedidos(prev => [...prev, ...page.results]);
+            setNextUrl(page.next);
+        } catch (err) {
+            console.error("Error al cargar más resultados:", err);
+            setError('No se pudieron cargar más resultados.');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
 
     useEffect(() => {
         fetchPedidos();
     }, [fetchPedidos]);
 
+    // Los pedidos ya vienen filtrados del servidor; se vuelve a filtrar localmente para que
+    // la búsqueda responda al escribir y para los pedidos que agrega la sincronización de cambios
     useEffect(() => {
         let filtered = pedidos;
 
@@ -528,6 +563,10 @@ const DespachosPanelPage = () => {
                             onPageChange={setCurrentPage}
                         />
                     )}
+
+                    {/* Siguiente página del servidor (paginación por cursor) */}
+                    <LoadMoreButton nextUrl={nextUrl} loading={loadingMore} onLoadMore={loadMore}
+                        note="El orden por columna se aplica a los resultados cargados." />
                 </>
             )}
         </div>
@@ -3,7 +3,17 @@ import axios from 'axios';
 
 import { Modal, Button } from 'react-bootstrap';
 import PaginationControl from '../../components/common/PaginationControl';
+import LoadMoreButton from '../../components/common/LoadMoreButton';
 import config from '../../config';
+import { fetchPage, panelFilterParams, useDebouncedValue } from '../../utils/pagination';
+import { usePedidoChanges } from '../../utils/changes';
+
+// Campos que usa este panel (el listado no trae opciones de envío ni datos de despacho)
+const CAMPOS_LISTADO = [
+    'id', 'estado', 'fecha_actualizacion', 'id_seguimiento', 'porcentaje_urgencia', 'costo_envio_estimado',
+    'total_cotizacion', 'cliente.nombre', 'cliente.apellido', 'cliente.empresa', 'cliente.email',
+    'cliente.telefono', 'items.id', 'items.descripcion', 'items.cantidad', 'items.precio_unitario'
+].join(',');
 
 const PagosPanelPage = () => {
     const [pedidos, setPedidos] = useState([]);
@@ -15,21 +25,28 @@ const PagosPanelPage = () => {
     const [endDate, setEndDate] = useState('');
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
+    const [nextUrl, setNextUrl] = useState(null); // Siguiente página del servidor
+    const [loadingMore, setLoadingMore] = useState(false);
     const [updatingId, setUpdatingId] = useState(null);
     const [currentPage, setCurrentPage] = useState(1);
     const [activeTab, setActiveTab] = useState('pendientes'); // 'pendientes' | 'historial'
 
+    // Sincroniza el listado con los cambios de su panel (pedidos/changes/)
+    usePedidoChanges(activeTab === 'pendientes' ? 'aceptados' : 'historial-pagos', CAMPOS_LISTADO, setPedidos);
+
     const [showModal, setShowModal] = useState(false);
     const [selectedPedido, setSelectedPedido] = useState(null);
     const [sortConfig, setSortConfig] = useState({ key: 'id', direction: 'desc' });
 
     const itemsPerPage = 10;
+    const debouncedSearch = useDebouncedValue(searchTerm);
 
 
 
+    // Se vuelve a pedir al cambiar de pestaña o de filtros (fetchPedidos depende de ambos)
     useEffect(() => {
         fetchPedidos();
-    }, [activeTab]); // fetchPedidos is stable if wrapped in useCallback, or we can omit it if we trust it doesn't change often, but better to wrap it.
+    }, [fetchPedidos]);
 
 
     useEffect(() => {
@@ -118,18 +135,35 @@ const PagosPanelPage = () => {
                 ? `${config.API_URL}/pedidos/aceptados/`
                 : `${config.API_URL}/pedidos/historial-pagos/`;
 
-            const response = await axios.get(endpoint, {
-                headers: { 'Authorization': `Bearer ${token}` }
-            });
-            setPedidos(response.data);
-            setFilteredPedidos(response.data);
+            // Búsqueda y fechas se filtran en el servidor (todo el listado, no solo lo cargado)
+            const filtros = panelFilterParams({ search: debouncedSearch, startDate, endDate }, CAMPOS_LISTADO);
+            const page = await fetchPage(`${endpoint}${filtros}`, token);
+            setPedidos(page.results);
+            setFilteredPedidos(page.results);
+            setNextUrl(page.next);
         } catch (err) {
             console.error("Error al cargar pedidos:", err);
             setError('No se pudieron cargar los pedidos.');
         } finally {
             setLoading(false);
         }
-    }, [activeTab]);
+    }, [activeTab, debouncedSearch, startDate, endDate]);
+
+    // Agrega la siguiente página del listado a los resultados ya cargados
+    const loadMore = async () => {
+        setLoadingMore(true);
+        try {
+            const token = localStorage.getItem('accessToken');
+            const page = await fetchPage(nextUrl, token);
+            setPedidos(prev => [...prev, ...page.results]);
+            setNextUrl(page.next);
+        } catch (err) {
+            console.error("Error al cargar más resultados:", err);
+            setError('No se pudieron cargar más resultados.');
+        } finally {
+            setLoadingMore(false);
+        }
+    };
 
     const handleConfirmarPago = async (pedidoId) => {
         if (!window.confirm(`¿Estás seguro de que deseas confirmar el pago para el pedido #${pedidoId}?`)) {
@@ -449,6 +483,10 @@ const PagosPanelPage = () => {
                             onPageChange={setCurrentPage}
                         />
                     )}
+
+                    {/* Siguiente página del servidor (paginación por cursor) */}
+                    <LoadMoreButton nextUrl={nextUrl} loading={loadingMore} onLoadMore={loadMore}
+                        note="El orden por columna se aplica a los resultados cargados." />
                 </>
             )}
 
@@ -3,7 +3,9 @@ import { Link } from 'react-router-dom';
 import axios from 'axios';
 import { Modal, Button } from 'react-bootstrap';
 import PaginationControl from '../../components/common/PaginationControl';
+import LoadMoreButton from '../../components/common/LoadMoreButton';
 import config from '../../config';
+import { fetchPage, panelFilterParams, useDebouncedValue } from '../../utils/pagination';
 
 const SolicitudesPanelPage = () => {
     const [solicitudes, setSolicitudes] = useState([]);
@@ -11,6 +13,8 @@ const SolicitudesPanelPage = () => {
     const [searchTerm, setSearchTerm] = useState('');
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState('');
+    const [nextUrl, setNextUrl] = useState(null); // Siguiente página del servidor
+    const [loadingMore, setLoadingMore] = useState(false);
     const [currentPage, setCurrentPage] = useState(1);
 
     // Filtros de fecha
@@ -34,12 +38,9 @@ const SolicitudesPanelPage = () => {
     };
 
     const itemsPerPage = 10;
+    const debouncedSearch = useDebouncedValue(searchTerm);
 
-    useEffect(() => {
-        fetchSolicitudes();
-    }, []);
-
-    const fetchSolicitudes = async () => {
+    const fetchSolicitudes = React.useCallback(async () => {
         try {
             const token = localStorage.getItem('accessToken');
             if (!token) {
@@ -48,20 +49,40 @@ const SolicitudesPanelPage = () => {
                 return;
             }
 
-            const response = await axios.get(`${config.API_URL}/pedidos/solicitudes/`, {
-                headers: {
-                    'Authorization': `Bearer ${token}`
-                }
-            });
+            // Búsqueda y fechas se filtran en el servidor (todo el listado, no solo lo cargado)
+            const filtros = panelFilterParams({ search: debouncedSearch, startDate, endDate });
+            const page = await fetchPage(`${config.API_URL}/pedidos/solicitudes/${filtros}`, token);
 
-            setSolicitudes(response.data);
-            setFilteredSolicitudes(response.data);
+            setSolicitudes(page.results);
+            setFilteredSolicitudes(page.results);
+            setNextUrl(page.next);
         } catch (err) {
             console.error("Error al obtener las solicitudes:", err);
             setError('No se pudieron cargar las solicitudes. Intente de nuevo más tarde.');
         } finally {
             setLoading(false);
         }
+    }, [debouncedSearch, startDate, endDate]);
+
+    // Se vuelve a pedir al cambiar los filtros
+    useEffect(() => {
+        fetchSolicitudes();
+    }, [fetchSolicitudes]);
+
+    // Agrega la siguiente página del listado a los resultados ya cargados
+    const loadMore = async () => {
+        setLoadingMore(true);
+        try {
+            const token = localStorage.getItem('accessToken');
+            const page = await fetchPage(nextUrl, token);
+            setSolicitudes(prev => [...prev, ...page.results]);
+            setNextUrl(page.next);
+        } catch (err) {
+            console.error("Error al cargar más resultados:", err);
+            setError('No se pudieron cargar más resultados.');
+        } finally {
+            setLoadingMore(false);
+        }
     };
 
     const filterSolicitudes = React.useCallback(() => {
@@ -354,6 +375,10 @@ const SolicitudesPanelPage = () => {
                             onPageChange={setCurrentPage}
                         />
                     )}
+
+                    {/* Siguiente página del servidor (paginación por cursor) */}
+                    <LoadMoreButton nextUrl={nextUrl} loading={loadingMore} onLoadMore={loadMore}
+                        note="El orden por columna se aplica a los resultados cargados." />
                 </>
             )}
 
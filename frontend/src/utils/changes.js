@@ -0,0 +1,59 @@
+import { useEffect } from 'react';
+import axios from 'axios';
+import config from '../config';
+
+// Intervalo entre sondeos de cambios de los paneles (ms)
+export const INTERVALO_CAMBIOS = 30000;
+
+// Aplica a un listado los cambios de su panel (respuesta de pedidos/changes/):
+// reemplaza los pedidos actualizados, agrega los nuevos al inicio y quita las bajas.
+export const applyChanges = (pedidos, changes, panel) => {
+    const cambiosPanel = changes.paneles[panel];
+    if (!cambiosPanel) return pedidos;
+    const bajas = new Set(cambiosPanel.bajas);
+    const actualizados = new Set(cambiosPanel.actualizados);
+    const porId = new Map(changes.pedidos.filter(p => actualizados.has(p.id)).map(p => [p.id, p]));
+    // Sin cambios en este panel se conserva el mismo arreglo (no se vuelve a renderizar)
+    if (bajas.size === 0 && porId.size === 0) return pedidos;
+
+    const existentes = new Set(pedidos.map(p => p.id));
+    const nuevos = [...porId.values()].filter(p => !existentes.has(p.id));
+    return [...nuevos, ...pedidos.filter(p => !bajas.has(p.id)).map(p => porId.get(p.id) || p)];
+};
+
+// Mantiene un listado al día sondeando solo los cambios de su panel, en lugar de volver a pedirlo completo.
+// El primer sondeo (sin 'since') solo obtiene el cursor de partida.
+export const usePedidoChanges = (panel, fields, setPedidos, intervalo = INTERVALO_CAMBIOS) => {
+    useEffect(() => {
+        let cursor = null;
+        let activo = true;
+
+        const sondear = async () => {
+            try {
+                let hayMas = true;
+                // Si hubo muchos cambios se piden las tandas siguientes de inmediato
+                while (activo && hayMas) {
+                    const params = { paneles: panel, fields };
+                    if (cursor) params.since = cursor;
+                    const { data } = await axios.get(`${config.API_URL}/pedidos/changes/`, {
+                        params,
+                        headers: { 'Authorization': `Bearer ${localStorage.getItem('accessToken')}` }
+                    });
+                    if (!activo) return;
+                    if (cursor) setPedidos(prev => applyChanges(prev, data, panel));
+                    cursor = data.cursor;
+                    hayMas = data.hay_mas;
+                }
+            } catch (err) {
+                console.error("Error al sincronizar cambios:", err);
+            }
+        };
+
+        sondear();
+        const id = setInterval(sondear, intervalo);
+        return () => {
+            activo = false;
+            clearInterval(id);
+        };
+    }, [panel, fields, setPedidos, intervalo]);
+};
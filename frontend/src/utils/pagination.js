@@ -0,0 +1,39 @@
+import { useEffect, useState } from 'react';
+import axios from 'axios';
+
+// Obtiene una página de un listado paginado por cursor ({ next, previous, results }).
+// Acepta también respuestas sin paginar (arreglo) para endpoints que aún no paginan.
+export const fetchPage = async (url, token) => {
+    // Pide la página con el token del usuario
+    const response = await axios.get(url, {
+        headers: { 'Authorization': `Bearer ${token}` }
+    });
+    // Respuesta sin paginar: todos los resultados y sin página siguiente
+    if (Array.isArray(response.data)) {
+        return { results: response.data, next: null };
+    }
+    // Respuesta paginada: resultados de la página y URL de la siguiente
+    return { results: response.data.results, next: response.data.next };
+};
+
+// Parámetros de búsqueda y rango de fechas de los listados del panel. El servidor los aplica
+// antes de paginar, así el filtro cubre todo el listado y no solo las páginas ya cargadas.
+export const panelFilterParams = ({ search, startDate, endDate }, fields) => {
+    const params = new URLSearchParams();
+    if (fields) params.set('fields', fields);
+    if (search && search.trim()) params.set('search', search.trim());
+    if (startDate) params.set('start_date', startDate);
+    if (endDate) params.set('end_date', endDate);
+    const query = params.toString();
+    return query ? `?${query}` : '';
+};
+
+// Valor que se actualiza solo tras 'delay' ms sin cambios (evita una consulta por tecla en la búsqueda)
+export const useDebouncedValue = (value, delay = 400) => {
+    const [debounced, setDebounced] = useState(value);
+    useEffect(() => {
+        const id = setTimeout(() => setDebounced(value), delay);
+        return () => clearTimeout(id);
+    }, [value, delay]);
+    return debounced;
+};